@@ -79,7 +79,7 @@ class Settings(BaseModel):
     SEARCH_DAILY_LIMIT: int = int(os.getenv("SEARCH_DAILY_LIMIT", "500"))
     APP_DATA_DIR: str = _DATA_DIR
     SEARCH_USAGE_STORAGE: str = os.getenv(
-        "SEARCH_USAGE_STORAGE", str(Path(_DATA_DIR) / "search_usage.json")
+        "SEARCH_USAGE_STORAGE", str(Path(_DATA_DIR) / "search_usage.db")
     )
     SEARCH_HTTP_TIMEOUT: float = float(os.getenv("SEARCH_HTTP_TIMEOUT", "15"))
     GOOGLE_CSE_MIN_RESULTS_PER_QUERY: int = int(os.getenv("GOOGLE_CSE_MIN_RESULTS_PER_QUERY", "30"))
@@ -89,6 +89,16 @@ class Settings(BaseModel):
     CRAWLER_DELAY_MAX: float = float(os.getenv("CRAWLER_DELAY_MAX", "1.8"))
     CRAWLER_DOMAIN_COOLDOWN: float = float(os.getenv("CRAWLER_DOMAIN_COOLDOWN", "2.5"))
     CRAWLER_PROXIES: List[str] = Field(default_factory=_crawler_proxies_default)
+    # 网页抓取缓存：新鲜期内直接复用，过期后用 ETag/Last-Modified 条件请求校验；路径留空则禁用
+    CRAWLER_CACHE_PATH: str = os.getenv("CRAWLER_CACHE_PATH", str(Path(_DATA_DIR) / "crawler_cache.db"))
+    CRAWLER_CACHE_FRESH_SEC: float = float(os.getenv("CRAWLER_CACHE_FRESH_SEC", "600"))
+    CRAWLER_CACHE_MAX_MB: int = int(os.getenv("CRAWLER_CACHE_MAX_MB", "200"))
+    CRAWLER_MAX_BODY_BYTES: int = int(os.getenv("CRAWLER_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+    CRAWLER_EXTRACT_WORKERS: int = int(os.getenv("CRAWLER_EXTRACT_WORKERS", "2"))  # 网页正文提取进程池大小
+    # 域名限速状态文件：留空时只在进程内共享，配置后同一主机上的多个 worker 共用
+    CRAWLER_DOMAIN_LIMITER_PATH: str = os.getenv("CRAWLER_DOMAIN_LIMITER_PATH", "")
+    CRAWLER_BLOCK_BACKOFF: float = float(os.getenv("CRAWLER_BLOCK_BACKOFF", "5"))  # 403/429 后该域名暂停秒数
+    CRAWLER_MAX_CONNECTIONS: int = int(os.getenv("CRAWLER_MAX_CONNECTIONS", "32"))
     APP_SETTINGS_PATH: str = os.getenv("APP_SETTINGS_PATH", str(Path(_DATA_DIR) / "app_settings.json"))
     MILVUS_LITE_PATH: str = os.getenv("MILVUS_LITE_PATH", str(Path(_DATA_DIR) / "milvus.db"))
     EMBEDDING_PROVIDERS_PATH: str = os.getenv(
@@ -102,6 +112,11 @@ class Settings(BaseModel):
     POSTGRES_DSN: Optional[str] = os.getenv("POSTGRES_DSN")
     POSTGRES_POOL_MIN: int = int(os.getenv("POSTGRES_POOL_MIN", "1"))
     POSTGRES_POOL_MAX: int = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+    # 把每个 span（检索/LLM/Embedding/soffice/ASR 等阶段耗时）写成一行结构化日志；/metrics 不受影响
+    TRACE_LOG_SPANS: bool = os.getenv("TRACE_LOG_SPANS", "false").lower() == "true"
+    # 流式对话 delta 合并：累计字符数达到上限或首个未发送 token 等待超过间隔（毫秒）即发送一帧；间隔为 0 时逐 token 发送
+    CHAT_STREAM_FLUSH_CHARS: int = int(os.getenv("CHAT_STREAM_FLUSH_CHARS", "256"))
+    CHAT_STREAM_FLUSH_INTERVAL_MS: int = int(os.getenv("CHAT_STREAM_FLUSH_INTERVAL_MS", "40"))
 
     # 是否启用 Mock 模式（对所有 LLM 生效，或者逐个 LLM 配置覆盖）
     MOCK_LLM: bool = os.getenv("MOCK_LLM", "true").lower() == "true"
@@ -124,6 +139,7 @@ class Settings(BaseModel):
     ASR_ENABLE_PREPROCESSING: bool = os.getenv("ASR_ENABLE_PREPROCESSING", "true").lower() == "true"
     ASR_NOISE_REDUCTION: bool = os.getenv("ASR_NOISE_REDUCTION", "true").lower() == "true"
     ASR_NORMALIZE_AUDIO: bool = os.getenv("ASR_NORMALIZE_AUDIO", "true").lower() == "true"
+    ASR_PREPROCESS_WORKERS: int = int(os.getenv("ASR_PREPROCESS_WORKERS", "2"))  # 预处理进程池大小
     
     # 说话人识别（Diarization）- CPU 版本默认禁用（需要 PyTorch）
     ASR_ENABLE_DIARIZATION: bool = os.getenv("ASR_ENABLE_DIARIZATION", "false").lower() == "true"
@@ -135,6 +151,19 @@ class Settings(BaseModel):
     # 时间戳
     ASR_ENABLE_TIMESTAMPS: bool = os.getenv("ASR_ENABLE_TIMESTAMPS", "true").lower() == "true"
     ASR_WORD_TIMESTAMPS: bool = os.getenv("ASR_WORD_TIMESTAMPS", "false").lower() == "true"
+    
+    # 长音频分段转写：超过阈值的录音按静音切段，并发调用远程 API，失败片段单独重试
+    ASR_SEGMENT_THRESHOLD_SECONDS: float = float(os.getenv("ASR_SEGMENT_THRESHOLD_SECONDS", "300"))
+    ASR_SEGMENT_TARGET_SECONDS: float = float(os.getenv("ASR_SEGMENT_TARGET_SECONDS", "60"))
+    ASR_SEGMENT_MAX_SECONDS: float = float(os.getenv("ASR_SEGMENT_MAX_SECONDS", "90"))
+    ASR_SEGMENT_CONCURRENCY: int = int(os.getenv("ASR_SEGMENT_CONCURRENCY", "4"))
+    ASR_SEGMENT_MAX_RETRIES: int = int(os.getenv("ASR_SEGMENT_MAX_RETRIES", "2"))
+    ASR_SEGMENT_TIMEOUT: int = int(os.getenv("ASR_SEGMENT_TIMEOUT", "120"))  # 单个片段请求超时（秒）
+
+    # WebSocket 流式转写：partial 输出间隔、定稿窗口下限与上限（秒）
+    ASR_STREAM_PARTIAL_INTERVAL_SECONDS: float = float(os.getenv("ASR_STREAM_PARTIAL_INTERVAL_SECONDS", "2"))
+    ASR_STREAM_MIN_FINAL_SECONDS: float = float(os.getenv("ASR_STREAM_MIN_FINAL_SECONDS", "8"))
+    ASR_STREAM_MAX_WINDOW_SECONDS: float = float(os.getenv("ASR_STREAM_MAX_WINDOW_SECONDS", "30"))
 
     # 模板 LLM 分析配置
     TEMPLATE_LLM_ANALYSIS_ENABLED: bool = os.getenv("TEMPLATE_LLM_ANALYSIS_ENABLED", "true").lower() == "true"
@@ -143,6 +172,20 @@ class Settings(BaseModel):
     TEMPLATE_LLM_ANALYSIS_MAX_CHARS_PER_BLOCK: int = int(os.getenv("TEMPLATE_LLM_ANALYSIS_MAX_CHARS_PER_BLOCK", "300"))
     TEMPLATE_LLM_ANALYSIS_CACHE_BY_SHA256: bool = os.getenv("TEMPLATE_LLM_ANALYSIS_CACHE_BY_SHA256", "true").lower() == "true"
     TEMPLATE_LLM_ANALYSIS_VERSION: str = os.getenv("TEMPLATE_LLM_ANALYSIS_VERSION", "v1")
+    # 分析缓存：Postgres 持久化 + 进程内 LRU（条目数）
+    TEMPLATE_LLM_ANALYSIS_CACHE_MEMORY_SIZE: int = int(os.getenv("TEMPLATE_LLM_ANALYSIS_CACHE_MEMORY_SIZE", "128"))
+    # 其他分析器版本的缓存条目超过该小时数未命中才清理（滚动发布期间新旧版本并存）
+    TEMPLATE_LLM_ANALYSIS_CACHE_STALE_TTL_HOURS: int = int(os.getenv("TEMPLATE_LLM_ANALYSIS_CACHE_STALE_TTL_HOURS", "168"))
+
+    # 招投标审核/抽取上下文：每组文档（招标/投标）按相关性选片段的 token 预算
+    TENDER_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("TENDER_CONTEXT_TOKEN_BUDGET", "16000"))
+    # 审核按维度分片：每个分片每组文档的 token 预算、并发 LLM 调用数、失败重试次数与退避（秒）
+    TENDER_REVIEW_SHARD_TOKEN_BUDGET: int = int(os.getenv("TENDER_REVIEW_SHARD_TOKEN_BUDGET", "6000"))
+    TENDER_REVIEW_SHARD_CONCURRENCY: int = int(os.getenv("TENDER_REVIEW_SHARD_CONCURRENCY", "4"))
+    TENDER_REVIEW_SHARD_MAX_RETRIES: int = int(os.getenv("TENDER_REVIEW_SHARD_MAX_RETRIES", "2"))
+    TENDER_REVIEW_SHARD_RETRY_BACKOFF: float = float(os.getenv("TENDER_REVIEW_SHARD_RETRY_BACKOFF", "1.0"))
+    # 多文件导入：同时处理的文件数
+    TENDER_IMPORT_CONCURRENCY: int = int(os.getenv("TENDER_IMPORT_CONCURRENCY", "4"))
 
 
 class FeatureFlags(BaseModel):
@@ -0,0 +1,62 @@
+"""
+懒加载进程池
+
+CPU 密集且长时间持有 GIL 的任务（ASR 音频预处理、网页正文提取）放在线程里同样会卡住事件循环，
+需要交给独立进程。LazyProcessPool 统一处理首次使用时创建、应用退出时关闭，
+以及子进程异常退出（BrokenProcessPool）后丢弃旧池、下次调用时重建。
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+__all__ = ["LazyProcessPool", "BrokenProcessPool"]
+
+
+class LazyProcessPool:
+    """
+    首次使用时创建的 ProcessPoolExecutor
+
+    使用 spawn 启动，避免 fork 带出事件循环线程和数据库连接；
+    max_workers 在创建时读取，便于跟随配置。
+    """
+
+    def __init__(self, max_workers: Callable[[], int]):
+        self._max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=max(1, self._max_workers()),
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._pool
+
+    def shutdown(self) -> None:
+        """关闭进程池；之后再调用 get() / run() 会重新创建"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        在进程池中执行 fn(*args)
+
+        子进程异常退出（如 OOM 被杀）后进程池不可再用：先关闭旧池再抛出 BrokenProcessPool，
+        由调用方决定如何回退，下一次调用使用新池。
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.get(), fn, *args)
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
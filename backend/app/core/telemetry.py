@@ -0,0 +1,473 @@
+"""
+进程内指标与链路计时
+
+- 指标：Counter / Gauge / Histogram，按 Prometheus 文本格式（0.0.4）渲染，由 /metrics 暴露
+- 链路：span() 上下文管理器 / traced() 装饰器，结束时写入 span_duration_seconds 直方图，
+  并把 SpanRecord 交给已注册的 SpanExporter（测试用 InMemorySpanExporter 断言）
+
+不依赖 prometheus_client / opentelemetry，API 与前者保持一致（labels/inc/observe/get_sample_value），
+以后切换到官方客户端时调用方无需改动。
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import logging
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# 覆盖毫秒级 DB 借连接到分钟级 soffice / ASR 的跨度
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counter 只能递增")
+        with self._lock:
+            self._value += amount
+
+    def samples(self, name: str, labels: Dict[str, str]):
+        yield name, labels, self._value
+
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def samples(self, name: str, labels: Dict[str, str]):
+        yield name, labels, self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self._upper = list(buckets)
+        self._counts = [0] * (len(self._upper) + 1)  # 末位为 +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._upper, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self, name: str, labels: Dict[str, str]):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for upper, count in zip(self._upper + [math.inf], counts):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": _format_value(upper)}, cumulative
+        yield f"{name}_count", labels, cumulative
+        yield f"{name}_sum", labels, total
+
+
+class _Metric(ABC):
+    """指标基类（子类提供 kind 与 _new_child）"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self):
+        """创建一个标签组合对应的子指标"""
+        pass
+
+    def labels(self, **labels: Any):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，收到 {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} 带标签 {self.labelnames}，请先调用 labels()")
+        return self.labels()
+
+    def collect(self):
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            yield from child.samples(self.name, dict(zip(self.labelnames, key)))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+
+class MetricsRegistry:
+    """指标注册表；collect hook 在渲染前调用，用于刷新按需计算的 Gauge（如连接池状态）"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._hooks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if type(existing) is not cls or existing.labelnames != tuple(labelnames):
+                    raise ValueError(f"指标 {name} 已以不同类型或标签注册")
+                return existing
+            metric = cls(name, documentation, labelnames, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collect_hook(self, hook: Callable[[], None]) -> None:
+        with self._lock:
+            if hook not in self._hooks:
+                self._hooks.append(hook)
+
+    def _run_hooks(self) -> None:
+        for hook in list(self._hooks):
+            try:
+                hook()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("metrics collect hook failed: %s", exc)
+
+    def render(self) -> str:
+        """渲染为 Prometheus 文本格式"""
+        self._run_hooks()
+        lines: List[str] = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.collect():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def get_sample_value(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        """按样本名（含 _bucket/_count/_sum 后缀）与标签取值，不存在时返回 None"""
+        wanted = {key: str(value) for key, value in (labels or {}).items()}
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if not name.startswith(metric.name):
+                continue
+            for sample_name, sample_labels, value in metric.collect():
+                if sample_name == name and sample_labels == wanted:
+                    return float(value)
+        return None
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.gauge(name, documentation, labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+# ==================== 链路计时 ====================
+
+SPAN_DURATION = histogram(
+    "span_duration_seconds",
+    "Duration of traced spans",
+    ("span", "status"),
+)
+
+
+@dataclass
+class SpanRecord:
+    """已结束的 span"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_time: float
+    duration: float
+    status: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class Span:
+    """进行中的 span，调用方可在执行过程中补充属性（命中数、token 数等）"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+
+class InMemorySpanExporter:
+    """保存最近结束的 span（有界），供测试与调试接口读取"""
+
+    def __init__(self, maxlen: int = 10000) -> None:
+        self._spans: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def export(self, record: SpanRecord) -> None:
+        with self._lock:
+            self._spans.append(record)
+
+    def spans(self, name: Optional[str] = None) -> List[SpanRecord]:
+        with self._lock:
+            records = list(self._spans)
+        if name is None:
+            return records
+        return [record for record in records if record.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class LoggingSpanExporter:
+    """把每个 span 输出为一行结构化日志"""
+
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.INFO) -> None:
+        self._log = log or logger
+        self._level = level
+
+    def export(self, record: SpanRecord) -> None:
+        self._log.log(
+            self._level,
+            "span name=%s status=%s ms=%.1f trace=%s attrs=%s",
+            record.name,
+            record.status,
+            record.duration * 1000,
+            record.trace_id[:8],
+            record.attributes,
+        )
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("telemetry_current_span", default=None)
+_exporters: List[Any] = []
+_exporters_lock = threading.Lock()
+
+
+def add_span_exporter(exporter: Any) -> None:
+    with _exporters_lock:
+        if exporter not in _exporters:
+            _exporters.append(exporter)
+
+
+def remove_span_exporter(exporter: Any) -> None:
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def _finish(active: Span, start_wall: float, duration: float, status: str, error: Optional[str]) -> None:
+    SPAN_DURATION.labels(span=active.name, status=status).observe(duration)
+    exporters = list(_exporters)
+    if not exporters:
+        return
+    record = SpanRecord(
+        name=active.name,
+        trace_id=active.trace_id,
+        span_id=active.span_id,
+        parent_id=active.parent_id,
+        start_time=start_wall,
+        duration=duration,
+        status=status,
+        attributes=dict(active.attributes),
+        error=error,
+    )
+    for exporter in exporters:
+        try:
+            exporter.export(record)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("span exporter failed: %s", exc)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    计时一段代码；嵌套时自动继承 trace_id 并记录父 span
+
+    异常会把 status 标记为 error 后原样抛出；取消（CancelledError）标记为 cancelled。
+    """
+    parent = _current_span.get()
+    active = Span(
+        name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes,
+    )
+    token = _current_span.set(active)
+    start_wall = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    error: Optional[str] = None
+    try:
+        yield active
+    except BaseException as exc:
+        status = "cancelled" if type(exc).__name__ == "CancelledError" else "error"
+        error = f"{type(exc).__name__}: {exc}"[:300]
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 在另一个 context 中结束（如生成器被其他任务关闭），回退为直接恢复父 span
+            _current_span.set(parent)
+        _finish(active, start_wall, duration, status, error)
+
+
+def traced(name: str, **attributes: Any) -> Callable:
+    """span() 的装饰器形式，支持同步与 async 函数"""
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
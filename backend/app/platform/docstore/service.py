@@ -5,12 +5,19 @@ DocStore 服务 - 统一文档管理
 from __future__ import annotations
 
 import hashlib
+import json
 import uuid
 from typing import Any, Dict, List, Optional
 
 from psycopg.rows import dict_row
 from psycopg_pool import ConnectionPool
 
+from app.platform.retrieval.cjk_lexical import build_tsvector_literal
+
+
+# 整批片段共享一个 JSON 编码器
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
 
 def _doc_id(prefix: str = "doc") -> str:
     """生成文档 ID"""
@@ -127,33 +134,74 @@ class DocStoreService:
             segment_ids: 片段ID列表
         """
         segment_ids = []
+        rows = []
+        for seg in segments:
+            seg_id = _segment_id()
+            segment_ids.append(seg_id)
+            content_text = seg.get("content_text", "")
+            rows.append((
+                seg_id,
+                doc_version_id,
+                seg.get("segment_no", 0),
+                content_text,
+                _json_encoder.encode(seg.get("meta_json", {})),
+                build_tsvector_literal(content_text),
+            ))
+        
+        if not rows:
+            return segment_ids
         
         sql = """
             INSERT INTO doc_segments (
-                id, doc_version_id, segment_no, content_text, meta_json, created_at
-            ) VALUES (%s, %s, %s, %s, %s::jsonb, now())
+                id, doc_version_id, segment_no, content_text, meta_json, tsv_cjk, created_at
+            ) VALUES (%s, %s, %s, %s, %s::jsonb, %s::tsvector, now())
         """
         
+        # executemany 在 psycopg3 中走 pipeline 模式，整批只需一次往返
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                for seg in segments:
-                    seg_id = _segment_id()
-                    segment_ids.append(seg_id)
-                    
-                    # 将 meta_json 转换为 JSON 字符串
-                    import json
-                    meta_json_str = json.dumps(seg.get("meta_json", {}))
-                    
-                    cur.execute(sql, (
-                        seg_id,
-                        doc_version_id,
-                        seg.get("segment_no", 0),
-                        seg.get("content_text", ""),
-                        meta_json_str
-                    ))
+                cur.executemany(sql, rows)
         
         return segment_ids
 
+    def backfill_cjk_lexical(self, batch_size: int = 500, max_batches: Optional[int] = None) -> int:
+        """
+        为历史片段补齐 tsv_cjk（中文词法索引）
+        
+        Args:
+            batch_size: 每批处理的片段数
+            max_batches: 最多处理的批数（None 表示处理到没有缺失为止）
+            
+        Returns:
+            本次回填的片段数
+        """
+        total = 0
+        batches = 0
+        last_id = ""
+        while max_batches is None or batches < max_batches:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        SELECT id, content_text FROM doc_segments
+                        WHERE tsv_cjk IS NULL AND id > %s
+                        ORDER BY id
+                        LIMIT %s
+                        """,
+                        (last_id, batch_size),
+                    )
+                    rows = cur.fetchall()
+                    if not rows:
+                        break
+                    cur.executemany(
+                        "UPDATE doc_segments SET tsv_cjk = %s::tsvector WHERE id = %s",
+                        [(build_tsvector_literal(text or ""), seg_id) for seg_id, text in rows],
+                    )
+            total += len(rows)
+            batches += 1
+            last_id = rows[-1][0]
+        return total
+
     def get_document_version(self, version_id: str) -> Optional[Dict[str, Any]]:
         """
         获取文档版本信息
@@ -268,3 +316,31 @@ class DocStoreService:
                 cur.execute(sql, (document_id,))
                 return cur.fetchone()
 
+    def delete_document_version(self, version_id: str) -> bool:
+        """
+        删除文档版本（片段随外键级联删除），文档不再有其他版本时一并删除
+        
+        Args:
+            version_id: 版本ID
+            
+        Returns:
+            是否删除了版本
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM document_versions WHERE id = %s RETURNING document_id",
+                    (version_id,),
+                )
+                row = cur.fetchone()
+                if not row:
+                    return False
+                cur.execute(
+                    """
+                    DELETE FROM documents d
+                    WHERE d.id = %s
+                      AND NOT EXISTS (SELECT 1 FROM document_versions v WHERE v.document_id = d.id)
+                    """,
+                    (row[0],),
+                )
+        return True
@@ -6,6 +6,8 @@ import logging
 import os
 from typing import Any, Dict, List, Optional, Union
 
+from app.core.telemetry import span, traced
+
 from .context import build_marked_context
 from .json_utils import extract_json, repair_json
 from .llm_adapter import call_llm
@@ -26,6 +28,7 @@ class ExtractionEngine:
     - 生成追踪信息
     """
     
+    @traced("extraction.run")
     async def run(
         self,
         spec: ExtractionSpec,
@@ -60,15 +63,17 @@ class ExtractionEngine:
         
         # 1. 执行检索
         retrieval_start = time.time()
-        all_chunks, query_trace = await self._retrieve_chunks(
-            spec=spec,
-            retriever=retriever,
-            project_id=project_id,
-            embedding_provider=embedding_provider,
-            trace_enabled=trace_enabled,
-            run_id=run_id,
-            mode=mode,
-        )
+        with span("extraction.retrieve") as stage:
+            all_chunks, query_trace = await self._retrieve_chunks(
+                spec=spec,
+                retriever=retriever,
+                project_id=project_id,
+                embedding_provider=embedding_provider,
+                trace_enabled=trace_enabled,
+                run_id=run_id,
+                mode=mode,
+            )
+            stage.set_attributes(queries=len(query_trace), chunks=len(all_chunks))
         retrieval_ms = int((time.time() - retrieval_start) * 1000)
         logger.info(f"[ExtractionEngine] AFTER_RETRIEVAL project_id={project_id} run_id={run_id} count={len(all_chunks)} ms={retrieval_ms}")
         
@@ -93,7 +98,9 @@ class ExtractionEngine:
             }
             for c in all_chunks
         ]
-        ctx = build_marked_context(chunk_dicts)
+        with span("extraction.context", chunks=len(chunk_dicts)) as stage:
+            ctx = build_marked_context(chunk_dicts)
+            stage.set_attribute("chars", len(ctx))
         ctx_ms = int((time.time() - ctx_start) * 1000)
         
         # 3. 调用 LLM
@@ -107,22 +114,25 @@ class ExtractionEngine:
         logger.info(f"[ExtractionEngine] BEFORE_LLM project_id={project_id} run_id={run_id} prompt_len={prompt_len} ctx_len={ctx_len}")
         
         llm_start = time.time()
-        out_text = await call_llm(messages, llm, model_id, temperature=spec.temperature)
+        with span("extraction.llm", prompt_chars=prompt_len + ctx_len):
+            out_text = await call_llm(messages, llm, model_id, temperature=spec.temperature)
         llm_ms = int((time.time() - llm_start) * 1000)
         out_len = len(out_text) if out_text else 0
         logger.info(f"[ExtractionEngine] AFTER_LLM project_id={project_id} run_id={run_id} ms={llm_ms} out_len={out_len}")
         
         # 4. 解析 JSON
         parse_start = time.time()
-        try:
-            obj = extract_json(out_text)
-        except Exception as e:
-            logger.warning(f"ExtractionEngine: extract_json failed, trying repair: {e}")
+        with span("extraction.parse") as stage:
             try:
-                obj = repair_json(out_text)
-            except Exception as e2:
-                logger.error(f"ExtractionEngine: repair_json also failed: {e2}")
-                obj = {}
+                obj = extract_json(out_text)
+            except Exception as e:
+                logger.warning(f"ExtractionEngine: extract_json failed, trying repair: {e}")
+                stage.set_attribute("repaired", True)
+                try:
+                    obj = repair_json(out_text)
+                except Exception as e2:
+                    logger.error(f"ExtractionEngine: repair_json also failed: {e2}")
+                    obj = {}
         
         parse_ms = int((time.time() - parse_start) * 1000)
         
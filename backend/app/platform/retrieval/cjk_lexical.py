@@ -0,0 +1,69 @@
+"""
+中文友好的词法检索分词
+PG 内置的 english/simple 解析器不会切分中文，整句汉字会变成一个词元，几乎无法命中。
+这里在 Python 侧统一分词：
+- 连续汉字切成重叠二元组（单字成段时保留单字）
+- 字母数字串按整体小写保留
+写入时生成带位置的 tsvector 字面量（doc_segments.tsv_cjk），查询时用同一套规则生成 OR 连接的 tsquery，
+两侧都不经过 PG 的文本解析器，结果与数据库 locale 无关。
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+_TOKEN_PATTERN = re.compile(r"([㐀-䶿一-鿿豈-﫿]+)|([0-9a-z]+)")
+
+MAX_TOKEN_LENGTH = 64        # 超长字母数字串截断，远低于 PG 词元 2KB 上限
+MAX_POSITION = 16383         # tsvector 位置上限
+MAX_POSITIONS_PER_LEXEME = 256
+MAX_QUERY_TOKENS = 64
+
+
+def cjk_tokens(text: str) -> List[str]:
+    """按文本顺序返回词元（可重复）"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    tokens: List[str] = []
+    for match in _TOKEN_PATTERN.finditer(normalized):
+        han, word = match.groups()
+        if han:
+            if len(han) == 1:
+                tokens.append(han)
+            else:
+                tokens.extend(han[i:i + 2] for i in range(len(han) - 1))
+        else:
+            tokens.append(word[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+def _quote(lexeme: str) -> str:
+    return "'" + lexeme.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def build_tsvector_literal(text: str) -> str:
+    """生成可直接 ::tsvector 的字面量，带词元位置（用于 ts_rank 的词频）"""
+    positions: Dict[str, List[int]] = {}
+    for pos, token in enumerate(cjk_tokens(text), start=1):
+        slots = positions.setdefault(token, [])
+        if len(slots) < MAX_POSITIONS_PER_LEXEME:
+            slots.append(min(pos, MAX_POSITION))
+    return " ".join(
+        f"{_quote(token)}:{','.join(str(p) for p in sorted(set(slots)))}"
+        for token, slots in positions.items()
+    )
+
+
+def build_tsquery_literal(query: str) -> Optional[str]:
+    """查询词元去重后 OR 连接；没有可用词元时返回 None"""
+    seen: List[str] = []
+    for token in cjk_tokens(query):
+        if token not in seen:
+            seen.append(token)
+        if len(seen) >= MAX_QUERY_TOKENS:
+            break
+    if not seen:
+        return None
+    return " | ".join(_quote(t) for t in seen)
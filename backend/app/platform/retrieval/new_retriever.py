@@ -1,12 +1,14 @@
 """
 新检索服务 - Step 4
-使用 doc_segments (PG FTS + Milvus) 进行混合检索
+使用 doc_segments (PG 中文词法索引 + Milvus) 进行混合检索
 """
 import logging
 from typing import Dict, List, Optional
 
 from psycopg_pool import ConnectionPool
 
+from app.core.telemetry import span, traced
+from app.platform.retrieval.cjk_lexical import build_tsquery_literal
 from app.services.embedding.http_embedding_client import embed_texts
 from app.services.embedding_provider_store import EmbeddingProviderStored
 from app.services.vectorstore.milvus_docseg_store import milvus_docseg_store
@@ -44,6 +46,7 @@ class NewRetriever:
     def __init__(self, pool: ConnectionPool):
         self.pool = pool
     
+    @traced("retrieval.docseg")
     async def retrieve(
         self,
         query: str,
@@ -84,25 +87,31 @@ class NewRetriever:
         # 2. 向量检索 (Milvus)
         dense_start = time.time()
         dense_hits = []
-        if embedding_provider:
-            dense_hits = await self._search_dense(
-                query, doc_version_ids, embedding_provider, dense_limit, project_id, doc_types
-            )
+        with span("retrieval.docseg.dense", limit=dense_limit) as leg:
+            if embedding_provider:
+                dense_hits = await self._search_dense(
+                    query, doc_version_ids, embedding_provider, dense_limit, project_id, doc_types
+                )
+            leg.set_attribute("hits", len(dense_hits))
         dense_ms = int((time.time() - dense_start) * 1000)
         logger.info(f"[NewRetriever] DENSE_DONE count={len(dense_hits)} ms={dense_ms}")
         
-        # 3. 全文检索 (PG tsvector)
+        # 3. 全文检索 (PG tsv_cjk)
         lexical_start = time.time()
-        lexical_hits = self._search_lexical(query, doc_version_ids, lexical_limit)
+        with span("retrieval.docseg.lexical", limit=lexical_limit) as leg:
+            lexical_hits = self._search_lexical(query, doc_version_ids, lexical_limit)
+            leg.set_attribute("hits", len(lexical_hits))
         lexical_ms = int((time.time() - lexical_start) * 1000)
         logger.info(f"[NewRetriever] LEXICAL_DONE count={len(lexical_hits)} ms={lexical_ms}")
         
         # 4. RRF 融合
-        fused = rrf_fuse(dense_hits, lexical_hits, k=60, topn=top_k)
+        with span("retrieval.docseg.fuse"):
+            fused = rrf_fuse(dense_hits, lexical_hits, k=60, topn=top_k)
         
         # 5. 加载完整文本
         chunk_ids = [hit["chunk_id"] for hit in fused]
-        results = self._load_chunks(chunk_ids)
+        with span("retrieval.docseg.load_chunks", chunks=len(chunk_ids)):
+            results = self._load_chunks(chunk_ids)
         
         overall_ms = int((time.time() - overall_start) * 1000)
         logger.info(
@@ -178,23 +187,27 @@ class NewRetriever:
     def _search_lexical(
         self, query: str, doc_version_ids: List[str], limit: int
     ) -> List[Dict]:
-        """PG tsvector 全文检索"""
+        """
+        PG 词法检索（tsv_cjk：汉字二元组 + 字母数字词）
+        
+        查询与索引使用同一套分词（cjk_lexical），词元 OR 连接；
+        ts_rank 归一化方式 1 按文档长度取对数衰减，避免长片段仅凭词多占据前排。
+        """
+        tsquery = build_tsquery_literal(query)
+        if not tsquery:
+            return []
         try:
             with self.pool.connection() as conn:
                 with conn.cursor() as cur:
-                    # 使用 tsvector 检索
                     sql = """
-                        SELECT id, ts_rank(tsv, query) as rank
-                        FROM doc_segments, to_tsquery('english', %s) query
+                        SELECT id, ts_rank(tsv_cjk, query, 1) as rank
+                        FROM doc_segments, CAST(%s AS tsquery) query
                         WHERE doc_version_id = ANY(%s)
-                          AND tsv @@ query
-                        ORDER BY rank DESC
+                          AND tsv_cjk @@ query
+                        ORDER BY rank DESC, id
                         LIMIT %s
                     """
-                    # 简单处理查询词：用 OR 连接
-                    query_terms = " | ".join(query.split())
-                    
-                    cur.execute(sql, [query_terms, doc_version_ids, limit])
+                    cur.execute(sql, [tsquery, doc_version_ids, limit])
                     rows = cur.fetchall()
                     
                     return [
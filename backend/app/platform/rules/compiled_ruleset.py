@@ -0,0 +1,189 @@
+"""
+规则集编译
+YAML 只解析一次，把 exists 规则的全部关键词编进一个多模式自动机，
+供 RulesEvaluatorV2 单遍扫描 doc_segments 使用
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from app.platform.rules.keyword_automaton import KeywordAutomaton
+
+# 规则类型
+RULE_KIND_EXISTS = "exists"
+RULE_KIND_SEMANTIC = "semantic"
+RULE_KIND_MISSING_FIELD = "missing_field"
+RULE_KIND_DATE_COMPARE = "date_compare"
+RULE_KIND_UNKNOWN = "unknown"
+
+# 显式声明需要语义检索的标记（rule.match 或 check 表达式中出现）
+_SEMANTIC_MARKERS = ("semantic", "similar", "语义", "相似")
+
+_KEYWORD_PATTERN = re.compile(r"['\"]([^'\"]+)['\"]")
+_FIELD_PATTERN = re.compile(r"field\(['\"]([^'\"]+)['\"]\)")
+
+
+@dataclass
+class CompiledRule:
+    """编译后的单条规则"""
+    index: int                      # 在规则集中的原始位置
+    rule_id: str
+    title: str
+    dimension: str
+    rigid: bool
+    select: str
+    check: str
+    kind: str
+    keywords: List[str] = field(default_factory=list)
+    doc_type: str = "tender"        # tender | bid
+    target_name: str = "招标文件"
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class CompiledRuleSet:
+    """编译后的规则集"""
+    rules: List[CompiledRule]
+    automaton: KeywordAutomaton
+    # automaton keyword_id -> [(rule.index, 规则内关键词序号)]
+    keyword_rules: Dict[int, List[Tuple[int, int]]]
+
+    @property
+    def exists_rules(self) -> List[CompiledRule]:
+        return [r for r in self.rules if r.kind == RULE_KIND_EXISTS and r.keywords]
+
+    @property
+    def semantic_rules(self) -> List[CompiledRule]:
+        return [r for r in self.rules if r.kind == RULE_KIND_SEMANTIC]
+
+    @property
+    def scan_doc_types(self) -> List[str]:
+        """单遍扫描需要覆盖的文档类型"""
+        return sorted({r.doc_type for r in self.exists_rules})
+
+
+def extract_keywords(check: str) -> List[str]:
+    """从 check 表达式中提取关键词（支持单引号和双引号）"""
+    return _KEYWORD_PATTERN.findall(check or "")
+
+
+def extract_field_name(check: str) -> str:
+    """从 check 表达式中提取 field('xxx') 的字段名"""
+    match = _FIELD_PATTERN.search(check or "")
+    return match.group(1) if match else "未知字段"
+
+
+def classify_rule(rule: Dict[str, Any]) -> str:
+    """识别规则类型（与 RulesEvaluatorV2 历史判定顺序保持一致）"""
+    check = rule.get("check", "")
+    if not isinstance(check, str):
+        return RULE_KIND_UNKNOWN
+
+    match_mode = str(rule.get("match", "")).lower()
+    # 语义标记只看表达式本身，引号内的关键词（如 '相似业绩'）不算
+    lowered = _KEYWORD_PATTERN.sub("''", check).lower()
+
+    if "must contain" in check or "contains" in check or "包含" in check:
+        if match_mode in ("semantic", "retrieval") or any(m in lowered for m in _SEMANTIC_MARKERS):
+            return RULE_KIND_SEMANTIC
+        return RULE_KIND_EXISTS
+    if "field" in check and ("missing" in check or "empty" in check):
+        return RULE_KIND_MISSING_FIELD
+    if "date" in check or "<=" in check or ">=" in check:
+        return RULE_KIND_DATE_COMPARE
+    if match_mode in ("semantic", "retrieval"):
+        return RULE_KIND_SEMANTIC
+    return RULE_KIND_UNKNOWN
+
+
+def _resolve_target(select: str, check: str) -> Tuple[str, str]:
+    if "bid" in (select or "").lower() or "bid" in (check or "").lower():
+        return "bid", "投标文件"
+    return "tender", "招标文件"
+
+
+def _compile(content_yaml: str) -> CompiledRuleSet:
+    rules_data = yaml.safe_load(content_yaml) or {}
+    raw_rules = rules_data.get("rules", []) or []
+
+    rules: List[CompiledRule] = []
+    keyword_ids: Dict[str, int] = {}
+    keyword_rules: Dict[int, List[Tuple[int, int]]] = {}
+
+    for index, raw in enumerate(raw_rules):
+        if not isinstance(raw, dict):
+            raw = {}
+        check = raw.get("check", "")
+        select = raw.get("select", "")
+        kind = classify_rule(raw)
+        doc_type, target_name = _resolve_target(str(select), check if isinstance(check, str) else "")
+        keywords = extract_keywords(check) if kind in (RULE_KIND_EXISTS, RULE_KIND_SEMANTIC) else []
+
+        compiled = CompiledRule(
+            index=index,
+            rule_id=raw.get("id", "unknown"),
+            title=raw.get("title", ""),
+            dimension=raw.get("dimension", "其他"),
+            rigid=raw.get("rigid", False),
+            select=select,
+            check=check,
+            kind=kind,
+            keywords=keywords,
+            doc_type=doc_type,
+            target_name=target_name,
+            raw=raw,
+        )
+        rules.append(compiled)
+
+        if kind != RULE_KIND_EXISTS:
+            continue
+        for kw_pos, keyword in enumerate(keywords):
+            norm = keyword.lower()
+            keyword_id = keyword_ids.setdefault(norm, len(keyword_ids))
+            keyword_rules.setdefault(keyword_id, []).append((index, kw_pos))
+
+    # keyword_ids 按插入顺序编号，与自动机下标一一对应
+    automaton = KeywordAutomaton(list(keyword_ids.keys()))
+    return CompiledRuleSet(rules=rules, automaton=automaton, keyword_rules=keyword_rules)
+
+
+_CACHE_MAX = 32
+_cache: "OrderedDict[str, CompiledRuleSet]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_ruleset(content_yaml: str) -> CompiledRuleSet:
+    """
+    编译规则集（按 YAML 内容哈希缓存，同一版本只解析一次）
+
+    Raises:
+        yaml.YAMLError: YAML 解析失败
+    """
+    key = hashlib.sha256((content_yaml or "").encode("utf-8")).hexdigest()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    compiled = _compile(content_yaml or "")
+
+    with _cache_lock:
+        _cache[key] = compiled
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def clear_compiled_cache() -> None:
+    """清空编译缓存（测试用）"""
+    with _cache_lock:
+        _cache.clear()
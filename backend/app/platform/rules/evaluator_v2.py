@@ -1,29 +1,56 @@
 """
 Rules Evaluator v2 - 基于新检索器的规则审核引擎
 支持确定性规则执行，生成 review findings
+
+执行方式：
+- 规则集 YAML 编译一次（compiled_ruleset），exists 规则的关键词合并进一个自动机
+- exists 规则：对项目 doc_segments 做一次流式扫描，产出全部命中证据
+- 语义规则（match: semantic）：走 NewRetriever 混合检索，并发执行
 """
 from __future__ import annotations
 
+import asyncio
 import logging
-import re
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import yaml
 from psycopg_pool import ConnectionPool
 
 from app.platform.retrieval.new_retriever import NewRetriever
+from app.platform.rules.compiled_ruleset import (
+    RULE_KIND_DATE_COMPARE,
+    RULE_KIND_EXISTS,
+    RULE_KIND_MISSING_FIELD,
+    RULE_KIND_SEMANTIC,
+    CompiledRule,
+    CompiledRuleSet,
+    compile_ruleset,
+    extract_field_name,
+)
 from app.services.embedding_provider_store import get_embedding_store
 
 logger = logging.getLogger(__name__)
 
+# 每条 exists 规则保留的证据数量（与原检索 top_k 一致）
+EXISTS_EVIDENCE_LIMIT = 5
+# 流式扫描时服务端游标每批拉取的行数
+SCAN_FETCH_SIZE = 500
+# 语义规则并发上限
+SEMANTIC_CONCURRENCY = 4
 
 class RulesEvaluatorV2:
-    """规则评估器 v2 - 使用新检索器"""
+    """规则评估器 v2 - 编译规则 + 单遍扫描，语义规则使用新检索器"""
 
-    def __init__(self, pool: ConnectionPool):
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        retriever: Optional[NewRetriever] = None,
+        semantic_concurrency: int = SEMANTIC_CONCURRENCY,
+    ):
         """初始化规则评估器"""
         self.pool = pool
-        self.retriever = NewRetriever(pool)
+        self.retriever = retriever or NewRetriever(pool)
+        self.semantic_concurrency = max(1, semantic_concurrency)
 
     async def evaluate(
         self,
@@ -41,7 +68,7 @@ class RulesEvaluatorV2:
                 - project_info: 项目信息（用于字段检测）
                 
         Returns:
-            findings 列表，每个包含：
+            findings 列表（按规则集中的顺序），每个包含：
                 - rule_id: 规则ID
                 - source: "rule"
                 - dimension: 维度
@@ -53,128 +80,256 @@ class RulesEvaluatorV2:
                 - evidence_chunk_ids: 证据 chunk IDs (兼容旧格式)
                 - evidence_spans: 证据 spans (新格式，包含 page_no)
         """
-        findings = []
-        
-        # 解析规则内容
+        # 解析并编译规则内容（同一 YAML 只编译一次）
         try:
-            content_yaml = rule_set_version.get("content_yaml", "")
-            rules_data = yaml.safe_load(content_yaml)
-            rules = rules_data.get("rules", [])
+            compiled = compile_ruleset(rule_set_version.get("content_yaml", ""))
         except Exception as e:
             logger.error(f"Failed to parse rules: {e}")
-            return findings
-        
-        # 执行每条规则
-        for rule in rules:
+            return []
+
+        context = context or {}
+        start = time.time()
+        results: Dict[int, Optional[Dict[str, Any]]] = {}
+
+        # 1. 确定性规则（不访问检索）
+        for rule in compiled.rules:
+            if rule.kind in (RULE_KIND_EXISTS, RULE_KIND_SEMANTIC):
+                continue
             try:
-                finding = await self._evaluate_rule(project_id, rule, context or {})
-                if finding:
-                    findings.append(finding)
+                results[rule.index] = self._evaluate_local_rule(rule, context)
             except Exception as e:
-                # 单条规则失败不影响其他规则
-                logger.warning(f"Rule {rule.get('id', 'unknown')} evaluation failed: {e}")
-                # 生成一个失败的 finding
-                findings.append({
-                    "rule_id": rule.get("id", "unknown"),
-                    "source": "rule",
-                    "dimension": rule.get("dimension", "规则执行"),
-                    "requirement_text": rule.get("title", "规则"),
-                    "response_text": "",
-                    "result": "risk",
-                    "rigid": False,
-                    "remark": f"规则执行失败: {str(e)}",
-                    "evidence_chunk_ids": [],
-                    "evidence_spans": []
-                })
-        
+                logger.warning(f"Rule {rule.rule_id} evaluation failed: {e}")
+                results[rule.index] = self._make_error_finding(rule, e)
+
+        # 2. exists 规则单遍扫描 + 语义规则并发检索
+        semaphore = asyncio.Semaphore(self.semantic_concurrency)
+
+        async def _run_semantic(rule: CompiledRule) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    return rule.index, await self._evaluate_semantic_rule(project_id, rule)
+                except Exception as e:
+                    logger.warning(f"Rule {rule.rule_id} evaluation failed: {e}")
+                    return rule.index, self._make_error_finding(rule, e)
+
+        tasks = [_run_semantic(rule) for rule in compiled.semantic_rules]
+        exists_task = asyncio.to_thread(self._evaluate_exists_rules, project_id, compiled)
+
+        outcomes = await asyncio.gather(exists_task, *tasks, return_exceptions=True)
+        exists_outcome, semantic_outcomes = outcomes[0], outcomes[1:]
+
+        if isinstance(exists_outcome, BaseException):
+            logger.warning(f"Rules exists scan failed project_id={project_id}: {exists_outcome}")
+            for rule in compiled.exists_rules:
+                results[rule.index] = self._make_error_finding(rule, exists_outcome)
+        else:
+            results.update(exists_outcome)
+
+        for outcome in semantic_outcomes:
+            if isinstance(outcome, BaseException):
+                logger.warning(f"Semantic rule task failed: {outcome}")
+                continue
+            index, finding = outcome
+            results[index] = finding
+
+        # exists 规则中关键词为空的，单独给出失败 finding
+        for rule in compiled.rules:
+            if rule.kind == RULE_KIND_EXISTS and not rule.keywords:
+                logger.warning(f"Rule {rule.rule_id}: No keywords extracted from check: {rule.check}")
+                results[rule.index] = self._make_finding(
+                    rule.rule_id, rule.title, rule.dimension, rule.rigid,
+                    "risk", "关键词提取失败", "无法解析 check 表达式"
+                )
+
+        findings = [results[i] for i in sorted(results) if results[i] is not None]
+        logger.info(
+            f"[RulesEvaluatorV2] DONE project_id={project_id} rules={len(compiled.rules)} "
+            f"exists={len(compiled.exists_rules)} semantic={len(compiled.semantic_rules)} "
+            f"findings={len(findings)} ms={int((time.time() - start) * 1000)}"
+        )
         return findings
 
-    async def _evaluate_rule(
+    def _evaluate_local_rule(
         self,
-        project_id: str,
-        rule: Dict[str, Any],
+        rule: CompiledRule,
         context: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
+        """执行不依赖文档内容的规则；未识别类型返回 None（不生成 finding）"""
+        if rule.kind == RULE_KIND_MISSING_FIELD:
+            return self._evaluate_missing_field_rule(
+                rule.rule_id, rule.title, rule.dimension, rule.rigid, rule.select, rule.check, context
+            )
+        if rule.kind == RULE_KIND_DATE_COMPARE:
+            return self._evaluate_date_compare_rule(
+                rule.rule_id, rule.title, rule.dimension, rule.rigid, rule.select, rule.check, context
+            )
+        logger.warning(f"Rule {rule.rule_id} type not recognized, check: {rule.check}")
+        return None
+
+    def _evaluate_exists_rules(
+        self,
+        project_id: str,
+        compiled: CompiledRuleSet
+    ) -> Dict[int, Dict[str, Any]]:
         """
-        执行单条规则
-        
-        Args:
-            project_id: 项目ID
-            rule: 规则定义
-            context: 执行上下文
-            
-        Returns:
-            finding 或 None（规则不适用）
+        单遍扫描项目 doc_segments，一次产出全部 exists 规则的 finding
+
+        每个分片只过一次自动机；命中的关键词映射回所属规则，
+        规则的证据为按文档顺序出现的前 EXISTS_EVIDENCE_LIMIT 个分片。
         """
-        rule_id = rule.get("id", "unknown")
-        title = rule.get("title", "")
-        dimension = rule.get("dimension", "其他")
-        rigid = rule.get("rigid", False)
-        select = rule.get("select", "")
-        check = rule.get("check", "")
-        
-        # 识别规则类型并执行
-        if isinstance(check, str):
-            # A. exists 规则：必须存在某关键词
-            if "must contain" in check or "contains" in check or "包含" in check:
-                return await self._evaluate_exists_rule(
-                    project_id, rule_id, title, dimension, rigid, select, check, context
-                )
-            
-            # B. missing_field 规则：字段缺失检测
-            elif "field" in check and ("missing" in check or "empty" in check):
-                return self._evaluate_missing_field_rule(
-                    rule_id, title, dimension, rigid, select, check, context
-                )
-            
-            # C. date_compare 规则：时间先后
-            elif "date" in check or "<=" in check or ">=" in check:
-                return self._evaluate_date_compare_rule(
-                    rule_id, title, dimension, rigid, select, check, context
-                )
-        
-        # 未识别的规则类型，返回 None（不生成 finding）
-        logger.warning(f"Rule {rule_id} type not recognized, check: {check}")
-        return None
+        exists_rules = compiled.exists_rules
+        if not exists_rules:
+            return {}
+
+        rules_by_index = {r.index: r for r in exists_rules}
+        evidence: Dict[int, List[Dict[str, Any]]] = {r.index: [] for r in exists_rules}
+        matched_keywords: Dict[int, set] = {r.index: set() for r in exists_rules}
+        pending = {r.index for r in exists_rules}
+        scanned = 0
+
+        for doc_type, segment in self._iter_project_segments(project_id, compiled.scan_doc_types):
+            scanned += 1
+            first_hits = compiled.automaton.find_first(segment["content_text"] or "")
+            if not first_hits:
+                continue
+
+            # 当前分片命中的规则 -> 最早命中位置
+            rule_offsets: Dict[int, int] = {}
+            for keyword_id, offset in first_hits.items():
+                for rule_index, kw_pos in compiled.keyword_rules.get(keyword_id, []):
+                    if rules_by_index[rule_index].doc_type != doc_type:
+                        continue
+                    matched_keywords[rule_index].add(kw_pos)
+                    if rule_index not in rule_offsets or offset < rule_offsets[rule_index]:
+                        rule_offsets[rule_index] = offset
 
-    async def _evaluate_exists_rule(
+            for rule_index, offset in rule_offsets.items():
+                if len(evidence[rule_index]) >= EXISTS_EVIDENCE_LIMIT:
+                    continue
+                evidence[rule_index].append(self._make_evidence_span(segment, offset))
+                if len(evidence[rule_index]) >= EXISTS_EVIDENCE_LIMIT:
+                    pending.discard(rule_index)
+
+            # 所有规则证据已满，提前结束扫描
+            if not pending:
+                break
+
+        logger.info(
+            f"[RulesEvaluatorV2] EXISTS_SCAN project_id={project_id} segments={scanned} "
+            f"rules={len(exists_rules)} saturated={len(exists_rules) - len(pending)}"
+        )
+
+        return {
+            rule.index: self._build_exists_finding(
+                rule,
+                evidence[rule.index],
+                [rule.keywords[i] for i in sorted(matched_keywords[rule.index])],
+            )
+            for rule in exists_rules
+        }
+
+    def _iter_project_segments(
         self,
         project_id: str,
-        rule_id: str,
-        title: str,
-        dimension: str,
-        rigid: bool,
-        select: str,
-        check: str,
-        context: Dict[str, Any]
+        doc_types: List[str]
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        流式读取项目下指定类型文档的全部 doc_segments
+
+        使用服务端游标分批拉取，内存占用与分片总数无关。
+
+        Yields:
+            (doc_type, segment)，segment 包含 id / doc_version_id / content_text / meta_json
+        """
+        if not doc_types:
+            return
+
+        sql = """
+            SELECT v.kind, s.id, s.doc_version_id, s.content_text, s.meta_json
+            FROM doc_segments s
+            JOIN (
+                SELECT DISTINCT kind, meta_json->>'doc_version_id' AS doc_version_id
+                FROM tender_project_assets
+                WHERE project_id = %s
+                  AND kind = ANY(%s)
+                  AND meta_json->>'doc_version_id' IS NOT NULL
+            ) v ON v.doc_version_id = s.doc_version_id
+            ORDER BY s.doc_version_id, s.segment_no
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor(name=f"rules_scan_{project_id}"[:63]) as cur:
+                cur.itersize = SCAN_FETCH_SIZE
+                cur.execute(sql, [project_id, doc_types])
+                for row in cur:
+                    yield row[0], {
+                        "id": row[1],
+                        "doc_version_id": row[2],
+                        "content_text": row[3],
+                        "meta_json": row[4] or {},
+                    }
+
+    def _make_evidence_span(self, segment: Dict[str, Any], offset: int) -> Dict[str, Any]:
+        """以命中位置为中心截取预览文本"""
+        text = segment.get("content_text") or ""
+        begin = max(0, offset - 20)
+        meta = segment.get("meta_json") or {}
+        return {
+            "chunk_id": segment["id"],
+            "page_no": meta.get("page_no"),
+            "doc_version_id": segment.get("doc_version_id"),
+            "text_preview": text[begin:begin + 100],
+        }
+
+    def _build_exists_finding(
+        self,
+        rule: CompiledRule,
+        evidence_spans: List[Dict[str, Any]],
+        matched_keywords: List[str],
+    ) -> Dict[str, Any]:
+        """根据扫描证据生成 exists 规则 finding"""
+        if evidence_spans:
+            result = "pass"
+            response_text = f"{rule.target_name}中找到相关内容"
+            remark = f"检测到关键词：{', '.join((matched_keywords or rule.keywords)[:3])}"
+        else:
+            result = "fail" if rule.rigid else "risk"
+            response_text = f"{rule.target_name}中未找到相关内容"
+            remark = f"缺少关键词：{', '.join(rule.keywords)}"
+
+        return {
+            "rule_id": rule.rule_id,
+            "source": "rule",
+            "dimension": rule.dimension,
+            "requirement_text": rule.title,
+            "response_text": response_text,
+            "result": result,
+            "rigid": rule.rigid,
+            "remark": remark,
+            "evidence_chunk_ids": [span["chunk_id"] for span in evidence_spans],
+            "evidence_spans": evidence_spans
+        }
+
+    async def _evaluate_semantic_rule(
+        self,
+        project_id: str,
+        rule: CompiledRule
     ) -> Dict[str, Any]:
         """
-        执行 exists 规则：检查是否存在某关键词/段落（使用新检索器）
+        执行语义规则：通过新检索器做混合检索判断相关内容是否存在
         
         例如：
-        select: "bid"
-        check: "must contain('营业执照', '有效期')"
+        match: semantic
+        check: "bid must contain('售后服务承诺')"
         """
-        # 提取要检查的关键词
-        keywords = self._extract_keywords_from_check(check)
+        rule_id, title, dimension, rigid = rule.rule_id, rule.title, rule.dimension, rule.rigid
+        keywords = rule.keywords
         if not keywords:
-            logger.warning(f"Rule {rule_id}: No keywords extracted from check: {check}")
+            logger.warning(f"Rule {rule_id}: No keywords extracted from check: {rule.check}")
             return self._make_finding(
                 rule_id, title, dimension, rigid,
                 "risk", "关键词提取失败", "无法解析 check 表达式"
             )
         
-        # 确定检查的目标（tender 或 bid）
-        if "bid" in select.lower() or "bid" in check.lower():
-            doc_types = ["bid"]
-            target_name = "投标文件"
-        else:
-            doc_types = ["tender"]
-            target_name = "招标文件"
-        
-        # 使用新检索器搜索关键词
-        query = " ".join(keywords)
-        
         embedding_provider = get_embedding_store().get_default()
         if not embedding_provider:
             logger.error("No embedding provider configured for rules")
@@ -185,11 +340,11 @@ class RulesEvaluatorV2:
         
         try:
             matched_chunks = await self.retriever.retrieve(
-                query=query,
+                query=" ".join(keywords),
                 project_id=project_id,
-                doc_types=doc_types,
+                doc_types=[rule.doc_type],
                 embedding_provider=embedding_provider,
-                top_k=5,  # 只需要少量结果
+                top_k=EXISTS_EVIDENCE_LIMIT,  # 只需要少量结果
             )
         except Exception as e:
             logger.error(f"Rule {rule_id} retrieval failed: {e}")
@@ -198,42 +353,16 @@ class RulesEvaluatorV2:
                 "risk", "检索失败", str(e)
             )
         
-        # 判断结果
-        if matched_chunks:
-            result = "pass"
-            response_text = f"{target_name}中找到相关内容"
-            remark = f"检测到关键词：{', '.join(keywords[:3])}"
-            
-            # 提取证据
-            evidence_chunk_ids = [c.chunk_id for c in matched_chunks]
-            evidence_spans = [
-                {
-                    "chunk_id": c.chunk_id,
-                    "page_no": c.meta.get("page_no"),
-                    "doc_version_id": c.meta.get("doc_version_id"),
-                    "text_preview": c.text[:100]
-                }
-                for c in matched_chunks
-            ]
-        else:
-            result = "fail" if rigid else "risk"
-            response_text = f"{target_name}中未找到相关内容"
-            remark = f"缺少关键词：{', '.join(keywords)}"
-            evidence_chunk_ids = []
-            evidence_spans = []
-        
-        return {
-            "rule_id": rule_id,
-            "source": "rule",
-            "dimension": dimension,
-            "requirement_text": title,
-            "response_text": response_text,
-            "result": result,
-            "rigid": rigid,
-            "remark": remark,
-            "evidence_chunk_ids": evidence_chunk_ids,
-            "evidence_spans": evidence_spans
-        }
+        evidence_spans = [
+            {
+                "chunk_id": c.chunk_id,
+                "page_no": c.meta.get("page_no"),
+                "doc_version_id": c.meta.get("doc_version_id"),
+                "text_preview": c.text[:100]
+            }
+            for c in matched_chunks
+        ]
+        return self._build_exists_finding(rule, evidence_spans, keywords)
 
     def _evaluate_missing_field_rule(
         self,
@@ -341,17 +470,22 @@ class RulesEvaluatorV2:
             "evidence_spans": []
         }
 
-    def _extract_keywords_from_check(self, check: str) -> List[str]:
-        """从 check 表达式中提取关键词"""
-        # 支持单引号和双引号
-        pattern = r"['\"]([^'\"]+)['\"]"
-        keywords = re.findall(pattern, check)
-        return keywords if keywords else []
+    def _make_error_finding(self, rule: CompiledRule, error: BaseException) -> Dict[str, Any]:
+        """单条规则失败不影响其他规则，生成一个失败的 finding"""
+        return {
+            "rule_id": rule.rule_id,
+            "source": "rule",
+            "dimension": rule.raw.get("dimension", "规则执行"),
+            "requirement_text": rule.raw.get("title", "规则"),
+            "response_text": "",
+            "result": "risk",
+            "rigid": False,
+            "remark": f"规则执行失败: {str(error)}",
+            "evidence_chunk_ids": [],
+            "evidence_spans": []
+        }
 
     def _extract_field_name_from_check(self, check: str) -> str:
         """从 check 表达式中提取字段名"""
-        # 提取 field('xxx') 中的 xxx
-        pattern = r"field\(['\"]([^'\"]+)['\"]\)"
-        match = re.search(pattern, check)
-        return match.group(1) if match else "未知字段"
+        return extract_field_name(check)
 
@@ -0,0 +1,117 @@
+"""
+多模式关键词自动机（Aho-Corasick）
+一次扫描文本即可找出所有规则关键词的出现位置
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 多模式匹配自动机
+
+    用法：
+        automaton = KeywordAutomaton(["营业执照", "有效期"])
+        for keyword_id, start in automaton.iter_matches(text):
+            ...
+
+    keyword_id 为关键词在构造参数中的下标（去重后保留首个下标），
+    匹配默认大小写不敏感。
+    """
+
+    def __init__(self, keywords: Iterable[str], case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self.keywords: List[str] = list(keywords)
+
+        # goto 表：每个状态一个 dict(char -> state)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态的输出：[(keyword_id, keyword_len)]
+        self._output: List[List[Tuple[int, int]]] = [[]]
+
+        seen: Dict[str, int] = {}
+        for keyword_id, keyword in enumerate(self.keywords):
+            pattern = self._normalize(keyword)
+            if not pattern or pattern in seen:
+                continue
+            seen[pattern] = keyword_id
+            self._add_pattern(pattern, keyword_id)
+
+        self._build_fail_links()
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _normalize(self, text: str) -> str:
+        return text if self.case_sensitive else text.lower()
+
+    def _add_pattern(self, pattern: str, keyword_id: int) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append((keyword_id, len(pattern)))
+
+    def _build_fail_links(self) -> None:
+        queue: deque[int] = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # 合并失败链上的输出，扫描时无需再沿 fail 链回溯
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        扫描文本，逐个产出 (keyword_id, start_offset)
+
+        Args:
+            text: 待扫描文本
+
+        Yields:
+            (关键词下标, 匹配起始位置)
+        """
+        if not text or len(self._goto) == 1:
+            return
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for pos, ch in enumerate(self._normalize(text)):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for keyword_id, length in output[state]:
+                    yield keyword_id, pos - length + 1
+
+    def find_first(self, text: str) -> Dict[int, int]:
+        """
+        返回每个命中关键词的首次出现位置
+
+        Returns:
+            {keyword_id: start_offset}
+        """
+        first: Dict[int, int] = {}
+        for keyword_id, start in self.iter_matches(text):
+            if keyword_id not in first:
+                first[keyword_id] = start
+        return first
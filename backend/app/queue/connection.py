@@ -3,6 +3,7 @@ Redis 连接管理
 """
 import logging
 import os
+import time
 from typing import Optional
 
 import redis
@@ -12,6 +13,17 @@ logger = logging.getLogger(__name__)
 
 _redis_client: Optional[redis.Redis] = None
 
+# 连接失败后的冷却时间：期间 is_redis_available 直接返回 False，避免每个请求都等待连接超时
+_UNAVAILABLE_COOLDOWN_SECONDS = 30.0
+_unavailable_until: float = 0.0
+
+
+def set_redis_connection(conn: Optional[redis.Redis]) -> None:
+    """注入 Redis 连接（测试中可传入 fakeredis；传 None 恢复按环境变量创建）"""
+    global _redis_client, _unavailable_until
+    _redis_client = conn
+    _unavailable_until = 0.0
+
 
 def get_redis_connection() -> redis.Redis:
     """获取 Redis 连接"""
@@ -47,18 +59,23 @@ def get_redis_connection() -> redis.Redis:
     return _redis_client
 
 
-def get_queue(name: str = "default") -> Queue:
+def get_queue(name: str = "default", connection: Optional[redis.Redis] = None) -> Queue:
     """获取队列实例"""
-    conn = get_redis_connection()
+    conn = connection or get_redis_connection()
     return Queue(name, connection=conn)
 
 
 def is_redis_available() -> bool:
-    """检查 Redis 是否可用"""
+    """检查 Redis 是否可用（失败后冷却一段时间再重试连接）"""
+    global _redis_client, _unavailable_until
+    if time.monotonic() < _unavailable_until:
+        return False
     try:
         conn = get_redis_connection()
         conn.ping()
         return True
     except Exception:
+        _redis_client = None
+        _unavailable_until = time.monotonic() + _UNAVAILABLE_COOLDOWN_SECONDS
         return False
 
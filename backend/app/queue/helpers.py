@@ -2,14 +2,19 @@
 异步任务辅助函数 - Step 10
 简化异步任务的提交和状态检查
 """
+import hashlib
 import logging
 import os
 import uuid
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
 
+from rq import Retry
+from rq.exceptions import NoSuchJobError
 from rq.job import Job
 
-from app.queue.connection import get_queue, is_redis_available
+from app.queue.connection import get_queue, get_redis_connection, is_redis_available
+from app.queue.registry import get_task_spec
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +24,7 @@ def is_async_enabled(feature: str) -> bool:
     检查异步功能是否启用
     
     Args:
-        feature: 功能名称 (ingest/extract/review)
+        feature: 功能名称 (ingest/extract/review/directory/delete)
         
     Returns:
         是否启用异步
@@ -30,6 +35,10 @@ def is_async_enabled(feature: str) -> bool:
         return os.getenv("ASYNC_EXTRACT_ENABLED", "false").lower() == "true"
     elif feature == "review":
         return os.getenv("ASYNC_REVIEW_ENABLED", "false").lower() == "true"
+    elif feature == "directory":
+        return os.getenv("ASYNC_DIRECTORY_ENABLED", "false").lower() == "true"
+    elif feature == "delete":
+        return os.getenv("ASYNC_DELETE_ENABLED", "false").lower() == "true"
     else:
         return False
 
@@ -77,6 +86,175 @@ def enqueue_task(
     return job.id
 
 
+# ==================== 注册任务提交（幂等） ====================
+
+# 幂等键保留时间：任务结束时会主动释放，这里只是兜底（Worker 崩溃等情况）
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("RQ_IDEMPOTENCY_TTL", "21600"))
+
+# 入队前的占位时长：提交方在建档 / 入队前崩溃时，占位最多挡住重复提交这么久
+IDEMPOTENCY_CLAIM_TTL_SECONDS = int(os.getenv("RQ_IDEMPOTENCY_CLAIM_TTL", "60"))
+
+# 占位值前缀（入队成功后替换为 job_id）
+_CLAIM_PREFIX = "claim:"
+
+# 幂等键命中时视为"同一个任务仍在进行"的状态
+_ACTIVE_STATUSES = {"queued", "started", "deferred", "scheduled"}
+
+_RQ_WORKER_KEY_PREFIX = "rq:worker:"
+
+
+@dataclass
+class SubmitResult:
+    """提交结果"""
+    job_id: str
+    deduplicated: bool = False
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+def _idempotency_redis_key(key: str) -> str:
+    return f"x-llmapp:idem:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+
+def release_idempotency_key(key: str, job_id: str, connection=None) -> bool:
+    """释放幂等键（仅当它仍指向 job_id 或 job_id 的入队前占位时）"""
+    conn = connection or get_redis_connection()
+    redis_key = _idempotency_redis_key(key)
+    current = conn.get(redis_key)
+    if current is not None and current.decode("utf-8") in (job_id, _CLAIM_PREFIX + job_id):
+        conn.delete(redis_key)
+        return True
+    return False
+
+
+def _worker_alive(conn, job: Job) -> bool:
+    """执行该任务的 Worker 是否仍在心跳（Worker 键过期即视为已死）"""
+    worker_name = getattr(job, "worker_name", None)
+    if not worker_name:
+        return True
+    return bool(conn.exists(_RQ_WORKER_KEY_PREFIX + worker_name))
+
+
+def _find_active_job(conn, key: str) -> Optional[SubmitResult]:
+    """
+    幂等键对应的任务仍在排队 / 执行中时返回它
+
+    以下情况视为键已空闲（返回 None）：任务已结束 / 失败、任务不存在、执行它的 Worker 已死。
+    """
+    current = conn.get(_idempotency_redis_key(key))
+    if current is None:
+        return None
+    value = current.decode("utf-8")
+    if value.startswith(_CLAIM_PREFIX):
+        # 并发提交的另一方正在建档 / 入队，占位很快过期，期间视为进行中
+        return SubmitResult(job_id=value[len(_CLAIM_PREFIX):], deduplicated=True)
+    try:
+        job = Job.fetch(value, connection=conn)
+    except NoSuchJobError:
+        return None
+    status = job.get_status(refresh=False)
+    if status not in _ACTIVE_STATUSES:
+        return None
+    if status == "started" and not _worker_alive(conn, job):
+        logger.warning(f"Idempotency key points to job on a dead worker, releasing: key={key} job_id={value}")
+        return None
+    return SubmitResult(job_id=value, deduplicated=True, meta=dict(job.meta or {}))
+
+
+def submit_task(
+    task_name: str,
+    task_kwargs: Optional[Dict[str, Any]] = None,
+    idempotency_key: Optional[str] = None,
+    prepare: Optional[Callable[[str], Dict[str, Any]]] = None,
+    biz_id: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    connection=None,
+) -> SubmitResult:
+    """
+    按注册表提交任务到对应队列
+
+    - 同一个 idempotency_key 在任务结束前只会入队一次，重复提交直接返回已有任务；
+      入队前只写短时占位，入队成功后才把键指向 job_id（保留 IDEMPOTENCY_TTL_SECONDS），
+      入队失败立即释放；键指向的任务已失败 / 不存在 / Worker 已死时视为空闲
+    - 新任务会先在 platform_jobs 建档（job_id 与 RQ job id 相同），Worker 执行时回写进度
+    - prepare(job_id) 只在真正入队时调用，返回值合并进 task_kwargs 并记入 job.meta
+      （例如路由在这里创建 tender_runs 记录，避免重复点击产生多余的 run）
+
+    Args:
+        task_name: 注册的任务名
+        task_kwargs: 任务关键字参数
+        idempotency_key: 幂等键
+        prepare: 入队前回调
+        biz_id: platform_jobs.biz_id（默认取 task_kwargs["project_id"]）
+        owner_id: 任务所有者
+        connection: Redis 连接（默认全局连接）
+
+    Returns:
+        SubmitResult
+    """
+    spec = get_task_spec(task_name)
+    conn = connection or get_redis_connection()
+    kwargs = dict(task_kwargs or {})
+    job_id = f"pj_{uuid.uuid4().hex}"
+
+    if idempotency_key:
+        redis_key = _idempotency_redis_key(idempotency_key)
+        claim = _CLAIM_PREFIX + job_id
+        while not conn.set(redis_key, claim, nx=True, ex=IDEMPOTENCY_CLAIM_TTL_SECONDS):
+            existing = _find_active_job(conn, idempotency_key)
+            if existing is not None:
+                logger.info(f"Task deduplicated: {task_name}, key={idempotency_key}, job_id={existing.job_id}")
+                return existing
+            # 旧任务已结束 / 失效但键未释放：清掉后重新抢占
+            conn.delete(redis_key)
+
+    try:
+        meta = dict(prepare(job_id) or {}) if prepare else {}
+        kwargs.update(meta)
+
+        from app.queue.runner import _jobs_service
+        _jobs_service().create_job(
+            spec.namespace,
+            task_name,
+            biz_id or str(kwargs.get("project_id") or ""),
+            owner_id=owner_id,
+            initial_message="排队中",
+            job_id=job_id,
+        )
+
+        queue = get_queue(spec.queue, connection=conn)
+        retry = None
+        if spec.max_retries > 0:
+            retry = Retry(max=spec.max_retries, interval=spec.retry_intervals or 0)
+        job = queue.enqueue(
+            "app.queue.runner.execute_task",
+            kwargs={
+                "task_name": task_name,
+                "platform_job_id": job_id,
+                "idempotency_key": idempotency_key,
+                "task_kwargs": kwargs,
+            },
+            job_id=job_id,
+            job_timeout=spec.timeout,
+            result_ttl=86400,
+            failure_ttl=604800,
+            retry=retry,
+            meta=meta,
+            description=f"{task_name} {biz_id or kwargs.get('project_id') or ''}".strip(),
+        )
+    except Exception:
+        if idempotency_key:
+            release_idempotency_key(idempotency_key, job_id, connection=conn)
+        raise
+
+    if idempotency_key:
+        # 入队成功后占位转正；占位已被 Worker 释放（任务已跑完）或过期被别人抢走时不覆盖
+        if conn.get(redis_key) == claim.encode("utf-8"):
+            conn.set(redis_key, job_id, ex=IDEMPOTENCY_TTL_SECONDS)
+
+    logger.info(f"Task submitted: {task_name}, job_id={job.id}, queue={spec.queue}")
+    return SubmitResult(job_id=job.id, meta=meta)
+
+
 def get_job_status(job_id: str) -> Dict[str, Any]:
     """
     获取任务状态
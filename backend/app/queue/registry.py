@@ -0,0 +1,125 @@
+"""
+任务注册表
+统一登记可入队的后台任务：任务名 -> 执行函数、目标队列、超时与重试策略。
+
+路由层只按任务名提交（app.queue.helpers.submit_task），
+Worker 侧由 app.queue.runner.execute_task 按任务名找到函数执行，
+两边不再直接传递函数路径字符串，避免签名漂移。
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ==================== 队列 ====================
+
+QUEUE_DEFAULT = "default"
+QUEUE_INGEST = "ingest"
+QUEUE_EXTRACT = "extract"
+QUEUE_REVIEW = "review"
+
+# 各队列默认并发（Worker 进程数），可用 RQ_QUEUE_CONCURRENCY 覆盖
+DEFAULT_QUEUE_CONCURRENCY: Dict[str, int] = {
+    QUEUE_DEFAULT: 1,
+    QUEUE_INGEST: 2,
+    QUEUE_EXTRACT: 2,
+    QUEUE_REVIEW: 1,
+}
+
+
+def parse_queue_concurrency(spec: Optional[str]) -> Dict[str, int]:
+    """
+    解析队列并发配置
+
+    Args:
+        spec: 形如 "extract=3,review=1" 的字符串；未出现的队列使用默认值，0 表示不启动
+
+    Returns:
+        {队列名: 并发数}
+    """
+    result = dict(DEFAULT_QUEUE_CONCURRENCY)
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, value = part.partition("=")
+        name = name.strip()
+        if not sep or not name:
+            raise ValueError(f"invalid queue concurrency item: {part!r}")
+        try:
+            result[name] = max(0, int(value))
+        except ValueError:
+            raise ValueError(f"invalid queue concurrency for {name}: {value!r}")
+    return result
+
+
+# ==================== 任务 ====================
+
+@dataclass(frozen=True)
+class TaskSpec:
+    """任务定义"""
+    name: str
+    func: Callable
+    queue: str = QUEUE_DEFAULT
+    timeout: int = 1800                      # 单次执行超时（秒）
+    max_retries: int = 0                     # 失败后的重试次数
+    retry_intervals: List[int] = field(default_factory=list)  # 每次重试前等待（秒），为空则立即重试
+    namespace: str = "tender"                # platform_jobs.namespace
+
+
+_REGISTRY: Dict[str, TaskSpec] = {}
+
+
+def register_task(
+    name: str,
+    queue: str = QUEUE_DEFAULT,
+    timeout: int = 1800,
+    max_retries: int = 0,
+    retry_intervals: Optional[List[int]] = None,
+    namespace: str = "tender",
+) -> Callable[[Callable], Callable]:
+    """
+    注册任务的装饰器
+
+    被注册函数的第一个参数是 TaskContext（进度上报 / 重试信息），其余为关键字参数。
+    """
+    def decorator(func: Callable) -> Callable:
+        if name in _REGISTRY and _REGISTRY[name].func is not func:
+            raise ValueError(f"task already registered: {name}")
+        _REGISTRY[name] = TaskSpec(
+            name=name,
+            func=func,
+            queue=queue,
+            timeout=timeout,
+            max_retries=max_retries,
+            retry_intervals=list(retry_intervals or []),
+            namespace=namespace,
+        )
+        return func
+    return decorator
+
+
+def get_task_spec(name: str) -> TaskSpec:
+    """按任务名获取定义（未注册时先加载内置任务模块）"""
+    spec = _REGISTRY.get(name)
+    if spec is None:
+        # 内置任务在 app.queue.tasks 中以装饰器注册，首次使用时再导入
+        import app.queue.tasks  # noqa: F401
+        spec = _REGISTRY.get(name)
+    if spec is None:
+        raise KeyError(f"unknown task: {name}")
+    return spec
+
+
+def list_tasks() -> List[TaskSpec]:
+    """列出所有已注册任务"""
+    import app.queue.tasks  # noqa: F401
+    return sorted(_REGISTRY.values(), key=lambda s: s.name)
+
+
+def unregister_task(name: str) -> None:
+    """移除任务（测试用）"""
+    _REGISTRY.pop(name, None)
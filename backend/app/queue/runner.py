@@ -0,0 +1,135 @@
+"""
+Worker 侧任务执行入口
+RQ 队列中的每个 job 都指向 execute_task(task_name, platform_job_id, ...)，
+由这里负责：查找注册表、把状态 / 进度写入 platform_jobs、区分"将重试"与"最终失败"、
+任务结束后释放幂等键。
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Optional
+
+from rq import get_current_job
+
+from app.queue.registry import get_task_spec
+
+logger = logging.getLogger(__name__)
+
+
+def _jobs_service():
+    """platform_jobs 服务（测试中可替换）"""
+    from app.services.db.postgres import _get_pool
+    from app.services.platform.jobs_service import JobsService
+    return JobsService(_get_pool())
+
+
+class TaskContext:
+    """传给任务函数的上下文：进度上报 + 当前重试信息"""
+
+    def __init__(
+        self,
+        task_name: str,
+        platform_job_id: Optional[str],
+        jobs_service: Any = None,
+        attempt: int = 1,
+        will_retry: bool = False,
+    ):
+        self.task_name = task_name
+        self.platform_job_id = platform_job_id
+        self.jobs_service = jobs_service
+        self.attempt = attempt
+        self.will_retry = will_retry
+        self._last_progress = -1
+
+    def report(self, progress: Optional[float], message: Optional[str] = None) -> None:
+        """
+        上报进度
+
+        Args:
+            progress: 0-1 的小数或 0-100 的整数；None 表示只更新消息
+            message: 状态消息
+        """
+        if not self.platform_job_id or self.jobs_service is None:
+            return
+        if progress is None:
+            value = max(self._last_progress, 0)
+        elif isinstance(progress, float) and progress <= 1.0:
+            value = int(round(progress * 100))
+        else:
+            value = int(progress)
+        # 成功前最多到 99，100 留给 finish_job_success
+        value = max(0, min(99, value))
+        if value == self._last_progress and message is None:
+            return
+        self._last_progress = value
+        try:
+            self.jobs_service.update_job_progress(
+                self.platform_job_id, value, status="running", message=message
+            )
+        except Exception as e:
+            logger.warning(f"[Worker] report progress failed job={self.platform_job_id}: {e}")
+
+
+def execute_task(
+    task_name: str,
+    platform_job_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    task_kwargs: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """RQ job 的实际入口"""
+    spec = get_task_spec(task_name)
+    rq_job = get_current_job()
+
+    will_retry = bool(rq_job is not None and rq_job.retries_left)
+    attempt = 1
+    if rq_job is not None and rq_job.retries_left is not None:
+        attempt = spec.max_retries - rq_job.retries_left + 1
+
+    jobs_service = _jobs_service() if platform_job_id else None
+    ctx = TaskContext(task_name, platform_job_id, jobs_service, attempt=attempt, will_retry=will_retry)
+
+    logger.info(f"[Worker] {task_name} start job={platform_job_id} attempt={attempt}")
+    ctx.report(0.01, "运行中" if attempt == 1 else f"第{attempt}次尝试")
+
+    try:
+        result = spec.func(ctx, **(task_kwargs or {}))
+    except Exception as e:
+        logger.error(f"[Worker] {task_name} failed job={platform_job_id} attempt={attempt}: {e}", exc_info=True)
+        if jobs_service is not None:
+            try:
+                if will_retry:
+                    jobs_service.update_job_progress(
+                        platform_job_id, max(ctx._last_progress, 0), status="queued",
+                        message=f"第{attempt}次执行失败，等待重试: {e}",
+                    )
+                else:
+                    jobs_service.finish_job_fail(platform_job_id, error=str(e))
+            except Exception as db_err:
+                logger.warning(f"[Worker] record failure failed job={platform_job_id}: {db_err}")
+        if not will_retry:
+            _release_idempotency_key(idempotency_key, rq_job)
+        raise
+
+    if jobs_service is not None:
+        try:
+            jobs_service.finish_job_success(
+                platform_job_id,
+                result=result if isinstance(result, dict) else {"result": result},
+                message="ok",
+            )
+        except Exception as e:
+            logger.warning(f"[Worker] record success failed job={platform_job_id}: {e}")
+    _release_idempotency_key(idempotency_key, rq_job)
+    logger.info(f"[Worker] {task_name} done job={platform_job_id}")
+    return result
+
+
+def _release_idempotency_key(key: Optional[str], rq_job) -> None:
+    """任务结束后释放幂等键（只删除仍指向本 job 的键）"""
+    if not key or rq_job is None:
+        return
+    from app.queue.helpers import release_idempotency_key
+    try:
+        release_idempotency_key(key, rq_job.id, connection=rq_job.connection)
+    except Exception as e:
+        logger.warning(f"[Worker] release idempotency key failed key={key}: {e}")
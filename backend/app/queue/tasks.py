@@ -1,320 +1,245 @@
 """
 异步任务定义 - Step 10
-支持 ingest, extract, review 的异步执行
+在注册表中登记招投标的长耗时操作（入库、抽取、目录、审核、范本填充、项目删除），
+由 RQ Worker 通过 app.queue.runner.execute_task 执行。
+
+每个任务函数的第一个参数是 TaskContext：
+- ctx.report(progress, message) 把进度写入 platform_jobs
+- ctx.will_retry 为 True 时，本次失败后还会重试（tender_runs 不标记为 failed）
 """
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import os
+from typing import Any, Dict, List, Optional
+
+from app.queue.registry import QUEUE_DEFAULT, QUEUE_EXTRACT, QUEUE_INGEST, QUEUE_REVIEW, register_task
 
 logger = logging.getLogger(__name__)
 
 
-# ==================== Ingest v2 异步任务 ====================
+# ==================== 公共构造 ====================
+
+def _get_pool():
+    from app.services.db.postgres import _get_pool as get_sync_pool
+    return get_sync_pool()
+
+
+def _progress_dao(ctx, run_id: Optional[str]):
+    """
+    返回一个 TenderDAO：对 run_id 的 update_run 同步转发到 platform_jobs 进度，
+    这样 TenderService 现有的阶段进度无需改动即可反映到任务表。
+    """
+    from app.services.dao.tender_dao import TenderDAO
+
+    class _ProgressTenderDAO(TenderDAO):
+        def update_run(self, rid, status, progress=None, message=None, result_json=None):
+            super().update_run(rid, status, progress=progress, message=message, result_json=result_json)
+            if rid == run_id and status not in ("success", "failed"):
+                ctx.report(progress, message)
+
+    return _ProgressTenderDAO(_get_pool())
+
+
+def _tender_service(dao):
+    """Worker 内构造 TenderService（平台任务由队列统一记录，不再注入 jobs_service 以免重复建档）"""
+    from app.services.simple_llm_orchestrator import SimpleLLMOrchestrator
+    from app.services.tender_service import TenderService
+    return TenderService(dao=dao, llm_orchestrator=SimpleLLMOrchestrator(), jobs_service=None)
+
+
+def _mark_run_failed(ctx, dao, run_id: Optional[str], error: Exception) -> None:
+    """失败时更新 tender_runs：还会重试则回到排队状态"""
+    if not run_id:
+        return
+    try:
+        if ctx.will_retry:
+            dao.update_run(run_id, "pending", message=f"第{ctx.attempt}次执行失败，等待重试: {error}")
+        else:
+            dao.update_run(run_id, "failed", message=str(error))
+    except Exception as e:
+        logger.warning(f"[Worker] update run failed run_id={run_id}: {e}")
+
 
-def async_ingest_asset_v2(
+def _run_summary(dao, run_id: Optional[str]) -> Dict[str, Any]:
+    run = dao.get_run(run_id) if run_id else None
+    return {
+        "run_id": run_id,
+        "status": run.get("status") if run else None,
+        "message": run.get("message") if run else None,
+    }
+
+
+# ==================== 入库 ====================
+
+@register_task("tender.ingest_asset_v2", queue=QUEUE_INGEST, timeout=3600, max_retries=2, retry_intervals=[30, 120])
+def ingest_asset_v2(
+    ctx,
     project_id: str,
     asset_id: str,
     owner_id: Optional[str] = None,
-    job_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """
-    异步执行资产入库 v2
-    
-    Args:
-        project_id: 项目ID
-        asset_id: 资产ID
-        owner_id: 用户ID
-        job_id: 任务ID (platform_jobs.id)
-        
-    Returns:
-        入库结果
-    """
-    from app.services.db.postgres import _get_pool
+    """执行资产入库 v2（读取 storage_path 上的原文件）"""
     from app.platform.ingest.v2_service import IngestV2Service
-    from app.services.embedding.http_embedding_client import HttpEmbeddingClient
-    
-    logger.info(f"[Worker] async_ingest_asset_v2 start: project={project_id}, asset={asset_id}")
-    
+    from app.services.dao.tender_dao import TenderDAO
+
     pool = _get_pool()
-    
-    # 更新 job 状态为 running
-    if job_id:
-        _update_job_status(job_id, "running", 10, "正在入库...")
-    
+    asset = TenderDAO(pool).get_asset_by_id(asset_id)
+    if not asset:
+        raise ValueError(f"Asset not found: {asset_id}")
+
+    storage_path = asset.get("storage_path")
+    if not storage_path or not os.path.exists(storage_path):
+        raise ValueError(f"Asset {asset_id} has no readable storage_path")
+
+    ctx.report(0.1, "正在入库...")
+    with open(storage_path, "rb") as f:
+        file_bytes = f.read()
+
+    result = asyncio.run(IngestV2Service(pool).ingest_asset_v2(
+        project_id=project_id,
+        asset_id=asset_id,
+        file_bytes=file_bytes,
+        filename=asset.get("filename") or os.path.basename(storage_path),
+        doc_type=asset.get("kind") or "tender",
+        owner_id=owner_id,
+        storage_path=storage_path,
+    ))
+    logger.info(f"[Worker] ingest_asset_v2 done: asset={asset_id}, segments={result.segment_count}")
+    return result.to_dict()
+
+
+# ==================== 抽取 ====================
+
+@register_task("tender.extract_project_info", queue=QUEUE_EXTRACT, timeout=3600, max_retries=1, retry_intervals=[60])
+def extract_project_info(
+    ctx,
+    project_id: str,
+    model_id: Optional[str],
+    run_id: Optional[str] = None,
+    owner_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """抽取项目信息"""
+    dao = _progress_dao(ctx, run_id)
+    if run_id:
+        dao.update_run(run_id, "running", progress=0.01, message="running")
     try:
-        # 获取 asset 信息
-        from app.services.dao.tender_dao import TenderDAO
-        dao = TenderDAO(pool)
-        asset = dao.get_asset(asset_id)
-        if not asset:
-            raise ValueError(f"Asset not found: {asset_id}")
-        
-        storage_path = asset.get("storage_path")
-        doc_type = asset.get("kind", "tender")  # tender / bid / custom_rule
-        
-        if not storage_path:
-            raise ValueError(f"Asset {asset_id} has no storage_path")
-        
-        # 执行 v2 入库
-        embedding_client = HttpEmbeddingClient()
-        ingest_service = IngestV2Service(pool, embedding_client)
-        
-        result = ingest_service.ingest_asset_v2(
-            project_id=project_id,
-            asset_id=asset_id,
-            file_path=storage_path,
-            doc_type=doc_type,
-            owner_id=owner_id,
-        )
-        
-        # 更新 job 状态为 succeeded
-        if job_id:
-            _update_job_status(job_id, "succeeded", 100, "入库完成", result)
-        
-        logger.info(f"[Worker] async_ingest_asset_v2 done: asset={asset_id}, segments={result.get('segment_count', 0)}")
-        return result
-        
+        _tender_service(dao).extract_project_info(project_id, model_id, run_id=run_id, owner_id=owner_id)
     except Exception as e:
-        logger.error(f"[Worker] async_ingest_asset_v2 failed: {e}", exc_info=True)
-        
-        # 更新 job 状态为 failed
-        if job_id:
-            _update_job_status(job_id, "failed", 0, f"入库失败: {str(e)}")
-        
+        _mark_run_failed(ctx, dao, run_id, e)
         raise
+    return _run_summary(dao, run_id)
 
 
-# ==================== Extract v2 异步任务 ====================
-
-def async_extract_project_info_v2(
+@register_task("tender.extract_risks", queue=QUEUE_EXTRACT, timeout=3600, max_retries=1, retry_intervals=[60])
+def extract_risks(
+    ctx,
     project_id: str,
     model_id: Optional[str],
     run_id: Optional[str] = None,
     owner_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """
-    异步执行项目信息抽取 v2
-    
-    Args:
-        project_id: 项目ID
-        model_id: 模型ID
-        run_id: tender_runs.id
-        owner_id: 用户ID
-        
-    Returns:
-        抽取结果
-    """
-    from app.services.db.postgres import _get_pool
-    from app.apps.tender.extract_v2_service import ExtractV2Service
-    from app.services.llm.llm_client import LLMClient
-    from app.services.dao.tender_dao import TenderDAO
-    
-    logger.info(f"[Worker] async_extract_project_info_v2 start: project={project_id}")
-    
-    pool = _get_pool()
-    dao = TenderDAO(pool)
-    
-    # 更新 run 状态
+    """识别风险"""
+    dao = _progress_dao(ctx, run_id)
     if run_id:
-        dao.update_run(run_id, "running", progress=0.1, message="正在抽取项目信息...")
-    
+        dao.update_run(run_id, "running", progress=0.01, message="running")
     try:
-        llm_client = LLMClient()
-        extract_v2 = ExtractV2Service(pool, llm_client)
-        
-        result = extract_v2.extract_project_info_v2(
-            project_id=project_id,
-            model_id=model_id,
-            run_id=run_id,
-            owner_id=owner_id,
-        )
-        
-        # 写入旧表（保证前端兼容）
-        data = result.get("data") or {}
-        eids = result.get("evidence_chunk_ids") or []
-        dao.upsert_project_info(project_id, data_json=data, evidence_chunk_ids=eids)
-        
-        # 更新 run 状态
-        if run_id:
-            dao.update_run(run_id, "success", progress=1.0, message="ok", result_json=result)
-        
-        logger.info(f"[Worker] async_extract_project_info_v2 done: project={project_id}")
-        return result
-        
+        _tender_service(dao).extract_risks(project_id, model_id, run_id=run_id, owner_id=owner_id)
     except Exception as e:
-        logger.error(f"[Worker] async_extract_project_info_v2 failed: {e}", exc_info=True)
-        
-        if run_id:
-            dao.update_run(run_id, "failed", progress=0.0, message=str(e))
-        
+        _mark_run_failed(ctx, dao, run_id, e)
         raise
+    return _run_summary(dao, run_id)
 
 
-def async_extract_risks_v2(
+# ==================== 目录 ====================
+
+@register_task("tender.generate_directory", queue=QUEUE_EXTRACT, timeout=3600, max_retries=1, retry_intervals=[60])
+def generate_directory(
+    ctx,
     project_id: str,
     model_id: Optional[str],
     run_id: Optional[str] = None,
-    owner_id: Optional[str] = None,
-) -> list:
-    """
-    异步执行风险抽取 v2
-    
-    Args:
-        project_id: 项目ID
-        model_id: 模型ID
-        run_id: tender_runs.id
-        owner_id: 用户ID
-        
-    Returns:
-        风险列表
-    """
-    from app.services.db.postgres import _get_pool
-    from app.apps.tender.extract_v2_service import ExtractV2Service
-    from app.services.llm.llm_client import LLMClient
-    from app.services.dao.tender_dao import TenderDAO
-    
-    logger.info(f"[Worker] async_extract_risks_v2 start: project={project_id}")
-    
-    pool = _get_pool()
-    dao = TenderDAO(pool)
-    
-    # 更新 run 状态
+) -> Dict[str, Any]:
+    """生成目录"""
+    dao = _progress_dao(ctx, run_id)
     if run_id:
-        dao.update_run(run_id, "running", progress=0.1, message="正在抽取风险...")
-    
+        dao.update_run(run_id, "running", progress=0.01, message="running")
     try:
-        llm_client = LLMClient()
-        extract_v2 = ExtractV2Service(pool, llm_client)
-        
-        result = extract_v2.extract_risks_v2(
-            project_id=project_id,
-            model_id=model_id,
-            run_id=run_id,
-            owner_id=owner_id,
-        )
-        
-        # 写入旧表（保证前端兼容）
-        dao.replace_risks(project_id, result)
-        
-        # 更新 run 状态
-        if run_id:
-            dao.update_run(run_id, "success", progress=1.0, message="ok", result_json=result)
-        
-        logger.info(f"[Worker] async_extract_risks_v2 done: project={project_id}, count={len(result)}")
-        return result
-        
+        _tender_service(dao).generate_directory(project_id, model_id, run_id=run_id)
     except Exception as e:
-        logger.error(f"[Worker] async_extract_risks_v2 failed: {e}", exc_info=True)
-        
-        if run_id:
-            dao.update_run(run_id, "failed", progress=0.0, message=str(e))
-        
+        _mark_run_failed(ctx, dao, run_id, e)
         raise
+    return _run_summary(dao, run_id)
 
 
-# ==================== Review v2 异步任务 ====================
+@register_task("tender.auto_fill_samples", queue=QUEUE_EXTRACT, timeout=1800)
+def auto_fill_samples(
+    ctx,
+    project_id: str,
+    run_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """自动填充所有章节的范本（服务本身不抛异常，结果写入 tender_runs.result_json）"""
+    dao = _progress_dao(ctx, run_id)
+    if run_id:
+        dao.update_run(run_id, "running", progress=0.01, message="running")
+    result = _tender_service(dao).auto_fill_samples(project_id)
+    if not isinstance(result, dict):
+        result = {"ok": False, "project_id": project_id, "warnings": ["auto_fill_samples returned non-dict result"]}
+    if run_id:
+        status = "success" if result.get("ok") else "failed"
+        dao.update_run(run_id, status, progress=1.0, message="ok" if result.get("ok") else "; ".join(
+            str(w) for w in (result.get("warnings") or [])
+        )[:500], result_json=result)
+    return {"run_id": run_id, "ok": bool(result.get("ok"))}
+
 
-def async_review_run_v2(
+# ==================== 审核 ====================
+
+@register_task("tender.run_review", queue=QUEUE_REVIEW, timeout=3600, max_retries=1, retry_intervals=[60])
+def run_review(
+    ctx,
     project_id: str,
     model_id: Optional[str],
-    bidder_name: Optional[str],
-    bid_asset_ids: list,
+    custom_rule_asset_ids: Optional[List[str]] = None,
+    bidder_name: Optional[str] = None,
+    bid_asset_ids: Optional[List[str]] = None,
     run_id: Optional[str] = None,
     owner_id: Optional[str] = None,
-) -> list:
-    """
-    异步执行审核 v2
-    
-    Args:
-        project_id: 项目ID
-        model_id: 模型ID
-        bidder_name: 投标人名称
-        bid_asset_ids: 投标资产ID列表
-        run_id: tender_runs.id
-        owner_id: 用户ID
-        
-    Returns:
-        审核结果列表
-    """
-    from app.services.db.postgres import _get_pool
-    from app.apps.tender.review_v2_service import ReviewV2Service
-    from app.services.llm.llm_client import LLMClient
-    from app.services.dao.tender_dao import TenderDAO
-    
-    logger.info(f"[Worker] async_review_run_v2 start: project={project_id}")
-    
-    pool = _get_pool()
-    dao = TenderDAO(pool)
-    
-    # 更新 run 状态
+) -> Dict[str, Any]:
+    """运行审核（招标规则 + 自定义规则文件叠加）"""
+    dao = _progress_dao(ctx, run_id)
     if run_id:
-        dao.update_run(run_id, "running", progress=0.1, message="正在审核...")
-    
+        dao.update_run(run_id, "running", progress=0.01, message="running")
     try:
-        llm_client = LLMClient()
-        review_v2 = ReviewV2Service(pool, llm_client)
-        
-        result = review_v2.run_review_v2(
-            project_id=project_id,
-            model_id=model_id,
-            bidder_name=bidder_name,
-            bid_asset_ids=bid_asset_ids,
+        _tender_service(dao).run_review(
+            project_id,
+            model_id,
+            custom_rule_asset_ids or [],
+            bidder_name,
+            bid_asset_ids or [],
             run_id=run_id,
             owner_id=owner_id,
         )
-        
-        # 写入旧表（保证前端兼容）
-        dao.replace_review_items(project_id, result)
-        
-        # 更新 run 状态
-        if run_id:
-            dao.update_run(run_id, "success", progress=1.0, message="ok", result_json={"count": len(result)})
-        
-        logger.info(f"[Worker] async_review_run_v2 done: project={project_id}, count={len(result)}")
-        return result
-        
     except Exception as e:
-        logger.error(f"[Worker] async_review_run_v2 failed: {e}", exc_info=True)
-        
-        if run_id:
-            dao.update_run(run_id, "failed", progress=0.0, message=str(e))
-        
+        _mark_run_failed(ctx, dao, run_id, e)
         raise
+    return _run_summary(dao, run_id)
 
 
-# ==================== Helper Functions ====================
-
-def _update_job_status(
-    job_id: str,
-    status: str,
-    progress: int,
-    message: str,
-    result_json: Optional[Dict[str, Any]] = None,
-):
-    """更新 platform_jobs 状态"""
-    from app.services.db.postgres import _get_pool
-    import json
-    
-    pool = _get_pool()
-    
-    with pool.connection() as conn:
-        with conn.cursor() as cur:
-            if result_json:
-                cur.execute(
-                    """
-                    UPDATE platform_jobs
-                    SET status=%s, progress=%s, message=%s, result_json=%s, updated_at=NOW()
-                    WHERE id=%s
-                    """,
-                    (status, progress, message, json.dumps(result_json), job_id)
-                )
-            else:
-                cur.execute(
-                    """
-                    UPDATE platform_jobs
-                    SET status=%s, progress=%s, message=%s, updated_at=NOW()
-                    WHERE id=%s
-                    """,
-                    (status, progress, message, job_id)
-                )
-            conn.commit()
+# ==================== 项目删除 ====================
 
+@register_task("tender.delete_project", queue=QUEUE_DEFAULT, timeout=7200, max_retries=2, retry_intervals=[60, 300])
+def delete_project(
+    ctx,
+    project_id: str,
+    audit_id: str,
+) -> Dict[str, Any]:
+    """执行项目删除（重试时从审计记录中的已完成阶段继续）"""
+    from app.services.project_delete import ProjectDeletionOrchestrator
+
+    status = ProjectDeletionOrchestrator(_get_pool()).run(audit_id, report=ctx.report)
+    return {
+        "project_id": project_id,
+        "audit_id": audit_id,
+        "status": status.get("status"),
+        "deleted": (status.get("progress_json") or {}).get("deleted", {}),
+    }
@@ -4,7 +4,9 @@ WebSocket 实时语音转写路由
 import json
 import uuid
 import asyncio
+import logging
 import tempfile
+import wave
 from datetime import datetime
 from typing import Optional, Dict
 from pathlib import Path
@@ -13,9 +15,13 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPExcept
 from pydantic import BaseModel
 
 from app.services.asr_service import transcribe_audio_streaming
+from app.services.asr_stream import FfmpegPcmDecoder, StreamingTranscriber, remote_pcm_transcriber
+from app.services.audio_decode import convert_to_wav, decode_to_wav_bytes
 from app.utils.auth import decode_access_token, TokenData
 from app.services.db.postgres import get_conn
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # 活跃的WebSocket连接管理
@@ -39,29 +45,102 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 class ASRSession:
-    """ASR 会话：管理单次录音的转写过程"""
+    """
+    ASR 会话：管理单次录音的转写过程
+
+    音频边收边写入录音文件，不在内存中累积；同时送入 StreamingTranscriber 输出 partial/final。
+    config.format == "pcm16" 时客户端直接发送 16kHz 单声道 s16le，录音保存为 wav；
+    否则按 webm 等容器格式保存，并通过 ffmpeg 实时解码后再转写（无 ffmpeg 时结束录音后整段转写）。
+    """
     def __init__(self, session_id: str, user_id: str, config: dict):
+        from app.config import get_settings
+
         self.session_id = session_id
         self.user_id = user_id
         self.config = config
-        self.audio_chunks: list[bytes] = []
+        self.recording_id = f"rec_{uuid.uuid4().hex[:12]}"
+        self.audio_format = "wav" if config.get("format") == "pcm16" else "webm"
         self.full_transcript = ""
         self.start_time = datetime.now()
         self.is_active = True
-        self.temp_audio_file: Optional[Path] = None
-    
-    def add_audio_chunk(self, chunk: bytes):
-        """添加音频数据块"""
-        if self.is_active:
-            self.audio_chunks.append(chunk)
-    
+        self.bytes_received = 0
+
+        audio_dir = Path(get_settings().APP_DATA_DIR) / "recordings"
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        self.audio_path = audio_dir / f"{self.recording_id}.{self.audio_format}"
+        if self.audio_format == "wav":
+            self._writer = wave.open(str(self.audio_path), "wb")
+            self._writer.setnchannels(1)
+            self._writer.setsampwidth(2)
+            self._writer.setframerate(16000)
+        else:
+            self._writer = open(self.audio_path, "wb")
+
+        self.transcriber: Optional[StreamingTranscriber] = None
+        self.decoder: Optional[FfmpegPcmDecoder] = None
+
+    async def start_streaming(self, emit) -> bool:
+        """启动流式转写，返回是否可用"""
+        from app.config import get_settings
+
+        settings = get_settings()
+        self.transcriber = StreamingTranscriber(
+            remote_pcm_transcriber(self.config.get("language", "zh")),
+            emit,
+            partial_interval=settings.ASR_STREAM_PARTIAL_INTERVAL_SECONDS,
+            min_final_seconds=settings.ASR_STREAM_MIN_FINAL_SECONDS,
+            max_window_seconds=settings.ASR_STREAM_MAX_WINDOW_SECONDS,
+        )
+        if self.audio_format == "wav":
+            return True
+        self.decoder = await FfmpegPcmDecoder.start(self.transcriber.feed)
+        if self.decoder is None:
+            logger.warning("ffmpeg not found, streaming transcription disabled for %s", self.session_id)
+            await self.transcriber.abort()
+            self.transcriber = None
+            return False
+        return True
+
+    async def add_audio_chunk(self, chunk: bytes):
+        """写入音频数据块并送入流式转写"""
+        if not self.is_active:
+            return
+        self.bytes_received += len(chunk)
+        if self.audio_format == "wav":
+            self._writer.writeframesraw(chunk)
+        else:
+            self._writer.write(chunk)
+        if self.decoder is not None:
+            await self.decoder.write(chunk)
+        elif self.transcriber is not None:
+            await self.transcriber.feed(chunk)
+
     def get_duration(self) -> float:
         """获取录音时长（秒）"""
         return (datetime.now() - self.start_time).total_seconds()
-    
-    def get_full_audio(self) -> bytes:
-        """获取完整音频数据"""
-        return b''.join(self.audio_chunks)
+
+    async def finish(self) -> Optional[str]:
+        """结束录音，返回流式转写的完整文本（未启用流式转写时返回 None）"""
+        self._writer.close()
+        if self.decoder is not None:
+            await self.decoder.close()
+        if self.transcriber is None:
+            return None
+        self.full_transcript = await self.transcriber.finish()
+        return self.full_transcript
+
+    async def abort(self):
+        """连接异常断开：停止转写并删除未完成的录音文件"""
+        self.is_active = False
+        if self.decoder is not None:
+            await self.decoder.abort()
+        if self.transcriber is not None:
+            await self.transcriber.abort()
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        self.audio_path.unlink(missing_ok=True)
 
 # 活跃的ASR会话
 active_sessions: Dict[str, ASRSession] = {}
@@ -78,12 +157,13 @@ async def websocket_asr_endpoint(
     1. Token 作为查询参数进行认证
     2. 音频数据块 (binary)
     3. 控制命令 (JSON)
-       - {"action": "start", "config": {...}}
+       - {"action": "start", "config": {...}}  config.format 可为 "pcm16"（16kHz 单声道 s16le）
        - {"action": "stop"}
        - {"action": "pause"}
     
     服务端发送:
-    1. 转写片段 {"type": "transcript", "text": "...", "is_partial": true}
+    1. 转写片段 {"type": "transcript", "text": "...", "is_partial": true, "start": 0.0, "end": 2.0, "seq": 1}
+       is_partial=false 为定稿片段，其后的 partial 只覆盖未定稿部分
     2. 最终结果 {"type": "final", "recording_id": "...", "full_transcript": "..."}
     3. 错误 {"type": "error", "message": "..."}
     4. 状态 {"type": "status", "message": "..."}
@@ -101,6 +181,8 @@ async def websocket_asr_endpoint(
     
     await manager.connect(session_id, websocket)
     
+    asr_session: Optional[ASRSession] = None
+    
     try:
         await manager.send_message(session_id, {
             "type": "status",
@@ -108,12 +190,12 @@ async def websocket_asr_endpoint(
             "session_id": session_id
         })
         
-        asr_session: Optional[ASRSession] = None
-        
         while True:
             # 接收消息（可能是音频数据或控制命令）
             try:
                 message = await websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    break
                 
                 # 处理文本消息（控制命令）
                 if "text" in message:
@@ -123,12 +205,18 @@ async def websocket_asr_endpoint(
                     if action == "start":
                         # 开始录音
                         config = data.get("config", {})
+                        if asr_session:
+                            await asr_session.abort()
                         asr_session = ASRSession(session_id, user_id, config)
                         active_sessions[session_id] = asr_session
+                        streaming = await asr_session.start_streaming(
+                            lambda msg: manager.send_message(session_id, msg)
+                        )
                         
                         await manager.send_message(session_id, {
                             "type": "status",
-                            "message": "Recording started - transcription will be done when you finish",
+                            "message": "Recording started" if streaming
+                            else "Recording started - transcription will be done when you finish",
                             "session_id": session_id
                         })
                     
@@ -147,11 +235,10 @@ async def websocket_asr_endpoint(
                                 "message": "Recording paused"
                             })
                 
-                # 处理音频数据 - 只累积，不实时转写
+                # 处理音频数据：写入录音文件并送入流式转写
                 elif "bytes" in message:
                     if asr_session and asr_session.is_active:
-                        audio_data = message["bytes"]
-                        asr_session.add_audio_chunk(audio_data)
+                        await asr_session.add_audio_chunk(message["bytes"])
             
             except WebSocketDisconnect:
                 break
@@ -164,6 +251,8 @@ async def websocket_asr_endpoint(
     
     finally:
         # 清理
+        if asr_session:
+            await asr_session.abort()
         manager.disconnect(session_id)
         if session_id in active_sessions:
             del active_sessions[session_id]
@@ -171,61 +260,29 @@ async def websocket_asr_endpoint(
 async def transcribe_chunk(audio_data: bytes, config: dict) -> str:
     """
     转写单个音频块
-    使用ffmpeg将音频转换为wav格式
+    ffmpeg 通过管道在内存中解码为 wav，不阻塞事件循环
     """
     import subprocess
-    import logging
-    
-    logger = logging.getLogger(__name__)
     
     # 检查音频数据大小，太小则跳过
     if len(audio_data) < 10000:  # 小于10KB则跳过
         logger.warning(f"Audio chunk too small: {len(audio_data)} bytes, skipping")
         return ""
     
-    # 检测可能的音频格式
-    file_ext = '.webm'  # 默认格式
-    
-    # 简单的格式检测（通过文件头）
-    if audio_data[:4] == b'OggS':
-        file_ext = '.ogg'
-    elif audio_data[:4] == b'ftyp' or audio_data[4:8] == b'ftyp':
-        file_ext = '.m4a'
-    elif audio_data[:4] == b'RIFF':
-        file_ext = '.wav'
-    
-    # 保存原始音频到临时文件
-    with tempfile.NamedTemporaryFile(suffix=file_ext, delete=False) as temp_file:
-        temp_file.write(audio_data)
-        temp_input_path = temp_file.name
-    
-    # 创建wav输出文件路径
-    temp_wav_path = temp_input_path.replace(file_ext, '.wav')
-    
+    temp_wav_path = None
     try:
         # 使用ffmpeg转换为wav (16kHz, 单声道)
-        cmd = [
-            'ffmpeg', '-y', '-i', temp_input_path,
-            '-ar', '16000',  # 采样率16kHz
-            '-ac', '1',      # 单声道
-            '-f', 'wav',     # wav格式
-            temp_wav_path
-        ]
+        wav_bytes = await decode_to_wav_bytes(audio_data, sample_rate=16000, timeout=10)
         
-        # 运行ffmpeg，隐藏输出
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            check=True,
-            timeout=10
-        )
-        
-        # 检查输出文件是否存在且大小合理
-        if not Path(temp_wav_path).exists() or Path(temp_wav_path).stat().st_size < 1000:
-            logger.error(f"FFmpeg output invalid: {temp_wav_path}")
+        # 检查输出大小是否合理
+        if len(wav_bytes) < 1000:
+            logger.error(f"FFmpeg output invalid: {len(wav_bytes)} bytes")
             return ""
         
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+            temp_file.write(wav_bytes)
+            temp_wav_path = temp_file.name
+        
         # 使用转换后的wav文件进行转写
         transcript, _ = await transcribe_audio_streaming(
             Path(temp_wav_path),
@@ -245,8 +302,7 @@ async def transcribe_chunk(audio_data: bytes, config: dict) -> str:
         
     finally:
         # 删除临时文件
-        Path(temp_input_path).unlink(missing_ok=True)
-        if Path(temp_wav_path).exists():
+        if temp_wav_path:
             Path(temp_wav_path).unlink(missing_ok=True)
 
 async def background_transcribe(recording_id: str, audio_path: str, language: str = "zh"):
@@ -254,9 +310,6 @@ async def background_transcribe(recording_id: str, audio_path: str, language: st
     后台任务：转写音频并更新数据库
     """
     import subprocess
-    import logging
-    
-    logger = logging.getLogger(__name__)
     
     try:
         logger.info(f"Starting background transcription for {recording_id}")
@@ -264,21 +317,13 @@ async def background_transcribe(recording_id: str, audio_path: str, language: st
         # 使用ffmpeg转换为wav
         webm_path = audio_path
         wav_path = webm_path.replace('.webm', '.wav')
-        cmd = [
-            'ffmpeg', '-y', '-i', webm_path,
-            '-ar', '16000', '-ac', '1', '-f', 'wav',
-            wav_path
-        ]
-        
         logger.info(f"Converting audio to WAV: {webm_path} -> {wav_path}")
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, 
-                      check=True, timeout=60)  # 增加超时时间到60秒
+        await convert_to_wav(webm_path, wav_path, sample_rate=16000, timeout=60)  # 增加超时时间到60秒
         
         # 转写
         logger.info(f"Calling ASR service for {recording_id}")
         from app.services.asr_service import transcribe_audio
-        with open(wav_path, 'rb') as f:
-            audio_data = f.read()
+        audio_data = await asyncio.to_thread(Path(wav_path).read_bytes)
         
         transcript, _ = await transcribe_audio(
             audio_data=audio_data,
@@ -338,31 +383,19 @@ async def background_transcribe(recording_id: str, audio_path: str, language: st
 
 async def finalize_recording(session_id: str, asr_session: ASRSession, websocket: WebSocket):
     """
-    完成录音并保存到数据库（快速保存，后台转写）
+    完成录音并保存到数据库
+
+    流式转写可用时等待剩余音频定稿后直接写入转写文本；否则快速保存，后台整段转写。
     """
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    
     try:
-        # 获取完整音频
-        full_audio = asr_session.get_full_audio()
         duration = int(asr_session.get_duration())
+        transcript = await asr_session.finish()
         
-        # 生成recording_id
-        recording_id = f"rec_{uuid.uuid4().hex[:12]}"
+        recording_id = asr_session.recording_id
+        audio_path = asr_session.audio_path
+        file_size = audio_path.stat().st_size if audio_path.exists() else 0
+        word_count = len(transcript) if transcript else 0
         
-        # 保存音频文件到磁盘
-        from app.config import get_settings
-        settings = get_settings()
-        audio_dir = Path(settings.APP_DATA_DIR) / "recordings"
-        audio_dir.mkdir(parents=True, exist_ok=True)
-        
-        audio_filename = f"{recording_id}.webm"
-        audio_path = audio_dir / audio_filename
-        audio_path.write_bytes(full_audio)
-        
-        # 快速保存到数据库（不等待转写完成）
         with get_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -375,30 +408,29 @@ async def finalize_recording(session_id: str, asr_session: ASRSession, websocket
                     recording_id,
                     asr_session.user_id,
                     f"录音_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                    audio_filename,
+                    audio_path.name,
                     duration,
-                    len(full_audio),
-                    "webm",
-                    "",  # 转写文本为空，后台处理
-                    0,   # 字数为0
+                    file_size,
+                    asr_session.audio_format,
+                    transcript or "",
+                    word_count,
                     str(audio_path),
                     "pending",
                     True  # 保留音频文件
                 ))
             conn.commit()
         
-        # 立即发送结果给前端（不等待转写）
         await manager.send_message(session_id, {
             "type": "final",
             "recording_id": recording_id,
-            "full_transcript": "",
+            "full_transcript": transcript or "",
             "duration": duration,
-            "word_count": 0,
+            "word_count": word_count,
             "session_id": session_id
         })
         
-        # 启动后台任务进行转写
-        if len(full_audio) > 10000:  # 至少10KB
+        # 未启用流式转写时启动后台任务进行整段转写
+        if transcript is None and asr_session.bytes_received > 10000:  # 至少10KB
             asyncio.create_task(
                 background_transcribe(recording_id, str(audio_path), asr_session.config.get("language", "zh"))
             )
@@ -409,4 +441,3 @@ async def finalize_recording(session_id: str, asr_session: ASRSession, websocket
             "type": "error",
             "message": f"Failed to save recording: {str(e)}"
         })
-
@@ -12,19 +12,23 @@ from fastapi.responses import StreamingResponse
 from urllib.parse import urlparse
 
 from app.config import get_settings
+from app.core.telemetry import counter, traced
 from ..schemas.chat import ChatRequest, ChatResponse, ChatSection, Message, Source, UsedModel
 from ..schemas.intent import AnswerStyle, IntentPlan
 from ..services.orchestrator import OrchestratorService
 from ..services.cache import doc_cache
 from ..services.dao import kb_dao
-from ..services.crawler.extractor import extract_content
+from ..services.crawler.extractor import extract_content_async
 from ..services.crawler.fetcher import PageFetcher
+from ..services.crawler.page_cache import get_page_cache
 from ..services.embedding.http_embedding_client import embed_texts
 from ..services.embedding_provider_store import get_embedding_store
 from ..services.history_store import (
     append_message as append_history_message,
     create_session as create_history_session,
-    get_session as get_history_session,
+    get_session_meta as get_history_session,
+    get_session_window as get_history_session_window,
+    list_messages as list_history_messages,
     update_session_kb_ids as update_history_session_kb_ids,
     update_session_meta as update_history_session_meta,
     update_session_summary as update_history_session_summary,
@@ -68,10 +72,19 @@ logger = logging.getLogger(__name__)
 
 INTENT_LLM_OVERRIDES = {"temperature": 0.0, "max_tokens": 512, "top_p": 0.8}
 STREAM_HEARTBEAT_INTERVAL = 15
+# SSE 输出队列上限：消费慢时 send_delta 阻塞，LLM 流随之暂停读取，内存不随输出长度增长
+STREAM_QUEUE_MAXSIZE = 64
+
+CHAT_STREAM_CANCELLED = counter(
+    "chat_stream_cancelled_total", "Streaming chat turns cancelled after the client disconnected"
+)
 
 # 上下文管理配置
 HISTORY_MESSAGE_LIMIT = 10  # 传给 LLM 的最近消息数量（增加到10轮，提供更丰富的上下文）
 SUMMARY_TRIGGER_THRESHOLD = 20  # 当消息数超过此值时触发摘要生成（从12增加到20，减少频繁摘要）
+# 每轮只加载最近的消息窗口：多取一条即可判断是否超过摘要阈值，不再随会话长度全量加载
+HISTORY_WINDOW_SIZE = max(SUMMARY_TRIGGER_THRESHOLD, HISTORY_MESSAGE_LIMIT) + 1
+SUMMARY_SOURCE_LIMIT = 200  # 生成摘要时最多读取的早期消息数
 MAX_CONTEXT_TOKENS = 128000  # 最大上下文token数（估算值，用于防止超出模型限制）
 
 # 网页抓取配置
@@ -269,6 +282,67 @@ def _format_sse_event(event_type: str, payload: dict) -> bytes:
     return f"event: {event_type}\ndata: {data}\n\n".encode("utf-8")
 
 
+class _DeltaCoalescer:
+    """
+    把上游逐 token 的增量合并成较大的 delta 帧，减少 JSON 编码与小包写出。
+    缓冲字符数达到 max_chars，或最早一个未发送 token 已等待 max_delay 秒时发送；
+    只做拼接不做切分，客户端拼出的文本与逐 token 发送完全一致。
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str], Awaitable[None]],
+        max_chars: int,
+        max_delay: float,
+    ) -> None:
+        self._emit = emit
+        self._max_chars = max_chars
+        self._max_delay = max_delay
+        self._parts: List[str] = []
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_task: Optional[asyncio.Task] = None
+
+    async def add(self, text: str) -> None:
+        if not text:
+            return
+        self._parts.append(text)
+        self._size += len(text)
+        if self._max_delay <= 0 or self._size >= self._max_chars:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._max_delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._timer_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        # 取缓冲与写出都在锁内，定时发送与阈值发送交错时仍保持顺序
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts = []
+            self._size = 0
+            await self._emit(text)
+
+    def cancel(self) -> None:
+        """丢弃未发送内容并停止定时器（本轮被取消时调用）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._timer_task is not None and not self._timer_task.done():
+            self._timer_task.cancel()
+        self._parts = []
+        self._size = 0
+
+
+@traced("chat.turn")
 async def _chat_endpoint_impl(
     req: ChatRequest,
     request_id: str,
@@ -340,7 +414,7 @@ async def _chat_endpoint_impl(
         },
     )
 
-    history_session = get_history_session(session_id)
+    history_session = get_history_session_window(session_id, HISTORY_WINDOW_SIZE)
     if not history_session:
         raise HTTPException(status_code=500, detail="会话记录异常，无法载入历史。")
 
@@ -354,13 +428,23 @@ async def _chat_endpoint_impl(
         and len(session_messages) > HISTORY_MESSAGE_LIMIT
     ):
         older_records = session_messages[:-HISTORY_MESSAGE_LIMIT]
+        earlier_cursor = history_session.get("messages_cursor")
+        if earlier_cursor:
+            # 窗口之外的早期消息只在首次生成摘要时按需读取
+            earlier, _ = list_history_messages(
+                session_id,
+                max(SUMMARY_SOURCE_LIMIT - len(older_records), 0),
+                earlier_cursor,
+            )
+            older_records = earlier + older_records
         summary_input = _records_to_messages(older_records, 0)
         if summary_input:
             try:
                 req_logger.info(
-                    "Generating session summary: %d old messages (total: %d)",
+                    "Generating session summary: %d old messages (window: %d, more: %s)",
                     len(older_records),
-                    len(session_messages)
+                    len(session_messages),
+                    bool(earlier_cursor),
                 )
                 generated_summary = await summarize_history(summary_input, req.llm_key)
             except Exception as exc:  # noqa: BLE001
@@ -419,7 +503,7 @@ async def _chat_endpoint_impl(
         
         total_tokens_after = sum(_estimate_tokens(m.content) for m in history_for_llm)
         req_logger.info(
-            "Context prepared: session=%s total_msgs=%d context_msgs=%d "
+            "Context prepared: session=%s window_msgs=%d context_msgs=%d "
             "has_summary=%s estimated_tokens=%d",
             session_id[:8] if session_id else "new",
             len(session_messages),
@@ -684,17 +768,24 @@ async def _chat_endpoint_impl(
             delay_range=(crawl_cfg.delay_min, crawl_cfg.delay_max),
             domain_cooldown=crawl_cfg.domain_cooldown,
             proxies=settings.CRAWLER_PROXIES,
+            cache=get_page_cache(),
+            max_body_bytes=settings.CRAWLER_MAX_BODY_BYTES,
+            block_backoff=settings.CRAWLER_BLOCK_BACKOFF,
         )
 
     if enable_web and fetched_urls and fetcher and embedding_provider:
         fetch_results = await fetcher.fetch(fetched_urls)
-        for result in fetch_results:
-            if result.error or not result.html:
-                continue
-            final_url = result.final_url or result.url
-            if not final_url:
-                continue
-            doc = extract_content(result.html, final_url, default_title=final_url, request_id=request_id)
+        pages = [
+            (result.final_url or result.url, result.html)
+            for result in fetch_results
+            if not result.error and result.html and (result.final_url or result.url)
+        ]
+        # 各页面的正文提取在进程池中并行，不占用事件循环
+        docs = await asyncio.gather(*(
+            extract_content_async(html, final_url, default_title=final_url, request_id=request_id)
+            for final_url, html in pages
+        ))
+        for (final_url, _), doc in zip(pages, docs):
             if not doc:
                 continue
             if is_chinese_heavy(doc.text or ""):
@@ -1160,22 +1251,29 @@ async def chat_endpoint(req: ChatRequest) -> ChatResponse:
 @router.post("/chat/stream")
 async def chat_stream_endpoint(req: ChatRequest):
     request_id = uuid4().hex
-    queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+    queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=STREAM_QUEUE_MAXSIZE)
     done_event = asyncio.Event()
 
-    async def send_delta(text: str) -> None:
-        if text:
-            await queue.put(_format_sse_event("delta", {"text": text}))
+    async def emit_delta(text: str) -> None:
+        await queue.put(_format_sse_event("delta", {"text": text}))
+
+    coalescer = _DeltaCoalescer(
+        emit_delta,
+        max_chars=settings.CHAT_STREAM_FLUSH_CHARS,
+        max_delay=settings.CHAT_STREAM_FLUSH_INTERVAL_MS / 1000,
+    )
 
     async def runner():
         try:
             response = await _chat_endpoint_impl(
                 req,
                 request_id,
-                stream_tokens=send_delta,
+                stream_tokens=coalescer.add,
             )
+            await coalescer.flush()
             await queue.put(_format_sse_event("result", response.model_dump()))
         except HTTPException as exc:
+            await coalescer.flush()
             await queue.put(
                 _format_sse_event(
                     "error",
@@ -1183,17 +1281,22 @@ async def chat_stream_endpoint(req: ChatRequest):
                 )
             )
         except Exception as exc:  # noqa: BLE001
+            await coalescer.flush()
             await queue.put(
                 _format_sse_event(
                     "error",
                     {"status": 500, "detail": str(exc)},
                 )
             )
+        except asyncio.CancelledError:
+            coalescer.cancel()
+            raise
         finally:
             done_event.set()
-            await queue.put(None)
+        # 被取消时不再写入结束标记：消费者已离开，有界队列可能已满
+        await queue.put(None)
 
-    asyncio.create_task(runner())
+    runner_task = asyncio.create_task(runner())
 
     async def heartbeat_sender():
         try:
@@ -1217,9 +1320,13 @@ async def chat_stream_endpoint(req: ChatRequest):
                 yield chunk
         finally:
             done_event.set()
-            if heartbeat_task and not heartbeat_task.done():
+            # 客户端断开时 Starlette 取消响应任务，生成器在此退出；
+            # 同步取消整轮对话（检索、抓取、LLM 流），不在已取消的作用域里等待
+            if not runner_task.done():
+                runner_task.cancel()
+                CHAT_STREAM_CANCELLED.inc()
+                logger.info("chat stream client disconnected, cancelled request_id=%s", request_id)
+            if not heartbeat_task.done():
                 heartbeat_task.cancel()
-                with contextlib.suppress(asyncio.CancelledError):
-                    await heartbeat_task
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
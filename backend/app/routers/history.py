@@ -1,12 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
 from ..services import history_store
 
 router = APIRouter(prefix="/api/history", tags=["history"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 @router.get("/sessions")
-def list_sessions(page: int = 1, page_size: int = 20):
-    return history_store.list_sessions(page, page_size)
+def list_sessions(
+    response: Response,
+    page: int = 1,
+    page_size: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """
+    会话列表（按更新时间倒序）
+
+    传 cursor（首页传空串）时走游标分页，下一页游标放在 X-Next-Cursor 响应头；
+    否则保持原有的 page/page_size 分页。
+    """
+    if cursor is None:
+        return history_store.list_sessions(page, page_size)
+    try:
+        sessions, next_cursor = history_store.list_sessions_page(cursor or None, page_size)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return sessions
 
 
 @router.get("/sessions/{session_id}")
@@ -17,11 +40,28 @@ def get_session(session_id: str):
     return session
 
 
+@router.get("/sessions/{session_id}/messages")
+def list_session_messages(
+    session_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+):
+    """按时间正序返回 before 游标之前的 limit 条消息，更早一页的游标放在 X-Next-Cursor 响应头"""
+    if not history_store.get_session_meta(session_id):
+        raise HTTPException(status_code=404, detail="会话不存在")
+    try:
+        messages, next_cursor = history_store.list_messages(session_id, limit, before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return messages
+
+
 @router.delete("/sessions/{session_id}")
 def delete_session(session_id: str):
-    session = history_store.get_session(session_id)
-    if not session:
+    if not history_store.get_session_meta(session_id):
         raise HTTPException(status_code=404, detail="会话不存在")
     history_store.delete_session(session_id)
     return {"status": "ok"}
-
@@ -0,0 +1,14 @@
+"""
+Prometheus 指标导出
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..core.telemetry import CONTENT_TYPE_LATEST, REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
@@ -1,6 +1,7 @@
 """
 录音管理API路由
 """
+import asyncio
 from typing import List, Optional
 from pathlib import Path
 from fastapi import APIRouter, HTTPException, status, Depends, Query
@@ -287,8 +288,7 @@ async def transcribe_recording(
         from app.services.asr_service import transcribe_audio
         
         # 读取音频文件
-        with open(audio_path, 'rb') as f:
-            audio_data = f.read()
+        audio_data = await asyncio.to_thread(Path(audio_path).read_bytes)
         
         filename = recording.get("filename", "audio.webm")
         
@@ -4,6 +4,8 @@
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import os
 from typing import Any, Dict, List, Optional
@@ -32,8 +34,9 @@ from app.schemas.project_delete import (
 from pydantic import BaseModel
 from app.config import get_feature_flags
 from app.services.dao.tender_dao import TenderDAO
-from app.services.tender_service import TenderService
+from app.services.tender_service import AssetImportError, TenderService
 from app.services.platform.jobs_service import JobsService
+from app.services.project_delete import ProjectDeletionOrchestrator
 from app.services import kb_service
 from app.utils.auth import get_current_user_sync
 from app.utils.evidence_mapper import chunks_to_span_refs
@@ -91,6 +94,72 @@ def _svc(req: Request) -> TenderService:
     return TenderService(dao=dao, llm_orchestrator=_get_llm(req), jobs_service=jobs_service)
 
 
+# ==================== 后台任务分发 ====================
+
+def _queue_enabled(feature: str) -> bool:
+    """该类任务是否走 RQ 队列（开关打开且 Redis 可用；否则退回进程内 BackgroundTasks）"""
+    from app.queue.connection import is_redis_available
+    from app.queue.helpers import is_async_enabled
+
+    if not is_async_enabled(feature):
+        return False
+    if not is_redis_available():
+        logging.getLogger(__name__).warning(f"Redis unavailable, run {feature} task in-process")
+        return False
+    return True
+
+
+def _idempotency_key(request: Request, kind: str, project_id: str, payload: Dict[str, Any]) -> str:
+    """幂等键：优先使用请求头 Idempotency-Key，否则按项目 + 参数生成（防止重复点击重复入队）"""
+    explicit = request.headers.get("Idempotency-Key")
+    if explicit:
+        return f"tender:{kind}:{project_id}:{explicit}"
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    return f"tender:{kind}:{project_id}:{digest}"
+
+
+def _submit_run(
+    request: Request,
+    project_id: str,
+    kind: str,
+    task_name: str,
+    task_kwargs: Dict[str, Any],
+    owner_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """提交到 RQ 队列，返回 run_id / job_id（相同任务仍在进行时返回已有的 run）"""
+    from app.queue.helpers import submit_task
+
+    dao = TenderDAO(_get_pool(request))
+    created: List[str] = []
+
+    def prepare(job_id: str) -> Dict[str, Any]:
+        run_id = dao.create_run(project_id, kind)
+        created.append(run_id)
+        dao.update_run(run_id, "pending", progress=0.0, message="queued")
+        return {"run_id": run_id}
+
+    try:
+        result = submit_task(
+            task_name,
+            task_kwargs,
+            idempotency_key=_idempotency_key(request, kind, project_id, task_kwargs),
+            prepare=prepare,
+            biz_id=project_id,
+            owner_id=owner_id,
+        )
+    except Exception as e:
+        logging.getLogger(__name__).exception(f"Enqueue {task_name} failed: {e}")
+        for run_id in created:
+            dao.update_run(run_id, "failed", message=f"enqueue failed: {e}")
+        raise HTTPException(status_code=503, detail="任务队列不可用，请稍后重试")
+
+    return {
+        "run_id": result.meta.get("run_id"),
+        "job_id": result.job_id,
+        "deduplicated": result.deduplicated,
+    }
+
+
 # ==================== 项目管理 ====================
 
 @router.post("/projects", response_model=ProjectOut)
@@ -146,19 +215,53 @@ def get_project_delete_plan(project_id: str, request: Request, user=Depends(get_
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@router.delete("/projects/{project_id}", status_code=204)
-def delete_project(project_id: str, req: ProjectDeleteRequest, request: Request, user=Depends(get_current_user_sync)):
+@router.delete("/projects/{project_id}", status_code=202)
+def delete_project(
+    project_id: str,
+    req: ProjectDeleteRequest,
+    request: Request,
+    bg: BackgroundTasks,
+    user=Depends(get_current_user_sync),
+):
     """
     删除项目（需要确认）
-    必须提供正确的确认文本和确认令牌
+    必须提供正确的确认令牌；校验通过后项目立即从列表隐藏，资源在后台分批删除，
+    进度通过 GET /projects/{project_id}/delete-status 查询
     """
     svc = _svc(request)
+    owner_id = user.user_id if user else None
     try:
-        svc.delete_project(project_id, req)
-        return None
+        audit_id = svc.delete_project(project_id, req, requested_by=owner_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    job_id = None
+    if _queue_enabled("delete"):
+        from app.queue.helpers import submit_task
+        try:
+            job_id = submit_task(
+                "tender.delete_project",
+                {"project_id": project_id, "audit_id": audit_id},
+                idempotency_key=f"tender:delete_project:{project_id}",
+                biz_id=project_id,
+                owner_id=owner_id,
+            ).job_id
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Enqueue project deletion failed, run in-process: {e}")
+    if job_id is None:
+        bg.add_task(svc.deletion_orchestrator.run, audit_id)
+
+    return {"project_id": project_id, "audit_id": audit_id, "job_id": job_id, "status": "PENDING"}
+
+
+@router.get("/projects/{project_id}/delete-status")
+def get_project_delete_status(project_id: str, request: Request, user=Depends(get_current_user_sync)):
+    """查询项目删除进度（审计记录中的阶段与各表删除行数）"""
+    status = ProjectDeletionOrchestrator(_get_pool(request)).get_status(project_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="No deletion found for project")
+    return status
+
 
 @router.get("/projects/{project_id}/documents")
 def list_legacy_documents(project_id: str, request: Request):
@@ -220,6 +323,23 @@ async def import_assets(
     svc = _svc(request)
     try:
         return await svc.import_assets(project_id, kind, files, bidder_name)
+    except AssetImportError as e:
+        # 部分失败：成功的文件已导入，重新提交整批文件只会补导失败的文件
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": str(e),
+                "results": [
+                    {
+                        "filename": r.filename,
+                        "status": r.status,
+                        "asset_id": (r.asset or {}).get("id"),
+                        "error": r.error,
+                    }
+                    for r in e.results
+                ],
+            },
+        )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -252,14 +372,21 @@ def extract_project_info(
     Args:
         sync: 同步执行模式，1=同步返回结果，0=后台任务（默认）
     """
-    dao = TenderDAO(_get_pool(request))
-    run_id = dao.create_run(project_id, "extract_project_info")
-    dao.update_run(run_id, "running", progress=0.01, message="running")
-    svc = _svc(request)
     owner_id = user.user_id if user else None
     
     # 检查是否同步执行
     run_sync = sync == 1 or request.headers.get("X-Run-Sync") == "1"
+    if not run_sync and _queue_enabled("extract"):
+        return _submit_run(
+            request, project_id, "extract_project_info", "tender.extract_project_info",
+            {"project_id": project_id, "model_id": req.model_id, "owner_id": owner_id},
+            owner_id=owner_id,
+        )
+
+    dao = TenderDAO(_get_pool(request))
+    run_id = dao.create_run(project_id, "extract_project_info")
+    dao.update_run(run_id, "running", progress=0.01, message="running")
+    svc = _svc(request)
 
     def job():
         try:
@@ -328,14 +455,21 @@ def extract_risks(
     Args:
         sync: 同步执行模式，1=同步返回结果，0=后台任务（默认）
     """
-    dao = TenderDAO(_get_pool(request))
-    run_id = dao.create_run(project_id, "extract_risks")
-    dao.update_run(run_id, "running", progress=0.01, message="running")
-    svc = _svc(request)
     owner_id = user.user_id if user else None
     
     # 检查是否同步执行
     run_sync = sync == 1 or request.headers.get("X-Run-Sync") == "1"
+    if not run_sync and _queue_enabled("extract"):
+        return _submit_run(
+            request, project_id, "extract_risks", "tender.extract_risks",
+            {"project_id": project_id, "model_id": req.model_id, "owner_id": owner_id},
+            owner_id=owner_id,
+        )
+
+    dao = TenderDAO(_get_pool(request))
+    run_id = dao.create_run(project_id, "extract_risks")
+    dao.update_run(run_id, "running", progress=0.01, message="running")
+    svc = _svc(request)
 
     def job():
         try:
@@ -404,6 +538,12 @@ def generate_directory(
     bg: BackgroundTasks,
 ):
     """生成目录"""
+    if _queue_enabled("directory"):
+        return _submit_run(
+            request, project_id, "generate_directory", "tender.generate_directory",
+            {"project_id": project_id, "model_id": req.model_id},
+        )
+
     dao = TenderDAO(_get_pool(request))
     run_id = dao.create_run(project_id, "generate_directory")
     dao.update_run(run_id, "running", progress=0.01, message="running")
@@ -463,8 +603,18 @@ def restore_sample(project_id: str, node_id: str, request: Request):
 
 
 @router.post("/projects/{project_id}/directory/auto-fill-samples")
-def auto_fill_samples(project_id: str, request: Request):
-    """自动填充所有章节的范本"""
+def auto_fill_samples(project_id: str, request: Request, sync: int = 1):
+    """自动填充所有章节的范本
+    
+    Args:
+        sync: 1=同步执行并返回结果与目录（默认），0=提交到任务队列，返回 run_id
+    """
+    if sync == 0 and _queue_enabled("directory"):
+        return _submit_run(
+            request, project_id, "auto_fill_samples", "tender.auto_fill_samples",
+            {"project_id": project_id},
+        )
+
     svc = _svc(request)
     logger = logging.getLogger(__name__)
 
@@ -850,14 +1000,28 @@ def run_review(
         req.bid_asset_ids: 投标资产ID列表（精确指定文件）
         sync: 同步执行模式，1=同步返回结果，0=后台任务（默认）
     """
-    dao = TenderDAO(_get_pool(request))
-    run_id = dao.create_run(project_id, "review")
-    dao.update_run(run_id, "running", progress=0.01, message="running")
-    svc = _svc(request)
     owner_id = user.user_id if user else None
     
     # 检查是否同步执行
     run_sync = sync == 1 or request.headers.get("X-Run-Sync") == "1"
+    if not run_sync and _queue_enabled("review"):
+        return _submit_run(
+            request, project_id, "review", "tender.run_review",
+            {
+                "project_id": project_id,
+                "model_id": req.model_id,
+                "custom_rule_asset_ids": req.custom_rule_asset_ids,
+                "bidder_name": req.bidder_name,
+                "bid_asset_ids": req.bid_asset_ids,
+                "owner_id": owner_id,
+            },
+            owner_id=owner_id,
+        )
+
+    dao = TenderDAO(_get_pool(request))
+    run_id = dao.create_run(project_id, "review")
+    dao.update_run(run_id, "running", progress=0.01, message="running")
+    svc = _svc(request)
 
     def job():
         try:
@@ -1443,9 +1607,9 @@ async def replace_format_template_file(
     # 读取文件内容
     docx_bytes = await file.read()
     
-    # 调用服务层
+    # 调用服务层（同一文件命中分析缓存，内容变化时 sha256 不同会重新分析）
     svc = _svc(request)
-    template = await svc.reanalyze_format_template(template_id, docx_bytes)
+    template = await svc.reanalyze_format_template(template_id, docx_bytes, force=False)
     
     return template
 
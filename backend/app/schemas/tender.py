@@ -32,6 +32,7 @@ class ProjectOut(BaseModel):
     name: str
     description: Optional[str] = None
     created_at: Optional[datetime] = None
+    delete_status: Optional[str] = None  # 删除失败的项目为 FAILED，可重新发起删除
 
 
 # ==================== 运行任务相关 ====================
@@ -70,6 +71,7 @@ class AssetOut(BaseModel):
     bidder_name: Optional[str] = None  # bid 时必填
     meta_json: Dict[str, Any] = Field(default_factory=dict)
     created_at: Optional[datetime] = None
+    import_status: Optional[str] = None  # 导入接口返回：created | existing（已导入过的相同文件）
 
 
 # ==================== Chunk 查询相关 ====================
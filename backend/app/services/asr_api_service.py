@@ -7,6 +7,8 @@ import httpx
 from pathlib import Path
 from typing import Optional, Tuple, Dict, Any
 
+from app.core.telemetry import traced
+
 logger = logging.getLogger(__name__)
 
 async def call_remote_asr_api(
@@ -33,6 +35,74 @@ async def call_remote_asr_api(
     Returns:
         (转写文本, 音频时长)
     """
+    result = await call_remote_asr_api_detailed(
+        audio_file_path=audio_file_path,
+        api_url=api_url,
+        model_name=model_name,
+        response_format=response_format,
+        api_key=api_key,
+        extra_params=extra_params,
+        timeout=timeout,
+    )
+    return result["text"], result["duration"]
+
+
+def _parse_asr_response(result: Any, response_format: str) -> Dict[str, Any]:
+    """解析 ASR 响应为 {"text", "duration", "segments"}"""
+    if response_format == "verbose_json" and isinstance(result, dict):
+        # verbose_json 格式包含详细信息
+        text = result.get('text', '')
+        duration = result.get('duration', 0.0)
+        segments = []
+        
+        # 如果有segments，优先使用segments组装文本
+        if 'segments' in result:
+            segments = [
+                {
+                    "start": seg.get("start", 0.0),
+                    "end": seg.get("end", 0.0),
+                    "text": seg.get("text", "").strip(),
+                }
+                for seg in result['segments']
+            ]
+            text = ' '.join(seg["text"] for seg in segments)
+        
+        return {"text": text, "duration": duration, "segments": segments}
+    
+    # 其他格式（json, text等）
+    if isinstance(result, dict):
+        text = result.get('text', str(result))
+    else:
+        text = str(result)
+    
+    # 尝试估算时长（如果没有提供）
+    duration = result.get('duration', 0.0) if isinstance(result, dict) else 0.0
+    
+    return {"text": text, "duration": duration, "segments": []}
+
+
+@traced("asr.remote")
+async def call_remote_asr_api_detailed(
+    audio_file_path: Path,
+    api_url: str,
+    model_name: str = "whisper",
+    response_format: str = "verbose_json",
+    api_key: Optional[str] = None,
+    extra_params: Optional[Dict[str, Any]] = None,
+    timeout: int = 300,
+    client: Optional[httpx.AsyncClient] = None,
+    content_type: str = "audio/mpeg",
+) -> Dict[str, Any]:
+    """
+    调用远程ASR API，返回文本、时长及带时间戳的片段
+    
+    Args:
+        client: 复用的 AsyncClient（分段并发转写时共享连接池），不提供则临时创建
+        content_type: 上传文件的 MIME 类型
+    
+    Returns:
+        {"text": str, "duration": float, "segments": [{"start", "end", "text"}, ...]}
+    """
     try:
         # 读取音频文件
         with open(audio_file_path, 'rb') as f:
@@ -40,7 +110,7 @@ async def call_remote_asr_api(
         
         # 构建表单数据
         files = {
-            'file': (audio_file_path.name, audio_data, 'audio/mpeg')
+            'file': (audio_file_path.name, audio_data, content_type)
         }
         
         data = {
@@ -69,45 +139,31 @@ async def call_remote_asr_api(
             read=timeout,  # 读取超时使用传入的timeout值
             write=30.0     # 写入超时30秒
         )
-        async with httpx.AsyncClient(timeout=timeout_config, verify=False) as client:
-            logger.info(f"Calling remote ASR API: {api_url} (timeout={timeout}s)")
-            
+        logger.info(f"Calling remote ASR API: {api_url} (timeout={timeout}s)")
+        if client is not None:
             response = await client.post(
                 api_url,
                 files=files,
                 data=data,
-                headers=headers
+                headers=headers,
+                timeout=timeout_config,
             )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            logger.info(f"ASR API response received: {len(result.get('text', ''))} chars")
-            
-            # 解析响应
-            if response_format == "verbose_json":
-                # verbose_json 格式包含详细信息
-                text = result.get('text', '')
-                duration = result.get('duration', 0.0)
-                
-                # 如果有segments，优先使用segments组装文本
-                if 'segments' in result:
-                    segments = result['segments']
-                    text_parts = [seg.get('text', '').strip() for seg in segments]
-                    text = ' '.join(text_parts)
-                
-                return text, duration
-            else:
-                # 其他格式（json, text等）
-                if isinstance(result, dict):
-                    text = result.get('text', str(result))
-                else:
-                    text = str(result)
-                
-                # 尝试估算时长（如果没有提供）
-                duration = result.get('duration', 0.0) if isinstance(result, dict) else 0.0
-                
-                return text, duration
+        else:
+            async with httpx.AsyncClient(timeout=timeout_config, verify=False) as own_client:
+                response = await own_client.post(
+                    api_url,
+                    files=files,
+                    data=data,
+                    headers=headers
+                )
+        
+        response.raise_for_status()
+        result = response.json()
+        
+        logger.info(f"ASR API response received: {len(result.get('text', '')) if isinstance(result, dict) else 0} chars")
+        
+        # 解析响应
+        return _parse_asr_response(result, response_format)
     
     except httpx.HTTPStatusError as e:
         error_text = e.response.text
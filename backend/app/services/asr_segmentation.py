@@ -0,0 +1,221 @@
+"""
+长音频分段转写
+按静音边界把长录音切成有上限的片段，受限并发调用远程 ASR，单个片段失败只重试该片段，
+最后按片段起点修正时间戳并合并结果。
+
+切分使用简单的能量 VAD（按帧 RMS，阈值相对本段录音的噪声底），不依赖额外模型。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AudioSegment:
+    """切分后的片段（秒）"""
+    index: int
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+# ==================== 静音检测与切分 ====================
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int, frame_ms: int = 30) -> np.ndarray:
+    """按帧计算 RMS 能量（dBFS），样本取值范围 [-1, 1]"""
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(samples[: n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(rms + 1e-10)
+
+
+def silence_runs(silent: np.ndarray, min_frames: int) -> List[tuple]:
+    """返回长度不少于 min_frames 的静音区间 [(start_frame, end_frame), ...]（end 不含）"""
+    if silent.size == 0:
+        return []
+    padded = np.concatenate(([False], silent, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    return [(int(s), int(e)) for s, e in zip(starts, ends) if e - s >= min_frames]
+
+
+def plan_segments(
+    samples: np.ndarray,
+    sample_rate: int,
+    target_seconds: float = 60.0,
+    max_seconds: float = 90.0,
+    min_silence_ms: int = 300,
+    frame_ms: int = 30,
+    silence_margin_db: float = 8.0,
+) -> List[AudioSegment]:
+    """
+    在静音处切分音频
+
+    每个片段不超过 max_seconds；在 [target/2, max] 范围内优先选择离 target 最近的静音区间中点作为切点，
+    找不到足够长的静音时退化为窗口内能量最低的帧。
+
+    Args:
+        samples: 单声道样本
+        sample_rate: 采样率
+        target_seconds: 期望片段长度
+        max_seconds: 片段长度上限
+        min_silence_ms: 可作为切点的最短静音
+        frame_ms: VAD 帧长
+        silence_margin_db: 高于噪声底多少 dB 以内视为静音
+
+    Returns:
+        覆盖整段音频、首尾相接的片段列表
+    """
+    total = len(samples) / float(sample_rate) if sample_rate else 0.0
+    if total <= max_seconds:
+        return [AudioSegment(0, 0.0, total)] if total > 0 else []
+
+    frame_sec = frame_ms / 1000.0
+    energy = frame_energy_db(samples, sample_rate, frame_ms)
+    noise_floor = float(np.percentile(energy, 10)) if energy.size else -100.0
+    silent = energy <= min(noise_floor + silence_margin_db, -20.0)
+    runs = silence_runs(silent, max(1, int(round(min_silence_ms / frame_ms))))
+    run_centers = np.array([(s + e) / 2.0 * frame_sec for s, e in runs], dtype=np.float64)
+
+    segments: List[AudioSegment] = []
+    pos = 0.0
+    while total - pos > max_seconds:
+        lo, hi, target = pos + target_seconds / 2.0, pos + max_seconds, pos + target_seconds
+        cut = None
+        if run_centers.size:
+            candidates = run_centers[(run_centers > lo) & (run_centers < hi)]
+            if candidates.size:
+                cut = float(candidates[np.argmin(np.abs(candidates - target))])
+        if cut is None:
+            f_lo, f_hi = int(lo / frame_sec), max(int(lo / frame_sec) + 1, int(hi / frame_sec))
+            window = energy[f_lo:f_hi]
+            cut = (f_lo + int(np.argmin(window)) + 0.5) * frame_sec if window.size else hi
+        segments.append(AudioSegment(len(segments), pos, cut))
+        pos = cut
+    segments.append(AudioSegment(len(segments), pos, total))
+    return segments
+
+
+def write_segment_wav(samples: np.ndarray, sample_rate: int, segment: AudioSegment, path: str) -> str:
+    """把片段写成 16bit PCM WAV"""
+    import soundfile as sf
+
+    start = int(round(segment.start * sample_rate))
+    end = int(round(segment.end * sample_rate))
+    sf.write(path, samples[start:end], sample_rate, subtype="PCM_16")
+    return path
+
+
+# ==================== 并发转写与合并 ====================
+
+SegmentTranscriber = Callable[[str, AudioSegment], Awaitable[Dict[str, Any]]]
+
+
+async def transcribe_segments(
+    samples: np.ndarray,
+    sample_rate: int,
+    segments: List[AudioSegment],
+    transcribe: SegmentTranscriber,
+    max_concurrency: int = 4,
+    max_retries: int = 2,
+    retry_backoff: float = 1.0,
+) -> List[Dict[str, Any]]:
+    """
+    受限并发转写各片段
+
+    片段 WAV 在占到并发槽位后才写入临时目录、转写完即删除，磁盘占用与并发数成正比。
+
+    Args:
+        transcribe: async (wav_path, segment) -> {"text", "duration", "segments"}
+        max_concurrency: 同时进行的请求数
+        max_retries: 单个片段失败后的重试次数
+        retry_backoff: 第 n 次重试前等待 retry_backoff * 2^(n-1) 秒
+
+    Returns:
+        与 segments 顺序一致的结果列表
+
+    Raises:
+        RuntimeError: 有片段在重试后仍失败
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    with tempfile.TemporaryDirectory(prefix="asr_seg_") as tmp_dir:
+
+        async def run_one(segment: AudioSegment) -> Dict[str, Any]:
+            last_error: Optional[BaseException] = None
+            for attempt in range(max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(retry_backoff * (2 ** (attempt - 1)))
+                    logger.warning(
+                        "ASR segment retry index=%d attempt=%d error=%s", segment.index, attempt + 1, last_error
+                    )
+                async with semaphore:
+                    path = os.path.join(tmp_dir, f"seg_{segment.index:05d}.wav")
+                    try:
+                        write_segment_wav(samples, sample_rate, segment, path)
+                        return await transcribe(path, segment)
+                    except Exception as exc:
+                        last_error = exc
+                    finally:
+                        try:
+                            os.unlink(path)
+                        except OSError:
+                            pass
+            raise RuntimeError(f"片段 {segment.index} ({segment.start:.1f}s-{segment.end:.1f}s) 转写失败: {last_error}")
+
+        results = await asyncio.gather(*(run_one(s) for s in segments), return_exceptions=True)
+
+    failed = [r for r in results if isinstance(r, BaseException)]
+    if failed:
+        raise RuntimeError(f"{len(failed)}/{len(segments)} 个片段转写失败: {failed[0]}")
+    return list(results)
+
+
+def merge_segment_results(
+    segments: List[AudioSegment],
+    results: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    合并各片段结果：子片段时间戳加上所在片段的起点，文本按顺序拼接
+
+    Returns:
+        {"text", "duration", "segments": [{"start", "end", "text"}, ...]}
+    """
+    merged: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    for segment, result in zip(segments, results):
+        text = (result.get("text") or "").strip()
+        if text:
+            texts.append(text)
+        sub_segments = result.get("segments") or []
+        if not sub_segments and text:
+            sub_segments = [{"start": 0.0, "end": segment.duration, "text": text}]
+        for sub in sub_segments:
+            start = min(float(sub.get("start") or 0.0), segment.duration)
+            end = min(float(sub.get("end") or start), segment.duration)
+            merged.append({
+                **sub,
+                "start": round(segment.start + start, 3),
+                "end": round(segment.start + max(start, end), 3),
+                "text": (sub.get("text") or "").strip(),
+            })
+    return {
+        "text": " ".join(texts),
+        "duration": segments[-1].end if segments else 0.0,
+        "segments": merged,
+    }
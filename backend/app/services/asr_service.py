@@ -5,6 +5,7 @@
 - 音频预处理（降噪、音量标准化）
 - 实时流式转写（WebSocket）
 """
+import heapq
 import io
 import logging
 import os
@@ -21,6 +22,8 @@ import soundfile as sf
 # pydub removed - no longer needed for remote ASR API
 
 from ..config import get_settings
+from ..core.process_pool import BrokenProcessPool, LazyProcessPool
+from ..core.telemetry import span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +32,8 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
 
 # 导入远程API服务
-from .asr_api_service import call_remote_asr_api
+from .asr_api_service import call_remote_asr_api, call_remote_asr_api_detailed
+from .asr_segmentation import merge_segment_results, plan_segments, transcribe_segments
 from .db.postgres import get_conn
 
 SUPPORTED_AUDIO_FORMATS = {
@@ -256,6 +260,37 @@ def preprocess_audio(
         return audio_path
 
 
+# 预处理进程池；并发数由 ASR_PREPROCESS_WORKERS 限制
+_preprocess_pool = LazyProcessPool(lambda: get_settings().ASR_PREPROCESS_WORKERS)
+
+
+def shutdown_preprocess_pool() -> None:
+    """关闭预处理进程池（应用退出时调用）"""
+    _preprocess_pool.shutdown()
+
+
+async def preprocess_audio_async(
+    audio_path: str,
+    reduce_noise: bool = True,
+    normalize: bool = True,
+) -> str:
+    """
+    在进程池中执行 preprocess_audio
+
+    librosa 重采样和 noisereduce 都是纯 CPU 计算且大量持有 GIL，放在线程里同样会拖慢事件循环，
+    因此交给独立进程；并发数由 ASR_PREPROCESS_WORKERS 限制，超出的任务在池内排队。
+    """
+    if not reduce_noise and not normalize:
+        return audio_path
+    try:
+        with span("asr.preprocess", reduce_noise=reduce_noise, normalize=normalize):
+            return await _preprocess_pool.run(preprocess_audio, audio_path, reduce_noise, normalize)
+    except BrokenProcessPool as exc:
+        # 子进程异常退出（如 OOM 被杀），进程池已丢弃、下次调用时重建；本次回退到原始音频
+        logger.warning("Preprocess pool broken, recreating: %s", exc)
+        return audio_path
+
+
 def perform_diarization(
     audio_path: str,
     min_speakers: int = 1,
@@ -308,6 +343,13 @@ def merge_transcription_with_diarization(
     """
     将转录结果与说话人识别结果合并
     
+    每个转录片段取中点时间，标记为包含该时间点（闭区间）的说话人片段中在列表里最靠前的那个；
+    没有命中时为 "Unknown"。
+    
+    实现为按时间扫描：转录中点升序处理，说话人片段按起点依次进入以原始下标为键的小顶堆，
+    堆顶已结束的片段出堆（中点单调递增，出堆后不会再命中），此时堆顶即为命中结果。
+    复杂度 O((N + M) log M)，与逐对比较的结果完全一致（包括重叠和乱序的说话人片段）。
+    
     Args:
         transcription_segments: Whisper 转录的片段
         diarization_segments: 说话人识别的片段
@@ -318,28 +360,130 @@ def merge_transcription_with_diarization(
     if not diarization_segments:
         return transcription_segments
     
-    merged = []
+    turns = sorted(
+        (
+            (d["start"], d["end"], idx)
+            for idx, d in enumerate(diarization_segments)
+            if d["start"] <= d["end"]  # 起止反转或 NaN 的片段不可能命中
+        ),
+        key=lambda t: t[0],
+    )
+    mids = sorted(
+        (mid, pos)
+        for pos, mid in enumerate((seg["start"] + seg["end"]) / 2 for seg in transcription_segments)
+        if mid == mid  # NaN 不会命中任何片段
+    )
     
-    for trans_seg in transcription_segments:
-        trans_start = trans_seg["start"]
-        trans_end = trans_seg["end"]
-        trans_mid = (trans_start + trans_end) / 2
-        
-        # 找到中点时间对应的说话人
-        speaker = "Unknown"
-        for diar_seg in diarization_segments:
-            if diar_seg["start"] <= trans_mid <= diar_seg["end"]:
-                speaker = diar_seg["speaker"]
-                break
+    speakers = ["Unknown"] * len(transcription_segments)
+    active: List[Tuple[int, float]] = []  # (原始下标, end)
+    next_turn = 0
+    for mid, pos in mids:
+        while next_turn < len(turns) and turns[next_turn][0] <= mid:
+            start, end, idx = turns[next_turn]
+            heapq.heappush(active, (idx, end))
+            next_turn += 1
+        while active and active[0][1] < mid:
+            heapq.heappop(active)
+        if active:
+            speakers[pos] = diarization_segments[active[0][0]]["speaker"]
+    
+    return [
+        {**trans_seg, "speaker": speaker}
+        for trans_seg, speaker in zip(transcription_segments, speakers)
+    ]
+
+
+def _probe_duration(audio_path: str) -> float:
+    """读取音频时长（秒），无法识别时返回 0（按短音频处理）"""
+    try:
+        return float(sf.info(audio_path).duration)
+    except Exception:
+        pass
+    try:
+        return float(librosa.get_duration(path=audio_path))
+    except Exception as exc:
+        logger.warning("Failed to probe audio duration: %s", exc)
+        return 0.0
+
+
+def _write_temp_file(data: bytes, suffix: str) -> str:
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(data)
+        return f.name
+
+
+def _load_mono(audio_path: str, sample_rate: int) -> np.ndarray:
+    """加载为单声道 float32；已是目标采样率的单声道文件（如预处理输出）直接读取，跳过重采样"""
+    try:
+        info = sf.info(audio_path)
+        if info.samplerate == sample_rate and info.channels == 1:
+            samples, _ = sf.read(audio_path, dtype="float32")
+            return samples
+    except Exception:
+        pass
+    samples, _ = librosa.load(audio_path, sr=sample_rate, mono=True)
+    return samples
+
+
+async def transcribe_long_audio(
+    audio_path: str,
+    asr_config: Dict[str, Any],
+    extra_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    长音频分段转写：按静音切段 -> 受限并发调用远程 API（失败片段单独重试）-> 修正时间戳后合并
+    
+    Returns:
+        {"text", "duration", "segments"}，segments 的时间戳相对整段录音
+    """
+    settings = get_settings()
+    sample_rate = 16000
+    with span("asr.segment") as stage:
+        samples = await asyncio.to_thread(_load_mono, audio_path, sample_rate)
+        segments = await asyncio.to_thread(
+            plan_segments,
+            samples,
+            sample_rate,
+            target_seconds=settings.ASR_SEGMENT_TARGET_SECONDS,
+            max_seconds=settings.ASR_SEGMENT_MAX_SECONDS,
+        )
+        stage.set_attributes(audio_seconds=round(len(samples) / sample_rate, 1), segments=len(segments))
+    logger.info(
+        "Segmented transcription: duration=%.1fs segments=%d concurrency=%d",
+        len(samples) / sample_rate,
+        len(segments),
+        settings.ASR_SEGMENT_CONCURRENCY,
+    )
+    
+    timeout = settings.ASR_SEGMENT_TIMEOUT
+    limits = httpx.Limits(max_connections=max(1, settings.ASR_SEGMENT_CONCURRENCY))
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, verify=False) as client:
+        async def transcribe_one(wav_path, segment):
+            return await call_remote_asr_api_detailed(
+                audio_file_path=Path(wav_path),
+                api_url=asr_config['api_url'],
+                model_name=asr_config['model_name'],
+                response_format=asr_config['response_format'],
+                api_key=asr_config.get('api_key'),
+                extra_params=extra_params,
+                timeout=timeout,
+                client=client,
+                content_type="audio/wav",
+            )
         
-        merged.append({
-            **trans_seg,
-            "speaker": speaker,
-        })
+        results = await transcribe_segments(
+            samples,
+            sample_rate,
+            segments,
+            transcribe_one,
+            max_concurrency=settings.ASR_SEGMENT_CONCURRENCY,
+            max_retries=settings.ASR_SEGMENT_MAX_RETRIES,
+        )
     
-    return merged
+    return merge_segment_results(segments, results)
 
 
+@traced("asr.transcribe")
 async def transcribe_audio(
     audio_data: bytes,
     filename: str,
@@ -384,10 +528,7 @@ async def transcribe_audio(
     
     # 创建临时文件
     suffix = Path(filename).suffix.lower()
-    temp_input = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-    temp_input.write(audio_data)
-    temp_input.close()
-    temp_input_path = temp_input.name
+    temp_input_path = await asyncio.to_thread(_write_temp_file, audio_data, suffix)
     
     temp_processed_path = None
     
@@ -401,7 +542,7 @@ async def transcribe_audio(
         
         # 音频预处理（可选）
         if settings.ASR_ENABLE_PREPROCESSING:
-            temp_processed_path = preprocess_audio(
+            temp_processed_path = await preprocess_audio_async(
                 temp_input_path,
                 reduce_noise=settings.ASR_NOISE_REDUCTION,
                 normalize=settings.ASR_NORMALIZE_AUDIO,
@@ -415,15 +556,21 @@ async def transcribe_audio(
         if language:
             extra_params['language'] = language
         
-        # 调用远程API
-        text, duration = await call_remote_asr_api(
-            audio_file_path=Path(audio_path_for_transcription),
-            api_url=asr_config['api_url'],
-            model_name=asr_config['model_name'],
-            response_format=asr_config['response_format'],
-            api_key=asr_config.get('api_key'),
-            extra_params=extra_params
-        )
+        # 长音频按静音分段并发转写，短音频仍单次调用
+        duration_probe = await asyncio.to_thread(_probe_duration, audio_path_for_transcription)
+        if duration_probe > settings.ASR_SEGMENT_THRESHOLD_SECONDS:
+            merged = await transcribe_long_audio(audio_path_for_transcription, asr_config, extra_params)
+            text, duration = merged["text"], merged["duration"]
+        else:
+            # 调用远程API
+            text, duration = await call_remote_asr_api(
+                audio_file_path=Path(audio_path_for_transcription),
+                api_url=asr_config['api_url'],
+                model_name=asr_config['model_name'],
+                response_format=asr_config['response_format'],
+                api_key=asr_config.get('api_key'),
+                extra_params=extra_params
+            )
         
         logger.info(
             "Audio transcription completed file=%s text_length=%d duration=%.2fs",
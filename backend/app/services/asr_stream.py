@@ -0,0 +1,390 @@
+"""
+WebSocket 流式转写
+- PcmSpool：磁盘上的滚动 PCM 缓冲，只保留尚未定稿的音频，内存占用与会话时长无关
+- StreamingTranscriber：随音频到达周期性输出 partial（当前未定稿窗口的临时结果），
+  窗口够长时在静音处切出 final（定稿片段），定稿后丢弃对应音频
+- FfmpegPcmDecoder：把浏览器 MediaRecorder 的 webm/ogg/mp4 流实时解码成 16kHz 单声道 PCM
+
+转写调用在单独的后台任务中串行执行，接收音频的协程从不等待转写。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import wave
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from ..core.telemetry import span
+from .asr_segmentation import frame_energy_db, silence_runs
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WIDTH = 2  # s16le
+
+PcmTranscriber = Callable[[bytes, int], Awaitable[str]]
+MessageEmitter = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class PcmSpool:
+    """
+    滚动 PCM 缓冲文件
+
+    偏移量一律使用会话内的绝对字节位置；discard_before 之前的数据累计超过 rotate_bytes 时，
+    把剩余部分拷到新文件并删除旧文件，磁盘占用同样有界。
+    """
+
+    def __init__(self, directory: Optional[str] = None, rotate_bytes: int = 8 * 1024 * 1024):
+        self._dir = tempfile.mkdtemp(prefix="asr_spool_", dir=directory)
+        self._rotate_bytes = rotate_bytes
+        self._generation = 0
+        self._base = 0
+        self._end = 0
+        self._discarded = 0
+        self._file = open(self._path(), "w+b", buffering=0)
+
+    def _path(self) -> str:
+        return os.path.join(self._dir, f"spool_{self._generation}.pcm")
+
+    @property
+    def end(self) -> int:
+        """已写入的绝对字节数"""
+        return self._end
+
+    @property
+    def file_size(self) -> int:
+        return self._end - self._base
+
+    def append(self, data: bytes) -> None:
+        self._file.write(data)
+        self._end += len(data)
+
+    def read(self, start: int, end: int) -> bytes:
+        start = max(start, self._base)
+        if end <= start:
+            return b""
+        return os.pread(self._file.fileno(), end - start, start - self._base)
+
+    def discard_before(self, offset: int) -> None:
+        """声明 offset 之前的数据不再需要"""
+        self._discarded = max(self._discarded, min(offset, self._end))
+        if self._discarded - self._base < self._rotate_bytes:
+            return
+        old_file, old_path = self._file, self._path()
+        self._generation += 1
+        new_file = open(self._path(), "w+b", buffering=0)
+        new_file.write(self.read(self._discarded, self._end))
+        self._file, self._base = new_file, self._discarded
+        old_file.close()
+        os.unlink(old_path)
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class StreamingTranscriber:
+    """增量转写：partial 覆盖当前未定稿窗口，final 在静音处定稿"""
+
+    def __init__(
+        self,
+        transcribe: PcmTranscriber,
+        emit: MessageEmitter,
+        sample_rate: int = 16000,
+        partial_interval: float = 2.0,
+        min_final_seconds: float = 8.0,
+        max_window_seconds: float = 30.0,
+        min_silence_ms: int = 400,
+        frame_ms: int = 30,
+        spool_dir: Optional[str] = None,
+    ):
+        self.transcribe = transcribe
+        self.emit = emit
+        self.sample_rate = sample_rate
+        self._bps = sample_rate * SAMPLE_WIDTH
+        self._frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self._frame_ms = frame_ms
+        self._partial_bytes = self._align(partial_interval * self._bps)
+        self._min_final_bytes = self._align(min_final_seconds * self._bps)
+        self._max_window_bytes = max(self._min_final_bytes, self._align(max_window_seconds * self._bps))
+        self._min_silence_frames = max(1, int(round(min_silence_ms / frame_ms)))
+
+        self._spool = PcmSpool(spool_dir)
+        self._committed = 0           # 已定稿的绝对字节位置
+        self._last_partial_end = 0    # 最近一次 partial 覆盖到的位置
+        self._energy_start = 0        # _energy 第一帧对应的绝对位置
+        self._energy: Deque[float] = deque()  # 未定稿音频的逐帧能量（dB）
+        self._pending_since: Optional[float] = None
+
+        self.finals: List[str] = []
+        self.partial_latencies: Deque[float] = deque(maxlen=1000)
+        self.stats = {"partials": 0, "finals": 0, "errors": 0}
+        self._seq = 0
+
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+        self._worker = asyncio.create_task(self._run())
+
+    # ==================== 输入 ====================
+
+    async def feed(self, pcm: bytes) -> None:
+        """追加一段 s16le PCM（不等待转写）"""
+        if not pcm or self._closing:
+            return
+        self._spool.append(pcm)
+        if self._pending_since is None:
+            self._pending_since = time.perf_counter()
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def wait_idle(self) -> None:
+        """等待已到达的音频全部处理完（测试及收尾使用）"""
+        await self._idle.wait()
+
+    async def finish(self) -> str:
+        """定稿剩余音频并返回完整文本"""
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await self._worker
+        finally:
+            self._spool.close()
+        return " ".join(t for t in self.finals if t)
+
+    async def abort(self) -> None:
+        """连接中断：放弃未处理的音频"""
+        self._closing = True
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._spool.close()
+
+    @property
+    def spool_bytes(self) -> int:
+        return self._spool.file_size
+
+    # ==================== 后台处理 ====================
+
+    def _align(self, n: float) -> int:
+        n = int(n)
+        return n - n % SAMPLE_WIDTH
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while await self._step():
+                pass
+            if self._closing:
+                await self._flush()
+                self._idle.set()
+                return
+            if not self._wakeup.is_set():
+                self._idle.set()
+
+    async def _step(self) -> bool:
+        """处理一步，返回是否还有工作"""
+        end = self._align(self._spool.end)
+        self._update_energy(end)
+
+        if end - self._committed >= self._min_final_bytes:
+            cut = self._find_cut(end)
+            if cut is not None:
+                await self._final(cut)
+                return True
+
+        if not self._closing and end - self._last_partial_end >= self._partial_bytes:
+            await self._partial(min(end, self._committed + self._max_window_bytes))
+            return True
+        return False
+
+    async def _flush(self) -> None:
+        end = self._align(self._spool.end)
+        while end - self._committed > 0:
+            await self._final(min(end, self._committed + self._max_window_bytes))
+
+    def _update_energy(self, end: int) -> None:
+        """只对新到达的整帧计算能量，保持与未定稿音频等长"""
+        start = self._energy_start + len(self._energy) * self._frame_bytes
+        usable = (end - start) // self._frame_bytes * self._frame_bytes
+        if usable <= 0:
+            return
+        pcm = self._spool.read(start, start + usable)
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        self._energy.extend(frame_energy_db(samples, self.sample_rate, self._frame_ms).tolist())
+
+    def _find_cut(self, end: int) -> Optional[int]:
+        """在 [min_final, max_window] 范围内找最后一段足够长的静音，取其中点为切点"""
+        window_end = min(end, self._committed + self._max_window_bytes)
+        first = (self._committed - self._energy_start) // self._frame_bytes
+        last = (window_end - self._energy_start) // self._frame_bytes
+        energy = np.fromiter(
+            (self._energy[i] for i in range(max(0, first), min(last, len(self._energy)))),
+            dtype=np.float32,
+        )
+        if energy.size:
+            threshold = min(float(np.percentile(energy, 10)) + 8.0, -20.0)
+            min_frame = self._min_final_bytes // self._frame_bytes
+            runs = [r for r in silence_runs(energy <= threshold, self._min_silence_frames)
+                    if (r[0] + r[1]) // 2 >= min_frame]
+            if runs:
+                s, e = runs[-1]
+                return self._committed + (s + e) // 2 * self._frame_bytes
+        if window_end - self._committed >= self._max_window_bytes:
+            return window_end
+        return None
+
+    async def _transcribe(self, start: int, end: int) -> Optional[str]:
+        pcm = self._spool.read(start, end)
+        try:
+            return (await self.transcribe(pcm, self.sample_rate) or "").strip()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[asr_stream] transcribe failed {start}-{end}: {e}")
+            return None
+
+    async def _partial(self, end: int) -> None:
+        with span("asr.stream.partial", audio_seconds=round((end - self._committed) / self._bps, 1)):
+            text = await self._transcribe(self._committed, end)
+        self._last_partial_end = end
+        if text is None:
+            return
+        if self._pending_since is not None:
+            self.partial_latencies.append(time.perf_counter() - self._pending_since)
+            self._pending_since = None
+        self.stats["partials"] += 1
+        await self._send(text, self._committed, end, is_partial=True)
+
+    async def _final(self, cut: int) -> None:
+        with span("asr.stream.final", audio_seconds=round((cut - self._committed) / self._bps, 1)):
+            text = await self._transcribe(self._committed, cut)
+            if text is None:
+                # 失败重试一次，仍失败则跳过该片段，避免卡住后续音频
+                text = await self._transcribe(self._committed, cut)
+        start = self._committed
+        self._committed = cut
+        self._last_partial_end = max(self._last_partial_end, cut)
+        drop = (cut - self._energy_start) // self._frame_bytes
+        for _ in range(min(drop, len(self._energy))):
+            self._energy.popleft()
+        self._energy_start += drop * self._frame_bytes
+        self._spool.discard_before(self._committed)
+        if text is None:
+            await self._emit({"type": "error", "message": f"片段转写失败 {start / self._bps:.1f}s-{cut / self._bps:.1f}s"})
+            return
+        self.finals.append(text)
+        self.stats["finals"] += 1
+        await self._send(text, start, cut, is_partial=False)
+
+    async def _send(self, text: str, start: int, end: int, is_partial: bool) -> None:
+        self._seq += 1
+        await self._emit({
+            "type": "transcript",
+            "text": text,
+            "is_partial": is_partial,
+            "start": round(start / self._bps, 3),
+            "end": round(end / self._bps, 3),
+            "seq": self._seq,
+        })
+
+    async def _emit(self, message: Dict[str, Any]) -> None:
+        # 客户端已断开时发送失败不影响转写本身
+        try:
+            await self.emit(message)
+        except Exception as e:
+            logger.debug(f"[asr_stream] emit failed: {e}")
+
+
+class FfmpegPcmDecoder:
+    """ffmpeg 子进程：stdin 接收压缩音频流，stdout 输出 16kHz 单声道 s16le"""
+
+    def __init__(self, proc: asyncio.subprocess.Process, sink: Callable[[bytes], Awaitable[None]]):
+        self._proc = proc
+        self._sink = sink
+        self._reader = asyncio.create_task(self._pump())
+
+    @classmethod
+    async def start(cls, sink: Callable[[bytes], Awaitable[None]], sample_rate: int = 16000) -> Optional["FfmpegPcmDecoder"]:
+        """启动解码器；环境中没有 ffmpeg 时返回 None"""
+        if shutil.which("ffmpeg") is None:
+            return None
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        return cls(proc, sink)
+
+    async def _pump(self) -> None:
+        while True:
+            chunk = await self._proc.stdout.read(64 * 1024)
+            if not chunk:
+                return
+            await self._sink(chunk)
+
+    async def write(self, data: bytes) -> None:
+        try:
+            self._proc.stdin.write(data)
+            await self._proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.warning(f"[asr_stream] ffmpeg stdin closed: {e}")
+
+    async def close(self) -> None:
+        try:
+            self._proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            await asyncio.wait_for(self._reader, timeout=30)
+        except asyncio.TimeoutError:
+            self._reader.cancel()
+        if self._proc.returncode is None:
+            try:
+                await asyncio.wait_for(self._proc.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self._proc.kill()
+
+    async def abort(self) -> None:
+        self._reader.cancel()
+        if self._proc.returncode is None:
+            self._proc.kill()
+
+
+def remote_pcm_transcriber(language: Optional[str] = None) -> PcmTranscriber:
+    """把 PCM 窗口写成临时 WAV 后调用远程 ASR（transcribe_audio_streaming）"""
+    from .asr_service import transcribe_audio_streaming
+
+    async def transcribe(pcm: bytes, sample_rate: int) -> str:
+        if not pcm:
+            return ""
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            with wave.open(path, "wb") as w:
+                w.setnchannels(1)
+                w.setsampwidth(SAMPLE_WIDTH)
+                w.setframerate(sample_rate)
+                w.writeframes(pcm)
+            text, _ = await transcribe_audio_streaming(Path(path), language=language)
+            return text
+        finally:
+            Path(path).unlink(missing_ok=True)
+
+    return transcribe
@@ -0,0 +1,66 @@
+"""
+音频解码（ffmpeg 异步子进程）
+所有调用都通过 asyncio 子进程完成，等待期间不占用事件循环；
+超时和非零退出码沿用 subprocess.TimeoutExpired / CalledProcessError，调用方的异常处理无需改动。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import subprocess
+from typing import List, Optional
+
+from app.core.telemetry import traced
+
+logger = logging.getLogger(__name__)
+
+
+@traced("asr.ffmpeg")
+async def run_ffmpeg(args: List[str], input_bytes: Optional[bytes] = None, timeout: float = 60) -> bytes:
+    """
+    运行 ffmpeg 并返回 stdout
+
+    Args:
+        args: ffmpeg 之后的参数
+        input_bytes: 写入 stdin 的数据（使用 pipe:0 作为输入时）
+        timeout: 超时秒数，超时后杀掉子进程
+
+    Raises:
+        subprocess.TimeoutExpired: 超时
+        subprocess.CalledProcessError: 退出码非零（stderr 中带 ffmpeg 错误信息）
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", *args]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input_bytes is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(input_bytes), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=stdout, stderr=stderr)
+    return stdout
+
+
+async def convert_to_wav(src: str, dst: str, sample_rate: int = 16000, timeout: float = 60) -> str:
+    """把音频文件转成单声道 WAV 文件"""
+    await run_ffmpeg(["-y", "-i", src, "-ar", str(sample_rate), "-ac", "1", "-f", "wav", dst], timeout=timeout)
+    return dst
+
+
+async def decode_to_wav_bytes(data: bytes, sample_rate: int = 16000, timeout: float = 10) -> bytes:
+    """内存中解码：压缩音频字节 -> 单声道 WAV 字节（不落临时文件）"""
+    return await run_ffmpeg(
+        ["-i", "pipe:0", "-ar", str(sample_rate), "-ac", "1", "-f", "wav", "pipe:1"],
+        input_bytes=data,
+        timeout=timeout,
+    )
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_PRUNE_THRESHOLD = 10000
+
+
+class DomainRateLimiter:
+    """
+    进程内共享的按域名限速器
+
+    每个域名维护"下一个可用时刻"，acquire 原子地领取一个时间槽并等待到该时刻，
+    因此同一进程内所有抓取（不论属于哪个请求）对同一域名的请求间隔都不小于 cooldown。
+    """
+
+    def __init__(self):
+        self._next: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _claim(self, domain: str, cooldown: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(domain, 0.0))
+            self._next[domain] = slot + cooldown
+            if len(self._next) > _PRUNE_THRESHOLD:
+                self._next = {d: t for d, t in self._next.items() if t > now}
+            return slot - now
+
+    async def acquire(self, domain: str, cooldown: float) -> float:
+        """等待轮到本次请求，返回等待秒数"""
+        if not domain or cooldown <= 0:
+            return 0.0
+        wait = self._claim(domain, cooldown)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    async def backoff(self, domain: str, delay: float) -> None:
+        """站点拒绝访问（如 403）时推迟该域名的所有后续请求"""
+        if not domain or delay <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + delay
+            self._next[domain] = max(self._next.get(domain, 0.0), until)
+
+
+class SqliteDomainRateLimiter(DomainRateLimiter):
+    """
+    跨 worker 进程共享的按域名限速器
+
+    时间槽记录在 SQLite 文件中，领取时间槽是一条 upsert 语句（库级写锁保证原子），
+    同一主机上的多个 uvicorn worker 共用同一份限速状态。
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS domain_slots (domain TEXT PRIMARY KEY, next_at REAL NOT NULL)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+
+    def _claim(self, domain: str, cooldown: float) -> float:
+        now = time.time()  # 跨进程比较，只能用墙上时钟
+        conn = self._connect()
+        try:
+            (next_at,) = conn.execute(
+                """
+                INSERT INTO domain_slots (domain, next_at) VALUES (?, ?)
+                ON CONFLICT(domain) DO UPDATE SET next_at = max(next_at, ?) + ?
+                RETURNING next_at
+                """,
+                (domain, now + cooldown, now, cooldown),
+            ).fetchone()
+        finally:
+            conn.close()
+        return next_at - cooldown - now
+
+    async def acquire(self, domain: str, cooldown: float) -> float:
+        if not domain or cooldown <= 0:
+            return 0.0
+        wait = await asyncio.to_thread(self._claim, domain, cooldown)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def _backoff(self, domain: str, delay: float) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                INSERT INTO domain_slots (domain, next_at) VALUES (?, ?)
+                ON CONFLICT(domain) DO UPDATE SET next_at = max(next_at, excluded.next_at)
+                """,
+                (domain, time.time() + delay),
+            )
+        finally:
+            conn.close()
+
+    async def backoff(self, domain: str, delay: float) -> None:
+        if not domain or delay <= 0:
+            return
+        await asyncio.to_thread(self._backoff, domain, delay)
+
+
+_domain_limiter: Optional[DomainRateLimiter] = None
+_domain_limiter_lock = threading.Lock()
+
+
+def get_domain_limiter() -> DomainRateLimiter:
+    """全局限速器；配置 CRAWLER_DOMAIN_LIMITER_PATH 时跨 worker 共享，否则仅在进程内共享"""
+    global _domain_limiter
+    if _domain_limiter is None:
+        with _domain_limiter_lock:
+            if _domain_limiter is None:
+                path = get_settings().CRAWLER_DOMAIN_LIMITER_PATH
+                _domain_limiter = SqliteDomainRateLimiter(path) if path else DomainRateLimiter()
+    return _domain_limiter
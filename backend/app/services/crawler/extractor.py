@@ -1,11 +1,17 @@
 import hashlib
 import logging
+from copy import deepcopy
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 from trafilatura import extract as trafilatura_extract
+from trafilatura.utils import load_html
 
+from app.config import get_settings
+from app.core.process_pool import BrokenProcessPool, LazyProcessPool
+from app.core.telemetry import span
 from app.services.logging.request_logger import (
     get_request_logger,
     is_debug_enabled,
@@ -23,33 +29,44 @@ class ExtractedDocument:
     content_hash: str
 
 
-def _fallback_extract(html: str) -> str:
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    text = soup.get_text("\n", strip=True)
-    return text
+def _fallback_extract(tree: lxml.html.HtmlElement) -> str:
+    etree.strip_elements(tree, "script", "style", "noscript", with_tail=False)
+    return "\n".join(part.strip() for part in tree.itertext() if part.strip())
 
 
-def extract_content(
-    html: str,
+def _parse_and_extract(html: str, url: str, default_title: str) -> Optional[Tuple[str, str]]:
+    """
+    只解析一次 HTML：标题、trafilatura 正文与兜底文本都取自同一棵 lxml 树
+
+    可在子进程中执行，因此不写日志，返回 (title, text)；无法解析时返回 None。
+    """
+    tree = load_html(html)
+    if tree is None:
+        try:
+            tree = lxml.html.document_fromstring(html)
+        except (etree.ParserError, ValueError):
+            return None
+    title_el = tree.find(".//title")
+    title = title_el.text_content().strip() if title_el is not None else default_title or url
+    # trafilatura 会就地清洗传入的树，兜底提取用副本（复制远比重新解析便宜）
+    backup = deepcopy(tree)
+    text = trafilatura_extract(tree, url=url, include_links=False, include_tables=False)
+    if not text:
+        text = _fallback_extract(backup)
+    return title, text
+
+
+def _build_document(
+    parsed: Optional[Tuple[str, str]],
     url: str,
-    default_title: str = "",
-    request_id: str | None = None,
+    raw_bytes: int,
+    req_logger: logging.LoggerAdapter,
 ) -> Optional[ExtractedDocument]:
-    req_logger = get_request_logger(logger, request_id)
-    raw_bytes = len(html.encode("utf-8", errors="ignore"))
-    text = trafilatura_extract(html, url=url, include_links=False, include_tables=False)
-    if not text:
-        text = _fallback_extract(html)
+    title, text = parsed or ("", "")
     if not text.strip():
         req_logger.warning("Extractor empty result url=%s raw_bytes=%s", url, raw_bytes)
         return None
 
-    soup = BeautifulSoup(html, "lxml")
-    title_tag = soup.find("title")
-    title = title_tag.get_text(strip=True) if title_tag else default_title or url
-
     content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
     extracted_chars = len(text)
     req_logger.info(
@@ -69,3 +86,46 @@ def extract_content(
         )
     return ExtractedDocument(url=url, title=title, text=text, content_hash=content_hash)
 
+
+def extract_content(
+    html: str,
+    url: str,
+    default_title: str = "",
+    request_id: str | None = None,
+) -> Optional[ExtractedDocument]:
+    req_logger = get_request_logger(logger, request_id)
+    raw_bytes = len(html.encode("utf-8", errors="ignore"))
+    return _build_document(_parse_and_extract(html, url, default_title), url, raw_bytes, req_logger)
+
+
+# 正文提取进程池；并发数由 CRAWLER_EXTRACT_WORKERS 限制
+_extract_pool = LazyProcessPool(lambda: get_settings().CRAWLER_EXTRACT_WORKERS)
+
+
+def shutdown_extract_pool() -> None:
+    """关闭正文提取进程池（应用退出时调用）"""
+    _extract_pool.shutdown()
+
+
+async def extract_content_async(
+    html: str,
+    url: str,
+    default_title: str = "",
+    request_id: str | None = None,
+) -> Optional[ExtractedDocument]:
+    """
+    在进程池中执行 extract_content
+
+    trafilatura 的树处理是纯 Python 代码，几 MB 的页面要数秒且全程持有 GIL，
+    放在线程里同样会卡住事件循环；并发数由 CRAWLER_EXTRACT_WORKERS 限制，超出的页面在池内排队。
+    """
+    req_logger = get_request_logger(logger, request_id)
+    raw_bytes = len(html.encode("utf-8", errors="ignore"))
+    try:
+        with span("crawler.extract", raw_bytes=raw_bytes):
+            parsed = await _extract_pool.run(_parse_and_extract, html, url, default_title)
+    except BrokenProcessPool as exc:
+        # 子进程异常退出（如 OOM 被杀），进程池已丢弃、下次调用时重建；本次跳过该页面
+        req_logger.warning("Extract pool broken, recreating url=%s: %s", url, exc)
+        return None
+    return _build_document(parsed, url, raw_bytes, req_logger)
@@ -1,13 +1,18 @@
 import asyncio
 import logging
 import random
+import threading
 import time
+from contextlib import AsyncExitStack
 from dataclasses import dataclass
 from typing import List, Optional
 from urllib.parse import urlparse
 
 import httpx
 
+from app.config import get_settings
+from app.services.crawler.domain_limiter import DomainRateLimiter, get_domain_limiter
+from app.services.crawler.page_cache import CachedPage, PageCache
 from app.services.logging.request_logger import (
     get_request_logger,
     safe_preview,
@@ -26,6 +31,44 @@ DEFAULT_REFERERS = [
 ]
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_BODY_BYTES = 5 * 1024 * 1024
+BLOCKED_STATUSES = (403, 429)
+
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client() -> httpx.AsyncClient:
+    """
+    所有 PageFetcher 共用的连接池（按事件循环创建）
+
+    连接数上限 CRAWLER_MAX_CONNECTIONS 对整个进程生效，同一站点的 keep-alive 连接在请求之间复用。
+    """
+    global _shared_client, _shared_client_loop
+    loop = asyncio.get_running_loop()
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client.is_closed or _shared_client_loop is not loop:
+            max_connections = max(1, get_settings().CRAWLER_MAX_CONNECTIONS)
+            _shared_client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max(1, max_connections // 2),
+                ),
+            )
+            _shared_client_loop = loop
+        return _shared_client
+
+
+async def close_shared_client() -> None:
+    """关闭共享连接池（应用退出时调用）"""
+    global _shared_client, _shared_client_loop
+    with _shared_client_lock:
+        client, _shared_client, _shared_client_loop = _shared_client, None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
 
 @dataclass
 class FetchResult:
@@ -47,6 +90,10 @@ class PageFetcher:
         delay_range: tuple[float, float] = (0.6, 1.8),
         domain_cooldown: float = 2.5,
         proxies: Optional[List[str]] = None,
+        cache: Optional[PageCache] = None,
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+        limiter: Optional[DomainRateLimiter] = None,
+        block_backoff: float = 5.0,
     ):
         # 为了整体延迟可控，将单次超时限制在 5~15 秒之间
         self.base_timeout = max(5.0, min(timeout, 15.0))
@@ -59,20 +106,15 @@ class PageFetcher:
         self.delay_min = max(0.0, lo)
         self.delay_max = max(0.0, hi)
         self.domain_cooldown = max(0.0, domain_cooldown)
-        self._domain_slots: dict[str, float] = {}
+        # 域名限速与连接池在进程内（可选跨 worker）共享，并发的多轮对话彼此遵守同一站点的冷却时间
+        self.limiter = limiter or get_domain_limiter()
+        self.block_backoff = max(0.0, block_backoff)
         self.proxies = [p for p in (proxies or []) if p]
+        self.cache = cache
+        self.max_body_bytes = max(1, max_body_bytes)
 
     async def _reserve_domain_slot(self, domain: str) -> None:
-        if not domain or self.domain_cooldown <= 0:
-            return
-        while True:
-            now = time.monotonic()
-            ready = self._domain_slots.get(domain, 0.0)
-            wait = ready - now
-            if wait <= 0:
-                self._domain_slots[domain] = now + self.domain_cooldown
-                return
-            await asyncio.sleep(min(wait, 1.0))
+        await self.limiter.acquire(domain, self.domain_cooldown)
 
     async def _sleep_jitter(self) -> None:
         if self.delay_max <= 0:
@@ -97,7 +139,40 @@ class PageFetcher:
         headers["Referer"] = referer
         return headers
 
+    @staticmethod
+    def _from_cache(url: str, page: CachedPage) -> FetchResult:
+        return FetchResult(
+            url=url,
+            final_url=page.final_url,
+            status=page.status,
+            content_type=page.content_type,
+            html=page.html,
+        )
+
+    async def _read_body(self, resp: httpx.Response) -> Optional[bytes]:
+        """流式读取正文；超过 max_body_bytes 立即中止并返回 None"""
+        declared = resp.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > self.max_body_bytes:
+            return None
+        body = bytearray()
+        async for chunk in resp.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > self.max_body_bytes:
+                return None
+        return bytes(body)
+
+    @staticmethod
+    def _decode(resp: httpx.Response, body: bytes) -> str:
+        try:
+            return body.decode(resp.charset_encoding or "utf-8", errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
     async def _fetch_single(self, shared_client: Optional[httpx.AsyncClient], url: str) -> FetchResult:
+        cached = await asyncio.to_thread(self.cache.get, url) if self.cache else None
+        if cached is not None and self.cache.is_fresh(cached):
+            self.logger.info("Crawler cache hit url=%s age=%.0fs", url, cached.age())
+            return self._from_cache(url, cached)
         async with self.semaphore:
             attempt = 0
             last_error = None
@@ -106,9 +181,19 @@ class PageFetcher:
             while attempt <= self.max_retries:
                 ua = USER_AGENTS[attempt % len(USER_AGENTS)]
                 timeout = max(self.base_timeout * (0.6**attempt), 4.0)
-                await self._reserve_domain_slot(domain)
+                # 抖动放在领取时间槽之前：领到槽后立即发请求，同一域名的实际间隔不小于冷却时间
                 await self._sleep_jitter()
+                await self._reserve_domain_slot(domain)
                 headers = self._build_headers(ua, url)
+                if cached is not None:
+                    # 缓存已过期：带上校验器做条件请求，未变化时服务端只回 304；
+                    # 去掉 no-cache，避免中间缓存和部分服务端忽略校验器直接回完整 200
+                    headers.pop("Cache-Control", None)
+                    headers.pop("Pragma", None)
+                    if cached.etag:
+                        headers["If-None-Match"] = cached.etag
+                    if cached.last_modified:
+                        headers["If-Modified-Since"] = cached.last_modified
                 proxy = random.choice(self.proxies) if self.proxies else None
                 start = time.perf_counter()
                 self.logger.info(
@@ -120,60 +205,122 @@ class PageFetcher:
                     proxy or "-",
                 )
                 try:
-                    if proxy:
-                        async with httpx.AsyncClient(follow_redirects=True, proxies=proxy, trust_env=False) as client:
-                            resp = await client.get(url, timeout=timeout, headers=headers)
-                    elif shared_client is not None:
-                        resp = await shared_client.get(url, timeout=timeout, headers=headers)
-                    else:
-                        async with httpx.AsyncClient(follow_redirects=True) as client:
-                            resp = await client.get(url, timeout=timeout, headers=headers)
-                    elapsed_ms = (time.perf_counter() - start) * 1000
-                    content_type = resp.headers.get("content-type")
-                    download_bytes = len(resp.content or b"")
-                    self.logger.info(
-                        "Crawler fetch done url=%s status=%s final_url=%s ctype=%s bytes=%s elapsed=%.1fms",
-                        url,
-                        resp.status_code,
-                        str(resp.url),
-                        content_type,
-                        download_bytes,
-                        elapsed_ms,
-                    )
-                    if resp.status_code == 403 and attempt < self.max_retries:
-                        preview = safe_preview(resp.text, 200)
-                        self.logger.warning(
-                            "Crawler HTTP 403 url=%s attempt=%s preview=%s，随机等待后重试",
-                            str(resp.url),
-                            attempt + 1,
-                            preview,
+                    async with AsyncExitStack() as stack:
+                        if proxy:
+                            client = await stack.enter_async_context(
+                                httpx.AsyncClient(follow_redirects=True, proxies=proxy, trust_env=False)
+                            )
+                        elif shared_client is not None:
+                            client = shared_client
+                        else:
+                            client = await stack.enter_async_context(httpx.AsyncClient(follow_redirects=True))
+                        resp = await stack.enter_async_context(
+                            client.stream("GET", url, timeout=timeout, headers=headers)
                         )
-                        attempt += 1
-                        continue
-                    if resp.status_code >= 400:
-                        preview = safe_preview(resp.text, 300)
-                        self.logger.warning(
-                            "Crawler HTTP %s url=%s preview=%s",
+                        content_type = resp.headers.get("content-type")
+                        is_html = "text/html" in (content_type or "")
+                        if resp.status_code == 304 and cached is not None:
+                            await asyncio.to_thread(self.cache.touch, url)
+                            self.logger.info(
+                                "Crawler cache revalidated url=%s elapsed=%.1fms",
+                                url,
+                                (time.perf_counter() - start) * 1000,
+                            )
+                            return self._from_cache(url, cached)
+                        if resp.status_code < 400 and not is_html:
+                            # 非 HTML 内容不下载正文
+                            self.logger.info(
+                                "Crawler skip non-HTML url=%s status=%s ctype=%s",
+                                url,
+                                resp.status_code,
+                                content_type,
+                            )
+                            return FetchResult(
+                                url=url,
+                                final_url=str(resp.url),
+                                status=resp.status_code,
+                                content_type=content_type,
+                                html=None,
+                                error="非 HTML 内容",
+                            )
+                        body = await self._read_body(resp)
+                        elapsed_ms = (time.perf_counter() - start) * 1000
+                        if body is None:
+                            self.logger.warning(
+                                "Crawler body exceeds limit url=%s limit=%s elapsed=%.1fms",
+                                url,
+                                self.max_body_bytes,
+                                elapsed_ms,
+                            )
+                            return FetchResult(
+                                url=url,
+                                final_url=str(resp.url),
+                                status=resp.status_code,
+                                content_type=content_type,
+                                html=None,
+                                error=f"页面超过 {self.max_body_bytes} 字节上限",
+                            )
+                        text = self._decode(resp, body)
+                        self.logger.info(
+                            "Crawler fetch done url=%s status=%s final_url=%s ctype=%s bytes=%s elapsed=%.1fms",
+                            url,
                             resp.status_code,
                             str(resp.url),
-                            preview,
+                            content_type,
+                            len(body),
+                            elapsed_ms,
                         )
-                    if "text/html" not in (content_type or ""):
+                        if resp.status_code in BLOCKED_STATUSES:
+                            # 站点已在拒绝访问：推迟该域名的所有后续请求（包括其他对话的），避免 403 风暴
+                            await self.limiter.backoff(domain, self.block_backoff)
+                        if resp.status_code == 403 and attempt < self.max_retries:
+                            preview = safe_preview(text, 200)
+                            self.logger.warning(
+                                "Crawler HTTP 403 url=%s attempt=%s preview=%s，随机等待后重试",
+                                str(resp.url),
+                                attempt + 1,
+                                preview,
+                            )
+                            attempt += 1
+                            continue
+                        if resp.status_code >= 400:
+                            preview = safe_preview(text, 300)
+                            self.logger.warning(
+                                "Crawler HTTP %s url=%s preview=%s",
+                                resp.status_code,
+                                str(resp.url),
+                                preview,
+                            )
+                        if not is_html:
+                            return FetchResult(
+                                url=url,
+                                final_url=str(resp.url),
+                                status=resp.status_code,
+                                content_type=content_type,
+                                html=None,
+                                error="非 HTML 内容",
+                            )
+                        if resp.status_code == 200 and self.cache is not None:
+                            await asyncio.to_thread(
+                                self.cache.put,
+                                CachedPage(
+                                    url=url,
+                                    final_url=str(resp.url),
+                                    status=resp.status_code,
+                                    content_type=content_type,
+                                    html=text,
+                                    etag=resp.headers.get("etag"),
+                                    last_modified=resp.headers.get("last-modified"),
+                                    fetched_at=time.time(),
+                                ),
+                            )
                         return FetchResult(
                             url=url,
                             final_url=str(resp.url),
                             status=resp.status_code,
                             content_type=content_type,
-                            html=None,
-                            error="非 HTML 内容",
+                            html=text,
                         )
-                    return FetchResult(
-                        url=url,
-                        final_url=str(resp.url),
-                        status=resp.status_code,
-                        content_type=content_type,
-                        html=resp.text,
-                    )
                 except httpx.HTTPError as exc:
                     last_error = str(exc)
                     self.logger.error("Crawler network error url=%s error=%r", url, exc)
@@ -198,13 +345,7 @@ class PageFetcher:
             )
 
     async def fetch(self, urls: List[str]) -> List[FetchResult]:
-        shared_client = None
-        if not self.proxies:
-            shared_client = httpx.AsyncClient(follow_redirects=True)
-        try:
-            tasks = [self._fetch_single(shared_client, url) for url in urls]
-            return await asyncio.gather(*tasks)
-        finally:
-            if shared_client is not None:
-                await shared_client.aclose()
+        shared_client = None if self.proxies else get_shared_client()
+        tasks = [self._fetch_single(shared_client, url) for url in urls]
+        return await asyncio.gather(*tasks)
 
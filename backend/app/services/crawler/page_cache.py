@@ -0,0 +1,139 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedPage:
+    url: str
+    final_url: str
+    status: int
+    content_type: Optional[str]
+    html: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float  # 最近一次下载或 304 校验成功的时间
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.fetched_at
+
+
+class PageCache:
+    """
+    网页抓取结果的持久化缓存（SQLite）
+
+    保存页面正文及 ETag/Last-Modified，供 PageFetcher 条件请求复用；
+    超出 max_bytes 时按最近校验时间淘汰最旧的页面。
+    """
+
+    def __init__(self, path: str, fresh_seconds: float = 600.0, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.fresh_seconds = max(0.0, fresh_seconds)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    final_url TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    content_type TEXT,
+                    html TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_fetched ON pages(fetched_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        try:
+            with conn:  # 正常退出时提交
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, final_url, status, content_type, html, etag, last_modified, fetched_at "
+                "FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return page.age() < self.fresh_seconds
+
+    def put(self, page: CachedPage) -> None:
+        size = len(page.html.encode("utf-8", errors="ignore"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO pages (url, final_url, status, content_type, html, etag, last_modified, size, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    final_url = excluded.final_url, status = excluded.status,
+                    content_type = excluded.content_type, html = excluded.html,
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    size = excluded.size, fetched_at = excluded.fetched_at
+                """,
+                (page.url, page.final_url, page.status, page.content_type, page.html,
+                 page.etag, page.last_modified, size, page.fetched_at),
+            )
+            self._evict(conn)
+
+    def touch(self, url: str, fetched_at: Optional[float] = None) -> None:
+        """304 校验通过：刷新校验时间"""
+        with self._connect() as conn:
+            conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (fetched_at or time.time(), url))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 从最旧的页面开始删除，直到总量回落到上限的 90%
+        target = total - int(self.max_bytes * 0.9)
+        rows = conn.execute("SELECT url, size FROM pages ORDER BY fetched_at").fetchall()
+        victims, freed = [], 0
+        for url, size in rows:
+            if freed >= target:
+                break
+            victims.append((url,))
+            freed += size
+        conn.executemany("DELETE FROM pages WHERE url = ?", victims)
+        logger.info("Page cache evicted %d pages (%d bytes)", len(victims), freed)
+
+
+_page_cache: Optional[PageCache] = None
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """全局页面缓存；CRAWLER_CACHE_PATH 为空时禁用"""
+    global _page_cache
+    settings = get_settings()
+    if not settings.CRAWLER_CACHE_PATH:
+        return None
+    if _page_cache is None:
+        _page_cache = PageCache(
+            settings.CRAWLER_CACHE_PATH,
+            fresh_seconds=settings.CRAWLER_CACHE_FRESH_SEC,
+            max_bytes=settings.CRAWLER_CACHE_MAX_MB * 1024 * 1024,
+        )
+    return _page_cache
@@ -0,0 +1,102 @@
+"""
+DAO 批量写入工具
+替代逐行 INSERT：
+- copy_rows: COPY ... FROM STDIN，纯追加写入（无表达式 / ON CONFLICT）首选
+- execute_values: 多行 VALUES 分页执行，用于 UPDATE ... FROM (VALUES ...) 等需要整批参与的语句
+- 带表达式或 upsert 的逐行语句直接使用 cursor.executemany（psycopg3 自动走 pipeline 模式）
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, List, Sequence
+
+from psycopg import Cursor, sql
+
+# Postgres 单条语句最多 65535 个绑定参数
+MAX_BIND_PARAMS = 65535
+DEFAULT_PAGE_SIZE = 200
+
+# 共享一个编码器实例；ensure_ascii=False 避免中文被转成 \uXXXX 放大 3 倍体积
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_json(value: Any, default: Any = None) -> str:
+    """把 Python 值编码为 JSON 文本（None 时使用 default）"""
+    if value is None:
+        value = default
+    return _json_encoder.encode(value)
+
+
+def _page_size(columns: int, page_size: int) -> int:
+    if columns <= 0:
+        return max(1, page_size)
+    return max(1, min(page_size, MAX_BIND_PARAMS // columns))
+
+
+def _chunks(rows: Sequence[Sequence[Any]], size: int) -> Iterable[Sequence[Sequence[Any]]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def execute_values(
+    cur: Cursor,
+    statement: str,
+    rows: Sequence[Sequence[Any]],
+    template: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> int:
+    """
+    多行 VALUES 批量执行（语义同 psycopg2.extras.execute_values）
+
+    Args:
+        cur: 游标（调用方负责事务）
+        statement: SQL 语句，用 {values} 标记 VALUES 列表插入位置，例如
+            "INSERT INTO t (a, b) VALUES {values} ON CONFLICT (a) DO NOTHING"
+        rows: 参数行
+        template: 单行占位模板，例如 "(%s, %s::jsonb)"
+        page_size: 每条语句的最大行数（会按绑定参数上限自动收缩）
+
+    Returns:
+        写入的行数
+    """
+    if not rows:
+        return 0
+    if "{values}" not in statement:
+        raise ValueError("statement must contain a {values} marker")
+
+    size = _page_size(template.count("%s"), page_size)
+    total = 0
+    for page in _chunks(rows, size):
+        values_sql = ",".join([template] * len(page))
+        params: List[Any] = []
+        for row in page:
+            params.extend(row)
+        cur.execute(statement.replace("{values}", values_sql), params)
+        total += len(page)
+    return total
+
+
+def copy_rows(
+    cur: Cursor,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+) -> int:
+    """
+    使用 COPY ... FROM STDIN 批量追加写入
+
+    未列出的列取表默认值（如 created_at DEFAULT now()）；JSON 列传入已编码的文本即可。
+
+    Returns:
+        写入的行数
+    """
+    stmt = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table),
+        sql.SQL(", ").join(sql.Identifier(c) for c in columns),
+    )
+    total = 0
+    with cur.copy(stmt) as copy:
+        for row in rows:
+            copy.write_row(row)
+            total += 1
+    return total
@@ -1,11 +1,48 @@
+import base64
 import json
 import uuid
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 
 from psycopg.rows import dict_row
 
 from app.services.db.postgres import get_conn
 
+SESSION_COLUMNS = "id, title, created_at, updated_at, default_kb_ids_json, search_mode, model_id, meta_json, summary"
+
+
+def encode_cursor(ts: datetime, row_id: str) -> str:
+    """游标 = (时间戳, id)，对调用方不透明"""
+    raw = json.dumps([ts.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标；格式不合法时抛 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(ts), str(row_id)
+    except Exception as exc:  # noqa: BLE001
+        raise ValueError(f"invalid cursor: {cursor!r}") from exc
+
+
+def _session_from_row(row: dict) -> dict:
+    data = dict(row)
+    data["default_kb_ids"] = row["default_kb_ids_json"] or []
+    data["meta"] = row["meta_json"] or {}
+    data["summary"] = row.get("summary")
+    data.pop("default_kb_ids_json", None)
+    data.pop("meta_json", None)
+    return data
+
+
+def _message_from_row(row: dict) -> dict:
+    msg = dict(row)
+    msg["metadata"] = row["metadata_json"] or {}
+    msg.pop("metadata_json", None)
+    return msg
+
 
 def create_session(
     title: str,
@@ -69,22 +106,46 @@ def list_sessions(page: int, page_size: int) -> List[dict]:
                 """
                 SELECT id, title, created_at, updated_at, default_kb_ids_json, search_mode, model_id, meta_json, summary
                 FROM chat_sessions
-                ORDER BY updated_at DESC
+                ORDER BY updated_at DESC, id DESC
                 LIMIT %s OFFSET %s
                 """,
                 (page_size, offset),
             )
             rows = cur.fetchall()
-    sessions = []
-    for row in rows:
-        data = dict(row)
-        data["default_kb_ids"] = row["default_kb_ids_json"] or []
-        data["meta"] = row["meta_json"] or {}
-        data["summary"] = row.get("summary")
-        data.pop("default_kb_ids_json", None)
-        data.pop("meta_json", None)
-        sessions.append(data)
-    return sessions
+    return [_session_from_row(row) for row in rows]
+
+
+def list_sessions_after(cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    按 updated_at 倒序的游标分页（走 idx_chat_sessions_updated，页深不影响耗时）
+
+    Returns:
+        (本页会话, 下一页游标；没有更多时为 None)
+    """
+    where = ""
+    params: list = []
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        where = "WHERE (updated_at, id) < (%s, %s)"
+        params.extend([ts, row_id])
+    params.append(limit + 1)
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                f"""
+                SELECT {SESSION_COLUMNS}
+                FROM chat_sessions
+                {where}
+                ORDER BY updated_at DESC, id DESC
+                LIMIT %s
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"]) if has_more and rows else None
+    return [_session_from_row(row) for row in rows], next_cursor
 
 
 def get_session(session_id: str) -> Optional[dict]:
@@ -101,13 +162,7 @@ def get_session(session_id: str) -> Optional[dict]:
             row = cur.fetchone()
     if not row:
         return None
-    data = dict(row)
-    data["default_kb_ids"] = row["default_kb_ids_json"] or []
-    data["meta"] = row["meta_json"] or {}
-    data["summary"] = row.get("summary")
-    data.pop("default_kb_ids_json", None)
-    data.pop("meta_json", None)
-    return data
+    return _session_from_row(row)
 
 
 def get_session_with_messages(session_id: str) -> Optional[dict]:
@@ -126,13 +181,60 @@ def get_session_with_messages(session_id: str) -> Optional[dict]:
                 (session_id,),
             )
             rows = cur.fetchall()
-    messages = []
-    for row in rows:
-        msg = dict(row)
-        msg["metadata"] = row["metadata_json"] or {}
-        msg.pop("metadata_json", None)
-        messages.append(msg)
-    session["messages"] = messages
+    session["messages"] = [_message_from_row(row) for row in rows]
+    return session
+
+
+def list_messages(
+    session_id: str,
+    limit: int,
+    before: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    取 before 游标之前（不传则为最新）的 limit 条消息，按时间正序返回
+
+    沿 idx_chat_messages_session_created 反向扫描，只读取 limit+1 行，与会话总长度无关。
+
+    Returns:
+        (消息列表, 更早一页的游标；没有更早消息时为 None)
+    """
+    where = "session_id=%s"
+    params: list = [session_id]
+    if before:
+        ts, row_id = decode_cursor(before)
+        where += " AND (created_at, id) < (%s, %s)"
+        params.extend([ts, row_id])
+    params.append(limit + 1)
+    with get_conn() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(
+                f"""
+                SELECT id, role, content, created_at, metadata_json
+                FROM chat_messages
+                WHERE {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    next_cursor = encode_cursor(rows[0]["created_at"], rows[0]["id"]) if has_more and rows else None
+    return [_message_from_row(row) for row in rows], next_cursor
+
+
+def get_session_with_recent_messages(session_id: str, limit: int) -> Optional[dict]:
+    """
+    会话信息 + 最近 limit 条消息（正序），用于构建提示词
+
+    messages_cursor 指向窗口之前的更早消息（可传给 list_messages 的 before），没有则为 None。
+    """
+    session = get_session(session_id)
+    if not session:
+        return None
+    session["messages"], session["messages_cursor"] = list_messages(session_id, limit)
     return session
 
 
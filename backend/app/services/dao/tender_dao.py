@@ -12,6 +12,8 @@ from typing import Any, Dict, List, Optional, Tuple
 from psycopg.rows import dict_row
 from psycopg_pool import ConnectionPool
 
+from app.services.dao.bulk import copy_rows, encode_json, execute_values
+
 
 def _id(prefix: str) -> str:
     """生成带前缀的UUID"""
@@ -123,24 +125,25 @@ class TenderDAO:
         return row or {"id": pid, "kb_id": kb_id, "name": name, "description": description, "owner_id": owner_id}
 
     def list_projects(self, owner_id: Optional[str]) -> List[Dict[str, Any]]:
-        """列出项目（按owner_id过滤）"""
-        if owner_id:
-            return self._fetchall(
-                """
-                SELECT id, kb_id, name, description, owner_id, created_at
-                FROM tender_projects
-                WHERE owner_id=%s
-                ORDER BY created_at DESC
-                """,
-                (owner_id,),
-            )
+        """
+        列出项目（按owner_id过滤）
+
+        删除中的项目不列出；删除失败的项目照常列出并带上 delete_status='FAILED'，便于用户重新发起删除。
+        """
         return self._fetchall(
             """
-            SELECT id, kb_id, name, description, owner_id, created_at
-            FROM tender_projects
-            ORDER BY created_at DESC
+            SELECT p.id, p.kb_id, p.name, p.description, p.owner_id, p.created_at, d.status AS delete_status
+            FROM tender_projects p
+            LEFT JOIN LATERAL (
+                SELECT status FROM tender_project_delete_audit a
+                WHERE a.project_id = p.id
+                ORDER BY a.created_at DESC LIMIT 1
+            ) d ON p.status = 'deleting'
+            WHERE (%s::text IS NULL OR p.owner_id = %s)
+              AND (p.status <> 'deleting' OR d.status = 'FAILED')
+            ORDER BY p.created_at DESC
             """,
-            (),
+            (owner_id or None, owner_id or None),
         )
     
     def update_project(self, project_id: str, name: Optional[str], description: Optional[str]) -> Dict[str, Any]:
@@ -251,6 +254,59 @@ class TenderDAO:
         )
         return row or {}
 
+    def create_asset_once(
+        self,
+        project_id: str,
+        kind: str,
+        filename: Optional[str],
+        mime_type: Optional[str],
+        size_bytes: Optional[int],
+        kb_doc_id: Optional[str],
+        storage_path: Optional[str],
+        bidder_name: Optional[str],
+        meta_json: Dict[str, Any],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        按 (项目, kind, 投标人, 文件名, meta_json.content_sha256) 幂等创建资产记录
+
+        同一键的并发导入用事务级 advisory lock 串行化，在锁内复查已有记录。
+
+        Returns:
+            (资产记录, 是否新建)；已被其他请求导入时返回已有记录与 False
+        """
+        digest = (meta_json or {}).get("content_sha256")
+        lock_key = f"tender_asset:{project_id}:{kind}:{bidder_name or ''}:{filename or ''}:{digest}"
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (lock_key,))
+                cur.execute(
+                    """
+                    SELECT * FROM tender_project_assets
+                    WHERE project_id=%s AND kind=%s
+                      AND bidder_name IS NOT DISTINCT FROM %s
+                      AND filename IS NOT DISTINCT FROM %s
+                      AND meta_json->>'content_sha256'=%s
+                    ORDER BY created_at ASC
+                    LIMIT 1
+                    """,
+                    (project_id, kind, bidder_name, filename, digest),
+                )
+                row = cur.fetchone()
+                if row:
+                    return row, False
+                cur.execute(
+                    """
+                    INSERT INTO tender_project_assets
+                      (id, project_id, kind, filename, mime_type, size_bytes, kb_doc_id, storage_path, bidder_name, meta_json, created_at)
+                    VALUES
+                      (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW())
+                    RETURNING *
+                    """,
+                    (_id("ta"), project_id, kind, filename, mime_type, size_bytes, kb_doc_id, storage_path,
+                     bidder_name, json.dumps(meta_json or {})),
+                )
+                return cur.fetchone(), True
+
     def list_assets(self, project_id: str) -> List[Dict[str, Any]]:
         """列出项目的所有资产"""
         return self._fetchall(
@@ -340,22 +396,30 @@ class TenderDAO:
     ) -> List[str]:
         """批量插入 KB chunks"""
         chunk_ids: List[str] = []
+        rows = []
+        for c in chunks:
+            cid = _id("chunk")
+            chunk_ids.append(cid)
+            content = c.get("content") or ""
+            rows.append((
+                cid, kb_id, doc_id,
+                c.get("title") or "",
+                c.get("url") or "",
+                int(c.get("position") or 0),
+                content, kb_category, content,
+            ))
+        if not rows:
+            return chunk_ids
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                for c in chunks:
-                    cid = _id("chunk")
-                    chunk_ids.append(cid)
-                    title = c.get("title") or ""
-                    url = c.get("url") or ""
-                    position = int(c.get("position") or 0)
-                    content = c.get("content") or ""
-                    cur.execute(
-                        """
-                        INSERT INTO kb_chunks (chunk_id, kb_id, doc_id, title, url, position, content, kb_category, created_at, tsv)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), to_tsvector('simple', %s))
-                        """,
-                        (cid, kb_id, doc_id, title, url, position, content, kb_category, content),
-                    )
+                # executemany 走 pipeline 模式：整批一次往返，语句自动预编译
+                cur.executemany(
+                    """
+                    INSERT INTO kb_chunks (chunk_id, kb_id, doc_id, title, url, position, content, kb_category, created_at, tsv)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), to_tsvector('simple', %s))
+                    """,
+                    rows,
+                )
             conn.commit()
         return chunk_ids
 
@@ -373,20 +437,25 @@ class TenderDAO:
             tuple(chunk_ids),
         )
 
-    def load_chunks_by_doc_ids(self, doc_ids: List[str], limit: int) -> List[Dict[str, Any]]:
-        """根据 doc_ids 加载 chunks"""
+    def load_chunks_by_doc_ids(self, doc_ids: List[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """根据 doc_ids 加载 chunks（按 doc_id, position 排序；limit 为 None 时加载全部）"""
         if not doc_ids:
             return []
         placeholders = ",".join(["%s"] * len(doc_ids))
+        params: List[Any] = list(doc_ids)
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT %s"
+            params.append(limit)
         return self._fetchall(
             f"""
             SELECT chunk_id, doc_id, title, url, position, content
             FROM kb_chunks
             WHERE doc_id IN ({placeholders})
-            ORDER BY doc_id ASC, position ASC
-            LIMIT %s
+            ORDER BY doc_id ASC, position ASC, chunk_id ASC
+            {limit_sql}
             """,
-            tuple(doc_ids + [limit]),
+            tuple(params),
         )
 
     # ==================== 项目信息 ====================
@@ -431,30 +500,31 @@ class TenderDAO:
 
     def replace_risks(self, project_id: str, items: List[Dict[str, Any]]):
         """替换项目的所有风险"""
+        rows = [
+            (
+                _id("risk"),
+                project_id,
+                it.get("risk_type") or "other",
+                it.get("title") or "",
+                it.get("description") or "",
+                it.get("suggestion") or "",
+                it.get("severity") or "medium",
+                encode_json(it.get("tags") or []),
+                encode_json(it.get("evidence_chunk_ids") or []),
+            )
+            for it in items
+        ]
         with self.pool.connection() as conn:
             with conn.transaction():  # 显式事务保护
                 with conn.cursor() as cur:
                     cur.execute("DELETE FROM tender_risks WHERE project_id=%s", (project_id,))
-                    for it in items:
-                        cur.execute(
-                            """
-                            INSERT INTO tender_risks
-                              (id, project_id, risk_type, title, description, suggestion, severity, tags_json, evidence_chunk_ids_json)
-                            VALUES
-                              (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb)
-                            """,
-                            (
-                                _id("risk"),
-                                project_id,
-                                it.get("risk_type") or "other",
-                                it.get("title") or "",
-                                it.get("description") or "",
-                                it.get("suggestion") or "",
-                                it.get("severity") or "medium",
-                                json.dumps(it.get("tags") or []),
-                                json.dumps(it.get("evidence_chunk_ids") or []),
-                            ),
-                        )
+                    copy_rows(
+                        cur,
+                        "tender_risks",
+                        ("id", "project_id", "risk_type", "title", "description", "suggestion",
+                         "severity", "tags_json", "evidence_chunk_ids_json"),
+                        rows,
+                    )
             # with transaction() 自动提交或回滚，无需手动 commit
 
     def list_risks(self, project_id: str) -> List[Dict[str, Any]]:
@@ -544,34 +614,33 @@ class TenderDAO:
             out_rows.append((order_no, nid, n))
 
         # 4) 写库（事务：先删后插）
+        rows = []
+        for order_no, nid, n in out_rows:
+            parent_num = _infer_parent_numbering(n["numbering"])
+            parent_id = by_numbering_id.get(parent_num) if parent_num else None
+            rows.append((
+                nid,
+                project_id,
+                parent_id,
+                order_no,
+                n["level"],
+                n["numbering"],
+                n["title"],
+                n["is_required"],
+                n["source"],
+                encode_json(n["evidence"]),
+                encode_json(n["meta"]),
+            ))
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM tender_directory_nodes WHERE project_id=%s", (project_id,))
-                for order_no, nid, n in out_rows:
-                    parent_num = _infer_parent_numbering(n["numbering"])
-                    parent_id = by_numbering_id.get(parent_num) if parent_num else None
-                    cur.execute(
-                        """
-                        INSERT INTO tender_directory_nodes
-                          (id, project_id, parent_id, order_no, level, numbering, title,
-                           is_required, source, evidence_chunk_ids_json, meta_json)
-                        VALUES
-                          (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s::jsonb,%s::jsonb)
-                        """,
-                        (
-                            nid,
-                            project_id,
-                            parent_id,
-                            order_no,
-                            n["level"],
-                            n["numbering"],
-                            n["title"],
-                            n["is_required"],
-                            n["source"],
-                            json.dumps(n["evidence"]),
-                            json.dumps(n["meta"]),
-                        ),
-                    )
+                copy_rows(
+                    cur,
+                    "tender_directory_nodes",
+                    ("id", "project_id", "parent_id", "order_no", "level", "numbering", "title",
+                     "is_required", "source", "evidence_chunk_ids_json", "meta_json"),
+                    rows,
+                )
             conn.commit()
 
     def list_directory(self, project_id: str) -> List[Dict[str, Any]]:
@@ -635,16 +704,24 @@ class TenderDAO:
         if not updates:
             return 0
         
+        rows = [
+            (update["id"], encode_json(update["meta_json"]))
+            for update in updates
+            if update.get("id") and update.get("meta_json") is not None
+        ]
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                for update in updates:
-                    node_id = update.get("id")
-                    meta_json = update.get("meta_json")
-                    if node_id and meta_json is not None:
-                        cur.execute(
-                            "UPDATE tender_directory_nodes SET meta_json = %s WHERE id = %s",
-                            (json.dumps(meta_json), node_id)
-                        )
+                execute_values(
+                    cur,
+                    """
+                    UPDATE tender_directory_nodes AS t
+                    SET meta_json = v.meta_json::jsonb
+                    FROM (VALUES {values}) AS v(id, meta_json)
+                    WHERE t.id = v.id
+                    """,
+                    rows,
+                    template="(%s, %s)",
+                )
         
         return len(updates)
     
@@ -695,32 +772,32 @@ class TenderDAO:
 
     def replace_review_items(self, project_id: str, items: List[Dict[str, Any]]):
         """替换项目的所有审核项"""
+        rows = [
+            (
+                _id("rev"),
+                project_id,
+                it.get("dimension") or "其他",
+                it.get("requirement_text") or "",
+                it.get("response_text") or "",
+                it.get("result") or "risk",
+                it.get("remark") or "",
+                bool(it.get("rigid", False)),
+                encode_json(it.get("tender_evidence_chunk_ids") or []),
+                encode_json(it.get("bid_evidence_chunk_ids") or []),
+            )
+            for it in items
+        ]
         with self.pool.connection() as conn:
             with conn.transaction():  # 显式事务保护
                 with conn.cursor() as cur:
                     cur.execute("DELETE FROM tender_review_items WHERE project_id=%s", (project_id,))
-                    for it in items:
-                        cur.execute(
-                            """
-                            INSERT INTO tender_review_items
-                              (id, project_id, dimension, tender_requirement, bid_response, result, remark, is_hard,
-                               tender_evidence_chunk_ids_json, bid_evidence_chunk_ids_json)
-                            VALUES
-                              (%s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb)
-                            """,
-                            (
-                                _id("rev"),
-                                project_id,
-                                it.get("dimension") or "其他",
-                                it.get("requirement_text") or "",
-                                it.get("response_text") or "",
-                                it.get("result") or "risk",
-                                it.get("remark") or "",
-                                bool(it.get("rigid", False)),
-                                json.dumps(it.get("tender_evidence_chunk_ids") or []),
-                                json.dumps(it.get("bid_evidence_chunk_ids") or []),
-                            ),
-                        )
+                    copy_rows(
+                        cur,
+                        "tender_review_items",
+                        ("id", "project_id", "dimension", "tender_requirement", "bid_response", "result",
+                         "remark", "is_hard", "tender_evidence_chunk_ids_json", "bid_evidence_chunk_ids_json"),
+                        rows,
+                    )
             # with transaction() 自动提交或回滚，无需手动 commit
 
     def list_review_items(self, project_id: str) -> List[Dict[str, Any]]:
@@ -1409,11 +1486,26 @@ class TenderDAO:
         if not requirements:
             return
         
+        rows = [
+            (
+                req["req_id"],
+                project_id,
+                outline_id,
+                req["req_type"],
+                req["title"],
+                req["content"],
+                encode_json(req.get("params")),
+                req.get("score_hint"),
+                req["must_level"],
+                req["source_chunk_ids"],
+                req.get("confidence", 0.8),
+            )
+            for req in requirements
+        ]
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                for req in requirements:
-                    cur.execute(
-                        """
+                cur.executemany(
+                    """
                         INSERT INTO tender_requirement_items
                           (req_id, project_id, outline_id, req_type, title, content,
                            params_json, score_hint, must_level, source_chunk_ids,
@@ -1429,21 +1521,9 @@ class TenderDAO:
                           source_chunk_ids=EXCLUDED.source_chunk_ids,
                           confidence=EXCLUDED.confidence,
                           updated_at=NOW()
-                        """,
-                        (
-                            req["req_id"],
-                            project_id,
-                            outline_id,
-                            req["req_type"],
-                            req["title"],
-                            req["content"],
-                            json.dumps(req.get("params")),
-                            req.get("score_hint"),
-                            req["must_level"],
-                            req["source_chunk_ids"],
-                            req.get("confidence", 0.8),
-                        ),
-                    )
+                    """,
+                    rows,
+                )
             conn.commit()
 
     def get_requirement_items(self, outline_id: str) -> List[Dict[str, Any]]:
@@ -1470,11 +1550,27 @@ class TenderDAO:
         if not nodes_flat:
             return
         
+        rows = [
+            (
+                node["node_id"],
+                outline_id,
+                project_id,
+                node.get("parent_id"),
+                node["level"],
+                node["order_no"],
+                node.get("numbering"),
+                node["title"],
+                node.get("summary"),
+                node.get("tags", []),
+                node.get("evidence_chunk_ids", []),
+                node.get("covered_req_ids", []),
+            )
+            for node in nodes_flat
+        ]
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                for node in nodes_flat:
-                    cur.execute(
-                        """
+                cur.executemany(
+                    """
                         INSERT INTO tender_semantic_outline_nodes
                           (node_id, outline_id, project_id, parent_id, level, order_no,
                            numbering, title, summary, tags, evidence_chunk_ids,
@@ -1491,22 +1587,9 @@ class TenderDAO:
                           evidence_chunk_ids=EXCLUDED.evidence_chunk_ids,
                           covered_req_ids=EXCLUDED.covered_req_ids,
                           updated_at=NOW()
-                        """,
-                        (
-                            node["node_id"],
-                            outline_id,
-                            project_id,
-                            node.get("parent_id"),
-                            node["level"],
-                            node["order_no"],
-                            node.get("numbering"),
-                            node["title"],
-                            node.get("summary"),
-                            node.get("tags", []),
-                            node.get("evidence_chunk_ids", []),
-                            node.get("covered_req_ids", []),
-                        ),
-                    )
+                    """,
+                    rows,
+                )
             conn.commit()
 
     def get_semantic_outline_nodes(self, outline_id: str) -> List[Dict[str, Any]]:
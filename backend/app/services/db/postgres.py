@@ -7,9 +7,10 @@ import time
 from typing import Optional
 
 from psycopg import Connection, connect
-from psycopg_pool import ConnectionPool
+from psycopg_pool import ConnectionPool, PoolTimeout
 
 from app.config import get_settings
+from app.core.telemetry import REGISTRY, counter, gauge, histogram
 
 settings = get_settings()
 
@@ -17,6 +18,40 @@ _pool: Optional[ConnectionPool] = None
 
 logger = logging.getLogger(__name__)
 
+DB_POOL_WAIT = histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to borrow a connection from the Postgres pool",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DB_POOL_TIMEOUTS = counter("db_pool_timeouts_total", "Pool checkouts that hit PoolTimeout")
+DB_POOL_STATE = gauge("db_pool_connections", "Postgres pool state at scrape time", ("state",))
+
+
+class InstrumentedConnectionPool(ConnectionPool):
+    """记录每次借连接的等待时间；pool.connection() 与 get_conn() 都经过 getconn()"""
+
+    def getconn(self, timeout: Optional[float] = None) -> Connection:
+        start = time.perf_counter()
+        try:
+            return super().getconn(timeout=timeout)
+        except PoolTimeout:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+def _collect_pool_state() -> None:
+    if _pool is None:
+        return
+    stats = _pool.get_stats()
+    DB_POOL_STATE.labels(state="size").set(stats.get("pool_size", 0))
+    DB_POOL_STATE.labels(state="available").set(stats.get("pool_available", 0))
+    DB_POOL_STATE.labels(state="waiting").set(stats.get("requests_waiting", 0))
+
+
+REGISTRY.add_collect_hook(_collect_pool_state)
+
 
 def _build_conninfo() -> str:
     if settings.POSTGRES_DSN:
@@ -33,7 +68,7 @@ def _build_conninfo() -> str:
 def _get_pool() -> ConnectionPool:
     global _pool
     if _pool is None:
-        _pool = ConnectionPool(
+        _pool = InstrumentedConnectionPool(
             conninfo=_build_conninfo(),
             min_size=settings.POSTGRES_POOL_MIN,
             max_size=settings.POSTGRES_POOL_MAX,
@@ -72,11 +107,8 @@ def init_db() -> None:
     _run_ddl()
 
 
-def _run_ddl() -> None:
-    pool = _get_pool()
-    ddl = """
-    CREATE EXTENSION IF NOT EXISTS pg_trgm;
-
+# 对话历史表结构（单独导出，供基准脚本在独立库中建表）
+CHAT_SCHEMA_DDL = """
     CREATE TABLE IF NOT EXISTS chat_sessions (
         id TEXT PRIMARY KEY,
         title TEXT,
@@ -99,8 +131,20 @@ def _run_ddl() -> None:
         created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
         metadata_json JSONB NOT NULL DEFAULT '{}'::jsonb
     );
-    CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id);
+    -- 游标分页与最近消息窗口：(updated_at, id) / (session_id, created_at, id) 复合索引，
+    -- 正反向扫描都走索引，页深与会话长度不影响单页耗时
+    CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created
+        ON chat_messages(session_id, created_at, id);
+    DROP INDEX IF EXISTS idx_chat_messages_session;
+"""
 
+
+def _run_ddl() -> None:
+    pool = _get_pool()
+    ddl = """
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+""" + CHAT_SCHEMA_DDL + """
     CREATE TABLE IF NOT EXISTS kb_categories (
         id TEXT PRIMARY KEY,
         name TEXT NOT NULL UNIQUE,
@@ -0,0 +1,447 @@
+"""
+流式 docx 正文扫描器
+直接用 lxml iterparse 读取 word/document.xml，逐个产出 w:body 的直接子元素，
+不构建 python-docx 的完整 DOM；处理完的元素立即释放，内存只与单个段落/表格大小相关。
+
+索引/文本语义与 python-docx 保持一致：
+- body_index：在 list(doc.element.body) 中的下标（包含 sectPr、sdt、书签等所有子元素）
+- 段落文本：同 Paragraph.text（w:r / w:hyperlink 直接子元素，w:tab->\\t，w:br->\\n 等）
+- 表格行：同 _Row.cells（gridSpan 重复单元格，vMerge=continue 取上一行同列单元格）
+- 样式：同 Paragraph.style / Table.style（未指定或无效时取默认样式），名称经 BabelFish 转换
+- heading_level：同 docx_style_utils.guess_heading_level（样式链 + w:outlineLvl 兜底）
+
+已经持有 python-docx Document 的调用方可用 scan_body_element 复用同一套逻辑，避免二次解析。
+"""
+from __future__ import annotations
+
+import os
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W = "{%s}" % W_NS
+_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_RT_STYLES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+
+W_BODY = _W + "body"
+W_P = _W + "p"
+W_TBL = _W + "tbl"
+W_R = _W + "r"
+W_HYPERLINK = _W + "hyperlink"
+W_TR = _W + "tr"
+W_TC = _W + "tc"
+
+_W_VAL = _W + "val"
+_W_TYPE = _W + "type"
+_RUN_CONTENT_TAGS = (_W + "br", _W + "cr", _W + "noBreakHyphen", _W + "ptab", _W + "t", _W + "tab")
+_ON_VALUES = ("1", "true", "on")
+
+# 与 docx_style_utils 保持一致：标题 1 / +标题1 / ＋标题1 / Heading 1
+_RE_HEADING_ZH = re.compile(r"(?:[\+＋]\s*)?标题\s*([1-9])")
+_RE_HEADING_EN = re.compile(r"Heading\s*([1-9])", re.I)
+
+# python-docx BabelFish：styles.xml 内部名 -> UI 名
+_UI_STYLE_NAMES = {
+    "caption": "Caption",
+    "footer": "Footer",
+    "header": "Header",
+    **{f"heading {i}": f"Heading {i}" for i in range(1, 10)},
+}
+
+KIND_PARAGRAPH = "paragraph"
+KIND_TABLE = "table"
+KIND_OTHER = "other"
+
+DocxSource = Union[bytes, str, "os.PathLike[str]", IO[bytes]]
+
+
+@dataclass
+class DocxBodyItem:
+    """w:body 的一个直接子元素"""
+    body_index: int
+    kind: str                                  # paragraph | table | other
+    tag: str                                   # 本地标签名（p / tbl / sectPr / sdt ...）
+    text: str = ""                             # 段落文本（未 strip）
+    style_id: Optional[str] = None
+    style_name: Optional[str] = None
+    heading_level: Optional[int] = None        # 1-based，同 guess_heading_level
+    num_id: Optional[int] = None
+    ilvl: Optional[int] = None
+    page_break_before: bool = False
+    has_border: bool = False
+    # 表格：rows[行][单元格] = 单元格内各段落文本
+    rows: List[List[Tuple[str, ...]]] = field(default_factory=list)
+    col_count: int = 0
+
+    @property
+    def is_paragraph(self) -> bool:
+        return self.kind == KIND_PARAGRAPH
+
+    @property
+    def is_table(self) -> bool:
+        return self.kind == KIND_TABLE
+
+    def cell_texts(self, max_rows: Optional[int] = None) -> List[List[str]]:
+        """表格单元格文本（同 python-docx cell.text：段落以换行拼接）"""
+        rows = self.rows if max_rows is None else self.rows[:max_rows]
+        return [["\n".join(cell) for cell in row] for row in rows]
+
+
+@dataclass
+class _StyleDef:
+    style_id: str
+    name: Optional[str]
+    type: str
+    based_on: Optional[str]
+    is_default: bool
+
+
+class DocxStyleTable:
+    """styles.xml 解析结果（每个文档只解析一次）"""
+
+    def __init__(self, styles_root: Optional[etree._Element]):
+        self._by_id: Dict[str, _StyleDef] = {}
+        self._defaults: Dict[str, _StyleDef] = {}
+        self._level_cache: Dict[str, Optional[int]] = {}
+        if styles_root is None:
+            return
+        for el in styles_root.iterchildren(_W + "style"):
+            name_el = el.find(_W + "name")
+            based_el = el.find(_W + "basedOn")
+            style = _StyleDef(
+                style_id=el.get(_W + "styleId") or "",
+                name=name_el.get(_W_VAL) if name_el is not None else None,
+                type=el.get(_W_TYPE) or "paragraph",
+                based_on=based_el.get(_W_VAL) if based_el is not None else None,
+                is_default=(el.get(_W + "default") or "").lower() in _ON_VALUES,
+            )
+            # 同 python-docx get_by_id：取第一个匹配的 styleId
+            self._by_id.setdefault(style.style_id, style)
+            # 同 python-docx default_for：同类型多个默认样式时取最后一个
+            if style.is_default:
+                self._defaults[style.type] = style
+
+    @classmethod
+    def from_xml(cls, styles_xml: Optional[bytes]) -> "DocxStyleTable":
+        if not styles_xml:
+            return cls(None)
+        return cls(etree.fromstring(styles_xml, etree.XMLParser(resolve_entities=False)))
+
+    @classmethod
+    def default(cls) -> "DocxStyleTable":
+        """文档缺少 styles 部件时，python-docx 会使用自带的默认样式"""
+        import docx
+
+        path = os.path.join(os.path.dirname(docx.__file__), "templates", "default-styles.xml")
+        with open(path, "rb") as f:
+            return cls.from_xml(f.read())
+
+    def resolve(self, style_id: Optional[str], style_type: str) -> Optional[_StyleDef]:
+        """同 python-docx part.get_style：找不到或类型不符时返回该类型默认样式"""
+        style = self._by_id.get(style_id) if style_id else None
+        if style is None or style.type != style_type:
+            return self._defaults.get(style_type)
+        return style
+
+    @staticmethod
+    def ui_name(style: Optional[_StyleDef]) -> Optional[str]:
+        if style is None or style.name is None:
+            return None
+        return _UI_STYLE_NAMES.get(style.name, style.name)
+
+    def heading_level(self, style: Optional[_StyleDef]) -> Optional[int]:
+        """沿 style / basedOn 链（最多 10 层）从样式名推断标题级别"""
+        if style is None:
+            return None
+        key = style.style_id
+        if key in self._level_cache:
+            return self._level_cache[key]
+
+        level = None
+        current: Optional[_StyleDef] = style
+        for _ in range(10):
+            if current is None:
+                break
+            name = self.ui_name(current) or ""
+            m = _RE_HEADING_ZH.search(name) or _RE_HEADING_EN.search(name)
+            if m:
+                level = int(m.group(1))
+                break
+            current = self._by_id.get(current.based_on) if current.based_on else None
+
+        self._level_cache[key] = level
+        return level
+
+
+# ==================== 元素 -> DocxBodyItem ====================
+
+def _local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _run_text(r) -> str:
+    parts = []
+    for child in r.iterchildren(*_RUN_CONTENT_TAGS):
+        tag = child.tag
+        if tag == _RUN_CONTENT_TAGS[4]:  # w:t
+            parts.append(child.text or "")
+        elif tag == _RUN_CONTENT_TAGS[5] or tag == _RUN_CONTENT_TAGS[3]:  # w:tab / w:ptab
+            parts.append("\t")
+        elif tag == _RUN_CONTENT_TAGS[0]:  # w:br
+            if (child.get(_W_TYPE) or "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif tag == _RUN_CONTENT_TAGS[1]:  # w:cr
+            parts.append("\n")
+        else:  # w:noBreakHyphen
+            parts.append("-")
+    return "".join(parts)
+
+
+def paragraph_text(p) -> str:
+    """同 python-docx Paragraph.text"""
+    parts = []
+    for child in p.iterchildren(W_R, W_HYPERLINK):
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        else:
+            for r in child.iterchildren(W_R):
+                parts.append(_run_text(r))
+    return "".join(parts)
+
+
+def _int_val(el) -> Optional[int]:
+    if el is None:
+        return None
+    try:
+        return int(el.get(_W_VAL))
+    except (TypeError, ValueError):
+        return None
+
+
+def _build_paragraph(p, index: int, styles: DocxStyleTable) -> DocxBodyItem:
+    item = DocxBodyItem(body_index=index, kind=KIND_PARAGRAPH, tag="p", text=paragraph_text(p))
+
+    ppr = p.find(_W + "pPr")
+    style_id = None
+    if ppr is not None:
+        pstyle = ppr.find(_W + "pStyle")
+        if pstyle is not None:
+            style_id = pstyle.get(_W_VAL)
+
+    style = styles.resolve(style_id, "paragraph")
+    item.style_id = style.style_id if style is not None else None
+    item.style_name = styles.ui_name(style)
+    item.heading_level = styles.heading_level(style)
+
+    if ppr is not None:
+        if item.heading_level is None:
+            outline = _int_val(ppr.find(_W + "outlineLvl"))
+            if outline is not None:
+                item.heading_level = outline + 1
+        numpr = ppr.find(_W + "numPr")
+        if numpr is not None:
+            item.num_id = _int_val(numpr.find(_W + "numId"))
+            item.ilvl = _int_val(numpr.find(_W + "ilvl"))
+        item.page_break_before = ppr.find(_W + "pageBreakBefore") is not None
+        item.has_border = ppr.find(_W + "pBdr") is not None
+    return item
+
+
+def _tc_span(tc) -> int:
+    tcpr = tc.find(_W + "tcPr")
+    if tcpr is None:
+        return 1
+    span = _int_val(tcpr.find(_W + "gridSpan"))
+    return span if span is not None else 1
+
+
+def _tc_is_continue(tc) -> bool:
+    tcpr = tc.find(_W + "tcPr")
+    if tcpr is None:
+        return False
+    vmerge = tcpr.find(_W + "vMerge")
+    if vmerge is None:
+        return False
+    return (vmerge.get(_W_VAL) or "continue") == "continue"
+
+
+def _grid_before(tr) -> int:
+    trpr = tr.find(_W + "trPr")
+    if trpr is None:
+        return 0
+    val = _int_val(trpr.find(_W + "gridBefore"))
+    return val if val is not None else 0
+
+
+def _build_table(tbl, index: int, styles: DocxStyleTable) -> DocxBodyItem:
+    item = DocxBodyItem(body_index=index, kind=KIND_TABLE, tag="tbl")
+
+    tblpr = tbl.find(_W + "tblPr")
+    style_id = None
+    if tblpr is not None:
+        tstyle = tblpr.find(_W + "tblStyle")
+        if tstyle is not None:
+            style_id = tstyle.get(_W_VAL)
+    style = styles.resolve(style_id, "table")
+    item.style_id = style.style_id if style is not None else None
+    item.style_name = styles.ui_name(style)
+
+    grid = tbl.find(_W + "tblGrid")
+    item.col_count = len(grid.findall(_W + "gridCol")) if grid is not None else 0
+
+    # 上一行：grid offset -> 该位置 w:tc 展开后的单元格（vMerge=continue 递归引用）
+    prev_row_cells: Dict[int, List[Tuple[str, ...]]] = {}
+    for tr in tbl.iterchildren(W_TR):
+        row: List[Tuple[str, ...]] = []
+        row_cells: Dict[int, List[Tuple[str, ...]]] = {}
+        offset = _grid_before(tr)
+        for tc in tr.iterchildren(W_TC):
+            span = _tc_span(tc)
+            if _tc_is_continue(tc):
+                # 上一行同列不存在起始单元格时（不合规文档）按空单元格处理
+                cells = prev_row_cells.get(offset) or [()]
+            else:
+                cell = tuple(paragraph_text(p) for p in tc.iterchildren(W_P))
+                cells = [cell] * span
+            row.extend(cells)
+            row_cells[offset] = cells
+            offset += span
+        item.rows.append(row)
+        prev_row_cells = row_cells
+    return item
+
+
+def build_body_item(element, index: int, styles: DocxStyleTable) -> DocxBodyItem:
+    """把单个 w:body 子元素转换为 DocxBodyItem"""
+    tag = element.tag
+    if tag == W_P:
+        return _build_paragraph(element, index, styles)
+    if tag == W_TBL:
+        return _build_table(element, index, styles)
+    return DocxBodyItem(body_index=index, kind=KIND_OTHER, tag=_local_name(tag))
+
+
+# ==================== 包结构解析 ====================
+
+def _rels_targets(zf: zipfile.ZipFile, rels_name: str, base_dir: str) -> Dict[str, str]:
+    """读取 .rels，返回 {relType: 部件路径}（同类型取第一个）"""
+    try:
+        root = etree.fromstring(zf.read(rels_name), etree.XMLParser(resolve_entities=False))
+    except KeyError:
+        return {}
+    targets: Dict[str, str] = {}
+    for rel in root.iterchildren(_REL_NS + "Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target") or ""
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join(base_dir, target))
+        targets.setdefault(rel.get("Type") or "", path)
+    return targets
+
+
+def _resolve_parts(zf: zipfile.ZipFile) -> Tuple[str, Optional[str]]:
+    """定位主文档部件与样式部件（默认 word/document.xml / word/styles.xml）"""
+    document_name = _rels_targets(zf, "_rels/.rels", "").get(_RT_OFFICE_DOCUMENT, "word/document.xml")
+    base_dir, file_name = posixpath.split(document_name)
+    rels_name = posixpath.join(base_dir, "_rels", file_name + ".rels")
+    styles_name = _rels_targets(zf, rels_name, base_dir).get(_RT_STYLES)
+    return document_name, styles_name
+
+
+def _open_zip(source: DocxSource) -> zipfile.ZipFile:
+    if isinstance(source, (bytes, bytearray)):
+        return zipfile.ZipFile(BytesIO(source))
+    return zipfile.ZipFile(source)
+
+
+def load_style_table(zf: zipfile.ZipFile, styles_name: Optional[str]) -> DocxStyleTable:
+    if styles_name:
+        try:
+            return DocxStyleTable.from_xml(zf.read(styles_name))
+        except KeyError:
+            pass
+    return DocxStyleTable.default()
+
+
+# ==================== 扫描入口 ====================
+
+def scan_docx_body(source: DocxSource) -> Iterator[DocxBodyItem]:
+    """
+    流式扫描 docx 正文
+
+    Args:
+        source: docx 字节 / 文件路径 / 二进制文件对象
+
+    Yields:
+        DocxBodyItem（按 body_index 递增，覆盖 w:body 的全部直接子元素）
+    """
+    with _open_zip(source) as zf:
+        document_name, styles_name = _resolve_parts(zf)
+        styles = load_style_table(zf, styles_name)
+
+        with zf.open(document_name) as stream:
+            # remove_blank_text 与 python-docx 的解析器保持一致
+            context = etree.iterparse(
+                stream,
+                events=("start", "end"),
+                remove_blank_text=True,
+                resolve_entities=False,
+                huge_tree=True,
+            )
+            body = None
+            depth = 0        # 相对 w:body 的深度
+            index = 0
+            for event, elem in context:
+                if body is None:
+                    if event == "start" and elem.tag == W_BODY:
+                        body = elem
+                    continue
+
+                if event == "start":
+                    depth += 1
+                    continue
+
+                if elem is body:
+                    break
+                depth -= 1
+                if depth != 0:
+                    continue
+
+                # body 直接子元素闭合：转换后立即释放
+                yield build_body_item(elem, index, styles)
+                index += 1
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del body[0]
+
+
+def scan_body_element(body, styles: DocxStyleTable) -> Iterator[DocxBodyItem]:
+    """
+    扫描已加载的 w:body 元素（如 python-docx 的 doc.element.body）
+
+    Args:
+        body: w:body lxml 元素
+        styles: 样式表（可用 styles_of_document 从 Document 构建）
+    """
+    for index, element in enumerate(body):
+        yield build_body_item(element, index, styles)
+
+
+def styles_of_document(doc) -> DocxStyleTable:
+    """从 python-docx Document 复用已解析的 styles 元素"""
+    try:
+        return DocxStyleTable(doc.styles.element)
+    except Exception:
+        return DocxStyleTable(None)
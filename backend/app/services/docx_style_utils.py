@@ -8,7 +8,7 @@ from __future__ import annotations
 import re
 from typing import Optional
 
-from docx.oxml.ns import nsmap
+from docx.oxml.ns import qn
 
 # 兼容：标题 1 / +标题1 / +标题 1 / ＋标题1
 _RE_HEADING_ZH = re.compile(r"(?:[\+＋]\s*)?标题\s*([1-9])")
@@ -41,12 +41,16 @@ def guess_heading_level(paragraph) -> Optional[int]:
         pass
 
     # 2) XML: w:outlineLvl/@w:val (0-based)
+    # 注意：python-docx 的 oxml 元素重写了 xpath()，不接受 namespaces 参数，这里用 find + qn
     try:
-        p = getattr(paragraph, "_p", None) or getattr(paragraph, "_element", None)
+        p = getattr(paragraph, "_p", None)
+        if p is None:
+            p = getattr(paragraph, "_element", None)
         if p is not None:
-            vals = p.xpath("./w:pPr/w:outlineLvl/@w:val", namespaces=nsmap)
-            if vals:
-                return int(vals[0]) + 1
+            ppr = p.find(qn("w:pPr"))
+            lvl = ppr.find(qn("w:outlineLvl")) if ppr is not None else None
+            if lvl is not None:
+                return int(lvl.get(qn("w:val"))) + 1
     except Exception:
         pass
 
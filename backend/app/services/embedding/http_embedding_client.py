@@ -6,11 +6,14 @@ from urllib.parse import urljoin
 
 import httpx
 
+from app.core.telemetry import counter, span
 from app.schemas.embedding_provider import EmbeddingProviderStored, EmbeddingProviderUpdate
 from app.services.embedding_provider_store import get_embedding_store
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_TEXTS = counter("embedding_texts_total", "Texts sent to the embedding service", ("model",))
+
 _EMB_PROBED = False
 _SPARSE_WARNED = False
 _SPARSE_CANDIDATE_KEYS: Tuple[str, ...] = (
@@ -151,39 +154,41 @@ async def embed_texts(
     detected_dim: Optional[int] = None
     sparse_missing_overall = False
 
-    async with httpx.AsyncClient(follow_redirects=True, timeout=timeout) as client:
-        for batch in batches:
-            payload: Dict[str, Any] = {
-                "model": cfg.model,
-                "input": batch,
-            }
-            if use_hybrid_payload:
-                payload.update(
-                    {
-                        "texts": batch,
-                        "output_dense": cfg.output_dense,
-                        "output_sparse": cfg.output_sparse,
-                        "sparse_format": cfg.sparse_format,
-                    }
-                )
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            _maybe_probe_response(data)
-            parsed, dense_dim, sparse_missing = _parse_results(data, cfg.output_sparse)
-            if len(parsed) != len(batch):
-                raise ValueError(
-                    f"Embedding 返回数量不匹配，期望 {len(batch)} 条，实际 {len(parsed)} 条"
-                )
-            results.extend(parsed)
-            if dense_dim is None:
-                for item in parsed:
-                    if item.get("dense") is not None:
-                        dense_dim = len(item["dense"])  # type: ignore[index]
-                        break
-            if dense_dim:
-                detected_dim = dense_dim
-            sparse_missing_overall = sparse_missing_overall or sparse_missing
+    with span("embedding.embed", model=cfg.model, texts=len(texts), batches=len(batches)):
+        async with httpx.AsyncClient(follow_redirects=True, timeout=timeout) as client:
+            for batch in batches:
+                payload: Dict[str, Any] = {
+                    "model": cfg.model,
+                    "input": batch,
+                }
+                if use_hybrid_payload:
+                    payload.update(
+                        {
+                            "texts": batch,
+                            "output_dense": cfg.output_dense,
+                            "output_sparse": cfg.output_sparse,
+                            "sparse_format": cfg.sparse_format,
+                        }
+                    )
+                response = await client.post(url, headers=headers, json=payload)
+                response.raise_for_status()
+                data = response.json()
+                _maybe_probe_response(data)
+                parsed, dense_dim, sparse_missing = _parse_results(data, cfg.output_sparse)
+                if len(parsed) != len(batch):
+                    raise ValueError(
+                        f"Embedding 返回数量不匹配，期望 {len(batch)} 条，实际 {len(parsed)} 条"
+                    )
+                results.extend(parsed)
+                if dense_dim is None:
+                    for item in parsed:
+                        if item.get("dense") is not None:
+                            dense_dim = len(item["dense"])  # type: ignore[index]
+                            break
+                if dense_dim:
+                    detected_dim = dense_dim
+                sparse_missing_overall = sparse_missing_overall or sparse_missing
+    EMBEDDING_TEXTS.labels(model=cfg.model).inc(len(texts))
 
     if detected_dim:
         try:
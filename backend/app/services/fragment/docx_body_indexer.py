@@ -4,15 +4,9 @@ DocxBodyIndexer - Word 文档结构索引器
 """
 import re
 from dataclasses import dataclass
-from io import BytesIO
 from typing import List, Optional
 
-from docx import Document
-from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl
-from docx.text.paragraph import Paragraph
-
-from app.services.docx_style_utils import guess_heading_level
+from app.services.docx_body_scanner import DocxBodyItem, scan_docx_body
 
 
 @dataclass
@@ -41,31 +35,31 @@ class DocxBodyIndexer:
         Returns:
             章节标题列表
         """
-        doc = Document(BytesIO(docx_bytes))
-        body_elements = list(doc.element.body)
-        
         headings: List[HeadingNode] = []
+        total_elements = 0
         
-        for idx, element in enumerate(body_elements):
-            if isinstance(element, CT_P):
-                para = Paragraph(element, doc)
-                heading_info = self._extract_heading_info(para)
-                
-                if heading_info:
-                    title, level = heading_info
-                    headings.append(HeadingNode(
-                        title=title,
-                        level=level,
-                        start_index=idx,
-                        end_index_candidate=-1  # 稍后计算
-                    ))
+        # 流式扫描：bodyIndex 与 list(doc.element.body) 的下标一致
+        for item in scan_docx_body(docx_bytes):
+            total_elements = item.body_index + 1
+            if not item.is_paragraph:
+                continue
+            heading_info = self._extract_heading_info(item)
+            
+            if heading_info:
+                title, level = heading_info
+                headings.append(HeadingNode(
+                    title=title,
+                    level=level,
+                    start_index=item.body_index,
+                    end_index_candidate=-1  # 稍后计算
+                ))
         
         # 计算每个标题的结束索引
-        self._compute_end_indices(headings, len(body_elements))
+        self._compute_end_indices(headings, total_elements)
         
         return headings
     
-    def _extract_heading_info(self, para: Paragraph) -> Optional[tuple[str, int]]:
+    def _extract_heading_info(self, para: DocxBodyItem) -> Optional[tuple[str, int]]:
         """
         从段落中提取标题信息
         
@@ -76,8 +70,8 @@ class DocxBodyIndexer:
         if not text:
             return None
         
-        # 方法1: 使用大纲级别
-        level = guess_heading_level(para)
+        # 方法1: 使用大纲级别（扫描时已按 guess_heading_level 规则推断）
+        level = para.heading_level
         if level is not None:
             return (text, level)
         
@@ -99,19 +93,18 @@ class DocxBodyIndexer:
         
         return None
     
-    def _get_outline_level(self, para: Paragraph) -> Optional[int]:
+    def _get_outline_level(self, para: DocxBodyItem) -> Optional[int]:
         """获取段落的大纲级别"""
         # 兼容保留：不再直接访问 pPr.outlineLvl（某些模板会 AttributeError）
-        lvl = guess_heading_level(para)
+        lvl = para.heading_level
         return (lvl - 1) if lvl is not None else None
     
-    def _get_heading_style_level(self, para: Paragraph) -> Optional[int]:
+    def _get_heading_style_level(self, para: DocxBodyItem) -> Optional[int]:
         """从样式名称中提取标题级别"""
-        if not para.style:
+        style_name = para.style_name or ""
+        if not style_name:
             return None
         
-        style_name = para.style.name or ""
-        
         # 匹配 "Heading 1", "标题 1" 等
         patterns = [
             (r'Heading\s*(\d+)', 1),
@@ -5,18 +5,12 @@ TenderSampleFragmentExtractor - 招标书范本片段抽取器
 import os
 import logging
 import json
-from io import BytesIO
 from typing import Any, Dict, List, Optional, Tuple
 
 from app.services.dao.tender_dao import TenderDAO
 from app.services.fragment.fragment_matcher import FragmentTitleMatcher
 from app.services.fragment.fragment_type import FragmentType
-from docx import Document
-from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl
-from docx.text.paragraph import Paragraph
-from docx.table import Table
-from app.services.docx_style_utils import guess_heading_level
+from app.services.docx_body_scanner import DocxBodyItem, scan_docx_body
 
 from app.services.fragment.llm_span_locator import TenderSampleSpanLocator, TenderSampleSpan
 from app.services.fragment.pdf_blocks import extract_pdf_body_items
@@ -33,19 +27,13 @@ class TenderSampleFragmentExtractor:
         self.locator = TenderSampleSpanLocator()
     
     # ==================== body 扫描（段落/表格） ====================
-    def _para_style_name(self, para: Paragraph) -> str:
-        try:
-            return (para.style.name or "") if para.style else ""
-        except Exception:
-            return ""
+    def _para_style_name(self, para: DocxBodyItem) -> str:
+        return para.style_name or ""
     
-    def _table_style_name(self, tbl: Table) -> str:
-        try:
-            return (tbl.style.name or "") if getattr(tbl, "style", None) else ""
-        except Exception:
-            return ""
+    def _table_style_name(self, tbl: DocxBodyItem) -> str:
+        return tbl.style_name or ""
     
-    def _table_text_preview(self, tbl: Table, max_rows: int = 8, max_cells: int = 6, max_chars: int = 200) -> str:
+    def _table_text_preview(self, tbl: DocxBodyItem, max_rows: int = 8, max_cells: int = 6, max_chars: int = 200) -> str:
         """
         表格文本预览：
         - 取前 max_rows 行
@@ -53,23 +41,20 @@ class TenderSampleFragmentExtractor:
         - 单元格内取所有段落拼接
         """
         rows = []
-        try:
-            for r in tbl.rows[:max_rows]:
-                cells_txt = []
-                for c in r.cells[:max_cells]:
-                    parts = []
-                    for p in c.paragraphs:
-                        t = (p.text or "").strip()
-                        if t:
-                            parts.append(t)
-                    ct = " ".join(parts).strip()
-                    if ct:
-                        cells_txt.append(ct)
-                rt = " | ".join(cells_txt).strip()
-                if rt:
-                    rows.append(rt)
-        except Exception:
-            pass
+        for r in tbl.rows[:max_rows]:
+            cells_txt = []
+            for cell_paragraphs in r[:max_cells]:
+                parts = []
+                for t in cell_paragraphs:
+                    t = (t or "").strip()
+                    if t:
+                        parts.append(t)
+                ct = " ".join(parts).strip()
+                if ct:
+                    cells_txt.append(ct)
+            rt = " | ".join(cells_txt).strip()
+            if rt:
+                rows.append(rt)
         txt = "\n".join(rows).strip()
         if len(txt) > max_chars:
             txt = txt[:max_chars]
@@ -89,38 +74,28 @@ class TenderSampleFragmentExtractor:
         x = re.sub(r"[：:。．\.,，;；\(\)（）\[\]【】《》<>]", "", x)
         return x
 
-    def _extract_body_items(self, doc):
+    def _extract_body_items(self, scanned: List[DocxBodyItem]):
         """
         以 doc.element.body 的真实索引为 bodyIndex（与 LLM span 索引体系一致）
         返回结构：[{bodyIndex, type, text/styleName, tableData?}, ...]
         """
         items = []
-        body_elements = list(doc.element.body)
 
-        for idx, el in enumerate(body_elements):
-            if isinstance(el, CT_P):
-                p = Paragraph(el, doc)
-                text = (p.text or "").strip()
+        for it in scanned:
+            if it.is_paragraph:
                 items.append({
-                    "bodyIndex": idx,
+                    "bodyIndex": it.body_index,
                     "type": "paragraph",
-                    "styleName": self._para_style_name(p),
-                    "text": text,
+                    "styleName": self._para_style_name(it),
+                    "text": it.text.strip(),
                 })
-            elif isinstance(el, CT_Tbl):
-                t = Table(el, doc)
-                rows = []
-                try:
-                    for r in t.rows:
-                        rows.append([(c.text or "").strip() for c in r.cells])
-                except Exception:
-                    rows = []
+            elif it.is_table:
                 items.append({
-                    "bodyIndex": idx,
+                    "bodyIndex": it.body_index,
                     "type": "table",
-                    "styleName": self._table_style_name(t),
-                    "tableData": rows,
-                    "text": self._table_text_preview(t, max_rows=8, max_cells=6, max_chars=200),
+                    "styleName": self._table_style_name(it),
+                    "tableData": [[c.strip() for c in row] for row in it.cell_texts()],
+                    "text": self._table_text_preview(it, max_rows=8, max_cells=6, max_chars=200),
                 })
 
         return items
@@ -416,13 +391,12 @@ class TenderSampleFragmentExtractor:
         self._last_rules_diag["heads_found"] = len(heads)
         return fragments
 
-    def _scan_body_elements(self, doc: Document) -> Tuple[List[Dict[str, Any]], List[int]]:
+    def _scan_body_elements(self, scanned: List[DocxBodyItem]) -> Tuple[List[Dict[str, Any]], List[int]]:
         """
-        直接遍历 doc.element.body 的 CT_P / CT_Tbl，生成 elements_meta + anchors。
+        遍历流式扫描得到的段落 / 表格（bodyIndex 同 doc.element.body），生成 elements_meta + anchors。
         elements_meta: {i,t,txt,style,h}
         anchors: 命中关键词的 body index 列表
         """
-        body_elements = list(doc.element.body)
         elements_meta: List[Dict[str, Any]] = []
         anchors: List[int] = []
 
@@ -444,14 +418,14 @@ class TenderSampleFragmentExtractor:
         import re
         appendix_re = re.compile("|".join(appendix_patterns))
 
-        for idx, el in enumerate(body_elements):
-            if isinstance(el, CT_P):
-                para = Paragraph(el, doc)
-                text = (para.text or "").strip()
+        for el in scanned:
+            idx = el.body_index
+            if el.is_paragraph:
+                text = el.text.strip()
                 if not text:
                     continue
-                style = self._para_style_name(para)
-                lvl = guess_heading_level(para)
+                style = self._para_style_name(el)
+                lvl = el.heading_level
                 meta = {
                     "i": idx,
                     "t": "P",
@@ -464,12 +438,11 @@ class TenderSampleFragmentExtractor:
                 norm = self._normalize_anchor_text(text)
                 if any(self._normalize_anchor_text(k) in norm for k in keywords) or appendix_re.search(norm):
                     anchors.append(idx)
-            elif isinstance(el, CT_Tbl):
-                tbl = Table(el, doc)
-                text = self._table_text_preview(tbl, max_rows=8, max_cells=6, max_chars=200)
+            elif el.is_table:
+                text = self._table_text_preview(el, max_rows=8, max_cells=6, max_chars=200)
                 if not text:
                     continue
-                style = self._table_style_name(tbl)
+                style = self._table_style_name(el)
                 meta = {
                     "i": idx,
                     "t": "T",
@@ -612,7 +585,7 @@ class TenderSampleFragmentExtractor:
         ext = os.path.splitext(tender_docx_path or "")[1].lower().strip()
 
         # ===== 1) 解析输入为"统一的 body_items" =====
-        doc = None
+        scanned: List[DocxBodyItem] = []
         pdf_diag = None
 
         if ext == ".pdf":
@@ -692,14 +665,11 @@ class TenderSampleFragmentExtractor:
             }
 
         else:
-            with open(tender_docx_path, "rb") as f:
-                docx_bytes = f.read()
-            doc = Document(BytesIO(docx_bytes))
-            body_elements = list(doc.element.body)
-            n_total = len(body_elements)
+            # 流式扫描一次，锚点识别与规则回退共用同一份结果
+            scanned = list(scan_docx_body(tender_docx_path))
+            n_total = len(scanned)
 
-            # docx 的原逻辑保持不变
-            elements_meta, anchors = self._scan_body_elements(doc)
+            elements_meta, anchors = self._scan_body_elements(scanned)
 
         logger.info(
             f"[samples] extractor: input parsed. project_id={project_id}, ext={ext}, "
@@ -763,9 +733,9 @@ class TenderSampleFragmentExtractor:
         fallback_spans: List[TenderSampleSpan] = []
         rules_fragments = []
         if not valid_spans:
-            # 对 DOCX：用 _extract_body_items(doc)
+            # 对 DOCX：用 _extract_body_items(scanned)
             try:
-                body_items = self._extract_body_items(doc)
+                body_items = self._extract_body_items(scanned)
                 logger.info(f"[samples] extractor: body_items extracted for rules. project_id={project_id}, count={len(body_items)}")
             except Exception as e:
                 logger.warning(f"[samples] extractor: _extract_body_items failed: {type(e).__name__}: {str(e)}. project_id={project_id}")
@@ -5,6 +5,8 @@ import tempfile
 import uuid
 from pathlib import Path
 
+from app.core.telemetry import span
+
 
 def _pick_soffice() -> str:
     for c in ["soffice", "libreoffice"]:
@@ -15,13 +17,17 @@ def _pick_soffice() -> str:
 
 
 def _run(cmd: list[str], env: dict) -> subprocess.CompletedProcess:
-    return subprocess.run(
-        cmd,
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+    target = cmd[cmd.index("--convert-to") + 1] if "--convert-to" in cmd else ""
+    with span("office.soffice", convert_to=target.split(":")[0]) as stage:
+        proc = subprocess.run(
+            cmd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        stage.set_attribute("returncode", proc.returncode)
+        return proc
 
 
 def _newest(outdir: Path, exts: tuple[str, ...]) -> Path | None:
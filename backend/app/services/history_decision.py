@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 from dataclasses import dataclass
 import logging
@@ -90,9 +91,36 @@ def _dedupe_queries(profile: CaseProfile, raw_question: str) -> List[str]:
             continue
         if value not in cleaned:
             cleaned.append(value)
+    # 原始问题始终保留（占最后一个名额），其检索结果在画像解析期间已提前发起
+    raw_value = (raw_question or "").strip()
+    if raw_value and raw_value not in cleaned[:6]:
+        return [*cleaned[:5], raw_value]
     return cleaned[:6]
 
 
+async def _retrieve_case_hits(
+    query: str,
+    kb_ids: Optional[List[str]],
+    embedding_provider: EmbeddingProviderStored,
+    dense_topk: int,
+    lexical_topk: int,
+    final_topk: int,
+    request_id: Optional[str],
+) -> List[dict]:
+    hits, _ = await retrieve(
+        query=query,
+        kb_ids=kb_ids,
+        kb_categories=["history_case"],
+        anchors=[],
+        embedding_provider=embedding_provider,
+        dense_topk=dense_topk,
+        lexical_topk=lexical_topk,
+        final_topk=final_topk,
+        request_id=request_id,
+    )
+    return hits
+
+
 async def _retrieve_case_chunks(
     queries: List[str],
     kb_ids: Optional[List[str]],
@@ -101,20 +129,22 @@ async def _retrieve_case_chunks(
     lexical_topk: int,
     final_topk: int,
     request_id: Optional[str],
+    prefetched: Optional[dict[str, asyncio.Task[List[dict]]]] = None,
 ) -> List[dict]:
-    aggregated: dict[str, dict] = {}
-    for query in queries:
-        hits, _ = await retrieve(
-            query=query,
-            kb_ids=kb_ids,
-            kb_categories=["history_case"],
-            anchors=[],
-            embedding_provider=embedding_provider,
-            dense_topk=dense_topk,
-            lexical_topk=lexical_topk,
-            final_topk=final_topk,
-            request_id=request_id,
+    """
+    各查询并发检索（prefetched 中已提前发起的直接复用），按查询顺序合并
+
+    同一文档取最高分，同分时先出现的查询优先，结果与各检索的完成先后无关。
+    """
+    prefetched = prefetched or {}
+    hit_lists = await asyncio.gather(*(
+        prefetched[query] if query in prefetched else _retrieve_case_hits(
+            query, kb_ids, embedding_provider, dense_topk, lexical_topk, final_topk, request_id
         )
+        for query in queries
+    ))
+    aggregated: dict[str, dict] = {}
+    for hits in hit_lists:
         for hit in hits:
             doc_id = hit.get("doc_id")
             if not doc_id:
@@ -192,10 +222,9 @@ def _build_case_records(
     return records, case_chunks
 
 
-async def _retrieve_support_chunks(
+async def _retrieve_support_hits(
     raw_question: str,
     kb_ids: Optional[List[str]],
-    skip_doc_ids: set[str],
     embedding_provider: EmbeddingProviderStored,
     dense_topk: int,
     lexical_topk: int,
@@ -213,6 +242,14 @@ async def _retrieve_support_chunks(
         final_topk=final_topk,
         request_id=request_id,
     )
+    return hits
+
+
+def _select_support_chunks(
+    hits: List[dict],
+    skip_doc_ids: set[str],
+    final_topk: int,
+) -> List[dict]:
     support: dict[str, dict] = {}
     for hit in hits:
         doc_id = hit.get("doc_id") or hit.get("chunk_id")
@@ -277,6 +314,12 @@ def _build_prompt_blocks(
     return prompt_body, constraints_text
 
 
+def _discard_task(task: asyncio.Task) -> None:
+    if not task.done():
+        task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
 async def generate_history_decision_answer(
     raw_question: str,
     history_messages: Sequence[Message],
@@ -291,33 +334,46 @@ async def generate_history_decision_answer(
     request_id: Optional[str] = None,
 ) -> HistoryDecisionResult:
     req_logger = get_request_logger(logger, request_id)
-    profile = await parse_to_case_profile(raw_question, call_profile_llm, request_id)
-    queries = _dedupe_queries(profile, raw_question)
-
-    case_hits = await _retrieve_case_chunks(
-        queries,
+    raw_query = (raw_question or "").strip()
+    # 画像解析（LLM 调用）期间提前检索原始问题：它一定在最终查询列表中，补充资料检索也只依赖原始问题
+    speculative: dict[str, asyncio.Task[List[dict]]] = {}
+    if raw_query:
+        speculative[raw_query] = asyncio.create_task(_retrieve_case_hits(
+            raw_query, kb_ids, embedding_provider, dense_topk, lexical_topk, final_topk, request_id
+        ))
+    support_task = asyncio.create_task(_retrieve_support_hits(
+        raw_question,
         kb_ids,
         embedding_provider,
-        dense_topk,
-        lexical_topk,
-        final_topk,
-        request_id,
-    )
-    case_records, case_chunks = _build_case_records(case_hits[:final_topk], profile)
-    skip_docs = {record.id for record in case_records}
+        dense_topk=max(8, dense_topk // 2),
+        lexical_topk=max(8, lexical_topk // 2),
+        final_topk=final_topk,
+        request_id=request_id,
+    ))
+    try:
+        profile = await parse_to_case_profile(raw_question, call_profile_llm, request_id)
+        queries = _dedupe_queries(profile, raw_question)
 
-    support_chunks = []
-    if len(case_chunks) < final_topk:
-        support_chunks = await _retrieve_support_chunks(
-            raw_question,
+        case_hits = await _retrieve_case_chunks(
+            queries,
             kb_ids,
-            skip_docs,
             embedding_provider,
-            dense_topk=max(8, dense_topk // 2),
-            lexical_topk=max(8, lexical_topk // 2),
-            final_topk=final_topk,
-            request_id=request_id,
+            dense_topk,
+            lexical_topk,
+            final_topk,
+            request_id,
+            prefetched=speculative,
         )
+        case_records, case_chunks = _build_case_records(case_hits[:final_topk], profile)
+        skip_docs = {record.id for record in case_records}
+
+        support_chunks = []
+        if len(case_chunks) < final_topk:
+            support_chunks = _select_support_chunks(await support_task, skip_docs, final_topk)
+    finally:
+        # 未用上的预检索直接取消，异常也不再向外抛
+        for task in (*speculative.values(), support_task):
+            _discard_task(task)
 
     prompt_body, _ = _build_prompt_blocks(profile, case_records, len(case_chunks), support_chunks)
     user_prompt = f"""
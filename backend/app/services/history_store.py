@@ -24,6 +24,22 @@ def get_session(session_id: str):
     return chat_dao.get_session_with_messages(session_id)
 
 
+def get_session_meta(session_id: str):
+    return chat_dao.get_session(session_id)
+
+
+def get_session_window(session_id: str, limit: int):
+    return chat_dao.get_session_with_recent_messages(session_id, limit)
+
+
+def list_sessions_page(cursor: Optional[str] = None, limit: int = 20):
+    return chat_dao.list_sessions_after(cursor, limit)
+
+
+def list_messages(session_id: str, limit: int = 50, before: Optional[str] = None):
+    return chat_dao.list_messages(session_id, limit, before)
+
+
 def update_session_kb_ids(session_id: str, kb_ids: List[str]):
     chat_dao.update_session_kb_ids(session_id, kb_ids)
 
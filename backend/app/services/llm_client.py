@@ -2,6 +2,7 @@ import asyncio
 import json
 import os
 import re
+import time
 from dataclasses import dataclass
 from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import httpx
@@ -11,6 +12,7 @@ from ..schemas.chat import Message
 from ..schemas.llm_config import LLMModelStored
 from ..services.llm_model_store import get_llm_store
 from app.config import get_settings
+from app.core.telemetry import counter, current_span, histogram, traced
 from ..utils.llm_endpoints import (
     normalize_base_url,
     normalize_endpoint_path,
@@ -20,6 +22,41 @@ from ..utils.llm_endpoints import (
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+LLM_TOKENS = counter("llm_tokens_total", "Tokens reported by the LLM service", ("model", "type"))
+LLM_FIRST_TOKEN = histogram(
+    "llm_time_to_first_token_seconds",
+    "Latency from request start to the first streamed chunk",
+    ("model",),
+)
+
+
+def record_llm_usage(model_name: str, parsed: Optional[dict]) -> None:
+    """
+    累计 LLM 响应中的 token 数并写入当前 span
+
+    支持 OpenAI 兼容的 usage（prompt_tokens/completion_tokens）与 Ollama 的 prompt_eval_count/eval_count；
+    响应未携带用量时不记录（不做估算）。
+    """
+    if not isinstance(parsed, dict):
+        return
+    usage = parsed.get("usage")
+    if isinstance(usage, dict):
+        counts = {
+            "prompt": usage.get("prompt_tokens", usage.get("input_tokens")),
+            "completion": usage.get("completion_tokens", usage.get("output_tokens")),
+        }
+    else:
+        counts = {"prompt": parsed.get("prompt_eval_count"), "completion": parsed.get("eval_count")}
+    active = current_span()
+    if active is not None:
+        active.set_attribute("model", model_name)
+    for kind, value in counts.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            continue
+        LLM_TOKENS.labels(model=model_name, type=kind).inc(value)
+        if active is not None:
+            active.set_attribute(f"{kind}_tokens", int(value))
+
 
 @dataclass
 class LLMProfile:
@@ -96,6 +133,7 @@ def select_llm_profile(llm_key: str | None) -> LLMProfile:
     return profiles[default_key]
 
 
+@traced("llm.request", kind="json")
 def llm_json(
     prompt: str,
     model_id: Optional[str] = None,
@@ -151,6 +189,7 @@ def llm_json(
             response = client.post(full_url, headers=headers, json=payload)
             response.raise_for_status()
             result = response.json()
+        record_llm_usage(profile.model, result)
         
         # 提取内容
         content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
@@ -236,6 +275,7 @@ def _apply_generation_overrides(
             payload[key] = val
 
 
+@traced("llm.request", kind="chat")
 async def generate_answer_with_llm(
     system_prompt: str,
     user_message: str,
@@ -298,6 +338,7 @@ async def generate_answer_with_llm(
         raise HTTPException(status_code=502, detail="LLM 请求失败，请检查模型服务") from exc
 
     answer, parsed = _parse_llm_response_text(resp.text)
+    record_llm_usage(profile.model, parsed)
     if answer:
         return answer
     return f"[LLM 返回格式异常] {parsed or resp.text[:400]}"
@@ -341,6 +382,7 @@ def _prepare_llm_request(
     return url, request_kind, headers, payload, timeout, messages, token, has_token
 
 
+@traced("llm.request", kind="chat")
 async def generate_answer_with_model(
     system_prompt: str,
     user_message: str,
@@ -413,6 +455,7 @@ async def generate_answer_with_model(
                     raise
 
                 answer, parsed = _parse_llm_response_text(resp.text)
+                record_llm_usage(model.model, parsed)
 
                 if (
                     request_kind.startswith("ollama")
@@ -435,6 +478,7 @@ async def generate_answer_with_model(
         raise HTTPException(status_code=502, detail="LLM 请求失败，请检查模型服务") from exc
 
 
+@traced("llm.request", kind="stream")
 async def stream_answer_with_model(
     system_prompt: str,
     user_message: str,
@@ -462,9 +506,12 @@ async def stream_answer_with_model(
         payload["stream"] = True
 
     buffer: List[str] = []
+    started = time.perf_counter()
 
     async def _consume_chunk(text: str) -> None:
         if text:
+            if not buffer:
+                LLM_FIRST_TOKEN.labels(model=model.model).observe(time.perf_counter() - started)
             buffer.append(text)
             await on_token(text)
 
@@ -499,6 +546,11 @@ async def stream_answer_with_model(
                         chunk_text = cleaned
                     else:
                         chunk_text = _extract_text_from_chunk(chunk_obj)
+                        # 用量只出现在末尾块（OpenAI include_usage / Ollama done 块）
+                        if isinstance(chunk_obj, dict) and (
+                            chunk_obj.get("usage") or chunk_obj.get("eval_count")
+                        ):
+                            record_llm_usage(model.model, chunk_obj)
                     if chunk_text:
                         await _consume_chunk(chunk_text)
                 final_text = _strip_think_tags("".join(buffer))
@@ -8,6 +8,8 @@ import tempfile
 import uuid
 from pathlib import Path
 
+from app.core.telemetry import span
+
 
 def docx_to_pdf(docx_path: str) -> str:
     """
@@ -26,16 +28,17 @@ def docx_to_pdf(docx_path: str) -> str:
     outdir = Path(tempfile.gettempdir()) / "tender_render_pdf" / run_id
     outdir.mkdir(parents=True, exist_ok=True)
 
-    subprocess.run(
-        [
-            "soffice", "--headless", "--nologo", "--nolockcheck",
-            "--convert-to", "pdf",
-            "--outdir", str(outdir),
-            docx_path
-        ],
-        check=True,
-        capture_output=True,
-    )
+    with span("office.soffice", convert_to="pdf"):
+        subprocess.run(
+            [
+                "soffice", "--headless", "--nologo", "--nolockcheck",
+                "--convert-to", "pdf",
+                "--outdir", str(outdir),
+                docx_path
+            ],
+            check=True,
+            capture_output=True,
+        )
     
     pdfs = list(outdir.glob("*.pdf"))
     if not pdfs:
@@ -65,15 +68,16 @@ def pdf_to_docx(pdf_path: str) -> str:
     outdir = Path(tempfile.gettempdir()) / "tender_pdf2docx" / run_id
     outdir.mkdir(parents=True, exist_ok=True)
 
-    subprocess.run(
-        [
-            "soffice", "--headless", "--nologo", "--nolockcheck",
-            "--convert-to", "docx",
-            "--outdir", str(outdir),
-            pdf_path
-        ],
-        check=True,
-    )
+    with span("office.soffice", convert_to="docx"):
+        subprocess.run(
+            [
+                "soffice", "--headless", "--nologo", "--nolockcheck",
+                "--convert-to", "docx",
+                "--outdir", str(outdir),
+                pdf_path
+            ],
+            check=True,
+        )
 
     docx_files = list(outdir.glob("*.docx"))
     if not docx_files:
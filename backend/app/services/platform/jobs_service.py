@@ -37,7 +37,8 @@ class JobsService:
         biz_id: str,
         owner_id: Optional[str] = None,
         initial_status: str = "queued",
-        initial_message: Optional[str] = None
+        initial_message: Optional[str] = None,
+        job_id: Optional[str] = None
     ) -> str:
         """
         创建新任务
@@ -49,11 +50,12 @@ class JobsService:
             owner_id: 任务所有者ID
             initial_status: 初始状态，默认 "queued"
             initial_message: 初始消息
+            job_id: 指定任务ID（可选，如与队列 job id 保持一致），不提供则自动生成
             
         Returns:
             job_id: 创建的任务ID
         """
-        job_id = _job_id()
+        job_id = job_id or _job_id()
         
         sql = """
             INSERT INTO platform_jobs (
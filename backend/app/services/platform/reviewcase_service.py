@@ -11,6 +11,8 @@ from typing import Any, Dict, List, Optional
 from psycopg.rows import dict_row
 from psycopg_pool import ConnectionPool
 
+from app.services.dao.bulk import copy_rows, encode_json
+
 
 def _case_id(prefix: str = "rc") -> str:
     """生成审核案例 ID"""
@@ -238,36 +240,36 @@ class ReviewCaseService:
             finding_ids: 发现ID列表
         """
         finding_ids = []
-        
-        sql = """
-            INSERT INTO review_findings (
-                id, run_id, source, dimension, requirement_text, response_text,
-                result, rigid, remark, evidence_jsonb, created_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, now()
-            )
-        """
-        
+        rows = []
+        for finding in findings:
+            finding_id = _finding_id()
+            finding_ids.append(finding_id)
+            rows.append((
+                finding_id,
+                run_id,
+                finding.get("source", "compare"),
+                finding.get("dimension"),
+                finding.get("requirement_text"),
+                finding.get("response_text"),
+                finding.get("result", "risk"),
+                finding.get("rigid", False),
+                finding.get("remark"),
+                encode_json(finding.get("evidence_jsonb", {})),
+            ))
+        
+        if not rows:
+            return finding_ids
+        
+        # COPY 一次写入整批发现（created_at 取表默认值 now()）
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                for finding in findings:
-                    finding_id = _finding_id()
-                    finding_ids.append(finding_id)
-                    
-                    evidence_json = json.dumps(finding.get("evidence_jsonb", {}))
-                    
-                    cur.execute(sql, (
-                        finding_id,
-                        run_id,
-                        finding.get("source", "compare"),
-                        finding.get("dimension"),
-                        finding.get("requirement_text"),
-                        finding.get("response_text"),
-                        finding.get("result", "risk"),
-                        finding.get("rigid", False),
-                        finding.get("remark"),
-                        evidence_json
-                    ))
+                copy_rows(
+                    cur,
+                    "review_findings",
+                    ("id", "run_id", "source", "dimension", "requirement_text", "response_text",
+                     "result", "rigid", "remark", "evidence_jsonb"),
+                    rows,
+                )
         
         return finding_ids
 
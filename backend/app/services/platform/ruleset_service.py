@@ -218,6 +218,107 @@ class RuleSetService:
         
         return version_id
 
+    def create_project_version(
+        self,
+        project_id: str,
+        content_yaml: str,
+        validate_status: str,
+        validate_message: Optional[str] = None,
+        namespace: str = "tender",
+    ) -> Tuple[str, str]:
+        """
+        为项目追加一个规则集版本（项目还没有规则集时先创建）
+        
+        同一项目的并发导入用事务级 advisory lock 串行化，查找/创建规则集与分配版本号在同一事务内完成，
+        不会创建出多个项目规则集或重复的版本号。
+        
+        Args:
+            project_id: 项目ID
+            content_yaml: YAML 内容
+            validate_status: 校验状态（"valid" | "invalid"）
+            validate_message: 校验消息
+            namespace: 业务命名空间
+            
+        Returns:
+            (rule_set_id, version_id)
+        """
+        version_id = _rule_set_version_id()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"rule_set:{project_id}",))
+                cur.execute(
+                    "SELECT id FROM rule_sets WHERE project_id = %s ORDER BY created_at DESC LIMIT 1",
+                    (project_id,),
+                )
+                row = cur.fetchone()
+                if row:
+                    rule_set_id = row[0]
+                else:
+                    rule_set_id = _rule_set_id()
+                    cur.execute(
+                        """
+                        INSERT INTO rule_sets (id, namespace, scope, project_id, name, created_at)
+                        VALUES (%s, %s, 'project', %s, %s, now())
+                        """,
+                        (rule_set_id, namespace, project_id, f"规则集-{project_id}"),
+                    )
+                cur.execute(
+                    """
+                    INSERT INTO rule_set_versions (
+                        id, rule_set_id, version_no, content_sha256, content_yaml,
+                        validate_status, validate_message, created_at
+                    )
+                    SELECT %s, %s, COALESCE(MAX(version_no), 0) + 1, %s, %s, %s, %s, now()
+                    FROM rule_set_versions
+                    WHERE rule_set_id = %s
+                    """,
+                    (
+                        version_id, rule_set_id, _compute_sha256(content_yaml), content_yaml,
+                        validate_status, validate_message, rule_set_id,
+                    ),
+                )
+        
+        return rule_set_id, version_id
+
+    def delete_version(self, version_id: str) -> bool:
+        """
+        删除规则集版本；项目规则集因此不再有任何版本时一并删除
+        
+        与 create_project_version 使用同一把项目锁，不会删掉并发导入刚创建、尚未写入版本的规则集。
+        
+        Args:
+            version_id: 版本ID
+            
+        Returns:
+            是否删除了版本
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT s.id, s.project_id FROM rule_set_versions v
+                    JOIN rule_sets s ON s.id = v.rule_set_id
+                    WHERE v.id = %s
+                    """,
+                    (version_id,),
+                )
+                row = cur.fetchone()
+                if not row:
+                    return False
+                rule_set_id, project_id = row
+                if project_id:
+                    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"rule_set:{project_id}",))
+                cur.execute("DELETE FROM rule_set_versions WHERE id = %s", (version_id,))
+                cur.execute(
+                    """
+                    DELETE FROM rule_sets s
+                    WHERE s.id = %s AND s.scope = 'project'
+                      AND NOT EXISTS (SELECT 1 FROM rule_set_versions v WHERE v.rule_set_id = s.id)
+                    """,
+                    (rule_set_id,),
+                )
+        return True
+
     def get_rule_set(self, rule_set_id: str) -> Optional[Dict[str, Any]]:
         """
         获取规则集信息
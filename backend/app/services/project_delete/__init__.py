@@ -1,6 +1,6 @@
 """
 项目删除模块
-包含资源清理器、删除编排器等
+包含资源清理器、删除编排器、孤儿数据回收等
 """
 from .orchestrator import ProjectDeletionOrchestrator
 from .cleaners import (
@@ -8,7 +8,10 @@ from .cleaners import (
     DocumentResourceCleaner,
     KnowledgeBaseResourceCleaner,
     AssetResourceCleaner,
+    DocStoreResourceCleaner,
+    MetadataResourceCleaner,
 )
+from .orphan_gc import OrphanCollector, OrphanReport
 
 __all__ = [
     "ProjectDeletionOrchestrator",
@@ -16,4 +19,8 @@ __all__ = [
     "DocumentResourceCleaner",
     "KnowledgeBaseResourceCleaner",
     "AssetResourceCleaner",
+    "DocStoreResourceCleaner",
+    "MetadataResourceCleaner",
+    "OrphanCollector",
+    "OrphanReport",
 ]
@@ -1,45 +1,193 @@
 """
 项目资源清理器
 每个清理器负责清理一类资源
+
+删除约定（保证中断后可重入）：
+- 先删外部资源（Milvus 向量、磁盘文件），再删定位它们所需的数据库行，
+  中断后重跑时仍能从剩余的行找到目标
+- 大表按主键分批删除，每批一个事务；on_batch(cur, table, count) 在该事务内回调，
+  编排器借此把进度与删除一起提交
 """
 import logging
 import os
+import shutil
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 from psycopg_pool import ConnectionPool
 
 logger = logging.getLogger(__name__)
 
+# 单批删除的行数
+DEFAULT_BATCH_SIZE = 500
+
+# on_batch(cur, table, count)
+BatchCallback = Callable[[Any, str, int], None]
+
+
+def project_asset_dir(project_id: str) -> str:
+    """项目资产文件目录（与 TenderService 导入资产时一致）"""
+    return os.path.join("data", "tender_assets", project_id)
+
 
 class ProjectResourceCleaner(ABC):
     """资源清理器基类"""
-    
+
+    def __init__(self, pool: ConnectionPool, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.pool = pool
+        self.batch_size = batch_size
+
     @abstractmethod
     def type(self) -> str:
         """资源类型"""
         pass
-    
+
     @abstractmethod
     def plan(self, project_id: str) -> Dict[str, Any]:
         """生成删除计划（不执行删除）"""
         pass
-    
+
     @abstractmethod
-    def delete(self, project_id: str) -> None:
-        """执行删除"""
+    def delete(self, project_id: str, on_batch: Optional[BatchCallback] = None) -> None:
+        """执行删除（幂等，可在中断后重复调用）"""
         pass
 
+    def _delete_in_batches(
+        self,
+        table: str,
+        key: str,
+        where: str,
+        params: Sequence[Any],
+        on_batch: Optional[BatchCallback] = None,
+    ) -> int:
+        """
+        按主键分批删除满足条件的行
+
+        Returns:
+            删除的总行数
+        """
+        total = 0
+        while True:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        DELETE FROM {table}
+                        WHERE {key} IN (SELECT {key} FROM {table} WHERE {where} LIMIT %s)
+                        """,
+                        (*params, self.batch_size),
+                    )
+                    count = cur.rowcount
+                    if count and on_batch:
+                        on_batch(cur, table, count)
+                conn.commit()
+            total += count
+            if count < self.batch_size:
+                return total
+
+
+class DocStoreResourceCleaner(ProjectResourceCleaner):
+    """DocStore 资源清理器（v2 入库：documents / document_versions / doc_segments + docseg 向量）"""
+
+    def __init__(self, pool: ConnectionPool, vector_store: Any = None, batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(pool, batch_size)
+        self._vector_store = vector_store
+
+    @property
+    def vector_store(self):
+        if self._vector_store is None:
+            from app.services.vectorstore.milvus_docseg_store import milvus_docseg_store
+            self._vector_store = milvus_docseg_store
+        return self._vector_store
+
+    def type(self) -> str:
+        return "DOCSTORE"
+
+    def _version_ids(self, project_id: str) -> List[str]:
+        """项目的文档版本：资产 meta_json 记录的版本 + 存储路径位于项目目录下的版本"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT v.id FROM document_versions v
+                    WHERE v.id IN (
+                        SELECT meta_json->>'doc_version_id' FROM tender_project_assets
+                        WHERE project_id=%s AND meta_json ? 'doc_version_id'
+                    )
+                    OR v.storage_path LIKE %s
+                    ORDER BY v.id
+                    """,
+                    (project_id, project_asset_dir(project_id).replace("_", r"\_") + os.sep + "%"),
+                )
+                return [row[0] for row in cur.fetchall()]
+
+    def plan(self, project_id: str) -> Dict[str, Any]:
+        """计划删除 DocStore 文档"""
+        version_ids = self._version_ids(project_id)
+        segment_count = 0
+        if version_ids:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT COUNT(*) FROM doc_segments WHERE doc_version_id = ANY(%s)",
+                        (version_ids,),
+                    )
+                    segment_count = cur.fetchone()[0]
+
+        return {
+            "type": self.type(),
+            "count": len(version_ids),
+            "samples": version_ids[:5],
+            "physical_targets": [f"doc_segments: {segment_count}", f"milvus: doc_segments_v1 project={project_id}"],
+        }
+
+    def delete(self, project_id: str, on_batch: Optional[BatchCallback] = None) -> None:
+        """删除 docseg 向量、doc_segments、document_versions 和不再有版本的 documents"""
+        version_ids = self._version_ids(project_id)
+
+        # 1. 向量（项目过滤覆盖 project_id 写入正确的分片，版本过滤兜住其余）
+        self.vector_store.delete_by_project(project_id)
+        self.vector_store.delete_by_versions(version_ids)
+
+        if not version_ids:
+            return
+
+        # 2. 分片按批删除（避免删除版本时级联出一个超大事务）
+        segments = self._delete_in_batches(
+            "doc_segments", "id", "doc_version_id = ANY(%s)", (version_ids,), on_batch
+        )
+
+        # 3. 版本与文档放在同一事务
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM document_versions WHERE id = ANY(%s) RETURNING document_id",
+                    (version_ids,),
+                )
+                document_ids = sorted({row[0] for row in cur.fetchall()})
+                cur.execute(
+                    """
+                    DELETE FROM documents d
+                    WHERE d.id = ANY(%s)
+                      AND NOT EXISTS (SELECT 1 FROM document_versions v WHERE v.document_id = d.id)
+                    """,
+                    (document_ids,),
+                )
+                if on_batch:
+                    on_batch(cur, "document_versions", len(version_ids))
+            conn.commit()
+
+        logger.info(
+            f"Deleted {len(version_ids)} doc versions / {segments} segments for project {project_id}"
+        )
+
 
 class AssetResourceCleaner(ProjectResourceCleaner):
-    """资产资源清理器（tender_project_assets）"""
-    
-    def __init__(self, pool: ConnectionPool):
-        self.pool = pool
-    
+    """资产资源清理器（tender_project_assets + 磁盘文件）"""
+
     def type(self) -> str:
         return "ASSET"
-    
+
     def plan(self, project_id: str) -> Dict[str, Any]:
         """计划删除资产"""
         with self.pool.connection() as conn:
@@ -54,20 +202,20 @@ class AssetResourceCleaner(ProjectResourceCleaner):
                     (project_id,)
                 )
                 rows = cur.fetchall()
-        
+
         count = len(rows)
         samples = [row[2] or f"{row[1]}_{row[0][:8]}" for row in rows[:5]]
         physical_targets = [row[3] for row in rows if row[3]]  # storage_path
-        
+
         return {
             "type": self.type(),
             "count": count,
             "samples": samples,
             "physical_targets": physical_targets[:10],  # 只显示前10个
         }
-    
-    def delete(self, project_id: str) -> None:
-        """删除资产记录和物理文件"""
+
+    def delete(self, project_id: str, on_batch: Optional[BatchCallback] = None) -> None:
+        """删除物理文件后再删除资产记录"""
         # 1. 查询所有资产
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
@@ -76,37 +224,31 @@ class AssetResourceCleaner(ProjectResourceCleaner):
                     (project_id,)
                 )
                 rows = cur.fetchall()
-        
-        # 2. 删除物理文件（仅 template 类型有 storage_path）
+
+        # 2. 删除物理文件（storage_path 可能在项目目录之外）与项目资产目录
         for asset_id, storage_path in rows:
             if storage_path and os.path.exists(storage_path):
                 try:
                     os.remove(storage_path)
                     logger.info(f"Deleted file: {storage_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete file {storage_path}: {e}")
-        
+                except FileNotFoundError:
+                    pass
+        asset_dir = project_asset_dir(project_id)
+        if os.path.isdir(asset_dir):
+            shutil.rmtree(asset_dir)
+            logger.info(f"Deleted directory: {asset_dir}")
+
         # 3. 删除数据库记录
-        with self.pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "DELETE FROM tender_project_assets WHERE project_id=%s",
-                    (project_id,)
-                )
-            conn.commit()
-        
-        logger.info(f"Deleted {len(rows)} assets for project {project_id}")
+        count = self._delete_in_batches("tender_project_assets", "id", "project_id=%s", (project_id,), on_batch)
+        logger.info(f"Deleted {count} assets for project {project_id}")
 
 
 class DocumentResourceCleaner(ProjectResourceCleaner):
     """文档资源清理器（tender_project_documents）"""
-    
-    def __init__(self, pool: ConnectionPool):
-        self.pool = pool
-    
+
     def type(self) -> str:
         return "DOCUMENT"
-    
+
     def plan(self, project_id: str) -> Dict[str, Any]:
         """计划删除文档绑定"""
         with self.pool.connection() as conn:
@@ -121,61 +263,72 @@ class DocumentResourceCleaner(ProjectResourceCleaner):
                     (project_id,)
                 )
                 rows = cur.fetchall()
-        
+
         count = len(rows)
         samples = [f"{row[1]}_{row[2][:8]}" for row in rows[:5]]
-        
+
         return {
             "type": self.type(),
             "count": count,
             "samples": samples,
             "physical_targets": [],
         }
-    
-    def delete(self, project_id: str) -> None:
+
+    def delete(self, project_id: str, on_batch: Optional[BatchCallback] = None) -> None:
         """删除文档绑定记录"""
-        with self.pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "DELETE FROM tender_project_documents WHERE project_id=%s",
-                    (project_id,)
-                )
-            conn.commit()
-        
+        self._delete_in_batches("tender_project_documents", "id", "project_id=%s", (project_id,), on_batch)
         logger.info(f"Deleted document bindings for project {project_id}")
 
 
 class KnowledgeBaseResourceCleaner(ProjectResourceCleaner):
-    """知识库资源清理器（kb_documents + kb_chunks）"""
-    
-    def __init__(self, pool: ConnectionPool):
-        self.pool = pool
-    
+    """知识库资源清理器（kb 向量 + kb_chunks + kb_documents + knowledge_bases）"""
+
+    def __init__(self, pool: ConnectionPool, vector_store: Any = None, batch_size: int = DEFAULT_BATCH_SIZE):
+        super().__init__(pool, batch_size)
+        self._vector_store = vector_store
+
+    @property
+    def vector_store(self):
+        if self._vector_store is None:
+            from app.services.vectorstore.milvus_lite_store import milvus_store
+            self._vector_store = milvus_store
+        return self._vector_store
+
     def type(self) -> str:
         return "KB"
-    
-    def plan(self, project_id: str) -> Dict[str, Any]:
-        """计划删除知识库资源"""
-        # 1. 获取项目的 kb_id
+
+    def _owned_kb_id(self, project_id: str) -> Optional[str]:
+        """项目独占的 kb_id（其他项目仍在使用时返回 None，不做清理）"""
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    "SELECT kb_id FROM tender_projects WHERE id=%s",
+                    """
+                    SELECT p.kb_id,
+                           EXISTS (SELECT 1 FROM tender_projects o WHERE o.kb_id = p.kb_id AND o.id <> p.id)
+                    FROM tender_projects p WHERE p.id=%s
+                    """,
                     (project_id,)
                 )
                 row = cur.fetchone()
-        
         if not row:
+            return None
+        kb_id, shared = row
+        if shared:
+            logger.warning(f"KB {kb_id} is shared with other projects, skip KB cleanup for {project_id}")
+            return None
+        return kb_id
+
+    def plan(self, project_id: str) -> Dict[str, Any]:
+        """计划删除知识库资源"""
+        kb_id = self._owned_kb_id(project_id)
+        if not kb_id:
             return {
                 "type": self.type(),
                 "count": 0,
                 "samples": [],
                 "physical_targets": [],
             }
-        
-        kb_id = row[0]
-        
-        # 2. 统计 kb_documents
+
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
@@ -188,79 +341,71 @@ class KnowledgeBaseResourceCleaner(ProjectResourceCleaner):
                     (kb_id,)
                 )
                 docs = cur.fetchall()
-                
+
                 cur.execute(
                     "SELECT COUNT(*) FROM kb_chunks WHERE kb_id=%s",
                     (kb_id,)
                 )
                 chunk_count = cur.fetchone()[0]
-        
+
         doc_count = len(docs)
         samples = [row[1] or row[0][:12] for row in docs[:5]]
         physical_targets = [f"kb_collection: {kb_id}", f"chunks: {chunk_count}"]
-        
+
         return {
             "type": self.type(),
             "count": doc_count,
             "samples": samples,
             "physical_targets": physical_targets,
         }
-    
-    def delete(self, project_id: str) -> None:
-        """删除知识库资源（文档、分块、向量）"""
-        # 1. 获取项目的 kb_id
-        with self.pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT kb_id FROM tender_projects WHERE id=%s",
-                    (project_id,)
-                )
-                row = cur.fetchone()
-        
-        if not row:
-            logger.warning(f"Project {project_id} not found, skipping KB cleanup")
+
+    def delete(self, project_id: str, on_batch: Optional[BatchCallback] = None) -> None:
+        """删除知识库资源（向量 → 分块 → 文档 → 知识库）"""
+        kb_id = self._owned_kb_id(project_id)
+        if not kb_id:
             return
-        
-        kb_id = row[0]
-        
-        # 2. 删除 kb_chunks
-        with self.pool.connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM kb_chunks WHERE kb_id=%s", (kb_id,))
-                chunk_count = cur.rowcount
-            conn.commit()
-        
-        logger.info(f"Deleted {chunk_count} chunks for kb_id {kb_id}")
-        
-        # 3. 删除 kb_documents
+
+        # 1. 向量
+        vectors = self.vector_store.delete_by_kb(kb_id)
+
+        # 2. 分块与文档分批删除
+        chunks = self._delete_in_batches("kb_chunks", "chunk_id", "kb_id=%s", (kb_id,), on_batch)
+        docs = self._delete_in_batches("kb_documents", "id", "kb_id=%s", (kb_id,), on_batch)
+
+        # 3. 知识库本身
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM kb_documents WHERE kb_id=%s", (kb_id,))
-                doc_count = cur.rowcount
+                cur.execute("DELETE FROM knowledge_bases WHERE id=%s", (kb_id,))
             conn.commit()
-        
-        logger.info(f"Deleted {doc_count} documents for kb_id {kb_id}")
-        
-        # 4. 删除知识库本身（如果有 kb 表）
-        # 注意：根据你的系统设计，可能还需要删除向量索引等
-        # 这里假设 kb_service.delete_kb() 会处理这些
-        try:
-            from app.services import kb_service
-            kb_service.delete_kb(kb_id)
-            logger.info(f"Deleted knowledge base {kb_id}")
-        except Exception as e:
-            logger.warning(f"Failed to delete KB {kb_id} via kb_service: {e}")
+
+        logger.info(f"Deleted kb {kb_id}: vectors={vectors} chunks={chunks} documents={docs}")
 
 
 class MetadataResourceCleaner(ProjectResourceCleaner):
-    """项目元数据清理器（risks, directory, review, runs, project_info）"""
-    
-    def __init__(self, pool: ConnectionPool):
-        self.pool = pool
-    
+    """项目元数据清理器（risks, directory, review, runs, project_info 及无外键的项目级表）"""
+
+    # 由外键 ON DELETE CASCADE 覆盖，显式删除以分批并统计
+    CASCADE_TABLES = [
+        "tender_risks",
+        "tender_directory_nodes",
+        "tender_review_items",
+        "tender_runs",
+        "tender_project_info",
+    ]
+    # 没有外键关联项目的表：表名 -> 条件（表可能尚未迁移，删除前检查是否存在）
+    LOOSE_TABLES = {
+        "tender_requirement_items": "project_id=%s",
+        "tender_semantic_outline_nodes": "project_id=%s",
+        "tender_semantic_outlines": "project_id=%s",
+        "tender_format_snippets": "project_id=%s",
+        "review_cases": "project_id=%s",
+        "rule_sets": "project_id=%s",
+        "doc_fragment": "owner_type='PROJECT' AND owner_id=%s",
+    }
+
     def type(self) -> str:
         return "METADATA"
-    
+
     def plan(self, project_id: str) -> Dict[str, Any]:
         """计划删除项目元数据"""
         counts = {}
@@ -269,40 +414,51 @@ class MetadataResourceCleaner(ProjectResourceCleaner):
                 # 统计各类资源
                 cur.execute("SELECT COUNT(*) FROM tender_risks WHERE project_id=%s", (project_id,))
                 counts["risks"] = cur.fetchone()[0]
-                
+
                 cur.execute("SELECT COUNT(*) FROM tender_directory_nodes WHERE project_id=%s", (project_id,))
                 counts["directory"] = cur.fetchone()[0]
-                
+
                 cur.execute("SELECT COUNT(*) FROM tender_review_items WHERE project_id=%s", (project_id,))
                 counts["review"] = cur.fetchone()[0]
-                
+
                 cur.execute("SELECT COUNT(*) FROM tender_runs WHERE project_id=%s", (project_id,))
                 counts["runs"] = cur.fetchone()[0]
-                
+
                 cur.execute("SELECT COUNT(*) FROM tender_project_info WHERE project_id=%s", (project_id,))
                 counts["project_info"] = cur.fetchone()[0]
-        
+
         total = sum(counts.values())
         samples = [f"{k}: {v}" for k, v in counts.items() if v > 0]
-        
+
         return {
             "type": self.type(),
             "count": total,
             "samples": samples,
             "physical_targets": [],
         }
-    
-    def delete(self, project_id: str) -> None:
-        """删除项目元数据（CASCADE 会自动删除）"""
-        # 由于外键 ON DELETE CASCADE，删除项目时会自动删除这些
-        # 这里显式删除以确保清理完整
+
+    def _existing_tables(self, tables: List[str]) -> List[str]:
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM tender_risks WHERE project_id=%s", (project_id,))
-                cur.execute("DELETE FROM tender_directory_nodes WHERE project_id=%s", (project_id,))
-                cur.execute("DELETE FROM tender_review_items WHERE project_id=%s", (project_id,))
-                cur.execute("DELETE FROM tender_runs WHERE project_id=%s", (project_id,))
-                cur.execute("DELETE FROM tender_project_info WHERE project_id=%s", (project_id,))
-            conn.commit()
-        
+                cur.execute(
+                    "SELECT t FROM unnest(%s::text[]) AS t WHERE to_regclass(t) IS NOT NULL",
+                    (tables,),
+                )
+                found = {row[0] for row in cur.fetchall()}
+        return [t for t in tables if t in found]
+
+    def delete(self, project_id: str, on_batch: Optional[BatchCallback] = None) -> None:
+        """删除项目元数据"""
+        for table in self.CASCADE_TABLES:
+            key = "project_id" if table == "tender_project_info" else "id"
+            self._delete_in_batches(table, key, "project_id=%s", (project_id,), on_batch)
+
+        for table in self._existing_tables(list(self.LOOSE_TABLES)):
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"DELETE FROM {table} WHERE {self.LOOSE_TABLES[table]}", (project_id,))
+                    if cur.rowcount and on_batch:
+                        on_batch(cur, table, cur.rowcount)
+                conn.commit()
+
         logger.info(f"Deleted metadata for project {project_id}")
@@ -1,18 +1,25 @@
 """
 项目删除编排器
 负责协调所有资源清理器、生成删除计划、执行删除操作
+
+删除以后台任务运行：start() 在请求内登记审计记录并把项目标记为 deleting，
+run() 在 Worker / 后台线程中按阶段执行清理器。审计记录的 progress_json 记录已完成阶段与各表删除行数，
+随每个批次在同一事务内提交，进程中断后再次 run() 会跳过已完成阶段继续删除。
 """
 import hashlib
 import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
+from psycopg.rows import dict_row
 from psycopg_pool import ConnectionPool
 
 from app.schemas.project_delete import DeletePlanItem, ProjectDeletePlanResponse
 from .cleaners import (
+    DEFAULT_BATCH_SIZE,
     AssetResourceCleaner,
+    DocStoreResourceCleaner,
     DocumentResourceCleaner,
     KnowledgeBaseResourceCleaner,
     MetadataResourceCleaner,
@@ -21,26 +28,44 @@ from .cleaners import (
 
 logger = logging.getLogger(__name__)
 
+# 最后一个阶段：删除项目本身（级联剩余子表）
+PROJECT_STAGE = "PROJECT"
+
+# 失败的删除在服务启动时自动重试的次数上限（按执行次数计，用户重新发起删除后清零）
+MAX_RESUME_ATTEMPTS = 3
+
+# report(progress 0-1, message)
+ProgressReporter = Callable[[Optional[float], Optional[str]], None]
+
 
 class ProjectDeletionOrchestrator:
     """项目删除编排器"""
-    
-    def __init__(self, pool: ConnectionPool):
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        kb_vector_store: Any = None,
+        docseg_vector_store: Any = None,
+    ):
         self.pool = pool
+        # 顺序即删除顺序：向量与分块 → 资产文件 → 绑定 → 元数据；
+        # DocStore 依赖资产 meta_json 定位版本，必须排在资产之前
         self.cleaners: List[ProjectResourceCleaner] = [
-            AssetResourceCleaner(pool),
-            DocumentResourceCleaner(pool),
-            KnowledgeBaseResourceCleaner(pool),
-            MetadataResourceCleaner(pool),
+            DocStoreResourceCleaner(pool, vector_store=docseg_vector_store, batch_size=batch_size),
+            KnowledgeBaseResourceCleaner(pool, vector_store=kb_vector_store, batch_size=batch_size),
+            AssetResourceCleaner(pool, batch_size=batch_size),
+            DocumentResourceCleaner(pool, batch_size=batch_size),
+            MetadataResourceCleaner(pool, batch_size=batch_size),
         ]
-    
+
     def build_plan(self, project_id: str) -> ProjectDeletePlanResponse:
         """
         生成删除计划
-        
+
         Args:
             project_id: 项目ID
-            
+
         Returns:
             删除计划响应
         """
@@ -52,12 +77,12 @@ class ProjectDeletionOrchestrator:
                     (project_id,)
                 )
                 row = cur.fetchone()
-        
+
         if not row:
             raise ValueError(f"Project {project_id} not found")
-        
+
         project_name = row[1]
-        
+
         # 2. 收集各类资源的删除计划
         items: List[DeletePlanItem] = []
         for cleaner in self.cleaners:
@@ -68,7 +93,7 @@ class ProjectDeletionOrchestrator:
             except Exception as e:
                 logger.error(f"Failed to build plan for {cleaner.type()}: {e}")
                 # 继续处理其他清理器
-        
+
         # 3. 生成确认令牌（基于 project_id + project_name + 计划内容）
         plan_json = json.dumps(
             {
@@ -79,7 +104,7 @@ class ProjectDeletionOrchestrator:
             sort_keys=True,
         )
         confirm_token = hashlib.sha256(plan_json.encode()).hexdigest()[:16]
-        
+
         return ProjectDeletePlanResponse(
             project_id=project_id,
             project_name=project_name,
@@ -87,74 +112,244 @@ class ProjectDeletionOrchestrator:
             confirm_token=confirm_token,
             warning="删除后无法恢复！将删除所有关联的文档、知识库、风险、目录、审核记录等。",
         )
-    
-    def delete(self, project_id: str) -> None:
+
+    def start(
+        self,
+        project_id: str,
+        requested_by: Optional[str] = None,
+        plan: Optional[ProjectDeletePlanResponse] = None,
+    ) -> str:
+        """
+        登记删除任务并把项目标记为 deleting（不执行删除）
+
+        同一项目已有未完成（或失败）的删除记录时复用该记录，run() 会从中断处继续。
+
+        Returns:
+            审计记录ID
         """
-        执行删除操作
-        
+        plan_json = json.dumps(plan.dict() if plan else {}, ensure_ascii=False)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                # 锁住项目行，串行化同一项目的并发删除请求
+                cur.execute("SELECT name FROM tender_projects WHERE id=%s FOR UPDATE", (project_id,))
+                row = cur.fetchone()
+                if not row:
+                    raise ValueError(f"Project {project_id} not found")
+
+                cur.execute(
+                    """
+                    SELECT id FROM tender_project_delete_audit
+                    WHERE project_id=%s AND status IN ('PENDING', 'RUNNING', 'FAILED')
+                    ORDER BY created_at DESC LIMIT 1
+                    """,
+                    (project_id,)
+                )
+                existing = cur.fetchone()
+                if existing:
+                    audit_id = existing[0]
+                    cur.execute(
+                        """
+                        UPDATE tender_project_delete_audit
+                        SET status = CASE WHEN status = 'FAILED' THEN 'PENDING' ELSE status END,
+                            progress_json = progress_json - 'attempts',
+                            error_message = NULL, finished_at = NULL, updated_at = NOW()
+                        WHERE id=%s
+                        """,
+                        (audit_id,)
+                    )
+                else:
+                    audit_id = f"audit_{uuid.uuid4().hex}"
+                    cur.execute(
+                        """
+                        INSERT INTO tender_project_delete_audit
+                          (id, project_id, project_name, requested_by, plan_json, status, created_at, updated_at)
+                        VALUES (%s, %s, %s, %s, %s::jsonb, 'PENDING', NOW(), NOW())
+                        """,
+                        (audit_id, project_id, row[0], requested_by, plan_json)
+                    )
+                cur.execute("UPDATE tender_projects SET status='deleting' WHERE id=%s", (project_id,))
+            conn.commit()
+
+        logger.info(f"Project deletion scheduled: project={project_id} audit={audit_id}")
+        return audit_id
+
+    def run(self, audit_id: str, report: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+        """
+        执行（或续跑）删除任务
+
+        同一项目同时只有一个执行者：用会话级 advisory lock 互斥，进程崩溃时锁随连接释放。
+
         Args:
-            project_id: 项目ID
+            audit_id: start() 返回的审计记录ID
+            report: 进度回调（队列任务传入 ctx.report）
+
+        Returns:
+            删除状态（同 get_status）
         """
-        # 1. 创建删除审计记录
-        audit_id = self._create_audit(project_id, "RUNNING")
-        
+        audit = self._get_audit(audit_id)
+        if not audit:
+            raise ValueError(f"Delete audit {audit_id} not found")
+        if audit["status"] == "SUCCESS":
+            return audit
+
+        lock_key = f"project_delete:{audit['project_id']}"
+        with self.pool.connection() as lock_conn:
+            with lock_conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (lock_key,))
+                locked = cur.fetchone()[0]
+            lock_conn.commit()
+            if not locked:
+                logger.info(f"Project deletion already running elsewhere: audit={audit_id}")
+                return self._get_audit(audit_id)
+            try:
+                # 拿到锁后重新读取，可能刚被其他执行者推进或完成
+                audit = self._get_audit(audit_id)
+                if audit["status"] != "SUCCESS":
+                    self._run_locked(audit, report)
+            finally:
+                with lock_conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (lock_key,))
+                lock_conn.commit()
+        return self._get_audit(audit_id)
+
+    def _run_locked(self, audit: Dict[str, Any], report: Optional[ProgressReporter]) -> None:
+        audit_id, project_id = audit["id"], audit["project_id"]
+        state = dict(audit.get("progress_json") or {})
+        state.setdefault("completed", [])
+        state.setdefault("deleted", {})
+        state.setdefault("progress", 0)
+        state["attempts"] = state.get("attempts", 0) + 1
+        stage_count = len(self.cleaners) + 1
+
+        def on_batch(cur, table: str, count: int) -> None:
+            state["deleted"][table] = state["deleted"].get(table, 0) + count
+            self._save_progress(cur, audit_id, state)
+
         try:
-            # 2. 按顺序执行清理器（KB → 文档 → 资产 → 元数据）
+            self._save_progress(None, audit_id, state, status="RUNNING")
             for cleaner in self.cleaners:
-                try:
-                    logger.info(f"Cleaning {cleaner.type()} for project {project_id}")
-                    cleaner.delete(project_id)
-                except Exception as e:
-                    logger.error(f"Failed to clean {cleaner.type()}: {e}")
-                    # 继续清理其他资源
-            
-            # 3. 最后删除项目本身
+                stage = cleaner.type()
+                if stage in state["completed"]:
+                    continue
+                state["stage"] = stage
+                self._save_progress(None, audit_id, state, status="RUNNING")
+                if report:
+                    report(state["progress"] / 100, f"正在删除 {stage}")
+                logger.info(f"Cleaning {stage} for project {project_id}")
+
+                cleaner.delete(project_id, on_batch=on_batch)
+
+                state["completed"].append(stage)
+                state["progress"] = int(100 * len(state["completed"]) / stage_count)
+                self._save_progress(None, audit_id, state)
+
+            # 最后删除项目本身，与审计成功在同一事务
+            state["stage"] = PROJECT_STAGE
+            state["completed"].append(PROJECT_STAGE)
+            state["progress"] = 100
             with self.pool.connection() as conn:
                 with conn.cursor() as cur:
+                    cur.execute("DELETE FROM tender_projects WHERE id=%s", (project_id,))
+                    self._save_progress(cur, audit_id, state, status="SUCCESS")
                     cur.execute(
-                        "DELETE FROM tender_projects WHERE id=%s",
-                        (project_id,)
+                        "UPDATE tender_project_delete_audit SET finished_at=NOW() WHERE id=%s",
+                        (audit_id,)
                     )
                 conn.commit()
-            
             logger.info(f"Successfully deleted project {project_id}")
-            
-            # 4. 更新审计记录为成功
-            self._update_audit(audit_id, "SUCCESS")
-            
         except Exception as e:
-            # 更新审计记录为失败
+            logger.exception(f"Project deletion failed at {state.get('stage')}: project={project_id}")
             self._update_audit(audit_id, "FAILED", error_message=str(e))
             raise
-    
-    def _create_audit(self, project_id: str, status: str) -> str:
-        """创建删除审计记录"""
-        # 查询项目名称
+
+    def delete(self, project_id: str) -> None:
+        """
+        同步执行删除（start + run）
+
+        Args:
+            project_id: 项目ID
+        """
+        self.run(self.start(project_id))
+
+    def get_status(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """项目最近一次删除的状态与进度"""
         with self.pool.connection() as conn:
-            with conn.cursor() as cur:
+            with conn.cursor(row_factory=dict_row) as cur:
                 cur.execute(
-                    "SELECT name FROM tender_projects WHERE id=%s",
+                    """
+                    SELECT id FROM tender_project_delete_audit
+                    WHERE project_id=%s ORDER BY created_at DESC LIMIT 1
+                    """,
                     (project_id,)
                 )
                 row = cur.fetchone()
-        
-        project_name = row[0] if row else "Unknown"
-        audit_id = f"audit_{uuid.uuid4().hex}"
-        
+        return self._get_audit(row["id"]) if row else None
+
+    def resume_interrupted(self, report: Optional[ProgressReporter] = None) -> List[str]:
+        """
+        续跑所有未完成的删除（服务启动时调用）
+
+        失败的删除同样重试（项目仍处于 deleting 才算），累计执行 MAX_RESUME_ATTEMPTS 次后不再自动重试，
+        项目以删除失败状态出现在项目列表中，由用户重新发起。
+
+        Returns:
+            本次续跑成功的审计记录ID
+        """
         with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    INSERT INTO tender_project_delete_audit
-                      (id, project_id, project_name, status, created_at)
-                    VALUES (%s, %s, %s, %s, NOW())
+                    SELECT a.id FROM tender_project_delete_audit a
+                    WHERE a.status IN ('PENDING', 'RUNNING')
+                       OR (a.status = 'FAILED'
+                           AND COALESCE((a.progress_json->>'attempts')::int, 0) < %s
+                           AND EXISTS (
+                               SELECT 1 FROM tender_projects p WHERE p.id = a.project_id AND p.status = 'deleting'
+                           ))
+                    ORDER BY a.created_at ASC
+                    """,
+                    (MAX_RESUME_ATTEMPTS,)
+                )
+                audit_ids = [row[0] for row in cur.fetchall()]
+
+        resumed = []
+        for audit_id in audit_ids:
+            try:
+                if self.run(audit_id, report)["status"] == "SUCCESS":
+                    resumed.append(audit_id)
+            except Exception as e:
+                logger.error(f"Resume project deletion failed audit={audit_id}: {e}")
+        return resumed
+
+    def _get_audit(self, audit_id: str) -> Optional[Dict[str, Any]]:
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(
+                    """
+                    SELECT id, project_id, project_name, status, error_message, progress_json,
+                           created_at, updated_at, finished_at
+                    FROM tender_project_delete_audit WHERE id=%s
                     """,
-                    (audit_id, project_id, project_name, status)
+                    (audit_id,)
                 )
+                return cur.fetchone()
+
+    def _save_progress(self, cur, audit_id: str, state: Dict[str, Any], status: Optional[str] = None) -> None:
+        """写入进度；cur 不为空时在调用方事务内执行"""
+        sql = """
+            UPDATE tender_project_delete_audit
+            SET progress_json=%s::jsonb, status=COALESCE(%s, status), updated_at=NOW()
+            WHERE id=%s
+        """
+        params = (json.dumps(state), status, audit_id)
+        if cur is not None:
+            cur.execute(sql, params)
+            return
+        with self.pool.connection() as conn:
+            with conn.cursor() as c:
+                c.execute(sql, params)
             conn.commit()
-        
-        return audit_id
-    
+
     def _update_audit(self, audit_id: str, status: str, error_message: Optional[str] = None):
         """更新删除审计记录"""
         with self.pool.connection() as conn:
@@ -162,7 +357,7 @@ class ProjectDeletionOrchestrator:
                 cur.execute(
                     """
                     UPDATE tender_project_delete_audit
-                    SET status=%s, error_message=%s, finished_at=NOW()
+                    SET status=%s, error_message=%s, finished_at=NOW(), updated_at=NOW()
                     WHERE id=%s
                     """,
                     (status, error_message, audit_id)
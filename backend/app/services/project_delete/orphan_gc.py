@@ -0,0 +1,378 @@
+"""
+孤儿数据回收（GC）
+入库部分失败、影子双写、删除中断都会留下无主数据：没有文档的 kb_chunks、
+chunk/segment 已不存在的 Milvus 实体、没有资产记录引用的磁盘文件。它们不会被任何流程清理，
+只会让索引变大、检索变慢。OrphanCollector 跨 Postgres / Milvus Lite / 存储目录对账并回收。
+
+约定：
+- 默认 dry_run，只统计与采样，不删除
+- 只回收早于 min_age_seconds 的数据，避免误删正在入库（已写 chunk、尚未写文档/资产）的数据
+- 删除时按批重新校验孤儿条件；max_deletes_per_sec 限制删除速率，降低对在线检索的影响
+- Web 检索缓存的 chunk（kb_id = __web__）本来就没有 kb_documents 行，不算孤儿
+"""
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+from psycopg_pool import ConnectionPool
+
+from .cleaners import DEFAULT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 与 milvus_lite_store.WEB_KB_ID 一致（此处不导入，避免 dry-run 时也初始化 Milvus 客户端）
+WEB_KB_ID = "__web__"
+
+# 资产文件根目录（与 project_asset_dir 一致）
+DEFAULT_ASSET_ROOT = os.path.join("data", "tender_assets")
+
+# 默认只回收 1 小时前的数据
+DEFAULT_MIN_AGE_SECONDS = 3600
+
+SAMPLE_LIMIT = 10
+
+# 引用磁盘文件的列（表或列不存在时跳过）
+FILE_REFERENCES = {
+    "tender_project_assets": "storage_path",
+    "document_versions": "storage_path",
+    "format_templates": "template_storage_path",
+    "format_template_assets": "storage_path",
+}
+
+
+@dataclass
+class OrphanReport:
+    """一类孤儿数据的回收结果"""
+    kind: str
+    found: int = 0
+    deleted: int = 0
+    samples: List[str] = field(default_factory=list)
+
+    def add_samples(self, items: Iterable[Any]) -> None:
+        for item in items:
+            if len(self.samples) >= SAMPLE_LIMIT:
+                return
+            self.samples.append(str(item))
+
+
+class RateLimiter:
+    """按"每秒删除条数"节流：每批删除前等待，使累计删除速率不超过上限"""
+
+    def __init__(
+        self,
+        max_per_sec: Optional[float],
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_per_sec = max_per_sec
+        self.sleep = sleep
+        self.clock = clock
+        self._next_at: Optional[float] = None
+
+    def wait(self, count: int) -> None:
+        """即将删除 count 条"""
+        if not self.max_per_sec or count <= 0:
+            return
+        now = self.clock()
+        if self._next_at is None or self._next_at < now:
+            self._next_at = now
+        delay = self._next_at - now
+        if delay > 0:
+            self.sleep(delay)
+        self._next_at += count / self.max_per_sec
+
+
+class OrphanCollector:
+    """孤儿数据回收器"""
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        kb_vector_store: Any = None,
+        docseg_vector_store: Any = None,
+        asset_root: str = DEFAULT_ASSET_ROOT,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_deletes_per_sec: Optional[float] = None,
+        min_age_seconds: int = DEFAULT_MIN_AGE_SECONDS,
+        dry_run: bool = True,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.pool = pool
+        self._kb_vector_store = kb_vector_store
+        self._docseg_vector_store = docseg_vector_store
+        self.asset_root = asset_root
+        self.batch_size = batch_size
+        self.min_age_seconds = min_age_seconds
+        self.dry_run = dry_run
+        self.limiter = RateLimiter(max_deletes_per_sec, sleep=sleep)
+
+    @property
+    def kb_vector_store(self):
+        if self._kb_vector_store is None:
+            from app.services.vectorstore.milvus_lite_store import milvus_store
+            self._kb_vector_store = milvus_store
+        return self._kb_vector_store
+
+    @property
+    def docseg_vector_store(self):
+        if self._docseg_vector_store is None:
+            from app.services.vectorstore.milvus_docseg_store import milvus_docseg_store
+            self._docseg_vector_store = milvus_docseg_store
+        return self._docseg_vector_store
+
+    def run(self) -> List[OrphanReport]:
+        """
+        依次回收 kb_chunks → Milvus chunk 向量 → Milvus 分片向量 → 磁盘文件
+
+        先删 kb_chunks，其向量随即在下一步成为孤儿被一并回收。
+        """
+        reports = [
+            self.collect_kb_chunks(),
+            self.collect_chunk_vectors(),
+            self.collect_segment_vectors(),
+            self.collect_files(),
+        ]
+        for report in reports:
+            logger.info(
+                f"Orphan GC {report.kind}: found={report.found} deleted={report.deleted} dry_run={self.dry_run}"
+            )
+        return reports
+
+    # ==================== kb_chunks ====================
+
+    # 孤儿 chunk：文档已不存在，且不是 Web 缓存、早于 min_age
+    _ORPHAN_CHUNK_WHERE = """
+        c.kb_id <> %(web)s
+        AND c.created_at < NOW() - make_interval(secs => %(min_age)s)
+        AND NOT EXISTS (SELECT 1 FROM kb_documents d WHERE d.id = c.doc_id)
+    """
+
+    def collect_kb_chunks(self) -> OrphanReport:
+        """没有 kb_documents 的 kb_chunks"""
+        report = OrphanReport(kind="kb_chunks")
+        params = {"web": WEB_KB_ID, "min_age": self.min_age_seconds}
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT c.kb_id, c.doc_id, COUNT(*)
+                    FROM kb_chunks c
+                    WHERE {self._ORPHAN_CHUNK_WHERE}
+                    GROUP BY c.kb_id, c.doc_id
+                    ORDER BY COUNT(*) DESC
+                    """,
+                    params,
+                )
+                rows = cur.fetchall()
+        report.found = sum(row[2] for row in rows)
+        report.add_samples(f"{row[0]}/{row[1]} ({row[2]})" for row in rows)
+        if self.dry_run or not report.found:
+            return report
+
+        while True:
+            self.limiter.wait(min(self.batch_size, report.found - report.deleted))
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        DELETE FROM kb_chunks WHERE chunk_id IN (
+                            SELECT c.chunk_id FROM kb_chunks c
+                            WHERE {self._ORPHAN_CHUNK_WHERE}
+                            LIMIT %(limit)s
+                        )
+                        """,
+                        {**params, "limit": self.batch_size},
+                    )
+                    count = cur.rowcount
+                conn.commit()
+            report.deleted += count
+            if count < self.batch_size:
+                return report
+
+    # ==================== Milvus ====================
+
+    def collect_chunk_vectors(self) -> OrphanReport:
+        """chunk_id 已不在有效 kb_chunks 中的 chunks_dense_v1 实体"""
+        return self._collect_vectors("milvus_chunks", self.kb_vector_store, "chunk_id", self._live_chunk_ids)
+
+    def collect_segment_vectors(self) -> OrphanReport:
+        """segment_id 已不在 doc_segments 中的 doc_segments_v1 实体"""
+        return self._collect_vectors("milvus_segments", self.docseg_vector_store, "segment_id", self._live_segment_ids)
+
+    def _collect_vectors(
+        self,
+        kind: str,
+        store: Any,
+        id_field: str,
+        live_ids: Callable[[List[str]], Set[str]],
+    ) -> OrphanReport:
+        """
+        按主键分页遍历集合，每页批量回查 Postgres，删除不存在的实体
+
+        入库先写 Postgres 再写 Milvus，所以没有对应行的实体不会是写入中的数据，无需 min_age。
+        """
+        report = OrphanReport(kind=kind)
+        for page in store.iter_entities([id_field], batch_size=self.batch_size):
+            ids = [e[id_field] for e in page if e.get(id_field)]
+            alive = live_ids(ids) if ids else set()
+            orphans = [e for e in page if e.get(id_field) not in alive]
+            if not orphans:
+                continue
+            report.found += len(orphans)
+            report.add_samples(e.get(id_field) or f"pk={e['pk']}" for e in orphans)
+            if not self.dry_run:
+                self.limiter.wait(len(orphans))
+                report.deleted += store.delete_by_pks([e["pk"] for e in orphans])
+        return report
+
+    def _live_chunk_ids(self, chunk_ids: List[str]) -> Set[str]:
+        # 与 collect_kb_chunks 的孤儿条件互补：dry-run 时两者统计口径一致
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT c.chunk_id FROM kb_chunks c
+                    WHERE c.chunk_id = ANY(%(ids)s)
+                      AND (c.kb_id = %(web)s
+                           OR c.created_at >= NOW() - make_interval(secs => %(min_age)s)
+                           OR EXISTS (SELECT 1 FROM kb_documents d WHERE d.id = c.doc_id))
+                    """,
+                    {"ids": chunk_ids, "web": WEB_KB_ID, "min_age": self.min_age_seconds},
+                )
+                return {row[0] for row in cur.fetchall()}
+
+    def _live_segment_ids(self, segment_ids: List[str]) -> Set[str]:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM doc_segments WHERE id = ANY(%s)", (segment_ids,))
+                return {row[0] for row in cur.fetchall()}
+
+    # ==================== 磁盘文件 ====================
+
+    def collect_files(self) -> OrphanReport:
+        """
+        资产目录下没有任何记录引用的文件
+
+        仍存在的项目如果有 storage_path 为空的资产，TenderService 会从项目目录里挑文件回填，
+        这类项目目录下的文件一律保留。格式模板的 template_storage_path 为空时，
+        TenderService 按 template_sha256 在资产目录的 template_*.docx 中回溯，哈希命中的文件同样保留。
+        已删除项目的空目录一并移除。
+        """
+        report = OrphanReport(kind="files")
+        if not os.path.isdir(self.asset_root):
+            return report
+
+        referenced = self._referenced_paths()
+        live_projects, recoverable_projects = self._project_ids()
+        template_sha256s = self._recoverable_template_sha256s()
+        cutoff = time.time() - self.min_age_seconds
+
+        for project_id in sorted(os.listdir(self.asset_root)):
+            project_dir = os.path.join(self.asset_root, project_id)
+            if not os.path.isdir(project_dir) or project_id in recoverable_projects:
+                continue
+            for root, _dirs, files in os.walk(project_dir):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if os.path.abspath(path) in referenced:
+                        continue
+                    try:
+                        if os.path.getmtime(path) >= cutoff:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    if template_sha256s and self._is_recoverable_template(path, template_sha256s):
+                        continue
+                    report.found += 1
+                    report.add_samples(path)
+                    if self.dry_run:
+                        continue
+                    self.limiter.wait(1)
+                    try:
+                        os.remove(path)
+                        report.deleted += 1
+                    except FileNotFoundError:
+                        pass
+            if not self.dry_run and project_id not in live_projects:
+                self._remove_empty_dirs(project_dir)
+        return report
+
+    def _referenced_paths(self) -> Set[str]:
+        paths: Set[str] = set()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                # 旧库可能未执行新增列的迁移，只查实际存在的列
+                cur.execute(
+                    """
+                    SELECT table_name, column_name FROM information_schema.columns
+                    WHERE table_schema = ANY(current_schemas(false))
+                      AND (table_name, column_name) IN (SELECT * FROM unnest(%s::text[], %s::text[]))
+                    """,
+                    (list(FILE_REFERENCES), list(FILE_REFERENCES.values())),
+                )
+                columns = cur.fetchall()
+                for table, column in columns:
+                    cur.execute(f"SELECT {column} FROM {table} WHERE COALESCE({column}, '') <> ''")
+                    paths.update(os.path.abspath(row[0]) for row in cur.fetchall())
+        return paths
+
+    def _recoverable_template_sha256s(self) -> Set[str]:
+        """template_storage_path 为空（或旧库还没有该列）的格式模板的 template_sha256"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = ANY(current_schemas(false))
+                      AND table_name = 'format_templates'
+                      AND column_name IN ('template_sha256', 'template_storage_path')
+                    """
+                )
+                columns = {row[0] for row in cur.fetchall()}
+                if "template_sha256" not in columns:
+                    return set()
+                where = "COALESCE(template_sha256, '') <> ''"
+                if "template_storage_path" in columns:
+                    where += " AND COALESCE(template_storage_path, '') = ''"
+                cur.execute(f"SELECT DISTINCT template_sha256 FROM format_templates WHERE {where}")
+                return {row[0] for row in cur.fetchall()}
+
+    @staticmethod
+    def _is_recoverable_template(path: str, sha256s: Set[str]) -> bool:
+        """与 TenderService._find_docx_by_sha256 的候选条件一致：文件名含 template_ 的 docx 且哈希命中"""
+        name = os.path.basename(path)
+        if "template_" not in name or not name.lower().endswith(".docx"):
+            return False
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError:
+            return True  # 读不了就不删
+        return digest.hexdigest() in sha256s
+
+    def _project_ids(self) -> Tuple[Set[str], Set[str]]:
+        """(仍存在的项目, 其中有 storage_path 为空的资产、可能从磁盘回填的项目)"""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM tender_projects")
+                live = {row[0] for row in cur.fetchall()}
+                cur.execute(
+                    "SELECT DISTINCT project_id FROM tender_project_assets "
+                    "WHERE kind IN ('tender', 'template') AND COALESCE(storage_path, '') = ''"
+                )
+                recoverable = {row[0] for row in cur.fetchall()}
+        return live, recoverable & live
+
+    @staticmethod
+    def _remove_empty_dirs(top: str) -> None:
+        for root, _dirs, _files in os.walk(top, topdown=False):
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass  # 非空
+
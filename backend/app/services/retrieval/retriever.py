@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
 from typing import List, Optional
 
+from app.core.telemetry import span, traced
 from app.schemas.intent import Anchor
 from app.services.dao import kb_dao
 from app.services.embedding.http_embedding_client import embed_texts
@@ -20,6 +22,7 @@ from app.services.logging.request_logger import (
 logger = logging.getLogger(__name__)
 
 
+@traced("retrieval.kb")
 async def retrieve(
     query: str,
     kb_ids: Optional[List[str]],
@@ -52,30 +55,40 @@ async def retrieve(
     dense_hits: List[dict] = []
     lexical_hits: List[dict] = []
 
-    try:
-        dense_hits = milvus_store.search_dense(
-            query_dense,
-            limit=dense_topk,
-            kb_ids=kb_ids,
-            kb_categories=kb_categories,
-            request_id=request_id,
-        )
-    except Exception as exc:  # noqa: BLE001
-        req_logger.error("Milvus dense 检索失败: %s", exc)
+    with span("retrieval.kb.dense", limit=dense_topk) as leg:
+        try:
+            # Milvus / Postgres 客户端是同步的，放到线程里执行，避免阻塞事件循环、使并发检索真正重叠
+            dense_hits = await asyncio.to_thread(
+                milvus_store.search_dense,
+                query_dense,
+                limit=dense_topk,
+                kb_ids=kb_ids,
+                kb_categories=kb_categories,
+                request_id=request_id,
+            )
+        except Exception as exc:  # noqa: BLE001
+            req_logger.error("Milvus dense 检索失败: %s", exc)
+            leg.set_attribute("error", str(exc)[:200])
+        leg.set_attribute("hits", len(dense_hits))
 
-    try:
-        lexical_hits = search_lexical(
-            query,
-            kb_ids,
-            kb_categories,
-            anchors,
-            topk=lexical_topk,
-            request_id=request_id,
-        )
-    except Exception as exc:  # noqa: BLE001
-        req_logger.error("Postgres lexical 检索失败: %s", exc)
+    with span("retrieval.kb.lexical", limit=lexical_topk) as leg:
+        try:
+            lexical_hits = await asyncio.to_thread(
+                search_lexical,
+                query,
+                kb_ids,
+                kb_categories,
+                anchors,
+                topk=lexical_topk,
+                request_id=request_id,
+            )
+        except Exception as exc:  # noqa: BLE001
+            req_logger.error("Postgres lexical 检索失败: %s", exc)
+            leg.set_attribute("error", str(exc)[:200])
+        leg.set_attribute("hits", len(lexical_hits))
 
-    fused = rrf_fuse(dense_hits, lexical_hits, topn=final_topk)
+    with span("retrieval.kb.fuse"):
+        fused = rrf_fuse(dense_hits, lexical_hits, topn=final_topk)
     if not fused:
         req_logger.warning("Retrieval no evidence dense=%s lexical=%s", len(dense_hits), len(lexical_hits))
         return [], {
@@ -85,7 +98,8 @@ async def retrieve(
         }
 
     chunk_ids = [hit["chunk_id"] for hit in fused]
-    chunk_map = kb_dao.get_chunks_by_ids(chunk_ids)
+    with span("retrieval.kb.load_chunks", chunks=len(chunk_ids)):
+        chunk_map = await asyncio.to_thread(kb_dao.get_chunks_by_ids, chunk_ids)
 
     results: List[dict] = []
     for hit in fused:
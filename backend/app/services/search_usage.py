@@ -1,59 +1,109 @@
 import json
+import logging
 import os
+import sqlite3
 from datetime import datetime, timezone
 from typing import Tuple, Callable
 from fastapi import HTTPException
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# 单条语句完成"未达上限则 +1"：SQLite 对写操作加库级锁，多线程/多 worker 进程共享同一文件时计数不丢、不超限
+_REGISTER_SQL = """
+    INSERT INTO search_usage (day, count) VALUES (?, 1)
+    ON CONFLICT(day) DO UPDATE SET count = count + 1 WHERE count < ?
+    RETURNING count
+"""
 
 
 class SearchUsageManager:
+    """
+    每日联网搜索计数
+
+    计数保存在 SQLite 文件中（storage_path；旧配置指向 .json 时改用同名 .db，并导入旧文件中的计数；
+    .db 尚不存在时同样导入旁边的同名 .json，默认配置从 search_usage.json 升级后计数不丢）。
+    """
+
     def __init__(
         self,
         storage_path: str,
         default_warn: int,
         default_limit: int,
         clock: Callable[[], datetime] | None = None,
+        busy_timeout: float = 10.0,
     ):
+        legacy_json = None
+        base, ext = os.path.splitext(storage_path)
+        if ext == ".json":
+            legacy_json = storage_path
+            storage_path = base + ".db"
+        elif ext == ".db" and not os.path.exists(storage_path):
+            legacy_json = base + ".json"
         self.storage_path = storage_path
         self.default_warn = default_warn
         self.default_limit = default_limit
         self.clock = clock or (lambda: datetime.now(timezone.utc))
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
+        self.busy_timeout = busy_timeout
+        os.makedirs(os.path.dirname(self.storage_path) or ".", exist_ok=True)
+        self._init_db(legacy_json)
+
+    def _connect(self) -> sqlite3.Connection:
+        # autocommit：每条语句自成事务，不在连接上长时间持锁
+        return sqlite3.connect(self.storage_path, timeout=self.busy_timeout, isolation_level=None)
 
-    def _load(self) -> dict:
-        if not os.path.exists(self.storage_path):
-            return {}
+    def _init_db(self, legacy_json: str | None) -> None:
+        conn = self._connect()
         try:
-            with open(self.storage_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS search_usage (day TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+            if legacy_json and os.path.exists(legacy_json):
+                self._import_legacy(conn, legacy_json)
+        finally:
+            conn.close()
 
-    def _save(self, data: dict) -> None:
-        tmp_path = f"{self.storage_path}.tmp"
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, self.storage_path)
+    @staticmethod
+    def _import_legacy(conn: sqlite3.Connection, path: str) -> None:
+        """导入旧版 JSON 计数（已存在的日期不覆盖，重复执行无副作用）"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            rows = [(str(day), int(count)) for day, count in data.items()]
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Skip legacy search usage file %s: %s", path, exc)
+            return
+        conn.executemany("INSERT OR IGNORE INTO search_usage (day, count) VALUES (?, ?)", rows)
 
     def _today_key(self) -> str:
         return self.clock().strftime("%Y-%m-%d")
 
+    def get_count(self, day: str | None = None) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT count FROM search_usage WHERE day = ?", (day or self._today_key(),)
+            ).fetchone()
+        finally:
+            conn.close()
+        return int(row[0]) if row else 0
+
     def register_search(self, warn: int | None = None, limit: int | None = None) -> Tuple[int, bool]:
         warn_threshold = warn or self.default_warn
         max_limit = limit or self.default_limit
-        today = self._today_key()
-        data = self._load()
-        count = int(data.get(today, 0))
-        if count >= max_limit:
+        row = None
+        if max_limit > 0:
+            conn = self._connect()
+            try:
+                row = conn.execute(_REGISTER_SQL, (self._today_key(), max_limit)).fetchone()
+            finally:
+                conn.close()
+        if row is None:
             raise HTTPException(
                 status_code=429,
                 detail=f"今日联网搜索已达 {max_limit} 次上限，请明日再试。",
             )
-        count += 1
-        data[today] = count
-        self._save(data)
+        count = int(row[0])
         warn_triggered = count >= warn_threshold
         return count, warn_triggered
 
@@ -63,4 +113,3 @@ usage_manager = SearchUsageManager(
     default_warn=settings.SEARCH_DAILY_WARN,
     default_limit=settings.SEARCH_DAILY_LIMIT,
 )
-
@@ -0,0 +1,109 @@
+"""
+TenderService 使用的同步 LLM 调用包装
+API 进程（app.state.llm_orchestrator）与 RQ Worker 共用同一实现
+"""
+import logging
+
+import httpx
+
+from app.core.telemetry import traced
+
+from .llm_client import get_default_llm_model, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+
+# LLM Orchestrator 包装器 - 用于 TenderService
+class SimpleLLMOrchestrator:
+    """简单的 LLM orchestrator 包装器，兼容 TenderService 的 duck typing 接口"""
+    
+    @traced("llm.request", kind="sync")
+    def chat(self, messages: list, model_id: str = None, **kwargs) -> dict:
+        """调用 LLM 生成回答（同步版本）"""
+        try:
+            # 获取模型配置
+            if model_id:
+                from .llm_client import get_llm_model_by_id
+                model = get_llm_model_by_id(model_id)
+            else:
+                model = get_default_llm_model()
+            
+            if not model:
+                logger.error("No LLM model available")
+                return {"choices": [{"message": {"content": "Error: No LLM model configured"}}]}
+            
+            # 构建请求 URL
+            base_url = model.base_url.rstrip("/")
+            endpoint_path = model.endpoint_path or "/v1/chat/completions"
+            
+            # 判断请求类型
+            if "ollama" in base_url.lower():
+                # Ollama 格式
+                endpoint = f"{base_url}/api/chat"
+                payload = {
+                    "model": model.model,
+                    "messages": messages,
+                    "stream": False,
+                }
+                # 应用覆盖参数
+                if kwargs:
+                    options = {}
+                    if "temperature" in kwargs:
+                        options["temperature"] = kwargs["temperature"]
+                    if "max_tokens" in kwargs:
+                        options["num_predict"] = kwargs["max_tokens"]
+                    if options:
+                        payload["options"] = options
+            else:
+                # OpenAI 兼容格式
+                endpoint = f"{base_url}{endpoint_path}"
+                payload = {
+                    "model": model.model,
+                    "messages": messages,
+                    "stream": False,
+                }
+                # 应用覆盖参数
+                if kwargs:
+                    if "temperature" in kwargs:
+                        payload["temperature"] = kwargs["temperature"]
+                    if "max_tokens" in kwargs:
+                        payload["max_tokens"] = kwargs["max_tokens"]
+                    if "top_p" in kwargs:
+                        payload["top_p"] = kwargs["top_p"]
+            
+            # 准备请求头
+            headers = {"Content-Type": "application/json"}
+            if model.api_key:
+                headers["Authorization"] = f"Bearer {model.api_key}"
+            
+            # 发送同步请求（增加超时时间到300秒，用于处理大文本）
+            with httpx.Client(timeout=300.0) as client:
+                response = client.post(endpoint, json=payload, headers=headers)
+                response.raise_for_status()
+                result = response.json()
+            record_llm_usage(model.model, result)
+            
+            # 返回统一格式
+            if "choices" in result:
+                return result
+            elif "message" in result:  # Ollama 格式
+                return {
+                    "choices": [{
+                        "message": {
+                            "content": result["message"].get("content", "")
+                        }
+                    }]
+                }
+            else:
+                logger.warning(f"Unexpected LLM response format: {result}")
+                return {"choices": [{"message": {"content": str(result)}}]}
+                
+        except Exception as e:
+            logger.error(f"LLM call failed: {e}", exc_info=True)
+            # 抛出异常而不是返回错误消息，让上层捕获
+            raise RuntimeError(f"LLM call failed: {str(e)}") from e
+    
+    # 为兼容性提供别名
+    complete = chat
+    generate = chat
+    run = chat
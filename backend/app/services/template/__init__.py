@@ -16,7 +16,8 @@ from .template_spec import (
     create_minimal_spec,
 )
 from .spec_validator import TemplateSpecValidator, SchemaValidationException, get_validator
-from .llm_analyzer import TemplateLlmAnalyzer, TemplateAnalysisCache, get_analysis_cache
+from .llm_analyzer import TemplateLlmAnalyzer
+from .analysis_cache import TemplateAnalysisCache, get_analysis_cache
 
 __all__ = [
     "BlockType",
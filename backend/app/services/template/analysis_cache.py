@@ -0,0 +1,218 @@
+"""
+模板分析缓存
+Postgres 持久化（template_analysis_cache 表，跨进程 / 跨重启共享）+ 进程内 LRU。
+
+缓存两类结果：
+- spec：TemplateLlmAnalyzer 生成的 TemplateSpec JSON，键 (sha256, 分析器版本, 模型)
+- extract：DocxBlockExtractor 抽取结果，键 (sha256, 抽取器版本, 抽取参数)
+
+版本号是键的一部分，版本升级后旧条目自然不再命中；
+每个进程首次访问某个版本时会顺带清理数据库中其他版本、且超过 stale_ttl_seconds 未被命中的条目。
+滚动发布期间新旧进程并存，旧版本条目仍在被旧进程命中（last_hit_at 持续刷新），不会被新进程删掉。
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+
+from psycopg_pool import ConnectionPool
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_KIND_SPEC = "spec"
+CACHE_KIND_EXTRACT = "extract"
+
+_CacheKey = Tuple[str, str, str, str]
+
+# 其他版本的条目超过该时长未命中才清理（默认 7 天）
+DEFAULT_STALE_TTL_SECONDS = 7 * 24 * 3600
+
+
+class TemplateAnalysisCache:
+    """模板分析缓存（基于 SHA256，Postgres + LRU 两级）"""
+
+    def __init__(
+        self,
+        pool: Optional[ConnectionPool] = None,
+        memory_size: int = 128,
+        stale_ttl_seconds: int = DEFAULT_STALE_TTL_SECONDS,
+    ):
+        self.pool = pool
+        self.memory_size = max(0, int(memory_size))
+        self.stale_ttl_seconds = max(0, int(stale_ttl_seconds))
+        self._memory: "OrderedDict[_CacheKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_versions: Set[Tuple[str, str]] = set()
+
+    def attach_pool(self, pool: Optional[ConnectionPool]) -> None:
+        """绑定数据库连接池（未绑定时只使用内存缓存）"""
+        if pool is not None and self.pool is None:
+            self.pool = pool
+
+    def get_cache_key(self, sha256: str, analyzer_version: str, model: str) -> str:
+        """生成缓存键（兼容旧接口）"""
+        return f"{sha256}:{analyzer_version}:{model}"
+
+    # ==================== TemplateSpec ====================
+
+    def get(self, sha256: str, analyzer_version: str, model: str) -> Optional[str]:
+        """获取缓存的 spec JSON"""
+        return self._get(CACHE_KIND_SPEC, sha256, analyzer_version, model)
+
+    def set(self, sha256: str, analyzer_version: str, model: str, spec_json: str):
+        """写入 spec JSON"""
+        self._set(CACHE_KIND_SPEC, sha256, analyzer_version, model, spec_json)
+
+    # ==================== DocxExtractResult ====================
+
+    def get_extract(self, sha256: str, extractor_version: str, params: str) -> Optional[str]:
+        """获取缓存的抽取结果 JSON（params 为抽取参数签名，如 "400x300"）"""
+        return self._get(CACHE_KIND_EXTRACT, sha256, extractor_version, params)
+
+    def set_extract(self, sha256: str, extractor_version: str, params: str, extract_json: str):
+        """写入抽取结果 JSON"""
+        self._set(CACHE_KIND_EXTRACT, sha256, extractor_version, params, extract_json)
+
+    # ==================== 管理 ====================
+
+    def clear(self, persistent: bool = False):
+        """清空内存缓存（persistent=True 时同时清空数据库）"""
+        with self._lock:
+            self._memory.clear()
+            self._purged_versions.clear()
+        if persistent and self.pool is not None:
+            try:
+                with self.pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("DELETE FROM template_analysis_cache")
+            except Exception as e:
+                logger.warning(f"[template_cache] clear failed: {e}")
+
+    def purge_stale(self, kind: str, current_version: str, ttl_seconds: Optional[int] = None) -> int:
+        """
+        删除数据库中 kind 类型、版本不等于 current_version 且超过 ttl_seconds 未命中的条目，返回删除数
+
+        ttl_seconds 默认取 stale_ttl_seconds；传 0 立即清理所有其他版本（确认旧版本进程已全部下线后手动执行）。
+        """
+        if self.pool is None:
+            return 0
+        ttl = self.stale_ttl_seconds if ttl_seconds is None else max(0, int(ttl_seconds))
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        DELETE FROM template_analysis_cache
+                        WHERE cache_kind=%s AND analyzer_version<>%s
+                          AND last_hit_at < now() - make_interval(secs => %s)
+                        """,
+                        (kind, current_version, ttl),
+                    )
+                    deleted = cur.rowcount or 0
+        except Exception as e:
+            logger.warning(f"[template_cache] purge stale failed kind={kind}: {e}")
+            return 0
+        if deleted:
+            logger.info(f"[template_cache] purged {deleted} stale entries kind={kind} current_version={current_version}")
+        return deleted
+
+    # ==================== 内部实现 ====================
+
+    def _get(self, kind: str, sha256: str, version: str, model: str) -> Optional[str]:
+        key = (kind, sha256, version, model or "")
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+
+        if self.pool is None:
+            return None
+
+        self._purge_once(kind, version)
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        UPDATE template_analysis_cache
+                        SET last_hit_at=now(), hit_count=hit_count+1
+                        WHERE cache_kind=%s AND template_sha256=%s AND analyzer_version=%s AND model=%s
+                        RETURNING payload_json
+                        """,
+                        key,
+                    )
+                    row = cur.fetchone()
+        except Exception as e:
+            logger.warning(f"[template_cache] db get failed kind={kind} sha256={sha256[:12]}: {e}")
+            return None
+
+        if not row:
+            return None
+        value = row[0]
+        self._remember(key, value)
+        return value
+
+    def _set(self, kind: str, sha256: str, version: str, model: str, payload: str) -> None:
+        key = (kind, sha256, version, model or "")
+        self._remember(key, payload)
+
+        if self.pool is None:
+            return
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """
+                        INSERT INTO template_analysis_cache
+                            (cache_kind, template_sha256, analyzer_version, model, payload_json)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (cache_kind, template_sha256, analyzer_version, model)
+                        DO UPDATE SET payload_json=EXCLUDED.payload_json, created_at=now(), last_hit_at=now()
+                        """,
+                        (*key, payload),
+                    )
+        except Exception as e:
+            logger.warning(f"[template_cache] db set failed kind={kind} sha256={sha256[:12]}: {e}")
+
+    def _remember(self, key: _CacheKey, value: str) -> None:
+        if self.memory_size <= 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _purge_once(self, kind: str, version: str) -> None:
+        marker = (kind, version)
+        with self._lock:
+            if marker in self._purged_versions:
+                return
+            self._purged_versions.add(marker)
+        self.purge_stale(kind, version)
+
+
+# 全局缓存实例
+_cache_instance: Optional[TemplateAnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache(pool: Optional[ConnectionPool] = None) -> TemplateAnalysisCache:
+    """获取缓存单例（首次传入 pool 时启用持久化）"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            settings = get_settings()
+            _cache_instance = TemplateAnalysisCache(
+                pool=pool,
+                memory_size=settings.TEMPLATE_LLM_ANALYSIS_CACHE_MEMORY_SIZE,
+                stale_ttl_seconds=settings.TEMPLATE_LLM_ANALYSIS_CACHE_STALE_TTL_HOURS * 3600,
+            )
+        else:
+            _cache_instance.attach_pool(pool)
+    return _cache_instance
@@ -4,22 +4,23 @@ DocxBlockExtractor - 确定性结构化解析 Word 文档
 """
 from __future__ import annotations
 
+import json
 import re
 import uuid
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 from typing import Dict, List, Optional, Any
 
 from docx import Document
 from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl
-from docx.table import Table
 from docx.text.paragraph import Paragraph
 from docx.oxml.ns import nsmap
 
-from app.services.docx_style_utils import guess_heading_level
+from app.services.docx_body_scanner import DocxBodyItem, scan_body_element, styles_of_document
+
+# 抽取逻辑版本：修改 blocks / stats 的产出方式时递增，使持久化的抽取缓存失效
+EXTRACTOR_VERSION = "1"
 
 
 class BlockType(str, Enum):
@@ -61,6 +62,37 @@ class DocxExtractResult:
     header_footer_media: Dict[str, Any] = field(default_factory=dict)  # 页眉页脚图片/LOGO信息
     tags_by_block_id: Dict[str, str] = field(default_factory=dict)  # block_id -> TOC/INSTRUCTION/COLOR_SWATCH/NORMAL
 
+    def to_json(self) -> str:
+        """序列化（用于持久化抽取缓存）"""
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text: str) -> "DocxExtractResult":
+        """反序列化（与 to_json 对应）"""
+        data = json.loads(text)
+        blocks = []
+        for b in data.get("blocks") or []:
+            b = dict(b)
+            b["type"] = BlockType(b["type"])
+            blocks.append(DocxBlock(**b))
+
+        # 编号统计的键为 int，JSON 往返后需要还原
+        numbering_stats = dict(data.get("numbering_stats") or {})
+        for key in ("numbering_count", "level_count"):
+            if isinstance(numbering_stats.get(key), dict):
+                numbering_stats[key] = {int(k): v for k, v in numbering_stats[key].items()}
+
+        return cls(
+            blocks=blocks,
+            style_stats=data.get("style_stats") or {},
+            numbering_stats=numbering_stats,
+            header_footer_stats=data.get("header_footer_stats") or {},
+            style_catalog=data.get("style_catalog") or {},
+            instructions_text=data.get("instructions_text") or "",
+            header_footer_media=data.get("header_footer_media") or {},
+            tags_by_block_id=data.get("tags_by_block_id") or {},
+        )
+
 
 class DocxBlockExtractor:
     """Word 文档块提取器"""
@@ -143,20 +175,18 @@ class DocxBlockExtractor:
             result.style_catalog = {}
         
         # 1. 提取主体内容（段落和表格）
+        #    复用已加载的 body / styles，与其他模块共用同一套扫描语义
         blocks = []
-        for element in doc.element.body:
-            if isinstance(element, CT_P):
-                para = Paragraph(element, doc)
-                block = self._extract_paragraph(para, sequence, max_chars_per_block)
-                if block:
-                    blocks.append(block)
-                    sequence += 1
-            elif isinstance(element, CT_Tbl):
-                table = Table(element, doc)
-                block = self._extract_table(table, sequence, max_chars_per_block)
-                if block:
-                    blocks.append(block)
-                    sequence += 1
+        for item in scan_body_element(doc.element.body, styles_of_document(doc)):
+            if item.is_paragraph:
+                block = self._extract_paragraph(item, sequence, max_chars_per_block)
+            elif item.is_table:
+                block = self._extract_table(item, sequence, max_chars_per_block)
+            else:
+                continue
+            if block:
+                blocks.append(block)
+                sequence += 1
         
         # 2. 提取页眉页脚
         for section in doc.sections:
@@ -465,46 +495,21 @@ class DocxBlockExtractor:
 
     def _extract_paragraph(
         self,
-        para: Paragraph,
+        para: DocxBodyItem,
         sequence: int,
         max_chars: int
     ) -> Optional[DocxBlock]:
         """提取段落块"""
         full_text = para.text.strip()
         
-        # 过滤空段落（但保留可能的分隔符）
-        if not full_text and not self._is_separator_paragraph(para):
+        # 过滤空段落（但保留可能的分隔符：有边框样式的段落，如水平线）
+        if not full_text and not para.has_border:
             return None
         
-        # 获取样式信息
-        style_id = para.style.style_id if para.style else None
-        style_name = para.style.name if para.style else None
-        
-        # 获取大纲级别
-        outline_level = None
-        try:
-            lvl = guess_heading_level(para)  # 1-based
-            outline_level = (lvl - 1) if lvl is not None else None  # 与历史字段保持一致：0-based
-        except Exception:
-            # 任何异常都不能中断整个 extract
-            outline_level = None
-        
-        # 获取编号信息
-        num_id = None
-        ilvl = None
-        try:
-            vals = para._p.xpath("./w:pPr/w:numPr/w:numId/@w:val", namespaces=nsmap)
-            if vals:
-                num_id = int(vals[0])
-            vals = para._p.xpath("./w:pPr/w:numPr/w:ilvl/@w:val", namespaces=nsmap)
-            if vals:
-                ilvl = int(vals[0])
-        except Exception:
-            num_id = None
-            ilvl = None
-        
-        # 检查分页符
-        is_page_break = self._has_page_break(para)
+        # 大纲级别：扫描时已按 guess_heading_level 推断（1-based）
+        # 与历史字段保持一致：0-based
+        lvl = para.heading_level
+        outline_level = (lvl - 1) if lvl is not None else None
         
         # 计算 tag（在截断前）
         tag = "NORMAL"
@@ -523,32 +528,33 @@ class DocxBlockExtractor:
             type=BlockType.PARAGRAPH,
             text=text,
             tag=tag,
-            style_id=style_id,
-            style_name=style_name,
+            style_id=para.style_id,
+            style_name=para.style_name,
             outline_level=outline_level,
-            num_id=num_id,
-            ilvl=ilvl,
-            is_page_break_before=is_page_break,
+            num_id=para.num_id,
+            ilvl=para.ilvl,
+            is_page_break_before=para.page_break_before,
             sequence=sequence
         )
 
     def _extract_table(
         self,
-        table: Table,
+        table: DocxBodyItem,
         sequence: int,
         max_chars: int
     ) -> Optional[DocxBlock]:
         """提取表格块"""
         rows = len(table.rows)
-        cols = len(table.columns) if table.rows else 0
+        cols = table.col_count if table.rows else 0
         
         if rows == 0 or cols == 0:
             return None
         
         # 提取表格文本（前几行）
+        head_rows = table.cell_texts(max_rows=3)  # 只取前3行
         text_parts = []
-        for i, row in enumerate(table.rows[:3]):  # 只取前3行
-            row_text = " | ".join(cell.text.strip() for cell in row.cells)
+        for row in head_rows:
+            row_text = " | ".join(cell.strip() for cell in row)
             text_parts.append(row_text)
         
         full_text = "\n".join(text_parts)
@@ -566,9 +572,8 @@ class DocxBlockExtractor:
         # 判断首行是否为表头
         is_header_row = False
         if rows > 1:
-            first_row = table.rows[0]
-            # 简单启发式：首行单元格都有内容且字体加粗
-            is_header_row = all(cell.text.strip() for cell in first_row.cells)
+            # 简单启发式：首行单元格都有内容
+            is_header_row = all(cell.strip() for cell in head_rows[0])
         
         table_meta = {
             "rows": rows,
@@ -609,23 +614,6 @@ class DocxBlockExtractor:
             sequence=sequence
         )
 
-    def _is_separator_paragraph(self, para: Paragraph) -> bool:
-        """判断是否为分隔符段落（如水平线）"""
-        # 简单实现：检查是否有边框样式（避免直接访问 pPr.pBdr）
-        try:
-            nodes = para._p.xpath("./w:pPr/w:pBdr", namespaces=nsmap)
-            return bool(nodes)
-        except Exception:
-            return False
-
-    def _has_page_break(self, para: Paragraph) -> bool:
-        """检查段落前是否有分页符"""
-        try:
-            nodes = para._p.xpath("./w:pPr/w:pageBreakBefore", namespaces=nsmap)
-            return bool(nodes)
-        except Exception:
-            return False
-
     def _denoise_and_prioritize(
         self,
         blocks: List[DocxBlock],
@@ -509,40 +509,3 @@ class TemplateLlmAnalyzer:
             return json_text
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON: {e}")
-
-
-class TemplateAnalysisCache:
-    """模板分析缓存（基于 SHA256）"""
-
-    def __init__(self):
-        self._cache: dict[str, str] = {}  # key: sha256+version, value: spec_json
-
-    def get_cache_key(self, sha256: str, analyzer_version: str, model: str) -> str:
-        """生成缓存键"""
-        return f"{sha256}:{analyzer_version}:{model}"
-
-    def get(self, sha256: str, analyzer_version: str, model: str) -> Optional[str]:
-        """获取缓存"""
-        key = self.get_cache_key(sha256, analyzer_version, model)
-        return self._cache.get(key)
-
-    def set(self, sha256: str, analyzer_version: str, model: str, spec_json: str):
-        """设置缓存"""
-        key = self.get_cache_key(sha256, analyzer_version, model)
-        self._cache[key] = spec_json
-
-    def clear(self):
-        """清空缓存"""
-        self._cache.clear()
-
-
-# 全局缓存实例
-_cache_instance: Optional[TemplateAnalysisCache] = None
-
-
-def get_analysis_cache() -> TemplateAnalysisCache:
-    """获取缓存单例"""
-    global _cache_instance
-    if _cache_instance is None:
-        _cache_instance = TemplateAnalysisCache()
-    return _cache_instance
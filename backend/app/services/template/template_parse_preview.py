@@ -24,6 +24,7 @@ from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.shared import Inches, Mm
 
+from app.core.telemetry import span
 from app.services.docx_style_utils import guess_heading_level
 
 
@@ -616,7 +617,8 @@ class TemplatePreviewGenerator:
             env = os.environ.copy()
             # LibreOffice 有时需要 HOME 可写
             env.setdefault("HOME", "/tmp")
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            with span("office.soffice", convert_to="pdf"):
+                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
         except FileNotFoundError:
             return None
         except Exception:
@@ -0,0 +1,260 @@
+"""
+招投标上下文选择器
+审核/抽取提示词不再截取文档开头的固定条数 chunk，而是按审核维度做相关性排序，
+在 token 预算内挑选片段：
+- 进程内 BM25，分词与 doc_segments 词法索引一致（汉字二元组 + 字母数字串）
+- 各维度轮流取当前得分最高的片段，避免某一维度独占预算
+- 同分按文档顺序（doc_id, position）决胜，结果稳定可复现
+- 预算有剩余时按文档顺序补齐，小文档的行为与原来一致
+输出片段恢复为文档顺序，便于 LLM 阅读上下文。
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from app.platform.retrieval.cjk_lexical import cjk_tokens
+
+# 每个片段的 "[DOC .. CHUNK .. POS ..]" 标记与换行开销
+CHUNK_MARKER_TOKENS = 24
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+
+# 审核维度 -> 检索关键词（与 REVIEW_PROMPT 的 dimension 取值一致）
+REVIEW_DIMENSION_QUERIES: Dict[str, str] = {
+    "资格审查": "资格 资质 营业执照 资质证书 认证 证书 体系认证 业绩 财务 审计报告 信誉 社保 授权委托书 法定代表人 联合体",
+    "报价审查": "报价 投标报价 总价 单价 分项报价 开标一览表 报价表 清单 税率 优惠 最高限价 控制价",
+    "技术审查": "技术 技术参数 技术要求 技术规格 性能 指标 技术方案 施工方案 设备 配置 偏离表 实质性响应",
+    "商务审查": "商务 付款 付款方式 合同 违约 保证金 履约保证金 质保 售后服务 交货 交付 验收 商务偏离",
+    "工期与质量": "工期 交货期 进度 计划 竣工 质量 质量标准 质量保证 质保期 合格 验收标准 安全文明",
+    "文档结构": "投标文件 组成 目录 格式 签字 盖章 密封 装订 正本 副本 附件 承诺函",
+}
+
+# "其他"维度：六个维度都没选中的片段里，优先带含义务/禁止类措辞的条款
+OTHER_DIMENSION_QUERY = "须 必须 应当 不得 禁止 严禁 规定 要求 遵守 符合 满足 承担 负责 保证"
+
+PROJECT_INFO_QUERIES: Dict[str, str] = {
+    "基本信息": "项目名称 项目编号 招标人 采购人 代理机构 联系人 电话 地址 预算 最高限价 控制价 资金来源",
+    "时间节点": "投标截止 开标时间 开标地点 工期 交货期 服务期 有效期 澄清 答疑 踏勘",
+    "资格要求": "资格要求 资质 业绩 项目经理 人员 财务 信誉 联合体 保证金",
+    "评标办法": "评标办法 评分标准 综合评分 分值 权重 价格分 技术分 商务分",
+}
+
+RISK_QUERIES: Dict[str, str] = {
+    "废标条款": "废标 无效投标 否决 拒绝 不予受理 取消资格 实质性 不得 必须 须",
+    "强制要求": "强制 应当 不允许 禁止 加星 星号 ★ ▲ 重要条款 不接受偏离",
+    "商务风险": "保证金 履约 违约 罚款 扣款 赔偿 付款 质保金 验收 责任",
+    "时间风险": "截止 逾期 工期 延误 有效期 时间",
+}
+
+DIRECTORY_QUERIES: Dict[str, str] = {
+    "文件组成": "投标文件 响应文件 文件组成 应包括 须提供 提交 附件 格式 附录 目录",
+    "商务文件": "投标函 授权委托书 法定代表人 开标一览表 报价 分项报价 清单 承诺 偏离表 商务响应",
+    "资格文件": "资格 资质 业绩 财务 信誉 证明材料",
+    "技术文件": "技术响应 技术方案 施工组织设计 技术偏离",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：汉字约 1.5 字/token，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return int(math.ceil(cjk / 1.5 + other / 4))
+
+
+def chunk_cost(chunk: Dict[str, Any]) -> int:
+    """单个片段进入提示词的 token 开销"""
+    return estimate_tokens(chunk.get("content") or "") + CHUNK_MARKER_TOKENS
+
+
+class Bm25Index:
+    """对一组 chunk 建立内存倒排索引，每个 chunk 只分词一次"""
+
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.size = len(chunks)
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[tuple]] = {}
+        for idx, chunk in enumerate(chunks):
+            counts = Counter(cjk_tokens(chunk.get("content") or ""))
+            self.lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((idx, tf))
+        total = sum(self.lengths)
+        self.avgdl = (total / self.size) if self.size else 0.0
+
+    def idf(self, token: str) -> float:
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str) -> Dict[int, float]:
+        """返回 {chunk 下标: 得分}，仅包含命中的 chunk；查询词元去重"""
+        scores: Dict[int, float] = {}
+        if not self.size or not self.avgdl:
+            return scores
+        for token in dict.fromkeys(cjk_tokens(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf(token)
+            for idx, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[idx] / self.avgdl)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+
+@dataclass
+class ContextSelection:
+    """选择结果：chunks 为文档顺序；by_dimension 记录各维度选中的 chunk_id（按相关性顺序）"""
+    chunks: List[Dict[str, Any]]
+    by_dimension: Dict[str, List[str]] = field(default_factory=dict)
+    used_tokens: int = 0
+    total_chunks: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.chunks) < self.total_chunks
+
+
+def select_context(
+    chunks: List[Dict[str, Any]],
+    queries: Dict[str, str],
+    token_budget: Optional[int],
+    index: Optional[Bm25Index] = None,
+    fill: bool = True,
+) -> ContextSelection:
+    """
+    在 token 预算内按维度相关性选择片段
+
+    Args:
+        chunks: 候选片段，需已按文档顺序（doc_id, position）排列，该顺序即同分决胜顺序
+        queries: 维度名 -> 检索查询文本，维度按字典顺序轮流取片段
+        token_budget: token 预算；None 表示不限制（全部返回）
+        index: 已对同一组 chunks 建好的索引，多次选择时复用，避免重复分词
+        fill: 预算剩余时是否按文档顺序补齐不相关片段
+
+    Returns:
+        ContextSelection
+    """
+    if token_budget is None:
+        return ContextSelection(
+            chunks=list(chunks),
+            used_tokens=sum(chunk_cost(c) for c in chunks),
+            total_chunks=len(chunks),
+        )
+
+    costs = [chunk_cost(c) for c in chunks]
+    if index is None:
+        index = Bm25Index(chunks)
+    ranked: Dict[str, List[int]] = {}
+    for dim, query in queries.items():
+        scores = index.score(query)
+        ranked[dim] = sorted(scores, key=lambda i: (-scores[i], i))
+
+    selected: Dict[int, None] = {}
+    by_dimension: Dict[str, List[str]] = {dim: [] for dim in queries}
+    cursors = {dim: 0 for dim in queries}
+    used = 0
+
+    def take_next(dim: str) -> bool:
+        """为维度取下一个放得下的片段；候选耗尽返回 False"""
+        nonlocal used
+        order = ranked[dim]
+        while cursors[dim] < len(order):
+            idx = order[cursors[dim]]
+            cursors[dim] += 1
+            if idx in selected:
+                continue
+            if used + costs[idx] > token_budget:
+                continue
+            selected[idx] = None
+            used += costs[idx]
+            by_dimension[dim].append(str(chunks[idx].get("chunk_id")))
+            return True
+        return False
+
+    active = [dim for dim in queries if ranked[dim]]
+    while active:
+        active = [dim for dim in active if take_next(dim)]
+
+    # 预算剩余时按文档顺序补齐
+    for idx, cost in enumerate(costs if fill else ()):
+        if idx not in selected and used + cost <= token_budget:
+            selected[idx] = None
+            used += cost
+
+    return ContextSelection(
+        chunks=[chunks[i] for i in sorted(selected)],
+        by_dimension=by_dimension,
+        used_tokens=used,
+        total_chunks=len(chunks),
+    )
+
+
+def dimension_text(selection: ContextSelection, dim: str, max_chars: int = 2000) -> str:
+    """拼接某维度选中片段的原文（按相关性顺序，截断到 max_chars），用于构造对侧文档的查询"""
+    by_id = {str(c.get("chunk_id")): c for c in selection.chunks}
+    parts: List[str] = []
+    size = 0
+    for chunk_id in selection.by_dimension.get(dim, []):
+        text = (by_id.get(chunk_id) or {}).get("content") or ""
+        if size + len(text) > max_chars:
+            text = text[: max_chars - size]
+        parts.append(text)
+        size += len(text)
+        if size >= max_chars:
+            break
+    return "\n".join(parts)
+
+
+def select_leftover(
+    chunks: List[Dict[str, Any]],
+    covered_ids: Set[str],
+    token_budget: Optional[int],
+    index: Optional[Bm25Index] = None,
+) -> ContextSelection:
+    """
+    为"其他"维度选择片段：未被任何维度选中的片段按 OTHER_DIMENSION_QUERY 相关性优先，
+    其余未选中片段按文档顺序其次，预算剩余再按文档顺序补齐已选片段
+
+    Args:
+        chunks: 候选片段，需已按文档顺序排列
+        covered_ids: 各维度分片已选中的 chunk_id
+        token_budget: token 预算；None 表示不限制（全部返回）
+        index: 已对同一组 chunks 建好的索引
+
+    Returns:
+        ContextSelection
+    """
+    if token_budget is None:
+        return select_context(chunks, {}, None)
+
+    costs = [chunk_cost(c) for c in chunks]
+    if index is None:
+        index = Bm25Index(chunks)
+    leftover = [i for i, c in enumerate(chunks) if str(c.get("chunk_id")) not in covered_ids]
+    scores = index.score(OTHER_DIMENSION_QUERY)
+    ranked = sorted((i for i in leftover if i in scores), key=lambda i: (-scores[i], i))
+    order = ranked + [i for i in leftover if i not in scores] + [
+        i for i, c in enumerate(chunks) if str(c.get("chunk_id")) in covered_ids
+    ]
+
+    selected: List[int] = []
+    used = 0
+    for idx in order:
+        if used + costs[idx] <= token_budget:
+            selected.append(idx)
+            used += costs[idx]
+
+    return ContextSelection(
+        chunks=[chunks[i] for i in sorted(selected)],
+        used_tokens=used,
+        total_chunks=len(chunks),
+    )
@@ -9,9 +9,8 @@ import tempfile
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-from docx import Document
-from docx.table import Table
-from docx.text.paragraph import Paragraph
+from app.core.telemetry import span
+from app.services.docx_body_scanner import scan_docx_body
 
 logger = logging.getLogger(__name__)
 
@@ -32,46 +31,24 @@ def extract_blocks_from_docx(docx_path: str) -> List[Dict[str, Any]]:
     """
     logger.info(f"开始从 DOCX 提取 blocks: {docx_path}")
     
-    doc = Document(docx_path)
     blocks = []
     block_idx = 0
     
-    # 按 body 顺序遍历所有元素
-    for element in doc.element.body:
+    # 按 body 顺序流式遍历（不构建完整 DOM）
+    for item in scan_docx_body(docx_path):
         # 段落
-        if element.tag.endswith('p'):
-            para = Paragraph(element, doc)
-            text = para.text or ""
-            style_name = None
-            
-            try:
-                if para.style:
-                    style_name = para.style.name
-            except Exception:
-                pass
-            
+        if item.is_paragraph:
             blocks.append({
                 "blockId": f"b{block_idx}",
                 "type": "p",
-                "styleName": style_name,
-                "text": text
+                "styleName": item.style_name,
+                "text": item.text
             })
             block_idx += 1
         
         # 表格
-        elif element.tag.endswith('tbl'):
-            table = Table(element, doc)
-            rows = []
-            
-            try:
-                for row in table.rows:
-                    cells = []
-                    for cell in row.cells:
-                        cells.append((cell.text or "").strip())
-                    rows.append(cells)
-            except Exception as e:
-                logger.warning(f"提取表格失败: {e}")
-                rows = [["表格提取失败"]]
+        elif item.is_table:
+            rows = [[text.strip() for text in row] for row in item.cell_texts()]
             
             blocks.append({
                 "blockId": f"b{block_idx}",
@@ -116,12 +93,14 @@ def convert_pdf_to_docx(pdf_path: str, output_dir: Optional[str] = None) -> str:
             pdf_path
         ]
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
+        with span("office.soffice", convert_to="docx") as stage:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                timeout=120
+            )
+            stage.set_attribute("returncode", result.returncode)
         
         if result.returncode != 0:
             raise RuntimeError(f"LibreOffice 转换失败: {result.stderr}")
@@ -0,0 +1,143 @@
+"""
+招投标审核分片执行
+审核按维度拆成多个分片，每个分片只带该维度相关的招标/投标/规则片段，
+在线程池中限流并发调用 LLM，单分片失败按指数退避重试；
+合并结果只依赖分片顺序，与完成先后无关，输出稳定可复现。
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+REVIEW_DIMENSIONS = ("资格审查", "报价审查", "技术审查", "商务审查", "工期与质量", "文档结构", "其他")
+
+
+@dataclass
+class ReviewShard:
+    """一个审核分片：key 一般为审核维度"""
+    key: str
+    messages: List[Dict[str, Any]]
+    tender_chunks: List[Dict[str, Any]] = field(default_factory=list)
+    bid_chunks: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class ShardResult:
+    key: str
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_review_shards(
+    shards: List[ReviewShard],
+    call: Callable[[ReviewShard], List[Dict[str, Any]]],
+    max_concurrency: int = 4,
+    max_retries: int = 2,
+    retry_backoff: float = 1.0,
+) -> List[ShardResult]:
+    """
+    限流并发执行审核分片
+
+    Args:
+        call: (shard) -> 审核项列表；抛异常视为本次尝试失败
+        max_concurrency: 同时进行的 LLM 调用数
+        max_retries: 单个分片失败后的重试次数
+        retry_backoff: 第 n 次重试前等待 retry_backoff * 2^(n-1) 秒
+
+    Returns:
+        与 shards 顺序一致的结果列表；重试后仍失败的分片 error 非空，不影响其他分片
+    """
+
+    def run_one(shard: ReviewShard) -> ShardResult:
+        last_error: Optional[BaseException] = None
+        with span("tender.review.shard", shard=shard.key) as sp:
+            for attempt in range(max_retries + 1):
+                if attempt:
+                    time.sleep(retry_backoff * (2 ** (attempt - 1)))
+                    logger.warning(
+                        "Review shard retry key=%s attempt=%d error=%s", shard.key, attempt + 1, last_error
+                    )
+                try:
+                    items = call(shard)
+                    sp.set_attributes(attempts=attempt + 1, items=len(items))
+                    return ShardResult(key=shard.key, items=items, attempts=attempt + 1)
+                except Exception as exc:
+                    last_error = exc
+            sp.set_attributes(attempts=max_retries + 1, failed=True)
+        logger.error("Review shard failed key=%s error=%s", shard.key, last_error)
+        return ShardResult(key=shard.key, attempts=max_retries + 1, error=str(last_error))
+
+    if not shards:
+        return []
+    workers = max(1, min(max_concurrency, len(shards)))
+    # 线程池不继承 contextvars，逐个复制调用方上下文，分片 span 才能挂在审核 span 下
+    contexts = [contextvars.copy_context() for _ in shards]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="review_shard") as pool:
+        return list(pool.map(lambda ctx, shard: ctx.run(run_one, shard), contexts, shards))
+
+
+def merge_shard_items(results: List[ShardResult]) -> List[Dict[str, Any]]:
+    """
+    按分片顺序合并审核项
+
+    - 缺失或非法的 dimension 归到所在分片的维度
+    - 同一 (dimension, requirement_text, response_text, result) 只保留首个
+    - 失败分片输出一条 risk 项，提示该维度需人工复核
+    """
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for result in results:
+        if not result.ok:
+            merged.append({
+                "dimension": result.key if result.key in REVIEW_DIMENSIONS else "其他",
+                "requirement_text": f"{result.key}维度自动审核未完成",
+                "response_text": "",
+                "result": "risk",
+                "remark": f"LLM 调用失败（已尝试 {result.attempts} 次），请人工复核：{result.error}",
+                "rigid": False,
+                "tender_evidence_chunk_ids": [],
+                "bid_evidence_chunk_ids": [],
+                "source": "compare",
+            })
+            continue
+        for item in result.items:
+            if not isinstance(item, dict):
+                continue
+            if item.get("dimension") not in REVIEW_DIMENSIONS:
+                item["dimension"] = result.key if result.key in REVIEW_DIMENSIONS else "其他"
+            key = (
+                item.get("dimension"),
+                (item.get("requirement_text") or "").strip(),
+                (item.get("response_text") or "").strip(),
+                item.get("result"),
+            )
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged
+
+
+def union_chunks(groups: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """合并多个分片的片段，按 chunk_id 去重并恢复文档顺序"""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for chunks in groups:
+        for chunk in chunks:
+            by_id.setdefault(str(chunk.get("chunk_id")), chunk)
+    return sorted(
+        by_id.values(),
+        key=lambda c: (str(c.get("doc_id")), c.get("position") or 0, str(c.get("chunk_id"))),
+    )
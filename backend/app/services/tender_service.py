@@ -4,6 +4,7 @@
 """
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import logging
@@ -11,18 +12,37 @@ import os
 import re
 import uuid
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from docx import Document
 from docx.text.paragraph import Paragraph
 from fastapi import UploadFile
 
 from app.config import get_settings, get_feature_flags
+from app.core.telemetry import span
 from app.schemas.project_delete import ProjectDeletePlanResponse, ProjectDeleteRequest
 from app.services.dao.tender_dao import TenderDAO
 from app.services.project_delete import ProjectDeletionOrchestrator
-from app.services.template.docx_extractor import DocxBlockExtractor
-from app.services.template.llm_analyzer import TemplateLlmAnalyzer, get_analysis_cache
+from app.services.tender.context_selector import (
+    DIRECTORY_QUERIES,
+    PROJECT_INFO_QUERIES,
+    REVIEW_DIMENSION_QUERIES,
+    RISK_QUERIES,
+    Bm25Index,
+    ContextSelection,
+    dimension_text,
+    select_context,
+    select_leftover,
+)
+from app.services.tender.review_shards import (
+    ReviewShard,
+    merge_shard_items,
+    run_review_shards,
+    union_chunks,
+)
+from app.services.template.docx_extractor import EXTRACTOR_VERSION, DocxBlockExtractor, DocxExtractResult
+from app.services.template.analysis_cache import get_analysis_cache
+from app.services.template.llm_analyzer import TemplateLlmAnalyzer
 from app.services.template.template_spec import TemplateSpec, create_minimal_spec, BasePolicyMode
 from app.services.template.outline_merger import OutlineMerger
 from app.services.template.template_parse_preview import DocxTemplateDeterministicParser, TemplatePreviewGenerator
@@ -157,6 +177,26 @@ class LLMCall:
     messages: List[Dict[str, str]]
 
 
+# ==================== 资产导入结果 ====================
+
+@dataclass
+class AssetImportResult:
+    """单个文件的导入结果：status 为 created | existing | failed"""
+    filename: str
+    status: str
+    asset: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class AssetImportError(Exception):
+    """批量导入中有文件失败；成功的文件已落库，results 含逐个文件状态"""
+
+    def __init__(self, results: List[AssetImportResult]):
+        self.results = results
+        failed = [r for r in results if r.status == "failed"]
+        super().__init__(f"{len(failed)}/{len(results)} 个文件导入失败: {failed[0].filename}: {failed[0].error}")
+
+
 # ==================== Service 主类 ====================
 
 class TenderService:
@@ -193,6 +233,11 @@ class TenderService:
         if self._llm_analyzer is None:
             self._llm_analyzer = TemplateLlmAnalyzer()
         return self._llm_analyzer
+
+    @property
+    def analysis_cache(self):
+        """模板分析缓存（Postgres 持久化 + 进程内 LRU）"""
+        return get_analysis_cache(getattr(self.dao, "pool", None))
     
     @property
     def deletion_orchestrator(self) -> ProjectDeletionOrchestrator:
@@ -471,29 +516,26 @@ class TenderService:
                 "content": part,
             })
 
-        self.dao.insert_kb_chunks(kb_id=kb_id, doc_id=doc_id, chunks=chunks)
+        try:
+            self.dao.insert_kb_chunks(kb_id=kb_id, doc_id=doc_id, chunks=chunks)
+        except Exception:
+            # 分块写入失败：删除刚创建的文档，避免留下没有 chunk 的孤儿文档
+            try:
+                from app.services import kb_service
+                kb_service.delete_document(kb_id, doc_id, skip_asset_cleanup=True)
+            except Exception as e:
+                logger.warning(f"Cleanup KB document {doc_id} failed: {e}")
+            raise
         return doc_id
 
-    def _load_context_by_assets(
+    def _context_doc_ids(
         self,
         project_id: str,
         kinds: List[str],
         bidder_name: Optional[str],
         bid_asset_ids: List[str],
-        limit: int,
-    ) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """
-        根据资产条件加载上下文 chunks
-        
-        Args:
-            kinds: 资产类型列表（如 ["tender"] 或 ["bid"]）
-            bidder_name: 投标人名称（用于过滤 bid）
-            bid_asset_ids: 投标资产ID列表（精确指定）
-            limit: 最多加载多少个 chunks
-        
-        Returns:
-            (chunks, doc_ids)
-        """
+    ) -> List[str]:
+        """按资产条件筛选出上下文所用的 kb doc_ids"""
         # 获取所有资产
         assets = self.dao.list_assets(project_id)
         
@@ -516,10 +558,57 @@ class TenderService:
             
             filtered.append(a)
 
-        # 提取 doc_ids 并加载 chunks
-        doc_ids = [a.get("kb_doc_id") for a in filtered if a.get("kb_doc_id")]
-        chunks = self.dao.load_chunks_by_doc_ids(doc_ids, limit=limit)
-        return chunks, doc_ids
+        return [a.get("kb_doc_id") for a in filtered if a.get("kb_doc_id")]
+
+    def _select_context_by_doc_ids(
+        self,
+        doc_ids: List[str],
+        queries: Dict[str, str],
+        token_budget: Optional[int] = None,
+    ) -> ContextSelection:
+        """
+        加载 doc_ids 的全部 chunks，按维度相关性在 token 预算内选择
+
+        Args:
+            queries: 维度名 -> 检索查询文本
+            token_budget: token 预算，默认 TENDER_CONTEXT_TOKEN_BUDGET
+        """
+        if token_budget is None:
+            token_budget = self.settings.TENDER_CONTEXT_TOKEN_BUDGET
+        chunks = self.dao.load_chunks_by_doc_ids(doc_ids)
+        selection = select_context(chunks, queries, token_budget)
+        if selection.truncated:
+            logger.info(
+                f"context selected {len(selection.chunks)}/{selection.total_chunks} chunks "
+                f"({selection.used_tokens}/{token_budget} tokens) for docs={doc_ids}"
+            )
+        return selection
+
+    def _load_context_by_assets(
+        self,
+        project_id: str,
+        kinds: List[str],
+        bidder_name: Optional[str],
+        bid_asset_ids: List[str],
+        queries: Dict[str, str],
+        token_budget: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        根据资产条件加载上下文 chunks（按相关性在 token 预算内选择，输出保持文档顺序）
+        
+        Args:
+            kinds: 资产类型列表（如 ["tender"] 或 ["bid"]）
+            bidder_name: 投标人名称（用于过滤 bid）
+            bid_asset_ids: 投标资产ID列表（精确指定）
+            queries: 维度名 -> 检索查询文本
+            token_budget: token 预算，默认 TENDER_CONTEXT_TOKEN_BUDGET
+        
+        Returns:
+            (chunks, doc_ids)
+        """
+        doc_ids = self._context_doc_ids(project_id, kinds, bidder_name, bid_asset_ids)
+        selection = self._select_context_by_doc_ids(doc_ids, queries, token_budget)
+        return selection.chunks, doc_ids
 
     # ==================== 公开 API ====================
 
@@ -533,6 +622,10 @@ class TenderService:
         """
         项目内上传文件并自动绑定
         
+        多个文件在 TENDER_IMPORT_CONCURRENCY 限制下并发导入，单个文件失败不影响其他文件。
+        以 (kind, bidder_name, filename, 内容 sha256) 作为幂等键：已导入过的文件直接返回已有资产，
+        因此部分失败后重新提交整批文件只会补导失败的那些。
+        
         Args:
             project_id: 项目ID
             kind: tender | bid | template | custom_rule
@@ -540,286 +633,354 @@ class TenderService:
             bidder_name: 投标人名称（kind=bid 时必填）
         
         Returns:
-            创建的资产列表
+            资产列表（与 files 顺序一致），每项带 import_status: created | existing
+        
+        Raises:
+            AssetImportError: 有文件导入失败（已成功的文件保留，results 含逐个文件状态）
         """
         # 获取项目信息
         proj = self.dao.get_project(project_id)
         if not proj:
             raise ValueError("project not found")
 
-        kb_id = proj["kb_id"]
-        assets_out = []
-
         # 创建存储目录
         base_dir = os.path.join("data", "tender_assets", project_id)
         _safe_mkdir(base_dir)
 
+        # 读取上传内容（UploadFile 需在请求协程内读取）
+        uploads = []
         for f in files:
             b = await f.read()  # 异步读取文件
-            filename = f.filename or "file"
-            mime = getattr(f, "content_type", None)
-            size = len(b)
+            uploads.append((f.filename or "file", getattr(f, "content_type", None), b))
 
-            kb_doc_id = None
-            storage_path: Optional[str] = None
-            doc_version_id = None  # 新增：DocStore 版本ID
-            tpl_meta = {}  # 初始化 meta_json
+        existing: Dict[Tuple, Dict[str, Any]] = {}
+        for a in self.dao.list_assets(project_id):
+            digest = (a.get("meta_json") or {}).get("content_sha256")
+            if digest:
+                existing[(a.get("kind"), a.get("bidder_name"), a.get("filename"), digest)] = a
 
-            if kind == "template":
-                # 模板文件：保存到磁盘
+        semaphore = asyncio.Semaphore(max(1, self.settings.TENDER_IMPORT_CONCURRENCY))
+
+        async def run_one(filename: str, mime: Optional[str], b: bytes, digest: str) -> AssetImportResult:
+            key = (kind, bidder_name, filename, digest)
+            if key in existing:
+                return AssetImportResult(filename=filename, status="existing", asset=existing[key])
+            async with semaphore:
+                try:
+                    with span("tender.import_asset", kind=kind, size=len(b)):
+                        asset, created = await self._import_one_asset(
+                            project_id, proj, kind, bidder_name, base_dir, filename, mime, b, digest
+                        )
+                    status = "created" if created else "existing"
+                    return AssetImportResult(filename=filename, status=status, asset=asset)
+                except Exception as e:
+                    logger.error(f"Import asset failed project={project_id} file={filename}: {e}", exc_info=True)
+                    return AssetImportResult(filename=filename, status="failed", error=str(e))
+
+        # 同一批次内的重复文件只导入一次
+        tasks: Dict[Tuple, asyncio.Task] = {}
+        order = []
+        for filename, mime, b in uploads:
+            digest = _sha256(b)
+            key = (filename, digest)
+            if key not in tasks:
+                tasks[key] = asyncio.ensure_future(run_one(filename, mime, b, digest))
+            order.append(key)
+        await asyncio.gather(*tasks.values())
+        results = [tasks[key].result() for key in order]
+
+        if any(r.status == "failed" for r in results):
+            raise AssetImportError(results)
+        return [dict(r.asset, import_status=r.status) for r in results]
+
+    async def _import_one_asset(
+        self,
+        project_id: str,
+        proj: Dict[str, Any],
+        kind: str,
+        bidder_name: Optional[str],
+        base_dir: str,
+        filename: str,
+        mime: Optional[str],
+        b: bytes,
+        content_sha256: str,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        导入单个文件：入库（按 cutover 模式）→ 旁路写入 → 创建资产记录
+        
+        阻塞的解析/分块/写库放到线程中执行；失败时清理已写入的 KB 文档与落盘文件，保证重试干净。
+        并发请求导入了同一文件时，落库时发现已有记录，清理本次写入并返回已有资产。
+
+        Returns:
+            (资产记录, 是否新建)
+        """
+        kb_id = proj["kb_id"]
+        kb_doc_id = None
+        storage_path: Optional[str] = None
+        tpl_meta: Dict[str, Any] = {"content_sha256": content_sha256}
+
+        def ensure_storage() -> str:
+            nonlocal storage_path
+            if not storage_path:
                 storage_path = os.path.join(base_dir, f"{kind}_{uuid.uuid4().hex}_{filename}")
                 with open(storage_path, "wb") as w:
                     w.write(b)
-                
-                # 新增：解析模板目录/样式摘要，写入 meta_json
-                tpl_meta = self._parse_template_meta(storage_path)
-            
-            # Step 4: 新入库逻辑（cutover 控制）
-            # 根据 cutover 模式决定入库策略
-            ingest_v2_result = None
-            v2_success = False
-            need_legacy_ingest = True  # 默认需要旧入库
-            
+            return storage_path
+
+        async def run_ingest_v2(mode: str):
+            from app.platform.ingest.v2_service import IngestV2Service
+            from app.services.db.postgres import _get_pool
+            ingest_v2 = IngestV2Service(_get_pool())
+            result = await ingest_v2.ingest_asset_v2(
+                project_id=project_id,
+                asset_id=f"temp_{uuid.uuid4().hex}",
+                file_bytes=b,
+                filename=filename,
+                doc_type=kind,
+                owner_id=proj.get("owner_id"),
+                storage_path=storage_path,
+            )
+            tpl_meta["doc_version_id"] = result.doc_version_id
+            tpl_meta["ingest_v2_status"] = "success"
+            tpl_meta["ingest_v2_segments"] = result.segment_count
+            logger.info(
+                f"IngestV2 {mode} success: "
+                f"doc_version_id={result.doc_version_id} "
+                f"segments={result.segment_count}"
+            )
+
+        def legacy_ingest() -> str:
+            # tender/bid/custom_rule：入库到 KB
+            doc_id = self._ingest_to_kb(
+                kb_id=kb_id,
+                filename=filename,
+                kind=kind,
+                bidder_name=bidder_name,
+                data=b,
+            )
+            logger.info(f"Legacy ingest done: kb_doc_id={doc_id}")
+
+            # 兼容旧 API：tender/bid 也写入 tender_project_documents
+            if kind in ("tender", "bid"):
+                role = "tender" if kind == "tender" else "bid"
+                self.dao.create_project_document_binding(
+                    project_id, role, doc_id, bidder_name, filename
+                )
+            return doc_id
+
+        async def shadow_ingest():
+            # SHADOW 模式：新入库失败仅记录，不影响主流程
+            try:
+                await run_ingest_v2("SHADOW")
+            except Exception as e:
+                logger.error(f"IngestV2 SHADOW failed: {e}", exc_info=True)
+                tpl_meta["ingest_v2_status"] = "failed"
+                tpl_meta["ingest_v2_error"] = str(e)
+            tpl_meta["ingest_mode_used"] = "SHADOW"
+
+        try:
+            if kind == "template":
+                # 模板文件：保存到磁盘，解析模板目录/样式摘要，写入 meta_json
+                await asyncio.to_thread(ensure_storage)
+                tpl_meta.update(await asyncio.to_thread(self._parse_template_meta, storage_path))
+
             if kind in ("tender", "bid", "custom_rule"):
+                # 新入库逻辑（cutover 控制）
                 from app.core.cutover import get_cutover_config
-                cutover = get_cutover_config()
-                ingest_mode = cutover.get_mode("ingest", project_id)
-                tpl_meta["ingest_mode_used"] = ingest_mode.value
-                
-                # PREFER_NEW 或 NEW_ONLY: 先尝试新入库
-                if ingest_mode.value in ("PREFER_NEW", "NEW_ONLY"):
+                ingest_mode = get_cutover_config().get_mode("ingest", project_id).value
+                tpl_meta["ingest_mode_used"] = ingest_mode
+                # tender/bid/custom_rule 均落盘，供新入库、范本抽取/预览/导出使用
+                await asyncio.to_thread(ensure_storage)
+
+                need_legacy_ingest = True
+                if ingest_mode in ("PREFER_NEW", "NEW_ONLY"):
                     try:
-                        from app.platform.ingest.v2_service import IngestV2Service
-                        from app.services.db.postgres import _get_pool
-                        pool = _get_pool()
-                        ingest_v2 = IngestV2Service(pool)
-                        
-                        # 确保 storage_path 存在（用于新入库）
-                        if not storage_path:
-                            storage_path = os.path.join(base_dir, f"{kind}_{uuid.uuid4().hex}_{filename}")
-                            with open(storage_path, "wb") as w:
-                                w.write(b)
-                        
-                        temp_asset_id = f"temp_{uuid.uuid4().hex}"
-                        
-                        ingest_v2_result = await ingest_v2.ingest_asset_v2(
-                            project_id=project_id,
-                            asset_id=temp_asset_id,
-                            file_bytes=b,
-                            filename=filename,
-                            doc_type=kind,
-                            owner_id=proj.get("owner_id"),
-                            storage_path=storage_path,
-                        )
-                        
-                        # 新入库成功
-                        tpl_meta["doc_version_id"] = ingest_v2_result.doc_version_id
-                        tpl_meta["ingest_v2_status"] = "success"
-                        tpl_meta["ingest_v2_segments"] = ingest_v2_result.segment_count
-                        v2_success = True
-                        
-                        logger.info(
-                            f"IngestV2 {ingest_mode.value} success: "
-                            f"doc_version_id={ingest_v2_result.doc_version_id} "
-                            f"segments={ingest_v2_result.segment_count}"
-                        )
-                        
-                        # PREFER_NEW 成功后默认不跑旧入库（可通过开关控制）
-                        if ingest_mode.value == "PREFER_NEW":
-                            need_legacy_ingest = False
+                        await run_ingest_v2(ingest_mode)
+                        # PREFER_NEW 成功后不跑旧入库，NEW_ONLY 永远不跑旧入库
+                        need_legacy_ingest = False
+                        if ingest_mode == "PREFER_NEW":
                             tpl_meta["ingest_v2_fallback_to_legacy"] = False
-                        # NEW_ONLY 永远不跑旧入库
-                        elif ingest_mode.value == "NEW_ONLY":
-                            need_legacy_ingest = False
-                        
                     except Exception as e:
-                        logger.error(f"IngestV2 {ingest_mode.value} failed: {e}", exc_info=True)
-                        
-                        if ingest_mode.value == "NEW_ONLY":
+                        logger.error(f"IngestV2 {ingest_mode} failed: {e}", exc_info=True)
+                        if ingest_mode == "NEW_ONLY":
                             # NEW_ONLY 失败直接抛错
-                            tpl_meta["ingest_v2_status"] = "failed"
-                            tpl_meta["ingest_v2_error"] = str(e)
                             raise ValueError(f"IngestV2 NEW_ONLY failed: {e}") from e
-            else:
-                            # PREFER_NEW 失败回退旧入库
-                            logger.warning(f"IngestV2 PREFER_NEW failed, fallback to legacy ingest: {e}")
-                            tpl_meta["ingest_v2_status"] = "failed_fallback"
-                            tpl_meta["ingest_v2_error"] = str(e)
-                            tpl_meta["ingest_v2_fallback_to_legacy"] = True
-                            need_legacy_ingest = True
-            
-            # 执行旧入库（如果需要）
-            if need_legacy_ingest and kind in ("tender", "bid", "custom_rule"):
-                # tender/bid/custom_rule：入库到 KB
-                kb_doc_id = self._ingest_to_kb(
-                    kb_id=kb_id,
-                    filename=filename,
-                    kind=kind,
-                    bidder_name=bidder_name,
-                    data=b,
-                )
-                
-                logger.info(f"Legacy ingest done: kb_doc_id={kb_doc_id}")
+                        # PREFER_NEW 失败回退旧入库
+                        logger.warning(f"IngestV2 PREFER_NEW failed, fallback to legacy ingest: {e}")
+                        tpl_meta["ingest_v2_status"] = "failed_fallback"
+                        tpl_meta["ingest_v2_error"] = str(e)
+                        tpl_meta["ingest_v2_fallback_to_legacy"] = True
 
-                # 兼容旧 API：tender/bid 也写入 tender_project_documents
-                if kind in ("tender", "bid"):
-                    role = "tender" if kind == "tender" else "bid"
-                    self.dao.create_project_document_binding(
-                        project_id, role, kb_doc_id, bidder_name, filename
-                    )
+                if need_legacy_ingest and ingest_mode == "SHADOW":
+                    # SHADOW：旧入库与新入库互不依赖，并行执行
+                    legacy_task = asyncio.ensure_future(asyncio.to_thread(legacy_ingest))
+                    await shadow_ingest()
+                    kb_doc_id = await legacy_task
+                elif need_legacy_ingest:
+                    kb_doc_id = await asyncio.to_thread(legacy_ingest)
 
-                # 新增：tender/bid/custom_rule 也落盘，供范本抽取/预览/导出使用
-                if not storage_path:
-                    storage_path = os.path.join(base_dir, f"{kind}_{uuid.uuid4().hex}_{filename}")
-                    with open(storage_path, "wb") as w:
-                        w.write(b)
-            
-            # SHADOW 模式：旧入库成功后，同步跑新入库（失败不影响主流程）
-            if kind in ("tender", "bid", "custom_rule") and not v2_success:
-                from app.core.cutover import get_cutover_config
-                cutover = get_cutover_config()
-                ingest_mode = cutover.get_mode("ingest", project_id)
-                
-                if ingest_mode.value == "SHADOW":
-                    try:
-                        from app.platform.ingest.v2_service import IngestV2Service
-                        from app.services.db.postgres import _get_pool
-                        pool = _get_pool()
-                        ingest_v2 = IngestV2Service(pool)
-                        
-                        # 确保 storage_path 存在
-                        if not storage_path:
-                            storage_path = os.path.join(base_dir, f"{kind}_{uuid.uuid4().hex}_{filename}")
-                            with open(storage_path, "wb") as w:
-                                w.write(b)
-                        
-                        temp_asset_id = f"temp_{uuid.uuid4().hex}"
-                        
-                        ingest_v2_result = await ingest_v2.ingest_asset_v2(
-                            project_id=project_id,
-                            asset_id=temp_asset_id,
-                            file_bytes=b,
-                            filename=filename,
-                            doc_type=kind,
-                            owner_id=proj.get("owner_id"),
-                            storage_path=storage_path,
-                        )
-                        
-                        # 记录到 meta_json
-                        tpl_meta["doc_version_id"] = ingest_v2_result.doc_version_id
-                        tpl_meta["ingest_v2_status"] = "success"
-                        tpl_meta["ingest_v2_segments"] = ingest_v2_result.segment_count
-                        tpl_meta["ingest_mode_used"] = "SHADOW"
-                        
-                        logger.info(
-                            f"IngestV2 SHADOW success: "
-                            f"doc_version_id={ingest_v2_result.doc_version_id} "
-                            f"segments={ingest_v2_result.segment_count}"
-                        )
-                    except Exception as e:
-                        # SHADOW 模式：新入库失败仅记录，不影响主流程
-                        logger.error(f"IngestV2 SHADOW failed: {e}", exc_info=True)
-                        tpl_meta["ingest_v2_status"] = "failed"
-                        tpl_meta["ingest_v2_error"] = str(e)
-                        tpl_meta["ingest_mode_used"] = "SHADOW"
-            
             # 旧双写逻辑（兼容 Step 2，如果 DOCSTORE_DUALWRITE=true 且未被 v2 覆盖）
             if self.feature_flags.DOCSTORE_DUALWRITE and "doc_version_id" not in tpl_meta:
-                try:
-                    from app.platform.docstore.service import DocStoreService
-                    from app.services.db.postgres import _get_pool
-                    pool = _get_pool()
-                    docstore = DocStoreService(pool)
-                    
-                    document_id = docstore.create_document(
-                        namespace="tender",
-                        doc_type=kind,
-                        owner_id=proj.get("owner_id")
-                    )
-                    
-                    doc_version_id = docstore.create_document_version(
-                        document_id=document_id,
-                        filename=filename,
-                        file_content=b,
-                        storage_path=storage_path
-                    )
-                    
+                doc_version_id = await asyncio.to_thread(
+                    self._docstore_dualwrite, proj, kind, filename, b, storage_path
+                )
+                if doc_version_id:
                     tpl_meta["doc_version_id"] = doc_version_id
-                    
-                except Exception as e:
-                    logger.error(f"DocStore dual-write failed: {e}", exc_info=True)
-            
+
             # 旁路解析：RuleSet（如果启用且 kind=custom_rule）
             if kind == "custom_rule" and self.feature_flags.RULESET_PARSE_ENABLED:
-                try:
-                    from app.services.platform.ruleset_service import RuleSetService
-                    from app.services.db.postgres import _get_pool
-                    pool = _get_pool()
-                    ruleset_service = RuleSetService(pool)
-                    
-                    # 1. 解码文件内容为文本
-                    try:
-                        content_text = b.decode('utf-8')
-                    except UnicodeDecodeError:
-                        # 尝试其他编码
-                        try:
-                            content_text = b.decode('gbk')
-                        except Exception:
-                            content_text = b.decode('latin-1', errors='ignore')
-                    
-                    # 2. 解析并校验
-                    is_valid, message, parsed_data = ruleset_service.parse_and_validate(content_text)
-                    
-                    # 3. 创建 rule_set（如果不存在）
-                    rule_set_id = None
-                    existing_rule_sets = ruleset_service.list_rule_sets_by_project(project_id, limit=1)
-                    if existing_rule_sets:
-                        rule_set_id = existing_rule_sets[0]["id"]
-                    else:
-                        rule_set_id = ruleset_service.create_rule_set(
-                            namespace="tender",
-                            scope="project",
-                            name=f"规则集-{project_id}",
-                            project_id=project_id
-                        )
-                    
-                    # 4. 创建 rule_set_version
-                    validate_status = "valid" if is_valid else "invalid"
-                    rule_set_version_id = ruleset_service.create_version(
-                        rule_set_id=rule_set_id,
-                        content_yaml=content_text,
-                        validate_status=validate_status,
-                        validate_message=message
-                    )
-                    
-                    # 5. 将 rule_set_version_id 记录到 meta_json
-                    tpl_meta["rule_set_version_id"] = rule_set_version_id
-                    tpl_meta["validate_status"] = validate_status
-                    tpl_meta["validate_message"] = message
-                    
-                    print(f"[INFO] RuleSet parsed: version_id={rule_set_version_id}, status={validate_status}")
-                    
-                except Exception as e:
-                    # 降级：RuleSet 解析失败不影响主流程
-                    print(f"[WARN] Failed to parse RuleSet: {e}")
-                    tpl_meta["validate_status"] = "error"
-                    tpl_meta["validate_message"] = f"Parsing error: {str(e)}"
+                tpl_meta.update(await asyncio.to_thread(self._parse_custom_rule_meta, project_id, b))
 
             # 创建资产记录
-            asset = self.dao.create_asset(
+            asset, created = await asyncio.to_thread(
+                self.dao.create_asset_once,
                 project_id=project_id,
                 kind=kind,
                 filename=filename,
                 mime_type=mime,
-                size_bytes=size,
+                size_bytes=len(b),
                 kb_doc_id=kb_doc_id,
                 storage_path=storage_path,
                 bidder_name=bidder_name,
                 meta_json=tpl_meta,
             )
-            assets_out.append(asset)
+        except BaseException:
+            await asyncio.to_thread(
+                self._rollback_partial_import, project_id, kb_id, kb_doc_id, storage_path, tpl_meta
+            )
+            raise
+        if not created:
+            logger.info(f"Asset imported concurrently, reuse existing: project={project_id} file={filename}")
+            await asyncio.to_thread(
+                self._rollback_partial_import, project_id, kb_id, kb_doc_id, storage_path, tpl_meta
+            )
+        return asset, created
+
+    def _rollback_partial_import(
+        self,
+        project_id: str,
+        kb_id: str,
+        kb_doc_id: Optional[str],
+        storage_path: Optional[str],
+        tpl_meta: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        导入失败时清理本次已写入的数据（尽力而为）
+
+        包括 KB 文档与文档绑定、DocStore 文档版本（新入库或双写，连同 docseg 向量）、
+        RuleSet 版本以及落盘文件；这些都只属于本次导入，不清理会成为孤儿数据。
+        """
+        if kb_doc_id:
+            try:
+                from app.services import kb_service
+                kb_service.delete_document(kb_id, kb_doc_id, skip_asset_cleanup=True)
+                self.dao._execute(
+                    "DELETE FROM tender_project_documents WHERE project_id=%s AND kb_doc_id=%s",
+                    (project_id, kb_doc_id)
+                )
+            except Exception as e:
+                logger.warning(f"Rollback KB document {kb_doc_id} failed: {e}")
+        tpl_meta = tpl_meta or {}
+        doc_version_id = tpl_meta.get("doc_version_id")
+        if doc_version_id:
+            try:
+                from app.platform.docstore.service import DocStoreService
+                from app.services.db.postgres import _get_pool
+                if tpl_meta.get("ingest_v2_status") == "success":
+                    # 新入库写过 docseg 向量：先删向量，再删定位它们所需的版本行
+                    from app.services.vectorstore.milvus_docseg_store import milvus_docseg_store
+                    milvus_docseg_store.delete_by_versions([doc_version_id])
+                DocStoreService(_get_pool()).delete_document_version(doc_version_id)
+            except Exception as e:
+                logger.warning(f"Rollback doc version {doc_version_id} failed: {e}")
+        rule_set_version_id = tpl_meta.get("rule_set_version_id")
+        if rule_set_version_id:
+            try:
+                from app.services.platform.ruleset_service import RuleSetService
+                from app.services.db.postgres import _get_pool
+                RuleSetService(_get_pool()).delete_version(rule_set_version_id)
+            except Exception as e:
+                logger.warning(f"Rollback rule set version {rule_set_version_id} failed: {e}")
+        if storage_path and os.path.exists(storage_path):
+            try:
+                os.remove(storage_path)
+            except OSError as e:
+                logger.warning(f"Rollback file {storage_path} failed: {e}")
 
-        return assets_out
+    def _docstore_dualwrite(
+        self,
+        proj: Dict[str, Any],
+        kind: str,
+        filename: str,
+        b: bytes,
+        storage_path: Optional[str],
+    ) -> Optional[str]:
+        """DocStore 双写，返回 doc_version_id；失败仅记录"""
+        try:
+            from app.platform.docstore.service import DocStoreService
+            from app.services.db.postgres import _get_pool
+            docstore = DocStoreService(_get_pool())
+            
+            document_id = docstore.create_document(
+                namespace="tender",
+                doc_type=kind,
+                owner_id=proj.get("owner_id")
+            )
+            
+            return docstore.create_document_version(
+                document_id=document_id,
+                filename=filename,
+                file_content=b,
+                storage_path=storage_path
+            )
+        except Exception as e:
+            logger.error(f"DocStore dual-write failed: {e}", exc_info=True)
+            return None
+
+    def _parse_custom_rule_meta(self, project_id: str, b: bytes) -> Dict[str, Any]:
+        """解析自定义规则文件为 RuleSet 版本，返回需写入 meta_json 的字段；失败降级不影响主流程"""
+        try:
+            from app.services.platform.ruleset_service import RuleSetService
+            from app.services.db.postgres import _get_pool
+            ruleset_service = RuleSetService(_get_pool())
+            
+            # 1. 解码文件内容为文本
+            try:
+                content_text = b.decode('utf-8')
+            except UnicodeDecodeError:
+                # 尝试其他编码
+                try:
+                    content_text = b.decode('gbk')
+                except Exception:
+                    content_text = b.decode('latin-1', errors='ignore')
+            
+            # 2. 解析并校验
+            is_valid, message, parsed_data = ruleset_service.parse_and_validate(content_text)
+            
+            # 3. 追加 rule_set_version（项目没有 rule_set 时一并创建，按项目串行化）
+            validate_status = "valid" if is_valid else "invalid"
+            _, rule_set_version_id = ruleset_service.create_project_version(
+                project_id=project_id,
+                content_yaml=content_text,
+                validate_status=validate_status,
+                validate_message=message,
+            )
+            
+            print(f"[INFO] RuleSet parsed: version_id={rule_set_version_id}, status={validate_status}")
+            
+            # 4. 将 rule_set_version_id 记录到 meta_json
+            return {
+                "rule_set_version_id": rule_set_version_id,
+                "validate_status": validate_status,
+                "validate_message": message,
+            }
+        except Exception as e:
+            # 降级：RuleSet 解析失败不影响主流程
+            print(f"[WARN] Failed to parse RuleSet: {e}")
+            return {
+                "validate_status": "error",
+                "validate_message": f"Parsing error: {str(e)}",
+            }
 
     def list_assets(self, project_id: str) -> List[Dict[str, Any]]:
         """列出项目的所有资产"""
@@ -1044,7 +1205,7 @@ class TenderService:
                     kinds=["tender"],
                     bidder_name=None,
                     bid_asset_ids=[],
-                    limit=240,
+                    queries=PROJECT_INFO_QUERIES,
                 )
                 ctx = _build_marked_context(chunks)
 
@@ -1267,7 +1428,7 @@ class TenderService:
                     kinds=["tender"],
                     bidder_name=None,
                     bid_asset_ids=[],
-                    limit=220,
+                    queries=RISK_QUERIES,
                 )
                 ctx = _build_marked_context(chunks)
 
@@ -1390,7 +1551,7 @@ class TenderService:
             kinds=["tender"],
             bidder_name=None,
             bid_asset_ids=[],
-            limit=260,
+            queries=DIRECTORY_QUERIES,
         )
         chunks = self._filter_chunks_for_bid_directory(chunks, limit=90)
         ctx = _build_marked_context(chunks)
@@ -2119,6 +2280,82 @@ class TenderService:
 
     # extract_rule_set 方法已删除，规则文件现在直接作为审核上下文叠加
 
+    def _build_review_shards(
+        self,
+        tender_chunks: List[Dict[str, Any]],
+        bid_chunks: List[Dict[str, Any]],
+        rule_chunks: List[Dict[str, Any]],
+    ) -> List[ReviewShard]:
+        """
+        按审核维度构造分片：每个维度只带该维度相关的片段
+
+        投标文件的查询 = 维度关键词 + 招标文件中该维度选中的要求原文，
+        这样埋在投标文件深处的响应内容也能被选中。三类文档都没有相关片段的维度不发起调用。
+        最后一个"其他"分片优先带各维度都没选中的条款，兜住六个维度之外的要求。
+        """
+        budget = self.settings.TENDER_REVIEW_SHARD_TOKEN_BUDGET
+        tender_index = Bm25Index(tender_chunks)
+        bid_index = Bm25Index(bid_chunks)
+        rule_index = Bm25Index(rule_chunks)
+
+        shards: List[ReviewShard] = []
+        covered: Set[str] = set()
+        for dim, query in REVIEW_DIMENSION_QUERIES.items():
+            tender_sel = select_context(tender_chunks, {dim: query}, budget, index=tender_index, fill=False)
+            bid_query = f"{query}\n{dimension_text(tender_sel, dim)}"
+            bid_sel = select_context(bid_chunks, {dim: bid_query}, budget, index=bid_index, fill=False)
+            rule_sel = select_context(rule_chunks, {dim: query}, budget // 2, index=rule_index, fill=False)
+            for sel in (tender_sel, bid_sel, rule_sel):
+                covered.update(str(c.get("chunk_id")) for c in sel.chunks)
+            if not (tender_sel.chunks or bid_sel.chunks or rule_sel.chunks):
+                continue
+            shards.append(self._review_shard(
+                dim, f"{dim}（其他维度由其他批次审核，不要输出）", tender_sel, bid_sel, rule_sel,
+            ))
+
+        tender_sel = select_leftover(tender_chunks, covered, budget, index=tender_index)
+        bid_sel = select_leftover(bid_chunks, covered, budget, index=bid_index)
+        rule_sel = select_leftover(rule_chunks, covered, budget // 2, index=rule_index)
+        if tender_sel.chunks or bid_sel.chunks or rule_sel.chunks:
+            named = "、".join(REVIEW_DIMENSION_QUERIES)
+            shards.append(self._review_shard(
+                "其他", f"其他（只输出不属于{named}的要求，这些维度由其他批次审核）",
+                tender_sel, bid_sel, rule_sel,
+            ))
+        return shards
+
+    def _review_shard(
+        self,
+        key: str,
+        scope: str,
+        tender_sel: ContextSelection,
+        bid_sel: ContextSelection,
+        rule_sel: ContextSelection,
+    ) -> ReviewShard:
+        """用选中的三类片段拼出单个维度分片的提示词"""
+        messages = [
+            {"role": "system", "content": self.REVIEW_PROMPT.strip()},
+            {
+                "role": "user",
+                "content": f"""本次只审核维度：{scope}
+
+招标文件原文片段：
+{_build_marked_context(tender_sel.chunks)}
+
+投标文件原文片段：
+{_build_marked_context(bid_sel.chunks)}
+
+自定义审核规则文件原文片段（可为空）：
+{_build_marked_context(rule_sel.chunks) or "(无)"}""",
+            },
+        ]
+        return ReviewShard(
+            key=key,
+            messages=messages,
+            tender_chunks=tender_sel.chunks,
+            bid_chunks=bid_sel.chunks,
+        )
+
     def run_review(
         self,
         project_id: str,
@@ -2154,55 +2391,41 @@ class TenderService:
                 print(f"[WARN] Failed to create platform job: {e}")
         
         try:
-            # 加载招标文件 chunks
-            tender_chunks, _ = self._load_context_by_assets(
-                project_id,
-                kinds=["tender"],
-                bidder_name=None,
-                bid_asset_ids=[],
-                limit=180,
-            )
-            tender_ctx = _build_marked_context(tender_chunks)
-
-            # 加载投标文件 chunks
-            bid_chunks, _ = self._load_context_by_assets(
-                project_id,
-                kinds=["bid"],
-                bidder_name=bidder_name,
-                bid_asset_ids=bid_asset_ids,
-                limit=180,
-            )
-            bid_ctx = _build_marked_context(bid_chunks)
-
-            # 加载自定义规则文件 chunks（直接叠加原文，不再抽取为 JSON）
-            rule_ctx = ""
+            # 加载招标/投标/自定义规则文件的全部 chunks，按维度拆成审核分片
+            tender_doc_ids = self._context_doc_ids(project_id, ["tender"], None, [])
+            bid_doc_ids = self._context_doc_ids(project_id, ["bid"], bidder_name, bid_asset_ids)
+            rule_doc_ids: List[str] = []
             if custom_rule_asset_ids:
+                # 自定义规则文件直接叠加原文，不再抽取为 JSON
                 rule_assets = self.dao.get_assets_by_ids(project_id, custom_rule_asset_ids)
                 rule_doc_ids = [a.get("kb_doc_id") for a in rule_assets if a.get("kb_doc_id")]
-                if rule_doc_ids:
-                    rule_chunks = self.dao.load_chunks_by_doc_ids(rule_doc_ids, limit=120)
-                    rule_ctx = _build_marked_context(rule_chunks)
-
-            # 调用 LLM
-            messages = [
-                {"role": "system", "content": self.REVIEW_PROMPT.strip()},
-                {
-                    "role": "user",
-                    "content": f"""招标文件原文片段：
-{tender_ctx}
-
-投标文件原文片段：
-{bid_ctx}
+            shards = self._build_review_shards(
+                self.dao.load_chunks_by_doc_ids(tender_doc_ids),
+                self.dao.load_chunks_by_doc_ids(bid_doc_ids),
+                self.dao.load_chunks_by_doc_ids(rule_doc_ids),
+            )
 
-自定义审核规则文件原文片段（可为空）：
-{rule_ctx or "(无)"}""",
-                },
-            ]
-            out_text = self._llm_text(LLMCall(model_id=model_id, messages=messages))
-            arr = _extract_json(out_text)
-            
-            if not isinstance(arr, list):
-                raise ValueError("review output not list")
+            # 各分片限流并发调用 LLM，失败分片单独重试，合并顺序只取决于分片顺序
+            def review_shard(shard: ReviewShard) -> List[Dict[str, Any]]:
+                out_text = self._llm_text(LLMCall(model_id=model_id, messages=shard.messages))
+                items = _extract_json(out_text)
+                if not isinstance(items, list):
+                    raise ValueError("review output not list")
+                return items
+
+            shard_results = run_review_shards(
+                shards,
+                review_shard,
+                max_concurrency=self.settings.TENDER_REVIEW_SHARD_CONCURRENCY,
+                max_retries=self.settings.TENDER_REVIEW_SHARD_MAX_RETRIES,
+                retry_backoff=self.settings.TENDER_REVIEW_SHARD_RETRY_BACKOFF,
+            )
+            failed_shards = [r.key for r in shard_results if not r.ok]
+            if shard_results and len(failed_shards) == len(shard_results):
+                raise ValueError(f"review failed in all shards: {shard_results[0].error}")
+            arr = merge_shard_items(shard_results)
+            tender_chunks = union_chunks([s.tender_chunks for s in shards])
+            bid_chunks = union_chunks([s.bid_chunks for s in shards])
             
             # 为所有对比审核项添加 source 字段
             for item in arr:
@@ -2366,7 +2589,8 @@ class TenderService:
             
             if run_id:
                 self.dao.update_run(
-                    run_id, "success", progress=1.0, message="ok", result_json={"count": len(arr)}
+                    run_id, "success", progress=1.0, message="ok",
+                    result_json={"count": len(arr), "shards": len(shards), "failed_shards": failed_shards},
                 )
             
             # Step 8: REVIEW_MODE 切换
@@ -3045,7 +3269,7 @@ class TenderService:
         
         # 检查缓存
         if not force and self.settings.TEMPLATE_LLM_ANALYSIS_CACHE_BY_SHA256:
-            cache = get_analysis_cache()
+            cache = self.analysis_cache
             cached_spec_json = cache.get(
                 template_sha256,
                 self.settings.TEMPLATE_LLM_ANALYSIS_VERSION,
@@ -3058,9 +3282,10 @@ class TenderService:
                     pass  # 缓存失效，继续分析
         
         try:
-            # 1. 确定性结构化提取
-            extract_result = self.docx_extractor.extract(
+            # 1. 确定性结构化提取（按 sha256 缓存）
+            extract_result = self.extract_template_blocks(
                 docx_bytes,
+                template_sha256=template_sha256,
                 max_blocks=self.settings.TEMPLATE_LLM_ANALYSIS_MAX_BLOCKS,
                 max_chars_per_block=self.settings.TEMPLATE_LLM_ANALYSIS_MAX_CHARS_PER_BLOCK
             )
@@ -3070,7 +3295,7 @@ class TenderService:
             
             # 3. 写入缓存
             if self.settings.TEMPLATE_LLM_ANALYSIS_CACHE_BY_SHA256 and spec.diagnostics.confidence > 0:
-                cache = get_analysis_cache()
+                cache = self.analysis_cache
                 cache.set(
                     template_sha256,
                     self.settings.TEMPLATE_LLM_ANALYSIS_VERSION,
@@ -3085,6 +3310,40 @@ class TenderService:
             error_msg = f"Template analysis failed: {type(e).__name__}: {str(e)}"
             return create_minimal_spec(confidence=0.0, error_msg=error_msg)
 
+    def extract_template_blocks(
+        self,
+        docx_bytes: bytes,
+        template_sha256: Optional[str] = None,
+        max_blocks: int = 400,
+        max_chars_per_block: int = 300,
+    ) -> DocxExtractResult:
+        """
+        DocxBlockExtractor 抽取（结果按 sha256 + 抽取器版本 + 参数缓存）
+        
+        缓存命中时 block id 与首次抽取一致，spec 中的 excluded_block_ids 可以直接对应。
+        """
+        if not self.settings.TEMPLATE_LLM_ANALYSIS_CACHE_BY_SHA256:
+            return self.docx_extractor.extract(
+                docx_bytes, max_blocks=max_blocks, max_chars_per_block=max_chars_per_block
+            )
+
+        template_sha256 = template_sha256 or _sha256(docx_bytes)
+        params = f"{max_blocks}x{max_chars_per_block}"
+        cache = self.analysis_cache
+
+        cached = cache.get_extract(template_sha256, EXTRACTOR_VERSION, params)
+        if cached:
+            try:
+                return DocxExtractResult.from_json(cached)
+            except Exception as e:
+                logger.warning(f"[template_cache] broken extract cache sha256={template_sha256[:12]}: {e}")
+
+        extract_result = self.docx_extractor.extract(
+            docx_bytes, max_blocks=max_blocks, max_chars_per_block=max_chars_per_block
+        )
+        cache.set_extract(template_sha256, EXTRACTOR_VERSION, params, extract_result.to_json())
+        return extract_result
+
     async def import_format_template_with_analysis(
         self,
         name: str,
@@ -3111,12 +3370,7 @@ class TenderService:
         # 1. 计算 SHA256
         template_sha256 = _sha256(docx_bytes)
         
-        # 2. 检查是否已有相同 hash 的模板（缓存复用）
-        cached_template = None
-        if not force_analyze and self.settings.TEMPLATE_LLM_ANALYSIS_CACHE_BY_SHA256:
-            cached_template = self.dao.get_format_template_by_sha256(template_sha256)
-        
-        # 3. 创建模板记录
+        # 2. 创建模板记录
         template = self.dao.create_format_template(
             name=name,
             description=description,
@@ -3127,40 +3381,23 @@ class TenderService:
         
         template_id = template["id"]
         
-        # 3.1 落盘保存模板 docx（用于导出 KEEP_ALL/KEEP_RANGE 保留页眉页脚/页边距/底板）
+        # 2.1 落盘保存模板 docx（用于导出 KEEP_ALL/KEEP_RANGE 保留页眉页脚/页边距/底板）
         self._persist_format_template_docx(template_id=template_id, docx_bytes=docx_bytes)
         
-        # 4. LLM 分析（异步）
-        spec: Optional[TemplateSpec] = None
-        
-        if cached_template and cached_template.get("template_spec_json"):
-            # 复用缓存的 spec
-            try:
-                spec = TemplateSpec.from_json(cached_template["template_spec_json"])
-                spec_json = cached_template["template_spec_json"]
-                spec_version = cached_template["template_spec_version"]
-                diagnostics_json = cached_template.get("template_spec_diagnostics_json")
-            except Exception:
-                # 缓存失败，重新分析
-                spec = await self.analyze_template_with_llm(docx_bytes, template_sha256, force=False)
-                spec_json = spec.to_json()
-                spec_version = spec.version
-                diagnostics_json = json.dumps(spec.diagnostics.to_dict() if hasattr(spec.diagnostics, 'to_dict') else {})
-        else:
-            # 新分析
-            spec = await self.analyze_template_with_llm(docx_bytes, template_sha256, force=force_analyze)
-            spec_json = spec.to_json()
-            spec_version = spec.version
-            diagnostics_data = {
-                "confidence": spec.diagnostics.confidence,
-                "warnings": spec.diagnostics.warnings,
-                "ignored_as_instructions_block_ids": spec.diagnostics.ignored_as_instructions_block_ids,
-                "analysis_duration_ms": spec.diagnostics.analysis_duration_ms,
-                "llm_model": spec.diagnostics.llm_model
-            }
-            diagnostics_json = json.dumps(diagnostics_data)
+        # 3. LLM 分析（相同 sha256 + 分析器版本 + 模型命中持久化缓存，不再重复调用 LLM）
+        spec = await self.analyze_template_with_llm(docx_bytes, template_sha256, force=force_analyze)
+        spec_json = spec.to_json()
+        spec_version = spec.version
+        diagnostics_data = {
+            "confidence": spec.diagnostics.confidence,
+            "warnings": spec.diagnostics.warnings,
+            "ignored_as_instructions_block_ids": spec.diagnostics.ignored_as_instructions_block_ids,
+            "analysis_duration_ms": spec.diagnostics.analysis_duration_ms,
+            "llm_model": spec.diagnostics.llm_model
+        }
+        diagnostics_json = json.dumps(diagnostics_data)
         
-        # 5. 更新模板记录
+        # 4. 更新模板记录
         self.dao.update_format_template_spec(
             template_id=template_id,
             template_sha256=template_sha256,
@@ -3169,7 +3406,7 @@ class TenderService:
             template_spec_diagnostics_json=diagnostics_json
         )
         
-        # 6. 返回完整模板记录
+        # 5. 返回完整模板记录
         updated_template = self.dao.get_format_template(template_id)
         result = updated_template or template
         
@@ -3933,13 +4170,24 @@ class TenderService:
         """
         return self.deletion_orchestrator.build_plan(project_id)
     
-    def delete_project(self, project_id: str, confirm_request: ProjectDeleteRequest) -> None:
+    def delete_project(
+        self,
+        project_id: str,
+        confirm_request: ProjectDeleteRequest,
+        requested_by: Optional[str] = None,
+    ) -> str:
         """
-        删除项目（需要确认）
+        发起项目删除（需要确认）
+        
+        只校验令牌并登记删除任务，实际删除由 deletion_orchestrator.run(audit_id) 在后台执行。
         
         Args:
             project_id: 项目ID
             confirm_request: 删除确认请求（包含确认令牌）
+            requested_by: 发起人
+            
+        Returns:
+            删除审计记录ID（用于查询进度）
             
         Raises:
             ValueError: 确认信息不匹配
@@ -3954,8 +4202,8 @@ class TenderService:
         if confirm_request.confirm_token != plan.confirm_token:
             raise ValueError("Confirm token mismatch. Please regenerate the delete plan.")
         
-        # 3. 执行删除
-        self.deletion_orchestrator.delete(project_id)
+        # 3. 登记删除任务
+        return self.deletion_orchestrator.start(project_id, requested_by=requested_by, plan=plan)
     
     # ==================== 格式模板管理扩展 ====================
     
@@ -3994,8 +4242,8 @@ class TenderService:
         Returns:
             解析详情（包含 blocks 和 exclude 信息）
         """
-        # 1. 提取结构化 blocks
-        extract_result = self.docx_extractor.extract(docx_bytes)
+        # 1. 提取结构化 blocks（按 sha256 缓存）
+        extract_result = self.extract_template_blocks(docx_bytes)
         
         # 2. 获取模板的 spec
         spec = self.get_format_template_spec(template_id)
@@ -6,7 +6,7 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from pymilvus import CollectionSchema, DataType, FieldSchema, MilvusClient
 from pymilvus.exceptions import MilvusException
@@ -38,9 +38,9 @@ def _ensure_dense_vector(vector: Optional[List[float]], dense_dim: int) -> List[
 class MilvusDocSegStore:
     """新文档分片向量存储"""
     
-    def __init__(self) -> None:
-        logger.info("Initializing Milvus DocSeg client path=%s", settings.MILVUS_LITE_PATH)
-        self.client = MilvusClient(uri=settings.MILVUS_LITE_PATH)
+    def __init__(self, uri: Optional[str] = None) -> None:
+        logger.info("Initializing Milvus DocSeg client path=%s", uri or settings.MILVUS_LITE_PATH)
+        self.client = MilvusClient(uri=uri or settings.MILVUS_LITE_PATH)
         self.collection_dim: Optional[int] = None
 
     def _ensure_collection(self, dense_dim: int) -> None:
@@ -174,6 +174,64 @@ class MilvusDocSegStore:
             logger.error("Milvus delete_by_version failed: %s", exc)
             raise RuntimeError(f"Milvus 删除失败: {exc}") from exc
 
+    def delete_by_versions(self, doc_version_ids: List[str], batch_size: int = 200) -> int:
+        """按版本批量删除分片（每批一个 in 过滤表达式）"""
+        if not doc_version_ids or not self.client.has_collection(COLLECTION_NAME):
+            return 0
+        deleted = 0
+        for i in range(0, len(doc_version_ids), batch_size):
+            quoted = ",".join(f'"{vid}"' for vid in doc_version_ids[i:i + batch_size])
+            try:
+                result = self.client.delete(collection_name=COLLECTION_NAME, filter=f"doc_version_id in [{quoted}]")
+            except MilvusException as exc:  # noqa: BLE001
+                logger.error("Milvus delete_by_versions failed: %s", exc)
+                raise RuntimeError(f"Milvus 删除失败: {exc}") from exc
+            deleted += int(getattr(result, "delete_count", 0) or 0)
+        return deleted
+
+    def delete_by_project(self, project_id: str) -> int:
+        """删除项目的所有分片"""
+        if not self.client.has_collection(COLLECTION_NAME):
+            return 0
+        expr = f'project_id == "{project_id}"'
+        try:
+            result = self.client.delete(collection_name=COLLECTION_NAME, filter=expr)
+            return int(getattr(result, "delete_count", 0) or 0)
+        except MilvusException as exc:  # noqa: BLE001
+            logger.error("Milvus delete_by_project failed: %s", exc)
+            raise RuntimeError(f"Milvus 删除失败: {exc}") from exc
+
+    def iter_entities(self, output_fields: List[str], batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """按主键升序分页遍历集合（对账用，返回的每条记录都带 pk）"""
+        if not self.client.has_collection(COLLECTION_NAME):
+            return
+        last_pk = -1
+        while True:
+            page = self.client.query(
+                collection_name=COLLECTION_NAME,
+                filter=f"pk > {last_pk}",
+                output_fields=["pk", *output_fields],
+                limit=batch_size,
+            )
+            if not page:
+                return
+            page.sort(key=lambda e: e["pk"])
+            yield page
+            if len(page) < batch_size:
+                return
+            last_pk = page[-1]["pk"]
+
+    def delete_by_pks(self, pks: List[int]) -> int:
+        """按主键删除"""
+        if not pks or not self.client.has_collection(COLLECTION_NAME):
+            return 0
+        try:
+            self.client.delete(collection_name=COLLECTION_NAME, ids=list(pks))
+        except MilvusException as exc:  # noqa: BLE001
+            logger.error("Milvus delete_by_pks failed: %s", exc)
+            raise RuntimeError(f"Milvus 删除失败: {exc}") from exc
+        return len(pks)
+
     def search_dense(
         self,
         query_dense: List[float],
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from pymilvus import CollectionSchema, DataType, FieldSchema, MilvusClient
 from pymilvus.exceptions import MilvusException
@@ -31,9 +31,9 @@ def _ensure_dense_vector(vector: Optional[List[float]], dense_dim: int) -> List[
 
 
 class MilvusLiteStore:
-    def __init__(self) -> None:
-        logger.info("Initializing Milvus Lite client path=%s", settings.MILVUS_LITE_PATH)
-        self.client = MilvusClient(uri=settings.MILVUS_LITE_PATH)
+    def __init__(self, uri: Optional[str] = None) -> None:
+        logger.info("Initializing Milvus Lite client path=%s", uri or settings.MILVUS_LITE_PATH)
+        self.client = MilvusClient(uri=uri or settings.MILVUS_LITE_PATH)
         self.collection_dim: Optional[int] = None
 
     def _ensure_collection(self, dense_dim: int) -> None:
@@ -174,6 +174,37 @@ class MilvusLiteStore:
             logger.error("Milvus delete_by_kb failed: %s", exc)
             raise RuntimeError(f"Milvus 删除失败: {exc}") from exc
 
+    def iter_entities(self, output_fields: List[str], batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """按主键升序分页遍历集合（对账用，返回的每条记录都带 pk）"""
+        if not self.client.has_collection(COLLECTION_NAME):
+            return
+        last_pk = -1
+        while True:
+            page = self.client.query(
+                collection_name=COLLECTION_NAME,
+                filter=f"pk > {last_pk}",
+                output_fields=["pk", *output_fields],
+                limit=batch_size,
+            )
+            if not page:
+                return
+            page.sort(key=lambda e: e["pk"])
+            yield page
+            if len(page) < batch_size:
+                return
+            last_pk = page[-1]["pk"]
+
+    def delete_by_pks(self, pks: List[int]) -> int:
+        """按主键删除"""
+        if not pks or not self.client.has_collection(COLLECTION_NAME):
+            return 0
+        try:
+            self.client.delete(collection_name=COLLECTION_NAME, ids=list(pks))
+        except MilvusException as exc:  # noqa: BLE001
+            logger.error("Milvus delete_by_pks failed: %s", exc)
+            raise RuntimeError(f"Milvus 删除失败: {exc}") from exc
+        return len(pks)
+
     def _build_filter(
         self,
         kb_ids: Optional[List[str]],
@@ -0,0 +1,19 @@
+-- 025_create_template_analysis_cache.sql
+-- 模板分析持久化缓存：跨进程 / 跨重启共享 LLM 分析结果与 DocxBlockExtractor 抽取结果
+
+CREATE TABLE IF NOT EXISTS template_analysis_cache (
+  cache_kind TEXT NOT NULL,                         -- "spec"（TemplateSpec）| "extract"（DocxExtractResult）
+  template_sha256 TEXT NOT NULL,                    -- 模板文件 SHA256
+  analyzer_version TEXT NOT NULL,                   -- 分析器 / 抽取器版本（版本变化即失效）
+  model TEXT NOT NULL DEFAULT '',                   -- LLM 模型（extract 为抽取参数签名）
+  payload_json TEXT NOT NULL,                       -- 序列化结果
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_hit_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  hit_count INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (cache_kind, template_sha256, analyzer_version, model)
+);
+
+-- 按版本清理过期条目
+CREATE INDEX IF NOT EXISTS idx_template_analysis_cache_version ON template_analysis_cache(cache_kind, analyzer_version);
+
+COMMENT ON TABLE template_analysis_cache IS '模板分析缓存（键：sha256 + 分析器版本 + 模型）';
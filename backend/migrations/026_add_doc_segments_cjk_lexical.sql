@@ -0,0 +1,12 @@
+-- 026_add_doc_segments_cjk_lexical.sql
+-- doc_segments 中文词法索引
+-- tsv_cjk 由应用在写入时生成（汉字二元组 + 字母数字词，见 app/platform/retrieval/cjk_lexical.py），
+-- 不经过 PG 文本解析器，作为 NewRetriever 的词法检索列。
+-- 已有数据需执行一次回填：python scripts/batch/backfill_doc_segments_cjk.py
+
+ALTER TABLE doc_segments ADD COLUMN IF NOT EXISTS tsv_cjk tsvector;
+
+CREATE INDEX IF NOT EXISTS idx_doc_segments_tsv_cjk ON doc_segments USING GIN(tsv_cjk);
+
+-- 回填脚本按主键分批扫描未生成的行
+CREATE INDEX IF NOT EXISTS idx_doc_segments_tsv_cjk_missing ON doc_segments(id) WHERE tsv_cjk IS NULL;
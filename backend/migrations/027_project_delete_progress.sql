@@ -0,0 +1,17 @@
+-- 027_project_delete_progress.sql
+-- 项目删除改为后台任务：审计记录同时作为任务进度，中断后按已完成阶段续跑
+-- progress_json: {"stage": 当前阶段, "completed": [已完成阶段], "deleted": {表名: 已删除行数}, "progress": 0-100}
+
+ALTER TABLE tender_project_delete_audit ADD COLUMN IF NOT EXISTS progress_json JSONB NOT NULL DEFAULT '{}'::jsonb;
+ALTER TABLE tender_project_delete_audit ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+-- 旧实现在请求内同步删除，遗留的 RUNNING 记录无法续跑，标记为失败（重新发起删除即可）
+UPDATE tender_project_delete_audit
+SET status = 'FAILED', error_message = COALESCE(error_message, 'interrupted before resumable deletion'), finished_at = NOW()
+WHERE status = 'RUNNING' AND progress_json = '{}'::jsonb;
+
+-- 启动时扫描未完成的删除
+CREATE INDEX IF NOT EXISTS idx_project_delete_audit_active
+  ON tender_project_delete_audit(created_at) WHERE status IN ('PENDING', 'RUNNING');
+
+COMMENT ON COLUMN tender_project_delete_audit.progress_json IS '删除进度：当前阶段、已完成阶段、各表已删除行数';
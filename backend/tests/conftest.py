@@ -0,0 +1,54 @@
+"""
+共享测试夹具
+
+pg_pool：需要 PostgreSQL 的集成测试（设置 TEST_POSTGRES_DSN）。每个测试在独立 schema 中
+执行 KB 表 DDL 与项目/DocStore 相关迁移，并切换到 tmp_path（资产目录是相对路径 data/tender_assets/<project_id>）。
+"""
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+KB_DDL = """
+CREATE TABLE knowledge_bases (id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT, category_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(), updated_at TIMESTAMPTZ NOT NULL DEFAULT now());
+CREATE TABLE kb_documents (id TEXT PRIMARY KEY, kb_id TEXT NOT NULL REFERENCES knowledge_bases(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL, source TEXT NOT NULL, content_hash TEXT NOT NULL, status TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(), updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    meta_json JSONB NOT NULL DEFAULT '{}'::jsonb, kb_category TEXT NOT NULL DEFAULT 'general_doc');
+CREATE TABLE kb_chunks (chunk_id TEXT PRIMARY KEY, kb_id TEXT NOT NULL, doc_id TEXT NOT NULL, title TEXT, url TEXT,
+    position INT, content TEXT NOT NULL, created_at TIMESTAMPTZ NOT NULL DEFAULT now(), tsv TSVECTOR,
+    kb_category TEXT NOT NULL DEFAULT 'general_doc');
+"""
+PG_MIGRATIONS = (
+    "005_create_tender_app_tables", "006_create_tender_project_assets", "009_add_template_spec_fields",
+    "010_project_cascade_delete_prepare", "011_create_doc_fragment_table", "013_add_format_template_storage_path",
+    "021_create_docstore_tables", "023_create_ruleset_tables", "027_project_delete_progress",
+)
+
+
+@pytest.fixture
+def pg_pool(tmp_path, monkeypatch):
+    dsn = os.getenv("TEST_POSTGRES_DSN")
+    if not dsn:
+        pytest.skip("TEST_POSTGRES_DSN not set")
+    import psycopg
+    from psycopg_pool import ConnectionPool
+
+    schema = f"t_{uuid.uuid4().hex[:12]}"
+    options = f"-c search_path={schema}"
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    with psycopg.connect(dsn, autocommit=True, options=options) as conn:
+        conn.execute(KB_DDL)
+        for name in PG_MIGRATIONS:
+            conn.execute((MIGRATIONS / f"{name}.sql").read_text(encoding="utf-8"))
+
+    monkeypatch.chdir(tmp_path)
+    p = ConnectionPool(dsn, kwargs={"options": options}, min_size=1, max_size=4)
+    yield p
+    p.close()
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
@@ -0,0 +1,145 @@
+"""
+音频预处理不阻塞事件循环
+多个上传同时做重采样 + 降噪时，同一进程内的 /health 请求仍持续得到响应，且延迟保持在较低水平
+"""
+import asyncio
+import shutil
+import statistics
+import subprocess
+import time
+
+import httpx
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import FastAPI, File, UploadFile
+
+from app.services import asr_service, audio_decode
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        text, duration = await asr_service.transcribe_audio(await file.read(), file.filename, language="zh")
+        return {"text": text, "duration": duration}
+
+    return app
+
+
+def _noisy_wav(seconds: int, seed: int) -> bytes:
+    """44.1kHz 立体声（强制走 librosa 重采样 + 降噪）"""
+    import io
+
+    rng = np.random.default_rng(seed)
+    sr = 44100
+    t = np.arange(seconds * sr) / sr
+    mono = 0.2 * np.sin(2 * np.pi * 200 * t) + 0.05 * rng.standard_normal(t.size)
+    buf = io.BytesIO()
+    sf.write(buf, np.stack([mono, mono], axis=1).astype(np.float32), sr, format="WAV")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def fake_remote_asr(monkeypatch):
+    settings = asr_service.get_settings()
+    monkeypatch.setattr(settings, "ASR_ENABLED", True)
+    monkeypatch.setattr(settings, "ASR_ENABLE_PREPROCESSING", True)
+    monkeypatch.setattr(settings, "ASR_NOISE_REDUCTION", True)
+    monkeypatch.setattr(settings, "ASR_NORMALIZE_AUDIO", True)
+    monkeypatch.setattr(settings, "ASR_PREPROCESS_WORKERS", 2)
+    monkeypatch.setattr(asr_service, "_get_default_asr_config", lambda: {
+        "id": "asr_test", "name": "stub", "api_url": "http://stub", "api_key": None,
+        "model_name": "whisper", "response_format": "json", "extra_params": {},
+    })
+    preprocessed = []
+
+    async def fake_call(audio_file_path, **kwargs):
+        info = sf.info(str(audio_file_path))
+        preprocessed.append((info.samplerate, info.channels))
+        return "ok", float(info.duration)
+
+    monkeypatch.setattr(asr_service, "call_remote_asr_api", fake_call)
+    monkeypatch.setattr(asr_service, "get_conn", lambda: (_ for _ in ()).throw(RuntimeError("no db")))
+    yield preprocessed
+    asr_service.shutdown_preprocess_pool()
+
+
+@pytest.mark.slow
+def test_health_is_served_while_uploads_are_preprocessed(fake_remote_asr, monkeypatch):
+    app = _build_app()
+    uploads = [_noisy_wav(8, seed) for seed in range(2)]
+
+    # 记录预处理进行中的区间：若预处理阻塞事件循环，这段时间里不可能有 /health 完成
+    in_flight = {"count": 0, "ever": 0}
+    original = asr_service.preprocess_audio_async
+
+    async def tracked_preprocess(*args, **kwargs):
+        in_flight["count"] += 1
+        in_flight["ever"] += 1
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            in_flight["count"] -= 1
+
+    monkeypatch.setattr(asr_service, "preprocess_audio_async", tracked_preprocess)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # 预热进程池，避免把子进程启动时间算进去
+            await asr_service._preprocess_pool.run(abs, 0)
+
+            async def post(i, data):
+                r = await client.post("/upload", files={"file": (f"u{i}.wav", data, "audio/wav")})
+                assert r.status_code == 200, r.text
+                return r.json()
+
+            tasks = [asyncio.create_task(post(i, d)) for i, d in enumerate(uploads)]
+            latencies = []
+            while not all(t.done() for t in tasks):
+                busy = in_flight["count"]
+                start = time.perf_counter()
+                r = await client.get("/health")
+                elapsed = time.perf_counter() - start
+                assert r.status_code == 200
+                # 只统计与预处理重叠的请求
+                if busy or in_flight["count"]:
+                    latencies.append(elapsed)
+                await asyncio.sleep(0.01)
+            return await asyncio.gather(*tasks), latencies
+
+    results, latencies = asyncio.run(run())
+
+    assert [r["text"] for r in results] == ["ok"] * 2
+    # 预处理输出为 16kHz 单声道，说明确实在进程池中跑了重采样
+    assert fake_remote_asr == [(16000, 1)] * 2
+    assert in_flight["ever"] == 2
+    # 预处理期间事件循环持续响应；阻塞时这段时间内一个请求也完成不了
+    assert len(latencies) >= 5, len(latencies)
+    # 阈值留足余量（预处理子进程与事件循环争用 CPU），阻塞时单次延迟是秒级
+    p50 = statistics.median(latencies)
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print("LAT", len(latencies), p50, p95, max(latencies))
+    assert p50 < 0.05, p50
+    assert p95 < 0.25, p95
+
+
+def test_preprocess_failure_falls_back_to_original(tmp_path, fake_remote_asr):
+    bogus = tmp_path / "bogus.wav"
+    bogus.write_bytes(b"not audio")
+    assert asyncio.run(asr_service.preprocess_audio_async(str(bogus))) == str(bogus)
+    assert asyncio.run(asr_service.preprocess_audio_async(str(bogus), False, False)) == str(bogus)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_pipe_decode_and_errors():
+    wav = asyncio.run(audio_decode.decode_to_wav_bytes(_noisy_wav(2, 0)))
+    assert wav[:4] == b"RIFF"
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(audio_decode.decode_to_wav_bytes(b"garbage" * 100))
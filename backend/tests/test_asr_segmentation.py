@@ -0,0 +1,146 @@
+"""
+长音频分段转写测试
+验证静音切分边界、片段上限、并发上限、失败片段单独重试以及合并后的时间戳
+"""
+import asyncio
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.services import asr_service
+from app.services.asr_segmentation import (
+    AudioSegment,
+    frame_energy_db,
+    merge_segment_results,
+    plan_segments,
+    transcribe_segments,
+)
+
+SR = 16000
+
+
+def _speech_with_pauses(seconds: float, seed: int = 0) -> np.ndarray:
+    """2~6 秒的"语音"与 0.5~1.2 秒的低噪停顿交替"""
+    rng = np.random.default_rng(seed)
+    parts, total = [], 0
+    while total < seconds * SR:
+        n = int(rng.uniform(2, 6) * SR)
+        t = np.arange(n) / SR
+        parts.append(0.3 * np.sin(2 * np.pi * 220 * t))
+        pause = int(rng.uniform(0.5, 1.2) * SR)
+        parts.append(0.001 * rng.standard_normal(pause))
+        total += n + pause
+    return np.concatenate(parts)[: int(seconds * SR)].astype(np.float32)
+
+
+def test_plan_cuts_inside_silence_and_respects_max():
+    samples = _speech_with_pauses(600)
+    segments = plan_segments(samples, SR, target_seconds=60, max_seconds=90)
+
+    assert len(segments) >= 6
+    assert segments[0].start == 0.0 and segments[-1].end == pytest.approx(600.0)
+    for prev, cur in zip(segments, segments[1:]):
+        assert prev.end == cur.start
+    assert all(s.duration <= 90.0 for s in segments)
+
+    # 每个切点都落在静音里
+    for seg in segments[:-1]:
+        idx = int(seg.end * SR)
+        window = samples[idx - 800: idx + 800]
+        assert np.sqrt(np.mean(window ** 2)) < 0.01
+
+
+def test_plan_without_silence_falls_back_to_hard_cut():
+    t = np.arange(300 * SR) / SR
+    samples = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    segments = plan_segments(samples, SR, target_seconds=60, max_seconds=90)
+    assert all(s.duration <= 90.0 for s in segments)
+    assert segments[-1].end == pytest.approx(300.0)
+
+
+def test_short_audio_is_single_segment():
+    assert plan_segments(np.zeros(30 * SR, dtype=np.float32), SR) == [AudioSegment(0, 0.0, 30.0)]
+    assert frame_energy_db(np.zeros(10, dtype=np.float32), SR).size == 0
+
+
+def test_transcribe_segments_caps_concurrency_and_retries_failed_segment_only():
+    samples = _speech_with_pauses(400)
+    segments = plan_segments(samples, SR, target_seconds=40, max_seconds=60)
+    calls = {}
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_transcribe(path, segment):
+        calls[segment.index] = calls.get(segment.index, 0) + 1
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            info = sf.info(path)
+            assert info.duration == pytest.approx(segment.duration, abs=1e-3)
+            await asyncio.sleep(0.01)
+            if segment.index == 2 and calls[2] == 1:
+                raise RuntimeError("HTTP 503")
+            return {"text": f"s{segment.index}", "duration": info.duration,
+                    "segments": [{"start": 1.0, "end": 2.0, "text": f"s{segment.index}"}]}
+        finally:
+            in_flight["now"] -= 1
+
+    results = asyncio.run(transcribe_segments(
+        samples, SR, segments, fake_transcribe, max_concurrency=3, max_retries=2, retry_backoff=0,
+    ))
+
+    assert in_flight["max"] == 3
+    assert calls[2] == 2
+    assert all(count == 1 for idx, count in calls.items() if idx != 2)
+    assert [r["text"] for r in results] == [f"s{s.index}" for s in segments]
+
+
+def test_transcribe_segments_raises_after_retries_exhausted():
+    samples = _speech_with_pauses(200)
+    segments = plan_segments(samples, SR, target_seconds=40, max_seconds=60)
+
+    async def broken(path, segment):
+        if segment.index == 1:
+            raise RuntimeError("boom")
+        return {"text": "ok"}
+
+    with pytest.raises(RuntimeError, match="1/"):
+        asyncio.run(transcribe_segments(samples, SR, segments, broken, max_retries=1, retry_backoff=0))
+
+
+def test_merge_offsets_timestamps():
+    segments = [AudioSegment(0, 0.0, 50.0), AudioSegment(1, 50.0, 95.5)]
+    results = [
+        {"text": "甲 乙", "segments": [{"start": 0.0, "end": 20.0, "text": "甲"}, {"start": 20.0, "end": 49.0, "text": "乙"}]},
+        {"text": "丙", "segments": []},
+    ]
+    merged = merge_segment_results(segments, results)
+    assert merged["text"] == "甲 乙 丙"
+    assert merged["duration"] == 95.5
+    assert [(s["start"], s["end"], s["text"]) for s in merged["segments"]] == [
+        (0.0, 20.0, "甲"), (20.0, 49.0, "乙"), (50.0, 95.5, "丙"),
+    ]
+
+
+def test_transcribe_long_audio_end_to_end(tmp_path, monkeypatch):
+    path = tmp_path / "meeting.wav"
+    sf.write(path, _speech_with_pauses(420), SR, subtype="PCM_16")
+    requests = []
+
+    async def fake_api(audio_file_path, **kwargs):
+        duration = sf.info(audio_file_path).duration
+        requests.append((duration, kwargs["content_type"], kwargs["client"]))
+        return {"text": "x", "duration": duration,
+                "segments": [{"start": 0.0, "end": duration, "text": "x"}]}
+
+    monkeypatch.setattr(asr_service, "call_remote_asr_api_detailed", fake_api)
+    config = {"api_url": "http://stub/v1/audio/transcriptions", "model_name": "whisper",
+              "response_format": "verbose_json", "api_key": None}
+    merged = asyncio.run(asr_service.transcribe_long_audio(str(path), config, {}))
+
+    assert len(requests) == len(merged["segments"]) >= 5
+    assert all(d <= 90.0 + 1e-3 for d, _, _ in requests)
+    assert {ct for _, ct, _ in requests} == {"audio/wav"}
+    assert len({id(c) for _, _, c in requests}) == 1  # 共享同一个连接池
+    assert merged["duration"] == pytest.approx(420.0)
+    assert merged["segments"][-1]["end"] == pytest.approx(420.0, abs=1e-2)
@@ -0,0 +1,157 @@
+"""
+WebSocket 流式转写测试
+验证滚动磁盘缓冲、partial/final 输出顺序与覆盖范围，以及 2 小时连续音频下内存与 partial 延迟保持平稳
+"""
+import asyncio
+import statistics
+
+import numpy as np
+import pytest
+
+from app.services.asr_stream import PcmSpool, StreamingTranscriber
+
+SR = 16000
+CHUNK = SR // 4  # 250ms，与前端 MediaRecorder 的切片间隔一致
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def _speech_cycle(seed: int = 0) -> list:
+    """约 11 秒的"语音 + 停顿"循环，预先切成 250ms 的 s16le 块"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for speech in (4.0, 2.5, 3.5):
+        t = np.arange(int(speech * SR)) / SR
+        parts.append(0.3 * np.sin(2 * np.pi * 220 * t))
+        parts.append(0.001 * rng.standard_normal(int(0.5 * SR)))
+    samples = np.concatenate(parts)
+    samples = samples[: len(samples) // CHUNK * CHUNK]
+    pcm = (samples * 32767).astype("<i2").tobytes()
+    return [pcm[i: i + CHUNK * 2] for i in range(0, len(pcm), CHUNK * 2)]
+
+
+async def _fake_transcribe(pcm: bytes, sample_rate: int) -> str:
+    await asyncio.sleep(0)
+    return f"<{len(pcm) // 2 / sample_rate:.2f}>"
+
+
+def test_spool_rotates_and_reads_absolute_offsets(tmp_path):
+    spool = PcmSpool(str(tmp_path), rotate_bytes=1000)
+    for i in range(10):
+        spool.append(bytes([i]) * 300)
+    assert spool.read(600, 603) == b"\x02\x02\x02"
+
+    spool.discard_before(1500)
+    assert spool.file_size == 1500
+    assert spool.read(1500, 1502) == b"\x05\x05"
+
+    spool.append(b"\xff" * 4)
+    assert spool.end == 3004 and spool.read(3000, 3004) == b"\xff" * 4
+    spool.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partials_then_finals_cover_audio_in_order(tmp_path):
+    messages = []
+
+    async def emit(msg):
+        messages.append(msg)
+
+    async def run():
+        st = StreamingTranscriber(_fake_transcribe, emit, spool_dir=str(tmp_path),
+                                  partial_interval=1.0, min_final_seconds=5.0, max_window_seconds=12.0)
+        for chunk in _speech_cycle() * 3:
+            await st.feed(chunk)
+            await st.wait_idle()
+        return await st.finish()
+
+    full = asyncio.run(run())
+    finals = [m for m in messages if not m["is_partial"]]
+    partials = [m for m in messages if m["is_partial"]]
+
+    assert partials and len(finals) >= 4
+    assert [m["seq"] for m in messages] == list(range(1, len(messages) + 1))
+    assert finals[0]["start"] == 0.0
+    assert all(a["end"] == b["start"] for a, b in zip(finals, finals[1:]))
+    assert finals[-1]["end"] == pytest.approx(len(_speech_cycle()) * 3 * 0.25)
+    assert all(f["end"] - f["start"] <= 12.0 + 1e-6 for f in finals)
+    # 没有落在硬切上限的定稿都切在停顿里（停顿位于每段语音之后）
+    assert any(f["end"] - f["start"] < 12.0 for f in finals[:-1])
+    assert full == " ".join(m["text"] for m in finals)
+    # partial 只覆盖未定稿部分
+    committed = 0.0
+    for m in messages:
+        assert m["start"] == pytest.approx(committed)
+        if not m["is_partial"]:
+            committed = m["end"]
+
+
+def test_failed_final_is_reported_and_skipped(tmp_path):
+    messages = []
+    calls = {"n": 0}
+
+    async def emit(msg):
+        messages.append(msg)
+
+    async def flaky(pcm, sample_rate):
+        calls["n"] += 1
+        if len(pcm) // 2 / sample_rate > 5:
+            raise RuntimeError("HTTP 503")
+        return "ok"
+
+    async def run():
+        st = StreamingTranscriber(flaky, emit, spool_dir=str(tmp_path),
+                                  partial_interval=1.0, min_final_seconds=5.0, max_window_seconds=6.0)
+        for chunk in _speech_cycle()[:40]:
+            await st.feed(chunk)
+        await st.wait_idle()
+        return await st.finish(), st.stats
+
+    full, stats = asyncio.run(run())
+    assert any(m["type"] == "error" for m in messages)
+    assert stats["errors"] >= 2
+    assert full.split() == ["ok"] * stats["finals"]
+
+
+def test_two_hours_stream_keeps_memory_and_partial_latency_flat(tmp_path):
+    """2 小时 16kHz PCM（约 230MB）按 250ms 块推流：RSS 不随时长增长，partial 延迟不漂移"""
+    cycle = _speech_cycle()
+    total_chunks = 2 * 3600 * 4
+    rss = {}
+    spool_peak = {"bytes": 0}
+    counts = {"partial": 0, "final": 0}
+
+    async def emit(msg):
+        counts["partial" if msg["is_partial"] else "final"] += 1
+
+    async def run():
+        st = StreamingTranscriber(_fake_transcribe, emit, spool_dir=str(tmp_path),
+                                  partial_interval=2.0, min_final_seconds=8.0, max_window_seconds=30.0)
+        for i in range(total_chunks):
+            await st.feed(cycle[i % len(cycle)])
+            if i % 8 == 7:  # 每 2 秒音频让出一次，模拟实时到达
+                await st.wait_idle()
+                spool_peak["bytes"] = max(spool_peak["bytes"], st.spool_bytes)
+            if i == 10 * 60 * 4:
+                rss["warm"] = _rss_mb()
+                head_latencies = list(st.partial_latencies)
+        rss["end"] = _rss_mb()
+        tail_latencies = list(st.partial_latencies)
+        await st.finish()
+        return head_latencies, tail_latencies
+
+    head_latencies, tail_latencies = asyncio.run(run())
+
+    assert counts["final"] >= 7200 / 30
+    assert counts["partial"] >= 1000
+    assert rss["end"] - rss["warm"] < 20.0, rss
+    assert spool_peak["bytes"] < 8 * 1024 * 1024 + 30 * SR * 2 * 2
+    head = statistics.median(head_latencies)
+    tail = statistics.median(tail_latencies[-200:])
+    assert tail <= head * 3 + 0.005, (head, tail)
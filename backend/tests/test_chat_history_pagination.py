@@ -0,0 +1,149 @@
+"""
+对话历史游标分页测试
+用内存中的假连接模拟 (时间戳, id) 复合排序，验证逐页遍历不重不漏、同一时间戳的行按 id 稳定切分，
+以及最近消息窗口与非法游标的处理
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import history
+from app.services.dao import chat_dao
+
+BASE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    """只实现 chat_dao 游标查询用到的语义：过滤、(ts, id) 倒序、LIMIT"""
+
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        params = list(params)
+        self.db["queries"].append(sql)
+        if "LIMIT" not in sql:  # get_session: 按主键取单行
+            self.rows = [s for s in self.db["sessions"] if s["id"] == params[0]]
+            return
+        limit = params.pop()
+        if "FROM chat_messages" in sql:
+            session_id = params.pop(0)
+            rows = [m for m in self.db["messages"] if m["session_id"] == session_id]
+            key = "created_at"
+        else:
+            rows = list(self.db["sessions"])
+            key = "updated_at"
+        if params:
+            bound = tuple(params)
+            rows = [r for r in rows if (r[key], r["id"]) < bound]
+        rows.sort(key=lambda r: (r[key], r["id"]), reverse=True)
+        self.rows = rows[:limit]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, row_factory=None):
+        return FakeCursor(self.db)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    data = {"sessions": [], "messages": [], "queries": []}
+    for i in range(45):
+        # 每 3 个会话共用一个 updated_at，检验 id 作为次级排序键
+        data["sessions"].append({
+            "id": f"s{i:03d}", "title": f"会话{i}", "created_at": BASE,
+            "updated_at": BASE + timedelta(minutes=i // 3), "default_kb_ids_json": [],
+            "search_mode": "off", "model_id": None, "meta_json": {}, "summary": None,
+        })
+    for i in range(130):
+        data["messages"].append({
+            "id": f"m{i:04d}", "session_id": "s001", "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"第{i}条", "created_at": BASE + timedelta(seconds=i // 4), "metadata_json": {},
+        })
+
+    @contextmanager
+    def fake_get_conn():
+        yield FakeConn(data)
+
+    monkeypatch.setattr(chat_dao, "get_conn", fake_get_conn)
+    return data
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    ts = BASE + timedelta(microseconds=123)
+    assert chat_dao.decode_cursor(chat_dao.encode_cursor(ts, "s1")) == (ts, "s1")
+    for bad in ("", "not-a-cursor", "W1td"):
+        with pytest.raises(ValueError):
+            chat_dao.decode_cursor(bad)
+
+
+def test_session_pages_cover_all_rows_in_order(db):
+    seen, cursor = [], None
+    while True:
+        page, cursor = chat_dao.list_sessions_after(cursor, 10)
+        seen.extend(s["id"] for s in page)
+        if not cursor:
+            break
+    expected = sorted(db["sessions"], key=lambda r: (r["updated_at"], r["id"]), reverse=True)
+    assert seen == [r["id"] for r in expected]
+    # 每页只多取一行用于判断是否还有下一页，不使用 OFFSET
+    assert all("OFFSET" not in sql for sql in db["queries"])
+    assert len(db["queries"]) == 5
+
+
+def test_message_window_and_backward_pages(db):
+    session = chat_dao.get_session_with_recent_messages("s001", 21)
+    window = session["messages"]
+    assert [m["id"] for m in window] == [f"m{i:04d}" for i in range(109, 130)]
+    assert window[0]["metadata"] == {} and "metadata_json" not in window[0]
+
+    older, cursor = [], session["messages_cursor"]
+    while cursor:
+        page, cursor = chat_dao.list_messages("s001", 50, cursor)
+        older = page + older
+    assert [m["id"] for m in older + window] == [f"m{i:04d}" for i in range(130)]
+
+    short, cursor = chat_dao.list_messages("s001", 500)
+    assert len(short) == 130 and cursor is None
+    assert chat_dao.get_session_with_recent_messages("missing", 21) is None
+
+
+def test_history_routes_expose_next_cursor(db):
+    app = FastAPI()
+    app.include_router(history.router)
+    client = TestClient(app)
+
+    first = client.get("/api/history/sessions", params={"cursor": "", "page_size": 20})
+    assert first.status_code == 200 and len(first.json()) == 20
+    second = client.get("/api/history/sessions", params={"cursor": first.headers["X-Next-Cursor"], "page_size": 20})
+    assert {s["id"] for s in first.json()}.isdisjoint(s["id"] for s in second.json())
+
+    resp = client.get("/api/history/sessions/s001/messages", params={"limit": 100})
+    assert [m["id"] for m in resp.json()][-1] == "m0129"
+    rest = client.get(
+        "/api/history/sessions/s001/messages",
+        params={"limit": 100, "before": resp.headers["X-Next-Cursor"]},
+    )
+    assert len(rest.json()) == 30 and "X-Next-Cursor" not in rest.headers
+
+    assert client.get("/api/history/sessions", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/api/history/sessions/nope/messages").status_code == 404
@@ -0,0 +1,94 @@
+"""
+流式对话断开取消测试
+验证客户端断开后整轮对话（LLM 流）在短时间内被取消，以及慢速读取时输出队列有界
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.telemetry import REGISTRY
+from app.routers import chat
+from app.schemas.chat import ChatRequest
+
+
+class FakeTurn:
+    """模拟持续输出 token 的 LLM 流，记录产出数量与被取消的时间"""
+
+    def __init__(self, interval=0.002, token="字" * 512):
+        self.interval = interval
+        self.token = token
+        self.produced = 0
+        self.cancelled_at = None
+
+    async def __call__(self, req, request_id, stream_tokens=None):
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await stream_tokens(self.token)
+                self.produced += 1
+        except asyncio.CancelledError:
+            self.cancelled_at = time.perf_counter()
+            raise
+
+
+def _cancelled_total():
+    return REGISTRY.get_sample_value("chat_stream_cancelled_total", {}) or 0
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_llm_stream(monkeypatch):
+    turn = FakeTurn()
+    monkeypatch.setattr(chat, "_chat_endpoint_impl", turn)
+    before = _cancelled_total()
+    response = await chat.chat_stream_endpoint(ChatRequest(message="你好"))
+
+    received = []
+    disconnect = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message["body"]:
+            received.append(message["body"])
+            if len(received) >= 10:
+                disconnect.set()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    # 与 Starlette 一致：收到 http.disconnect 后取消响应任务
+    await asyncio.wait_for(response({"type": "http"}, receive, send), timeout=2)
+    disconnected_at = time.perf_counter()
+    for _ in range(50):
+        if turn.cancelled_at is not None:
+            break
+        await asyncio.sleep(0.01)
+
+    assert received[0] == b":open\n\n"
+    assert turn.cancelled_at is not None
+    assert turn.cancelled_at - disconnected_at < 0.2
+    produced = turn.produced
+    await asyncio.sleep(0.1)
+    assert turn.produced == produced
+    assert _cancelled_total() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_slow_reader_applies_backpressure(monkeypatch):
+    turn = FakeTurn(interval=0)
+    monkeypatch.setattr(chat, "_chat_endpoint_impl", turn)
+    response = await chat.chat_stream_endpoint(ChatRequest(message="你好"))
+    stream = response.body_iterator
+
+    consumed = 0
+    for _ in range(5):
+        # 读者停顿期间生产者最多领先队列容量，内存不随输出增长
+        await asyncio.sleep(0.05)
+        assert turn.produced - consumed <= chat.STREAM_QUEUE_MAXSIZE + 1
+        for _ in range(20):
+            await stream.__anext__()
+            consumed += 1
+
+    await stream.aclose()
+    await asyncio.sleep(0.01)
+    assert turn.cancelled_at is not None
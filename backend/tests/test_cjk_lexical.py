@@ -0,0 +1,80 @@
+"""
+中文词法检索分词测试
+验证汉字二元组/字母数字切分、tsvector/tsquery 字面量格式，以及 NewRetriever 词法检索走 tsv_cjk
+"""
+from contextlib import contextmanager
+
+from app.platform.retrieval.cjk_lexical import (
+    MAX_POSITIONS_PER_LEXEME,
+    build_tsquery_literal,
+    build_tsvector_literal,
+    cjk_tokens,
+)
+from app.platform.retrieval.new_retriever import NewRetriever
+
+
+def test_tokens_bigrams_and_words():
+    assert cjk_tokens("投标保证金") == ["投标", "标保", "保证", "证金"]
+    assert cjk_tokens("符合ISO9001认证、GB50311-2016") == [
+        "符合", "iso9001", "认证", "gb50311", "2016",
+    ]
+    # 全角字符归一化，单字成段保留单字
+    assert cjk_tokens("ＵＰＳ：2台") == ["ups", "2", "台"]
+    assert cjk_tokens("") == [] and cjk_tokens("，。！") == []
+
+
+def test_tsvector_literal_keeps_positions():
+    literal = build_tsvector_literal("保证金，保证")
+    assert literal == "'保证':1,3 '证金':2"
+    many = build_tsvector_literal("甲乙" * 600)
+    lexemes = dict(part.split(":") for part in many.split(" "))
+    assert set(lexemes) == {"'甲乙'", "'乙甲'"}
+    assert all(len(positions.split(",")) == MAX_POSITIONS_PER_LEXEME for positions in lexemes.values())
+
+
+def test_tsquery_literal_dedups_and_ors():
+    assert build_tsquery_literal("保证金 保证") == "'保证' | '证金'"
+    assert build_tsquery_literal("？？") is None
+
+
+class _RecordingPool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    @contextmanager
+    def connection(self):
+        pool = self
+
+        class Cur:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params):
+                pool.executed.append((sql, params))
+
+            def fetchall(self):
+                return pool.rows
+
+        class Conn:
+            def cursor(self):
+                return Cur()
+
+        yield Conn()
+
+
+def test_retriever_lexical_leg_uses_cjk_index():
+    pool = _RecordingPool([("seg_a", 0.5), ("seg_b", 0.1)])
+    hits = NewRetriever(pool)._search_lexical("投标保证金多少", ["dv_1"], 10)
+
+    sql, params = pool.executed[0]
+    assert "tsv_cjk @@ query" in sql and "english" not in sql
+    assert params == ["'投标' | '标保' | '保证' | '证金' | '金多' | '多少'", ["dv_1"], 10]
+    assert [(h["chunk_id"], h["rank"]) for h in hits] == [("seg_a", 0), ("seg_b", 1)]
+
+    # 没有可检索词元时不访问数据库
+    assert NewRetriever(pool)._search_lexical("？", ["dv_1"], 10) == []
+    assert len(pool.executed) == 1
@@ -0,0 +1,203 @@
+"""
+跨请求域名限速测试
+启动两个本地 HTTP 服务（不同 host:port 即不同域名），模拟多轮对话各自创建 PageFetcher 并发抓取，
+验证同一域名的请求间隔不小于冷却时间、不同域名互不阻塞、403 后的退避对其他抓取生效，
+以及 SQLite 限速器在多进程间同样生效
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.crawler import fetcher as fetcher_module
+from app.services.crawler.domain_limiter import DomainRateLimiter, SqliteDomainRateLimiter
+from app.services.crawler.fetcher import PageFetcher
+
+COOLDOWN = 0.1
+PAGE = b"<html><head><title>t</title></head><body><p>ok</p></body></html>"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    arrivals = None
+    blocked_paths = set()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.arrivals.append((self.server.server_address[1], self.path, time.monotonic()))
+        status = 403 if self.path in self.blocked_paths else 200
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+
+@pytest.fixture
+def servers():
+    Handler.arrivals = []
+    Handler.blocked_paths = set()
+    started = []
+    for _ in range(2):
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        started.append(httpd)
+    yield [f"http://127.0.0.1:{s.server_address[1]}" for s in started], Handler.arrivals
+    for httpd in started:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def _fetcher(limiter, **kwargs):
+    return PageFetcher(
+        timeout=5, concurrency=4, max_retries=0, delay_range=(0, 0),
+        domain_cooldown=COOLDOWN, limiter=limiter, **kwargs,
+    )
+
+
+class RecordingLimiter(DomainRateLimiter):
+    """记录每次领取到的时间槽（领取在事件循环线程内同步完成，读 _next 不会与其他领取交错）"""
+
+    def __init__(self):
+        super().__init__()
+        self.slots = {}
+
+    def _claim(self, domain, cooldown):
+        wait = super()._claim(domain, cooldown)
+        self.slots.setdefault(domain, []).append(self._next[domain] - cooldown)
+        return wait
+
+
+def _slot_gaps(slots):
+    slots = sorted(slots)
+    return [b - a for a, b in zip(slots, slots[1:])]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_turns_share_domain_spacing(servers):
+    (site_a, site_b), _ = servers
+    limiter = RecordingLimiter()
+    turns, per_site = 8, 2
+
+    async def chat_turn(i):
+        urls = [f"{site}/t{i}/p{j}" for site in (site_a, site_b) for j in range(per_site)]
+        return await _fetcher(limiter).fetch(urls)
+
+    results = await asyncio.gather(*(chat_turn(i) for i in range(turns)))
+
+    assert all(r.status == 200 for turn in results for r in turn)
+    # 断言限速器发出的时间槽而不是服务端到达间隔，结果不受调度抖动影响
+    domains = [site.split("//", 1)[1] for site in (site_a, site_b)]
+    for domain in domains:
+        slots = limiter.slots[domain]
+        assert len(slots) == turns * per_site
+        assert min(_slot_gaps(slots)) >= COOLDOWN - 1e-9
+    # 两个域名各自排队、并行推进：B 的第一个槽不必等 A 的队列排完
+    slots_a, slots_b = (limiter.slots[d] for d in domains)
+    assert min(slots_b) < max(slots_a) and min(slots_a) < max(slots_b)
+
+
+@pytest.mark.asyncio
+async def test_per_instance_limiters_would_not_space_requests(servers):
+    """对照：每个请求各自限速（旧行为）时，并发对话对同一站点几乎同时领到时间槽"""
+    (site_a, _), _ = servers
+    limiters = [RecordingLimiter() for _ in range(6)]
+    await asyncio.gather(*(_fetcher(limiter).fetch([f"{site_a}/x{i}"]) for i, limiter in enumerate(limiters)))
+    domain = site_a.split("//", 1)[1]
+    slots = [slot for limiter in limiters for slot in limiter.slots[domain]]
+    assert len(slots) == 6
+    assert max(slots) - min(slots) < COOLDOWN
+
+
+@pytest.mark.asyncio
+async def test_jitter_happens_before_the_slot_is_claimed(servers):
+    """领到时间槽后不能再随机等待，否则同一域名的请求会乱序或间隔小于冷却时间"""
+    (site_a, _), arrivals = servers
+    fetcher = _fetcher(RecordingLimiter())
+    events = []
+    jitter, reserve = fetcher._sleep_jitter, fetcher._reserve_domain_slot
+
+    async def record_jitter():
+        events.append("jitter")
+        await jitter()
+
+    async def record_reserve(domain):
+        events.append("slot")
+        await reserve(domain)
+
+    fetcher._sleep_jitter, fetcher._reserve_domain_slot = record_jitter, record_reserve
+    await fetcher.fetch([f"{site_a}/a", f"{site_a}/b"])
+    assert events == ["jitter", "slot", "jitter", "slot"] or events == ["jitter", "jitter", "slot", "slot"]
+    assert len(arrivals) == 2
+
+
+@pytest.mark.asyncio
+async def test_block_backoff_applies_to_other_fetchers(servers):
+    (site_a, _), arrivals = servers
+    Handler.blocked_paths = {"/blocked"}
+    limiter = DomainRateLimiter()
+
+    blocked = await _fetcher(limiter, block_backoff=0.5).fetch([f"{site_a}/blocked"])
+    other = await _fetcher(limiter).fetch([f"{site_a}/ok"])
+
+    assert blocked[0].status == 403 and other[0].status == 200
+    (_, _, t_blocked), (_, _, t_ok) = sorted(arrivals, key=lambda a: a[2])
+    assert t_ok - t_blocked >= 0.45
+
+
+class _RecordingClock:
+    """记录 _claim 内部读取的墙上时钟，时间槽 = 该时刻 + 返回的等待秒数"""
+
+    def __init__(self):
+        self.last = 0.0
+
+    def time(self):
+        self.last = time.time()
+        return self.last
+
+
+def _claim_worker(path, start_event, slots, claims):
+    from app.services.crawler import domain_limiter
+
+    clock = _RecordingClock()
+    domain_limiter.time = clock  # fork 出的子进程内替换，不影响测试进程
+    limiter = SqliteDomainRateLimiter(path)
+    start_event.wait()
+    for _ in range(claims):
+        wait = limiter._claim("example.com", COOLDOWN)
+        slots.put(clock.last + wait)
+
+
+def test_sqlite_limiter_spaces_slots_across_processes(tmp_path):
+    # 断言各进程领取到的时间槽，而不是服务端到达间隔，结果不受调度抖动影响
+    path = str(tmp_path / "domains.db")
+    SqliteDomainRateLimiter(path)
+    ctx = multiprocessing.get_context("fork")
+    start_event, slots = ctx.Event(), ctx.Queue()
+    workers = [ctx.Process(target=_claim_worker, args=(path, start_event, slots, 4)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    start_event.set()
+    claimed = sorted(slots.get(timeout=30) for _ in range(12))
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    gaps = [b - a for a, b in zip(claimed, claimed[1:])]
+    # 墙上时钟约 1.7e9 秒，浮点累加误差在微秒级
+    assert min(gaps) >= COOLDOWN - 1e-4
+
+
+@pytest.mark.asyncio
+async def test_fetchers_share_one_connection_pool():
+    first = fetcher_module.get_shared_client()
+    assert fetcher_module.get_shared_client() is first
+    await fetcher_module.close_shared_client()
+    assert first.is_closed
+    assert fetcher_module.get_shared_client() is not first
+    await fetcher_module.close_shared_client()
@@ -0,0 +1,84 @@
+"""
+网页正文提取测试
+验证单次解析下的标题/兜底文本与原先的 BeautifulSoup 行为一致，以及进程池提取期间事件循环保持响应
+"""
+import asyncio
+import random
+import time
+
+import pytest
+from bs4 import BeautifulSoup
+
+from app.services.crawler import extractor
+
+WORDS = "招标 投标 文件 技术 要求 响应 the model data system 供应商 资质 报价 项目".split()
+
+
+def _article(sections, seed=0):
+    rng = random.Random(seed)
+
+    def para(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    body = "".join(
+        f"<h2>第{i}节</h2>" + "".join(f"<p>{para(120)}</p>" for _ in range(8))
+        for i in range(sections)
+    )
+    return (
+        f"<html><head><title> 招标公告 </title><script>var x = 1;</script></head>"
+        f"<body><nav>{para(20)}</nav><article>{body}</article></body></html>"
+    )
+
+
+def test_title_and_text_come_from_one_parse():
+    doc = extractor.extract_content(_article(5), "https://example.com/a", default_title="fallback")
+    assert doc.title == "招标公告"
+    assert "第0节" in doc.text and "var x" not in doc.text
+    assert len(doc.content_hash) == 40
+
+    untitled = extractor.extract_content("<html><body><p>" + "正文 " * 100 + "</p></body></html>", "u", "默认标题")
+    assert untitled.title == "默认标题"
+
+
+def test_fallback_text_matches_previous_soup_output(monkeypatch):
+    # trafilatura 无结果时走兜底，结果与原 BeautifulSoup 实现逐字一致
+    monkeypatch.setattr(extractor, "trafilatura_extract", lambda *a, **k: None)
+    html = (
+        "<html><head><title> T </title><script>var a=1</script></head><body><!-- c -->"
+        "<p>Hello <b>w</b> x</p><style>p{}</style><noscript>ns</noscript><div>  tail </div>after</body></html>"
+    )
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+
+    doc = extractor.extract_content(html, "u")
+    assert doc.text == soup.get_text("\n", strip=True)
+    assert extractor.extract_content("<html><body>   </body></html>", "u") is None
+
+
+@pytest.mark.asyncio
+async def test_async_extraction_keeps_event_loop_responsive():
+    pages = [_article(150, seed=i) for i in range(3)]
+    expected = [extractor.extract_content(html, f"u{i}") for i, html in enumerate(pages)]
+
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    tick = asyncio.create_task(ticker())
+    try:
+        docs = await asyncio.gather(*(
+            extractor.extract_content_async(html, f"u{i}") for i, html in enumerate(pages)
+        ))
+    finally:
+        stop.set()
+        await tick
+        extractor.shutdown_extract_pool()
+
+    assert [(d.title, d.content_hash) for d in docs] == [(d.title, d.content_hash) for d in expected]
+    assert max(lags) < 0.1
@@ -0,0 +1,142 @@
+"""
+网页抓取缓存与正文上限测试
+启动本地 HTTP 服务，验证 ETag/Last-Modified 条件请求（304 复用缓存）、新鲜期内不发请求、
+超大正文与非 HTML 内容在下载途中中止
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.crawler.fetcher import PageFetcher
+from app.services.crawler.page_cache import PageCache
+
+PAGE_HTML = "<html><head><title>招标公告</title></head><body>" + "公告正文" * 200 + "</body></html>"
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+STREAM_TOTAL = 64 * 1024 * 1024
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    state = None  # 每个测试的服务端计数，由 fixture 设置
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.end_headers()
+        chunk = b"x" * 65536
+        try:
+            while self.state["sent"][self.path] < STREAM_TOTAL:
+                self.wfile.write(chunk)
+                self.state["sent"][self.path] += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        state = self.state
+        state["requests"].append((self.path, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+        state["cache_headers"].append((self.headers.get("Cache-Control"), self.headers.get("Pragma")))
+        state["sent"].setdefault(self.path, 0)
+        html_headers = {"Content-Type": "text/html; charset=utf-8"}
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == state["etag"]:
+                return self._send(304, headers={"ETag": state["etag"]})
+            body = state["html"].encode("utf-8")
+            return self._send(200, body, {**html_headers, "ETag": state["etag"], "Content-Length": str(len(body))})
+        if self.path == "/last-modified":
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                return self._send(304)
+            body = PAGE_HTML.encode("utf-8")
+            return self._send(200, body, {**html_headers, "Last-Modified": LAST_MODIFIED})
+        if self.path == "/big-declared":
+            # 声明的长度超过上限：读到响应头即放弃
+            return self._send(200, headers={**html_headers, "Content-Length": str(STREAM_TOTAL)})
+        if self.path == "/big-stream":
+            return self._stream("text/html")
+        if self.path == "/report.pdf":
+            return self._stream("application/pdf")
+        return self._send(404)
+
+
+@pytest.fixture
+def server():
+    state = {"requests": [], "cache_headers": [], "sent": {}, "etag": '"v1"', "html": PAGE_HTML}
+    Handler.state = state
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _fetcher(cache=None, max_body_bytes=1024 * 1024):
+    return PageFetcher(
+        timeout=5, max_retries=0, delay_range=(0, 0), domain_cooldown=0,
+        cache=cache, max_body_bytes=max_body_bytes,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_revalidated_with_304(server, tmp_path):
+    base, state = server
+    cache = PageCache(str(tmp_path / "pages.db"), fresh_seconds=0)
+    urls = [f"{base}/etag", f"{base}/last-modified"]
+
+    first = await _fetcher(cache).fetch(urls)
+    second = await _fetcher(cache).fetch(urls)
+
+    assert [r.html for r in first] == [PAGE_HTML, PAGE_HTML]
+    assert [(r.status, r.html) for r in second] == [(200, PAGE_HTML), (200, PAGE_HTML)]
+    revalidations = state["requests"][2:]
+    assert sorted(revalidations) == [("/etag", '"v1"', None), ("/last-modified", None, LAST_MODIFIED)]
+    # 首次请求带 no-cache，条件请求不带，以免服务端忽略校验器
+    assert state["cache_headers"][:2] == [("no-cache", "no-cache")] * 2
+    assert state["cache_headers"][2:] == [(None, None)] * 2
+
+    # 内容变化（ETag 变化）时重新下载并更新缓存
+    state["etag"], state["html"] = '"v2"', PAGE_HTML.replace("公告正文", "变更公告")
+    changed = await _fetcher(cache).fetch([f"{base}/etag"])
+    assert changed[0].html == state["html"]
+    assert cache.get(f"{base}/etag").etag == '"v2"'
+
+
+@pytest.mark.asyncio
+async def test_fresh_cache_hit_makes_no_request(server, tmp_path):
+    base, state = server
+    cache = PageCache(str(tmp_path / "pages.db"), fresh_seconds=600)
+
+    await _fetcher(cache).fetch([f"{base}/etag"])
+    hit = await _fetcher(cache).fetch([f"{base}/etag"])
+
+    assert hit[0].html == PAGE_HTML and hit[0].error is None
+    assert len(state["requests"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_body_cap_and_non_html_abort_early(server, tmp_path):
+    base, state = server
+    cache = PageCache(str(tmp_path / "pages.db"))
+    results = await _fetcher(cache, max_body_bytes=256 * 1024).fetch(
+        [f"{base}/big-declared", f"{base}/big-stream", f"{base}/report.pdf"]
+    )
+
+    declared, streamed, pdf = results
+    assert declared.html is None and "上限" in declared.error
+    assert streamed.html is None and "上限" in streamed.error
+    assert pdf.html is None and pdf.error == "非 HTML 内容"
+    # 客户端中止后服务端写入失败，远未发完整个正文
+    assert state["sent"]["/big-stream"] < STREAM_TOTAL / 4
+    assert state["sent"]["/report.pdf"] < STREAM_TOTAL / 4
+    assert all(cache.get(r.url) is None for r in results)
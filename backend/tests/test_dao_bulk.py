@@ -0,0 +1,159 @@
+"""
+DAO 批量写入工具测试
+"""
+import json
+from contextlib import contextmanager
+
+import pytest
+from psycopg import sql
+
+from app.services.dao.bulk import MAX_BIND_PARAMS, copy_rows, encode_json, execute_values
+from app.services.dao.tender_dao import TenderDAO
+
+
+def _render(stmt):
+    """不连数据库渲染 psycopg.sql 语句（标识符按 PostgreSQL 规则加双引号）"""
+    if isinstance(stmt, sql.Composed):
+        return "".join(_render(part) for part in stmt)
+    if isinstance(stmt, sql.Identifier):
+        return ".".join('"' + name.replace('"', '""') + '"' for name in stmt._obj)
+    if isinstance(stmt, sql.SQL):
+        return stmt.as_string(None)
+    return str(stmt)
+
+
+class RecordingCopy:
+    def __init__(self, statement):
+        self.statement = _render(statement)
+        self.rows = []
+
+    def write_row(self, row):
+        self.rows.append(tuple(row))
+
+
+class RecordingCursor:
+    """记录 execute / copy 调用的假游标"""
+
+    def __init__(self):
+        self.calls = []
+        self.copies = []
+
+    def execute(self, sql, params=None):
+        self.calls.append((sql, list(params or [])))
+
+    @contextmanager
+    def copy(self, statement):
+        copy = RecordingCopy(statement)
+        self.copies.append(copy)
+        yield copy
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class RecordingPool:
+    """pool.connection() / conn.transaction() / conn.cursor() 都落到同一个假游标"""
+
+    def __init__(self):
+        self.cursor_obj = RecordingCursor()
+        self.transactions = 0
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield
+
+    def cursor(self, **kwargs):
+        return self.cursor_obj
+
+
+def test_execute_values_pages_rows():
+    cur = RecordingCursor()
+    rows = [(i, f"t{i}") for i in range(5)]
+
+    total = execute_values(
+        cur, "INSERT INTO t (a, b) VALUES {values} ON CONFLICT DO NOTHING", rows, "(%s, %s::jsonb)", page_size=2
+    )
+
+    assert total == 5
+    assert len(cur.calls) == 3
+    first_sql, first_params = cur.calls[0]
+    assert "VALUES (%s, %s::jsonb),(%s, %s::jsonb) ON CONFLICT DO NOTHING" in first_sql
+    assert first_params == [0, "t0", 1, "t1"]
+    assert cur.calls[-1][1] == [4, "t4"]
+
+
+def test_execute_values_respects_bind_param_limit():
+    cur = RecordingCursor()
+    template = "(" + ", ".join(["%s"] * 10) + ")"
+    rows = [tuple(range(10))] * 10000
+
+    execute_values(cur, "INSERT INTO t VALUES {values}", rows, template, page_size=100000)
+
+    assert all(len(params) <= MAX_BIND_PARAMS for _, params in cur.calls)
+    assert sum(len(params) for _, params in cur.calls) == 100000
+
+
+def test_execute_values_empty_and_marker():
+    cur = RecordingCursor()
+    assert execute_values(cur, "INSERT INTO t VALUES {values}", [], "(%s)") == 0
+    assert cur.calls == []
+    with pytest.raises(ValueError):
+        execute_values(cur, "INSERT INTO t VALUES (%s)", [(1,)], "(%s)")
+
+
+def test_encode_json_keeps_cjk_and_default():
+    assert encode_json({"t": "营业执照"}) == '{"t":"营业执照"}'
+    assert encode_json(None, default=[]) == "[]"
+
+
+def test_copy_rows_statement_and_rows():
+    cur = RecordingCursor()
+    rows = [("r1", "营业执照", encode_json({"k": "值"})), ("r2", None, "[]")]
+
+    total = copy_rows(cur, "tender_risks", ("id", "title", "tags_json"), iter(rows))
+
+    assert total == 2
+    (copy,) = cur.copies
+    assert copy.statement == 'COPY "tender_risks" ("id", "title", "tags_json") FROM STDIN'
+    # 行原样交给 write_row：None 即 NULL，JSON 列是已编码文本
+    assert copy.rows == [("r1", "营业执照", '{"k":"值"}'), ("r2", None, "[]")]
+
+
+def test_replace_risks_deletes_then_copies_in_one_transaction():
+    pool = RecordingPool()
+    items = [
+        {"risk_type": "qualification", "title": "资质不符", "severity": "high",
+         "tags": ["资质"], "evidence_chunk_ids": ["c1", "c2"]},
+        {"title": "缺省字段"},
+    ]
+
+    TenderDAO(pool).replace_risks("tp_1", items)
+
+    cur = pool.cursor_obj
+    assert pool.transactions == 1
+    assert cur.calls == [("DELETE FROM tender_risks WHERE project_id=%s", ["tp_1"])]
+    (copy,) = cur.copies
+    assert copy.statement == (
+        'COPY "tender_risks" ("id", "project_id", "risk_type", "title", "description", "suggestion", '
+        '"severity", "tags_json", "evidence_chunk_ids_json") FROM STDIN'
+    )
+    first, second = copy.rows
+    assert first[0].startswith("risk_") and first[0] != second[0]
+    assert first[1:] == ("tp_1", "qualification", "资质不符", "", "", "high", '["资质"]', '["c1","c2"]')
+    assert second[1:] == ("tp_1", "other", "缺省字段", "", "", "medium", "[]", "[]")
+    assert json.loads(first[7]) == ["资质"]
+
+
+def test_replace_risks_empty_still_clears():
+    pool = RecordingPool()
+    TenderDAO(pool).replace_risks("tp_1", [])
+    assert pool.cursor_obj.calls == [("DELETE FROM tender_risks WHERE project_id=%s", ["tp_1"])]
+    assert pool.cursor_obj.copies[0].rows == []
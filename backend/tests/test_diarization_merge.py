@@ -0,0 +1,67 @@
+"""
+转录片段与说话人片段合并测试
+线性扫描实现与原逐对比较实现的输出逐条一致（含重叠、乱序、边界相等、空隙和无效片段）
+"""
+import random
+
+from app.services.asr_service import merge_transcription_with_diarization
+
+
+def _reference_merge(transcription_segments, diarization_segments):
+    """原 O(N·M) 实现，作为等价性基准"""
+    if not diarization_segments:
+        return transcription_segments
+    merged = []
+    for trans_seg in transcription_segments:
+        trans_mid = (trans_seg["start"] + trans_seg["end"]) / 2
+        speaker = "Unknown"
+        for diar_seg in diarization_segments:
+            if diar_seg["start"] <= trans_mid <= diar_seg["end"]:
+                speaker = diar_seg["speaker"]
+                break
+        merged.append({**trans_seg, "speaker": speaker})
+    return merged
+
+
+def _random_case(rng: random.Random, n_segments: int, n_turns: int):
+    # 使用 0.5 秒栅格，制造大量中点恰好落在片段边界上的情况
+    def t():
+        return rng.randint(0, 400) / 2
+
+    segments = []
+    for i in range(n_segments):
+        a, b = sorted((t(), t()))
+        segments.append({"id": i, "start": a, "end": b, "text": f"s{i}"})
+    turns = []
+    for j in range(n_turns):
+        a = t()
+        b = a + rng.choice([0, 0.5, 1, 3, 10, 40]) * (1 if rng.random() > 0.05 else -1)
+        turns.append({"start": a, "end": b, "speaker": f"SPEAKER_{j % 7:02d}"})
+    rng.shuffle(turns)
+    return segments, turns
+
+
+def test_matches_reference_on_random_overlapping_turns():
+    rng = random.Random(20240)
+    for _ in range(300):
+        segments, turns = _random_case(rng, rng.randint(0, 60), rng.randint(1, 40))
+        assert merge_transcription_with_diarization(segments, turns) == _reference_merge(segments, turns)
+
+
+def test_edge_cases():
+    segments = [
+        {"start": 0.0, "end": 2.0, "text": "a"},              # 中点 1.0 恰为两个片段的交界
+        {"start": 5.0, "end": 5.0, "text": "b"},              # 零长度片段
+        {"start": 9.0, "end": 11.0, "text": "c"},             # 空隙
+        {"start": float("nan"), "end": 1.0, "text": "d"},     # 异常时间戳
+    ]
+    turns = [
+        {"start": 1.0, "end": 6.0, "speaker": "B"},
+        {"start": 0.0, "end": 1.0, "speaker": "A"},
+        {"start": 6.0, "end": 4.0, "speaker": "X"},           # 起止反转
+    ]
+    merged = merge_transcription_with_diarization(segments, turns)
+    assert merged == _reference_merge(segments[:3], turns) + [{**segments[3], "speaker": "Unknown"}]
+    assert [m["speaker"] for m in merged] == ["B", "B", "Unknown", "Unknown"]
+    assert merge_transcription_with_diarization(segments, []) is segments
+    assert merge_transcription_with_diarization([], turns) == []
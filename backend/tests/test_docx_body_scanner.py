@@ -0,0 +1,138 @@
+"""
+docx_body_scanner 流式扫描测试
+与 python-docx 逐元素对比：bodyIndex、段落文本、样式、标题级别、合并单元格
+"""
+from io import BytesIO
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_BREAK
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from app.services.docx_body_scanner import (
+    KIND_OTHER,
+    KIND_PARAGRAPH,
+    KIND_TABLE,
+    scan_body_element,
+    scan_docx_body,
+    styles_of_document,
+)
+from app.services.docx_style_utils import guess_heading_level
+
+
+def _build_docx_bytes() -> bytes:
+    doc = Document()
+    doc.add_heading("第一章 总则", level=1)
+
+    custom = doc.styles.add_style("+标题2", WD_STYLE_TYPE.PARAGRAPH)
+    custom.base_style = doc.styles["Normal"]
+    doc.add_paragraph("1.1 自定义标题样式", style=custom)
+
+    derived = doc.styles.add_style("派生标题", WD_STYLE_TYPE.PARAGRAPH)
+    derived.base_style = doc.styles["Heading 3"]
+    doc.add_paragraph("派生自 Heading 3", style=derived)
+
+    para = doc.add_paragraph("含\t制表符")
+    run = para.add_run("换行")
+    run.add_break()
+    run.add_text("之后")
+    run.add_break(WD_BREAK.PAGE)
+    para.paragraph_format.page_break_before = True
+
+    # 超链接 + 大纲级别 + 编号 + 边框
+    doc.element.body.append(parse_xml(
+        f'<w:p {nsdecls("w", "r")}>'
+        '<w:pPr><w:outlineLvl w:val="1"/><w:numPr><w:ilvl w:val="2"/><w:numId w:val="5"/></w:numPr>'
+        '<w:pBdr><w:bottom w:val="single"/></w:pBdr></w:pPr>'
+        '<w:r><w:t xml:space="preserve">前缀 </w:t></w:r>'
+        '<w:hyperlink r:id="rId99"><w:r><w:t>链接文本</w:t></w:r></w:hyperlink>'
+        '<w:r><w:noBreakHyphen/><w:cr/><w:t>尾</w:t></w:r>'
+        '</w:p>'
+    ))
+    doc.element.body.append(parse_xml(f'<w:bookmarkStart {nsdecls("w")} w:id="0" w:name="bm"/>'))
+    doc.add_paragraph("")
+    doc.add_paragraph("未知样式引用回退默认").style = doc.styles["Normal"]
+    doc.paragraphs[-1]._p.get_or_add_pPr().get_or_add_pStyle().val = "NotExist"
+
+    table = doc.add_table(rows=4, cols=4)
+    table.style = doc.styles["Table Grid"]
+    for r in range(4):
+        for c in range(4):
+            table.cell(r, c).text = f"R{r}C{c}"
+    table.cell(0, 0).merge(table.cell(0, 1))       # 横向合并
+    table.cell(1, 2).merge(table.cell(3, 2))       # 纵向合并
+    table.cell(2, 0).merge(table.cell(3, 1))       # 块合并
+    table.cell(1, 3).add_paragraph("第二段")
+
+    doc.add_paragraph("结尾")
+
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _reference_items(docx_bytes: bytes):
+    doc = Document(BytesIO(docx_bytes))
+    items = []
+    for idx, el in enumerate(doc.element.body):
+        if isinstance(el, CT_P):
+            p = Paragraph(el, doc)
+            items.append((idx, KIND_PARAGRAPH, p.text, p.style.style_id, p.style.name, guess_heading_level(p)))
+        elif isinstance(el, CT_Tbl):
+            t = Table(el, doc)
+            rows = [[c.text for c in r.cells] for r in t.rows]
+            items.append((idx, KIND_TABLE, rows, t.style.style_id, t.style.name, len(t.columns)))
+        else:
+            items.append((idx, KIND_OTHER))
+    return items
+
+
+def _as_tuple(item):
+    if item.kind == KIND_PARAGRAPH:
+        return (item.body_index, item.kind, item.text, item.style_id, item.style_name, item.heading_level)
+    if item.kind == KIND_TABLE:
+        return (item.body_index, item.kind, item.cell_texts(), item.style_id, item.style_name, item.col_count)
+    return (item.body_index, item.kind)
+
+
+def test_streaming_scan_matches_python_docx():
+    docx_bytes = _build_docx_bytes()
+    expected = _reference_items(docx_bytes)
+
+    scanned = [_as_tuple(i) for i in scan_docx_body(docx_bytes)]
+    assert scanned == expected
+    # sectPr / bookmarkStart 也占用 bodyIndex
+    assert any(e[1] == KIND_OTHER for e in expected)
+
+
+def test_scan_body_element_matches_streaming():
+    docx_bytes = _build_docx_bytes()
+    doc = Document(BytesIO(docx_bytes))
+    from_dom = list(scan_body_element(doc.element.body, styles_of_document(doc)))
+    streamed = list(scan_docx_body(BytesIO(docx_bytes)))
+    assert from_dom == streamed
+
+
+def test_paragraph_properties():
+    items = list(scan_docx_body(_build_docx_bytes()))
+    special = next(i for i in items if i.is_paragraph and "链接文本" in i.text)
+    assert special.text == "前缀 链接文本-\n尾"
+    assert special.heading_level == 2
+    assert (special.num_id, special.ilvl) == (5, 2)
+    assert special.has_border is True
+
+    broken = next(i for i in items if i.is_paragraph and i.text.startswith("含"))
+    assert broken.page_break_before is True
+    assert broken.text == "含\t制表符换行\n之后"
+
+
+def test_scan_stops_early_without_reading_whole_body():
+    gen = scan_docx_body(_build_docx_bytes())
+    first = next(gen)
+    gen.close()
+    assert first.body_index == 0 and first.heading_level == 1
@@ -0,0 +1,158 @@
+"""
+历史案例决策的预检索测试
+用假 LLM、假 embedding 与内存案例库跑真实的 retrieve：案例库的向量 / 词法检索与取分块用 time.sleep 模拟
+同步客户端的阻塞。验证原始问题的检索与画像解析重叠、各查询并发检索（阻塞调用不占用事件循环）、
+合并结果与完成顺序无关
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+
+import pytest
+
+from app.services import history_decision
+from app.services.history_decision import generate_history_decision_answer
+from app.services.retrieval import retriever
+
+LLM_DELAY = 0.3
+SEARCH_DELAY = 0.1  # 向量检索、词法检索各阻塞这么久
+RETRIEVE_DELAY = 2 * SEARCH_DELAY
+
+CASES = {
+    "case_a": "供应商 资质 过期 投标 被否决",
+    "case_b": "工期 延误 违约 金 索赔",
+    "case_c": "报价 低于 成本 澄清 答辩",
+    "case_d": "资质 挂靠 联合体 投标",
+}
+SUPPORT = {"doc_kb": "投标 资质 审查 要点"}
+
+
+class FakeStore:
+    """
+    按词重叠打分的内存案例库，替换 retrieve 依赖的 embedding / Milvus / Postgres
+
+    检索函数是同步阻塞的（time.sleep），延迟可随机抖动以打乱完成顺序。
+    """
+
+    def __init__(self, jitter_seed=None):
+        self.calls = []
+        self.rng = random.Random(jitter_seed) if jitter_seed is not None else None
+        self.lock = threading.Lock()
+
+    def _block(self):
+        with self.lock:
+            factor = self.rng.uniform(0.2, 1.0) if self.rng else 1.0
+        time.sleep(SEARCH_DELAY * factor)
+
+    async def embed_texts(self, texts, provider=None):
+        self.calls.append((time.perf_counter(), texts[0]))
+        return [{"dense": [0.1, 0.2]}]
+
+    def search_dense(self, vector, limit, kb_ids, kb_categories, request_id=None):
+        self._block()
+        return []
+
+    def search_lexical(self, query, kb_ids, kb_categories, anchors, topk, request_id=None):
+        self._block()
+        docs = CASES if kb_categories == ["history_case"] else {**CASES, **SUPPORT}
+        words = set(query.split())
+        scored = [(len(words & set(text.split())), doc_id) for doc_id, text in docs.items()]
+        ranked = sorted((item for item in scored if item[0]), key=lambda item: (-item[0], item[1]))
+        return [{"chunk_id": f"{doc_id}_0", "score": overlap / 10} for overlap, doc_id in ranked[:topk]]
+
+    def get_chunks_by_ids(self, chunk_ids):
+        chunks = {}
+        for chunk_id in chunk_ids:
+            doc_id = chunk_id.rsplit("_", 1)[0]
+            text = CASES.get(doc_id) or SUPPORT[doc_id]
+            category = "history_case" if doc_id in CASES else "kb"
+            chunks[chunk_id] = {"doc_id": doc_id, "content": text, "kb_category": category}
+        return chunks
+
+    def install(self, monkeypatch):
+        monkeypatch.setattr(retriever, "embed_texts", self.embed_texts)
+        monkeypatch.setattr(retriever.milvus_store, "search_dense", self.search_dense)
+        monkeypatch.setattr(retriever, "search_lexical", self.search_lexical)
+        monkeypatch.setattr(retriever.kb_dao, "get_chunks_by_ids", self.get_chunks_by_ids)
+        return self
+
+
+def _profile_llm(queries, delay=LLM_DELAY):
+    async def call(system_prompt, user_prompt, history):
+        await asyncio.sleep(delay)
+        return json.dumps({
+            "problem_summary": "资质 过期",
+            "context": "投标 资质 审查",
+            "constraints": [],
+            "search_queries": queries,
+        }, ensure_ascii=False)
+    return call
+
+
+async def _answer_llm(system_prompt, user_prompt, history):
+    return "报告"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(history_decision.kb_dao, "get_documents_meta", lambda doc_ids: {})
+    return FakeStore().install(monkeypatch)
+
+
+async def _run(profile_llm, question="供应商 资质 过期 怎么办", final_topk=3):
+    start = time.perf_counter()
+    result = await generate_history_decision_answer(
+        question, [], _answer_llm, profile_llm, embedding_provider=None,
+        kb_ids=None, dense_topk=10, lexical_topk=10, final_topk=final_topk,
+    )
+    return result, time.perf_counter() - start
+
+
+@pytest.mark.asyncio
+async def test_latency_overlaps_profile_llm_and_retrieval(store):
+    queries = ["工期 违约", "报价 成本", "联合体 投标"]
+    result, elapsed = await _run(_profile_llm(queries))
+
+    n_queries = len(result.search_queries)
+    assert n_queries == 6 and result.search_queries[-1] == "供应商 资质 过期 怎么办"
+    sequential = LLM_DELAY + (n_queries + 1) * RETRIEVE_DELAY
+    # 原始问题与补充资料检索和 LLM 重叠，其余查询一轮并发完成
+    assert elapsed < LLM_DELAY + RETRIEVE_DELAY + 0.15
+    assert elapsed < sequential / 2
+    first_calls = [q for t, q in store.calls if t - store.calls[0][0] < 0.05]
+    assert len(first_calls) == 2  # 画像解析返回前已发起两次检索
+
+
+@pytest.mark.asyncio
+async def test_no_new_queries_costs_max_of_llm_and_retrieval(store):
+    # 画像没有带来新的查询时（如 LLM 失败回退为原始问题），端到端约为 max(LLM, 检索)
+    async def failing_llm(system_prompt, user_prompt, history):
+        await asyncio.sleep(LLM_DELAY)
+        raise RuntimeError("upstream timeout")
+
+    result, elapsed = await _run(failing_llm, question="资质 过期")
+    assert result.search_queries == ["资质 过期"]
+    assert elapsed < max(LLM_DELAY, RETRIEVE_DELAY) + 0.15
+    assert len(store.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_merge_is_deterministic_regardless_of_completion_order(monkeypatch):
+    monkeypatch.setattr(history_decision.kb_dao, "get_documents_meta", lambda doc_ids: {})
+    outcomes = set()
+    for seed in range(5):
+        FakeStore(jitter_seed=seed).install(monkeypatch)
+        result, _ = await _run(_profile_llm(["工期 违约", "报价 成本", "联合体 投标"], delay=0.05), final_topk=4)
+        outcomes.add(tuple((c["doc_id"], c["score"]) for c in result.combined_chunks))
+    assert len(outcomes) == 1
+
+
+@pytest.mark.asyncio
+async def test_unused_speculative_support_is_discarded(store):
+    result, _ = await _run(_profile_llm(["工期 违约", "报价 成本", "联合体 投标"]), final_topk=1)
+    assert result.case_count == 1
+    assert all(c["kb_category"] == "history_case" for c in result.combined_chunks)
+    await asyncio.sleep(RETRIEVE_DELAY)
+    assert not [t for t in asyncio.all_tasks() if "_retrieve_support_hits" in repr(t.get_coro())]
@@ -0,0 +1,315 @@
+"""
+孤儿数据回收测试
+默认套件用内存向量库和注入的 Postgres 查询结果覆盖文件 / 向量回收；
+集成测试需要 PostgreSQL（TEST_POSTGRES_DSN），向量库用 tmp_path 下的真实 Milvus Lite：
+构造一份故意损坏的数据集（无文档的分块、无行的向量、无记录的文件），验证 dry-run 只报告、
+正式回收只删孤儿、限速生效，以及 Web 缓存 / 新写入 / 可回填文件不被误删
+"""
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.project_delete import OrphanCollector
+from app.services.project_delete.orphan_gc import RateLimiter
+
+DIM = 4
+OLD = time.time() - 7200
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+def test_rate_limiter_spaces_batches():
+    clock = FakeClock()
+    limiter = RateLimiter(10, sleep=clock.sleep, clock=lambda: clock.now)
+    for count in (3, 3, 2):
+        limiter.wait(count)
+    assert clock.sleeps == [0.3, 0.3]
+
+    # 空闲超过配额后不再等待，也不累积"欠账"
+    clock.now += 5
+    limiter.wait(3)
+    assert clock.sleeps == [0.3, 0.3]
+
+    unlimited = RateLimiter(None, sleep=clock.sleep, clock=lambda: clock.now)
+    unlimited.wait(1000)
+    assert clock.sleeps == [0.3, 0.3]
+
+
+class MemoryStore:
+    """按主键分页遍历、按主键删除的内存向量集合"""
+
+    def __init__(self, id_field, ids):
+        self.entities = [{"pk": pk, id_field: id_} for pk, id_ in enumerate(ids)]
+
+    def iter_entities(self, fields, batch_size):
+        snapshot = list(self.entities)
+        for start in range(0, len(snapshot), batch_size):
+            yield [dict(e) for e in snapshot[start:start + batch_size]]
+
+    def delete_by_pks(self, pks):
+        drop = set(pks)
+        before = len(self.entities)
+        self.entities = [e for e in self.entities if e["pk"] not in drop]
+        return before - len(self.entities)
+
+
+def _offline_collector(monkeypatch, asset_root, live_ids=(), referenced=(), projects=((), ()),
+                       template_sha256s=(), **kwargs):
+    """不连 Postgres：把各类回查结果直接注入"""
+    collector = OrphanCollector(None, asset_root=str(asset_root), batch_size=4, **kwargs)
+    monkeypatch.setattr(collector, "_live_chunk_ids", lambda ids: set(ids) & set(live_ids))
+    monkeypatch.setattr(collector, "_live_segment_ids", lambda ids: set(ids) & set(live_ids))
+    monkeypatch.setattr(collector, "_referenced_paths", lambda: {os.path.abspath(p) for p in referenced})
+    monkeypatch.setattr(collector, "_project_ids", lambda: (set(projects[0]), set(projects[1])))
+    monkeypatch.setattr(collector, "_recoverable_template_sha256s", lambda: set(template_sha256s))
+    return collector
+
+
+def test_vector_gc_without_postgres(monkeypatch, tmp_path):
+    store = MemoryStore("chunk_id", [f"c{i}" for i in range(10)])
+    live = {"c0", "c3", "c4", "c9"}
+
+    dry = _offline_collector(monkeypatch, tmp_path, live_ids=live, kb_vector_store=store)
+    report = dry.collect_chunk_vectors()
+    assert (report.found, report.deleted) == (6, 0)
+    assert len(store.entities) == 10
+
+    sleeps = []
+    collector = _offline_collector(
+        monkeypatch, tmp_path, live_ids=live, kb_vector_store=store,
+        dry_run=False, max_deletes_per_sec=2, sleep=sleeps.append,
+    )
+    report = collector.collect_chunk_vectors()
+    assert (report.found, report.deleted) == (6, 6)
+    assert {e["chunk_id"] for e in store.entities} == live
+    # 三页孤儿 2 + 3 + 1，限速 2 条/秒（sleep 只记录不真睡）：最后一页排在前 5 条之后
+    assert len(sleeps) == 2 and 2 < max(sleeps) <= 2.5
+
+
+def test_file_gc_without_postgres(monkeypatch, tmp_path):
+    root = tmp_path / "tender_assets"
+    kept_template = _write_file(root / "tp_live" / "template_kept.docx")
+    Path(kept_template).write_bytes(b"template body")
+    os.utime(kept_template, (OLD, OLD))
+    referenced = [_write_file(root / "tp_live" / "tender_a.docx")]
+    _write_file(root / "tp_live" / "tender_stray.docx")
+    _write_file(root / "tp_live" / "template_stray.docx")
+    _write_file(root / "tp_live" / "tender_uploading.docx", old=False)
+    _write_file(root / "tp_recover" / "tender_old.docx")
+    _write_file(root / "tp_gone" / "images" / "logo.png")
+
+    def collector(**kwargs):
+        return _offline_collector(
+            monkeypatch, root, referenced=referenced,
+            projects=({"tp_live", "tp_recover"}, {"tp_recover"}),
+            template_sha256s={hashlib.sha256(b"template body").hexdigest()},
+            **kwargs,
+        )
+
+    def files():
+        return {str(p.relative_to(root)) for p in root.rglob("*") if p.is_file()}
+
+    before = files()
+    report = collector().collect_files()
+    assert (report.found, report.deleted) == (3, 0)
+    assert files() == before
+
+    report = collector(dry_run=False).collect_files()
+    assert (report.found, report.deleted) == (3, 3)
+    # 格式模板按 sha256 回溯的 template_*.docx、可回填项目、新文件都保留
+    assert files() == {
+        "tp_live/template_kept.docx",
+        "tp_live/tender_a.docx",
+        "tp_live/tender_uploading.docx",
+        "tp_recover/tender_old.docx",
+    }
+    assert not (root / "tp_gone").exists()
+
+
+@pytest.fixture
+def stores(tmp_path):
+    from app.services.vectorstore.milvus_docseg_store import MilvusDocSegStore
+    from app.services.vectorstore.milvus_lite_store import MilvusLiteStore
+
+    chunks = MilvusLiteStore(uri=str(tmp_path / "chunks.db"))
+    segments = MilvusDocSegStore(uri=str(tmp_path / "segments.db"))
+    yield chunks, segments
+    chunks.client.close()
+    segments.client.close()
+
+
+def _write_file(path, old=True):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+    if old:
+        os.utime(path, (OLD, OLD))
+    return str(path)
+
+
+def _seed_corrupted(pool, chunk_store, segment_store):
+    """
+    存活数据 + 各类孤儿：
+    - kb_chunks：7 条文档已删的分块（孤儿）；1 条刚写入、文档未落库的分块与 2 条 Web 缓存分块（保留）
+    - chunks 向量：上述分块各一条 + 3 条没有 kb_chunks 行的向量（孤儿 7 + 3）
+    - 分片向量：4 条 segment 已不存在（孤儿）
+    - 文件：2 个已删除项目的文件 + 1 个无记录的旧文件（孤儿）；新文件、可回填项目的文件、
+      可按 sha256 回溯的格式模板文件保留
+    """
+    chunk_vectors, segment_vectors = [], []
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO knowledge_bases (id, name) VALUES ('kb_live', 'live')")
+            cur.execute(
+                "INSERT INTO kb_documents (id, kb_id, filename, source, content_hash, status) "
+                "VALUES ('doc_live', 'kb_live', 'a.docx', 'upload', 'h', 'ready')"
+            )
+            rows = [(f"live_c{i}", "kb_live", "doc_live", "2 hours") for i in range(5)]
+            rows += [(f"ghost_c{i}", "kb_live", "doc_ghost", "2 hours") for i in range(7)]
+            rows += [("young_c0", "kb_live", "doc_pending", "0 seconds")]
+            rows += [(f"web_c{i}", "__web__", "web::abc", "2 hours") for i in range(2)]
+            for chunk_id, kb_id, doc_id, age in rows:
+                cur.execute(
+                    "INSERT INTO kb_chunks (chunk_id, kb_id, doc_id, content, created_at) "
+                    "VALUES (%s, %s, %s, 'x', NOW() - %s::interval)",
+                    (chunk_id, kb_id, doc_id, age),
+                )
+                chunk_vectors.append({"chunk_id": chunk_id, "kb_id": kb_id, "doc_id": doc_id, "dense": [0.1] * DIM})
+            chunk_vectors += [
+                {"chunk_id": f"lost_c{i}", "kb_id": "kb_live", "doc_id": "doc_lost", "dense": [0.2] * DIM}
+                for i in range(3)
+            ]
+
+            live_dir = Path("data", "tender_assets", "tp_live")
+            asset_path = _write_file(live_dir / "tender_a.docx")
+            version_path = _write_file(live_dir / "tender_v1.docx")
+            cur.execute("INSERT INTO tender_projects (id, kb_id, name) VALUES ('tp_live', 'kb_live', 'live')")
+            cur.execute(
+                "INSERT INTO tender_project_assets (id, project_id, kind, filename, storage_path) "
+                "VALUES ('ta_live', 'tp_live', 'tender', 'tender_a.docx', %s)",
+                (asset_path,),
+            )
+            cur.execute("INSERT INTO documents (id, namespace, doc_type) VALUES ('d1', 'tender', 'tender')")
+            cur.execute(
+                "INSERT INTO document_versions (id, document_id, sha256, filename, storage_path) "
+                "VALUES ('dv1', 'd1', 'h', 'tender_v1.docx', %s)",
+                (os.path.abspath(version_path),),
+            )
+            for i in range(4):
+                cur.execute(
+                    "INSERT INTO doc_segments (id, doc_version_id, segment_no, content_text) VALUES (%s, 'dv1', %s, 'x')",
+                    (f"seg_{i}", i),
+                )
+            segment_vectors += [
+                {"segment_id": f"{prefix}_{i}", "doc_version_id": "dv1", "project_id": "tp_live", "dense": [0.1] * DIM}
+                for prefix in ("seg", "seg_gone") for i in range(4)
+            ]
+
+            # storage_path 丢失的项目：TenderService 会从目录里回填，文件不能动
+            cur.execute("INSERT INTO tender_projects (id, kb_id, name) VALUES ('tp_recover', 'kb_live', 'recover')")
+            cur.execute(
+                "INSERT INTO tender_project_assets (id, project_id, kind, filename) "
+                "VALUES ('ta_recover', 'tp_recover', 'tender', 'tender.docx')"
+            )
+            # storage_path 为空的格式模板：TenderService 按 sha256 在 template_*.docx 里回溯
+            cur.execute(
+                "INSERT INTO format_templates (id, name, template_sha256) VALUES ('ft_1', 'ft', %s)",
+                (hashlib.sha256(b"x").hexdigest(),),
+            )
+        conn.commit()
+
+    _write_file(Path("data", "tender_assets", "tp_live", "template_ft.docx"))
+    _write_file(Path("data", "tender_assets", "tp_live", "tender_stray.docx"))
+    _write_file(Path("data", "tender_assets", "tp_live", "tender_uploading.docx"), old=False)
+    _write_file(Path("data", "tender_assets", "tp_gone", "tender_1.docx"))
+    _write_file(Path("data", "tender_assets", "tp_gone", "images", "logo.png"))
+    _write_file(Path("data", "tender_assets", "tp_recover", "tender_old.docx"))
+
+    chunk_store.upsert_chunks(chunk_vectors, dense_dim=DIM)
+    segment_store.upsert_segments(segment_vectors, dense_dim=DIM)
+
+
+def _state(pool, chunk_store, segment_store):
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT chunk_id FROM kb_chunks")
+            chunk_rows = {row[0] for row in cur.fetchall()}
+    chunk_vectors = {e["chunk_id"] for page in chunk_store.iter_entities(["chunk_id"], batch_size=4) for e in page}
+    segment_vectors = {
+        e["segment_id"] for page in segment_store.iter_entities(["segment_id"], batch_size=4) for e in page
+    }
+    files = {str(p.relative_to("data/tender_assets")) for p in Path("data", "tender_assets").rglob("*") if p.is_file()}
+    return chunk_rows, chunk_vectors, segment_vectors, files
+
+
+def _counts(reports):
+    return {r.kind: (r.found, r.deleted) for r in reports}
+
+
+@pytest.mark.integration
+def test_orphan_gc_on_corrupted_dataset(pg_pool, stores):
+    chunk_store, segment_store = stores
+    _seed_corrupted(pg_pool, chunk_store, segment_store)
+    before = _state(pg_pool, chunk_store, segment_store)
+
+    def collector(**kwargs):
+        return OrphanCollector(
+            pg_pool, kb_vector_store=chunk_store, docseg_vector_store=segment_store, batch_size=4, **kwargs
+        )
+
+    # dry-run：只报告，不改任何数据
+    reports = collector().run()
+    assert _counts(reports) == {
+        "kb_chunks": (7, 0),
+        "milvus_chunks": (10, 0),
+        "milvus_segments": (4, 0),
+        "files": (3, 0),
+    }
+    samples = {r.kind: r.samples for r in reports}
+    assert samples["kb_chunks"] == ["kb_live/doc_ghost (7)"]
+    assert set(samples["milvus_segments"]) == {f"seg_gone_{i}" for i in range(4)}
+    assert _state(pg_pool, chunk_store, segment_store) == before
+
+    sleeps = []
+    # 限速 1 条/秒（sleep 只记录不真睡）：共删 24 条，最后一条要排在第 23 秒之后
+    reports = collector(dry_run=False, max_deletes_per_sec=1, sleep=sleeps.append).run()
+    assert _counts(reports) == {
+        "kb_chunks": (7, 7),
+        "milvus_chunks": (10, 10),
+        "milvus_segments": (4, 4),
+        "files": (3, 3),
+    }
+    assert 22 < max(sleeps) <= 23
+
+    chunk_rows, chunk_vectors, segment_vectors, files = _state(pg_pool, chunk_store, segment_store)
+    survivors = {f"live_c{i}" for i in range(5)} | {"young_c0", "web_c0", "web_c1"}
+    assert chunk_rows == survivors
+    assert chunk_vectors == survivors
+    assert segment_vectors == {f"seg_{i}" for i in range(4)}
+    assert files == {
+        "tp_live/template_ft.docx",
+        "tp_live/tender_a.docx",
+        "tp_live/tender_v1.docx",
+        "tp_live/tender_uploading.docx",
+        "tp_recover/tender_old.docx",
+    }
+    assert not Path("data", "tender_assets", "tp_gone").exists()
+
+    # 再跑一次没有剩余孤儿
+    assert {kind: found for kind, (found, _) in _counts(collector().run()).items()} == {
+        "kb_chunks": 0,
+        "milvus_chunks": 0,
+        "milvus_segments": 0,
+        "files": 0,
+    }
@@ -0,0 +1,36 @@
+"""
+懒加载进程池测试
+验证首次使用时才创建、关闭后可重新创建，以及子进程异常退出后丢弃旧池、下一次调用使用新池
+"""
+import os
+
+import pytest
+
+from app.core.process_pool import BrokenProcessPool, LazyProcessPool
+
+
+@pytest.fixture
+def pool():
+    pool = LazyProcessPool(lambda: 1)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_is_created_lazily_and_recreated_after_shutdown(pool):
+    assert pool._pool is None
+    first = pool.get()
+    assert pool.get() is first
+    pool.shutdown()
+    assert pool._pool is None
+    assert pool.get() is not first
+
+
+@pytest.mark.asyncio
+async def test_broken_pool_is_replaced(pool):
+    assert await pool.run(abs, -3) == 3
+    broken = pool.get()
+    with pytest.raises(BrokenProcessPool):
+        await pool.run(os._exit, 1)
+    assert pool._pool is None
+    assert await pool.run(abs, -4) == 4
+    assert pool.get() is not broken
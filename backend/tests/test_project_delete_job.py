@@ -0,0 +1,314 @@
+"""
+项目后台删除测试（需要 PostgreSQL：设置 TEST_POSTGRES_DSN，每个测试在独立 schema 中建表）
+用内存向量库替代 Milvus，验证分批删除、进度与删除同事务提交、中断后续跑，以及删除完成后不留孤儿数据
+"""
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from app.services.dao.tender_dao import TenderDAO
+from app.services.project_delete import ProjectDeletionOrchestrator
+
+DSN = os.getenv("TEST_POSTGRES_DSN")
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.skipif(not DSN, reason="TEST_POSTGRES_DSN not set"),
+]
+
+CHUNKS_PER_DOC = 150
+SEGMENTS_PER_VERSION = 120
+BATCH = 50
+
+
+class MemoryVectorStore:
+    """按字段过滤删除的内存向量库（同时充当 chunks 与 doc_segments 两个集合）"""
+
+    def __init__(self):
+        self.entities = []
+        self.calls = []
+        self.fail_next = None
+
+    def _delete(self, name, match):
+        self.calls.append(name)
+        if self.fail_next == name:
+            self.fail_next = None
+            raise RuntimeError(f"Milvus 删除失败: {name}")
+        before = len(self.entities)
+        self.entities = [e for e in self.entities if not match(e)]
+        return before - len(self.entities)
+
+    def delete_by_kb(self, kb_id):
+        return self._delete("delete_by_kb", lambda e: e.get("kb_id") == kb_id)
+
+    def delete_by_project(self, project_id):
+        return self._delete("delete_by_project", lambda e: e.get("project_id") == project_id)
+
+    def delete_by_versions(self, version_ids):
+        ids = set(version_ids)
+        return self._delete("delete_by_versions", lambda e: e.get("doc_version_id") in ids)
+
+
+class Crash(BaseException):
+    """模拟进程被杀（不经过 except Exception，审计记录停留在 RUNNING）"""
+
+
+@pytest.fixture
+def pool(pg_pool):
+    return pg_pool
+
+
+def _seed_project(pool, vectors, name, docs=3, versions=2):
+    """一个项目：KB 文档/分块 + 向量、DocStore 版本/分片 + 向量、资产文件、元数据"""
+    project_id, kb_id = f"tp_{name}", f"kb_{name}"
+    asset_dir = Path("data", "tender_assets", project_id)
+    asset_dir.mkdir(parents=True)
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO knowledge_bases (id, name) VALUES (%s, %s)", (kb_id, name))
+            cur.execute("INSERT INTO tender_projects (id, kb_id, name) VALUES (%s, %s, %s)", (project_id, kb_id, name))
+            for d in range(docs):
+                doc_id = f"{kb_id}_doc{d}"
+                cur.execute(
+                    "INSERT INTO kb_documents (id, kb_id, filename, source, content_hash, status) "
+                    "VALUES (%s, %s, %s, 'upload', %s, 'ready')",
+                    (doc_id, kb_id, f"{doc_id}.docx", doc_id),
+                )
+                for c in range(CHUNKS_PER_DOC):
+                    chunk_id = f"{doc_id}_c{c}"
+                    cur.execute(
+                        "INSERT INTO kb_chunks (chunk_id, kb_id, doc_id, position, content) VALUES (%s, %s, %s, %s, 'x')",
+                        (chunk_id, kb_id, doc_id, c),
+                    )
+                    vectors.entities.append({"chunk_id": chunk_id, "kb_id": kb_id, "doc_id": doc_id})
+
+            for v in range(versions):
+                version_id, document_id = f"dv_{name}{v}", f"doc_{name}{v}"
+                storage_path = str(asset_dir / f"tender_{v}.docx")
+                Path(storage_path).write_bytes(b"docx")
+                cur.execute("INSERT INTO documents (id, namespace, doc_type) VALUES (%s, 'tender', 'tender')", (document_id,))
+                cur.execute(
+                    "INSERT INTO document_versions (id, document_id, sha256, filename, storage_path) "
+                    "VALUES (%s, %s, 'h', %s, %s)",
+                    (version_id, document_id, f"tender_{v}.docx", storage_path),
+                )
+                for s in range(SEGMENTS_PER_VERSION):
+                    segment_id = f"seg_{name}{v}_{s}"
+                    cur.execute(
+                        "INSERT INTO doc_segments (id, doc_version_id, segment_no, content_text) VALUES (%s, %s, %s, 'x')",
+                        (segment_id, version_id, s),
+                    )
+                    # 第二个版本的向量没写 project_id（旧数据），只能按版本删掉
+                    vectors.entities.append({
+                        "segment_id": segment_id, "doc_version_id": version_id,
+                        "project_id": project_id if v == 0 else "",
+                    })
+                # 只有第一个版本记在资产 meta_json，第二个版本靠存储路径找到
+                cur.execute(
+                    "INSERT INTO tender_project_assets (id, project_id, kind, filename, storage_path, kb_doc_id, meta_json) "
+                    "VALUES (%s, %s, 'tender', %s, %s, %s, %s::jsonb)",
+                    (f"ta_{name}{v}", project_id, f"tender_{v}.docx", storage_path, f"{kb_id}_doc{v}",
+                     json.dumps({"doc_version_id": version_id} if v == 0 else {})),
+                )
+            cur.execute(
+                "INSERT INTO tender_project_documents (id, project_id, kb_doc_id, doc_role) VALUES (%s, %s, %s, 'tender')",
+                (f"tpd_{name}", project_id, f"{kb_id}_doc0"),
+            )
+            for r in range(120):
+                cur.execute(
+                    "INSERT INTO tender_risks (id, project_id, risk_type, title) VALUES (%s, %s, 'other', 't')",
+                    (f"risk_{name}{r}", project_id),
+                )
+            cur.execute("INSERT INTO tender_project_info (project_id) VALUES (%s)", (project_id,))
+            cur.execute(
+                "INSERT INTO doc_fragment (id, owner_type, owner_id, source_file_key, fragment_type, title, title_norm, "
+                "start_body_index, end_body_index) VALUES (%s, 'PROJECT', %s, 'k', 'BID_LETTER', 't', 't', 0, 1)",
+                (f"frag_{name}", project_id),
+            )
+        conn.commit()
+    return project_id, kb_id
+
+
+def _footprint(pool, vectors, project_id, kb_id):
+    """项目在各存储层残留的数据量"""
+    versions = [f"dv_{project_id[3:]}{v}" for v in range(2)]
+    queries = {
+        "tender_projects": ("SELECT COUNT(*) FROM tender_projects WHERE id=%s", project_id),
+        "knowledge_bases": ("SELECT COUNT(*) FROM knowledge_bases WHERE id=%s", kb_id),
+        "kb_documents": ("SELECT COUNT(*) FROM kb_documents WHERE kb_id=%s", kb_id),
+        "kb_chunks": ("SELECT COUNT(*) FROM kb_chunks WHERE kb_id=%s", kb_id),
+        "document_versions": ("SELECT COUNT(*) FROM document_versions WHERE id = ANY(%s)", versions),
+        "documents": ("SELECT COUNT(*) FROM documents WHERE id = ANY(%s)", [f"doc_{v[3:]}" for v in versions]),
+        "doc_segments": ("SELECT COUNT(*) FROM doc_segments WHERE doc_version_id = ANY(%s)", versions),
+        "tender_project_assets": ("SELECT COUNT(*) FROM tender_project_assets WHERE project_id=%s", project_id),
+        "tender_project_documents": ("SELECT COUNT(*) FROM tender_project_documents WHERE project_id=%s", project_id),
+        "tender_risks": ("SELECT COUNT(*) FROM tender_risks WHERE project_id=%s", project_id),
+        "tender_project_info": ("SELECT COUNT(*) FROM tender_project_info WHERE project_id=%s", project_id),
+        "doc_fragment": ("SELECT COUNT(*) FROM doc_fragment WHERE owner_id=%s", project_id),
+    }
+    counts = {}
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            for name, (sql, param) in queries.items():
+                cur.execute(sql, (param,))
+                counts[name] = cur.fetchone()[0]
+    counts["vectors"] = sum(
+        1 for e in vectors.entities
+        if e.get("kb_id") == kb_id or e.get("doc_version_id") in versions
+    )
+    counts["files"] = len(list(Path("data", "tender_assets", project_id).glob("*")))
+    return counts
+
+
+def _orchestrator(pool, vectors):
+    return ProjectDeletionOrchestrator(pool, batch_size=BATCH, kb_vector_store=vectors, docseg_vector_store=vectors)
+
+
+def test_interrupted_deletion_resumes_without_orphans(pool):
+    vectors = MemoryVectorStore()
+    project_id, kb_id = _seed_project(pool, vectors, "a")
+    keep = _seed_project(pool, vectors, "b")
+    keep_before = _footprint(pool, vectors, *keep)
+
+    orchestrator = _orchestrator(pool, vectors)
+    audit_id = orchestrator.start(project_id)
+    assert [p["id"] for p in TenderDAO(pool).list_projects(None)] == [keep[0]]
+
+    # 删 kb_chunks 的第 4 批时进程被杀：该批回滚，进度停在前 3 批
+    save_progress = orchestrator._save_progress
+    batches = []
+
+    def crash_on_fourth_chunk_batch(cur, audit_id, state, status=None):
+        if cur is not None and state.get("stage") == "KB":
+            batches.append(state["deleted"].get("kb_chunks"))
+            if len(batches) == 4:
+                raise Crash()
+        save_progress(cur, audit_id, state, status)
+
+    orchestrator._save_progress = crash_on_fourth_chunk_batch
+    with pytest.raises(Crash):
+        orchestrator.run(audit_id)
+
+    status = orchestrator.get_status(project_id)
+    assert status["status"] == "RUNNING"
+    assert status["progress_json"]["completed"] == ["DOCSTORE"]
+    assert status["progress_json"]["deleted"]["kb_chunks"] == 3 * BATCH
+    partial = _footprint(pool, vectors, project_id, kb_id)
+    assert partial["kb_chunks"] == 3 * CHUNKS_PER_DOC - 3 * BATCH
+    assert partial["doc_segments"] == 0 and partial["tender_project_assets"] == 2
+
+    # 重启后续跑：已完成的 DOCSTORE 阶段不再执行
+    vectors.calls.clear()
+    resumed = _orchestrator(pool, vectors)
+    assert resumed.resume_interrupted() == [audit_id]
+    assert "delete_by_project" not in vectors.calls
+
+    status = resumed.get_status(project_id)
+    assert status["status"] == "SUCCESS"
+    assert status["progress_json"]["progress"] == 100
+    deleted = status["progress_json"]["deleted"]
+    # 进度与删除同事务提交：崩溃回滚的那一批没有被重复计数
+    assert deleted["kb_chunks"] == 3 * CHUNKS_PER_DOC
+    assert deleted["doc_segments"] == 2 * SEGMENTS_PER_VERSION
+    assert deleted["tender_risks"] == 120
+
+    assert set(_footprint(pool, vectors, project_id, kb_id).values()) == {0}
+    assert not Path("data", "tender_assets", project_id).exists()
+    assert _footprint(pool, vectors, *keep) == keep_before
+
+
+def test_failed_stage_is_retried_on_next_request(pool):
+    vectors = MemoryVectorStore()
+    project_id, kb_id = _seed_project(pool, vectors, "a", docs=1, versions=1)
+    orchestrator = _orchestrator(pool, vectors)
+
+    vectors.fail_next = "delete_by_kb"
+    audit_id = orchestrator.start(project_id)
+    with pytest.raises(RuntimeError):
+        orchestrator.run(audit_id)
+
+    status = orchestrator.get_status(project_id)
+    assert status["status"] == "FAILED"
+    assert status["progress_json"]["stage"] == "KB"
+    # 向量删除失败时分块还在，重试能重新定位
+    assert _footprint(pool, vectors, project_id, kb_id)["kb_chunks"] == CHUNKS_PER_DOC
+
+    # 再次发起删除复用同一条记录，从失败阶段继续
+    assert orchestrator.start(project_id) == audit_id
+    assert orchestrator.run(audit_id)["status"] == "SUCCESS"
+    assert set(_footprint(pool, vectors, project_id, kb_id).values()) == {0}
+
+
+def test_concurrent_runner_does_not_run_twice(pool):
+    vectors = MemoryVectorStore()
+    project_id, kb_id = _seed_project(pool, vectors, "a", docs=1, versions=1)
+    orchestrator = _orchestrator(pool, vectors)
+    audit_id = orchestrator.start(project_id)
+
+    # 另一个执行者持有该项目的锁
+    with pool.connection() as other:
+        other.execute("SELECT pg_advisory_lock(hashtext(%s))", (f"project_delete:{project_id}",))
+        other.commit()
+        status = orchestrator.run(audit_id)
+        other.execute("SELECT pg_advisory_unlock(hashtext(%s))", (f"project_delete:{project_id}",))
+        other.commit()
+
+    assert status["status"] == "PENDING"
+    assert vectors.calls == []
+    assert orchestrator.run(audit_id)["status"] == "SUCCESS"
+
+
+def test_failed_deletion_is_listed_and_retried_on_startup_up_to_cap(pool):
+    from app.services.project_delete.orchestrator import MAX_RESUME_ATTEMPTS
+
+    vectors = MemoryVectorStore()
+    project_id, kb_id = _seed_project(pool, vectors, "a", docs=1, versions=1)
+    orchestrator = _orchestrator(pool, vectors)
+    dao = TenderDAO(pool)
+
+    audit_id = orchestrator.start(project_id)
+    assert dao.list_projects(None) == []
+
+    # 每次执行都在 KB 阶段失败：项目以删除失败状态重新出现在列表中
+    healthy_delete, failures = vectors._delete, []
+
+    def failing_delete(name, match):
+        if name == "delete_by_kb":
+            failures.append(name)
+            raise RuntimeError("Milvus 不可用")
+        return healthy_delete(name, match)
+
+    vectors._delete = failing_delete
+    with pytest.raises(RuntimeError):
+        orchestrator.run(audit_id)
+    listed = dao.list_projects(None)
+    assert [(p["id"], p["delete_status"]) for p in listed] == [(project_id, "FAILED")]
+
+    # 启动续跑会重试失败的删除，累计执行达到上限后不再自动重试
+    for _ in range(MAX_RESUME_ATTEMPTS - 1):
+        assert orchestrator.resume_interrupted() == []
+    assert orchestrator.get_status(project_id)["progress_json"]["attempts"] == MAX_RESUME_ATTEMPTS
+    assert orchestrator.resume_interrupted() == []
+    assert len(failures) == MAX_RESUME_ATTEMPTS
+
+    # 用户重新发起删除：计数清零，故障恢复后续跑成功
+    vectors._delete = healthy_delete
+    assert orchestrator.start(project_id) == audit_id
+    assert dao.list_projects(None) == []
+    assert orchestrator.resume_interrupted() == [audit_id]
+    assert set(_footprint(pool, vectors, project_id, kb_id).values()) == {0}
+
+
+def test_failed_deletion_of_a_live_project_is_not_resumed(pool):
+    vectors = MemoryVectorStore()
+    project_id, _ = _seed_project(pool, vectors, "a", docs=1, versions=1)
+    # 旧实现遗留的失败记录：项目并未进入 deleting，不能在启动时被自动删除
+    with pool.connection() as conn:
+        conn.execute(
+            "INSERT INTO tender_project_delete_audit (id, project_id, project_name, status) "
+            "VALUES ('audit_old', %s, 'a', 'FAILED')",
+            (project_id,),
+        )
+    assert _orchestrator(pool, vectors).resume_interrupted() == []
+    assert [p["delete_status"] for p in TenderDAO(pool).list_projects(None)] == [None]
@@ -0,0 +1,228 @@
+"""
+项目删除续跑逻辑测试（不需要数据库）
+内存假连接池只模拟编排器用到的几条审计 / 项目语句，清理器用假实现：
+验证跳过已完成阶段、执行次数累计与清零、FAILED 记录在 start() 中重新置为 PENDING、
+启动续跑的重试上限，以及另一执行者持锁时不重复执行
+"""
+import copy
+import itertools
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from app.services.project_delete import ProjectDeletionOrchestrator
+from app.services.project_delete.orchestrator import MAX_RESUME_ATTEMPTS, PROJECT_STAGE
+
+
+class FakeDB:
+    """tender_projects / tender_project_delete_audit 两张表与 advisory lock"""
+
+    def __init__(self):
+        self.projects = {}
+        self.audits = {}
+        self.locks = set()
+        self.clock = itertools.count()
+
+
+class FakeCursor:
+    def __init__(self, db, as_dict):
+        self.db = db
+        self.as_dict = as_dict
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def _audit_row(self, audit):
+        if self.as_dict:
+            return copy.deepcopy(audit)
+        return (audit["id"],)
+
+    def execute(self, sql, params=()):
+        db, sql = self.db, " ".join(sql.split())
+        self.rows = []
+        if "pg_try_advisory_lock" in sql:
+            free = params[0] not in db.locks
+            db.locks.add(params[0])
+            self.rows = [(free,)]
+        elif "pg_advisory_unlock" in sql:
+            db.locks.discard(params[0])
+        elif sql.startswith("SELECT name FROM tender_projects"):
+            project = db.projects.get(params[0])
+            self.rows = [(project["name"],)] if project else []
+        elif "status IN ('PENDING', 'RUNNING', 'FAILED')" in sql:
+            active = [a for a in db.audits.values()
+                      if a["project_id"] == params[0] and a["status"] in ("PENDING", "RUNNING", "FAILED")]
+            self.rows = [(a["id"],) for a in sorted(active, key=lambda a: a["created_at"], reverse=True)[:1]]
+        elif "SET status = CASE WHEN status = 'FAILED'" in sql:
+            audit = db.audits[params[0]]
+            if audit["status"] == "FAILED":
+                audit["status"] = "PENDING"
+            audit["progress_json"].pop("attempts", None)
+            audit.update(error_message=None, finished_at=None)
+        elif sql.startswith("INSERT INTO tender_project_delete_audit"):
+            audit_id, project_id, name = params[0], params[1], params[2]
+            db.audits[audit_id] = {
+                "id": audit_id, "project_id": project_id, "project_name": name, "status": "PENDING",
+                "error_message": None, "progress_json": {}, "created_at": next(db.clock),
+                "updated_at": None, "finished_at": None,
+            }
+        elif sql.startswith("UPDATE tender_projects SET status='deleting'"):
+            db.projects[params[0]]["status"] = "deleting"
+        elif sql.startswith("DELETE FROM tender_projects"):
+            db.projects.pop(params[0], None)
+        elif "SET progress_json=%s::jsonb" in sql:
+            audit = db.audits[params[2]]
+            audit["progress_json"] = json.loads(params[0])
+            audit["status"] = params[1] or audit["status"]
+        elif "SET status=%s, error_message=%s" in sql:
+            db.audits[params[2]].update(status=params[0], error_message=params[1])
+        elif "SET finished_at=NOW()" in sql:
+            pass
+        elif "FROM tender_project_delete_audit WHERE id=%s" in sql:
+            audit = db.audits.get(params[0])
+            self.rows = [self._audit_row(audit)] if audit else []
+        elif "WHERE project_id=%s ORDER BY created_at DESC" in sql:
+            audits = sorted((a for a in db.audits.values() if a["project_id"] == params[0]),
+                            key=lambda a: a["created_at"], reverse=True)
+            self.rows = [{"id": a["id"]} for a in audits[:1]]
+        elif sql.startswith("SELECT a.id FROM tender_project_delete_audit a"):
+            def resumable(a):
+                if a["status"] in ("PENDING", "RUNNING"):
+                    return True
+                project = db.projects.get(a["project_id"])
+                return (a["status"] == "FAILED"
+                        and a["progress_json"].get("attempts", 0) < params[0]
+                        and project is not None and project["status"] == "deleting")
+            audits = sorted((a for a in db.audits.values() if resumable(a)), key=lambda a: a["created_at"])
+            self.rows = [(a["id"],) for a in audits]
+        else:
+            raise AssertionError(f"unexpected SQL: {sql}")
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, row_factory=None):
+        return FakeCursor(self.db, as_dict=row_factory is not None)
+
+    def commit(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, db):
+        self.db = db
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self.db)
+
+
+class FakeCleaner:
+    def __init__(self, stage, calls, fail=None):
+        self.stage = stage
+        self.calls = calls
+        self.fail = fail
+
+    def type(self):
+        return self.stage
+
+    def delete(self, project_id, on_batch=None):
+        self.calls.append(self.stage)
+        if self.fail and self.fail():
+            raise RuntimeError(f"{self.stage} 删除失败")
+        if on_batch:
+            on_batch(None, self.stage.lower(), 1)
+
+
+@pytest.fixture
+def env():
+    db = FakeDB()
+    db.projects["tp_1"] = {"name": "p", "status": "draft"}
+    calls, failing = [], set()
+    orchestrator = ProjectDeletionOrchestrator(FakePool(db))
+    orchestrator.cleaners = [
+        FakeCleaner(stage, calls, fail=lambda stage=stage: stage in failing)
+        for stage in ("DOCSTORE", "KB", "ASSET", "METADATA")
+    ]
+    return db, orchestrator, calls, failing
+
+
+def test_resume_skips_completed_stages(env):
+    db, orchestrator, calls, _ = env
+    audit_id = orchestrator.start("tp_1")
+    assert db.projects["tp_1"]["status"] == "deleting"
+    db.audits[audit_id]["progress_json"] = {"completed": ["DOCSTORE", "KB"], "deleted": {"kb": 3}, "progress": 40}
+    db.audits[audit_id]["status"] = "RUNNING"
+
+    assert orchestrator.resume_interrupted() == [audit_id]
+    assert calls == ["ASSET", "METADATA"]
+    status = orchestrator.get_status("tp_1")
+    assert status["status"] == "SUCCESS"
+    assert status["progress_json"]["completed"] == ["DOCSTORE", "KB", "ASSET", "METADATA", PROJECT_STAGE]
+    assert status["progress_json"]["deleted"] == {"kb": 3, "asset": 1, "metadata": 1}
+    assert "tp_1" not in db.projects
+
+
+def test_failed_audit_counts_attempts_and_restart_resets_them(env):
+    db, orchestrator, calls, failing = env
+    failing.add("KB")
+    audit_id = orchestrator.start("tp_1")
+    with pytest.raises(RuntimeError):
+        orchestrator.run(audit_id)
+    assert db.audits[audit_id]["status"] == "FAILED"
+    assert db.audits[audit_id]["progress_json"]["attempts"] == 1
+
+    # 启动续跑：仍处于 deleting 的失败删除会被重试，累计执行达到上限后不再自动重试
+    for _ in range(MAX_RESUME_ATTEMPTS):
+        assert orchestrator.resume_interrupted() == []
+    assert db.audits[audit_id]["progress_json"]["attempts"] == MAX_RESUME_ATTEMPTS
+    assert calls.count("KB") == MAX_RESUME_ATTEMPTS
+    # 已完成的 DOCSTORE 阶段只执行过一次
+    assert calls.count("DOCSTORE") == 1
+
+    # 用户重新发起删除：复用同一记录，FAILED → PENDING，执行次数清零
+    failing.clear()
+    assert orchestrator.start("tp_1") == audit_id
+    audit = db.audits[audit_id]
+    assert audit["status"] == "PENDING" and "attempts" not in audit["progress_json"]
+    assert audit["progress_json"]["completed"] == ["DOCSTORE"]
+    assert orchestrator.resume_interrupted() == [audit_id]
+    assert db.audits[audit_id]["progress_json"]["attempts"] == 1
+    assert calls.count("DOCSTORE") == 1
+
+
+def test_failed_audit_of_live_project_is_not_resumed(env):
+    db, orchestrator, calls, failing = env
+    failing.add("DOCSTORE")
+    audit_id = orchestrator.start("tp_1")
+    with pytest.raises(RuntimeError):
+        orchestrator.run(audit_id)
+    db.projects["tp_1"]["status"] = "draft"
+    assert orchestrator.resume_interrupted() == []
+    assert calls == ["DOCSTORE"]
+
+
+def test_runner_skips_when_another_holds_the_lock(env):
+    db, orchestrator, calls, _ = env
+    audit_id = orchestrator.start("tp_1")
+    db.locks.add("project_delete:tp_1")
+    assert orchestrator.run(audit_id)["status"] == "PENDING"
+    assert calls == []
+    db.locks.clear()
+    assert orchestrator.run(audit_id)["status"] == "SUCCESS"
+    # 已成功的记录再次执行直接返回
+    assert orchestrator.run(audit_id)["status"] == "SUCCESS"
+    assert calls == ["DOCSTORE", "KB", "ASSET", "METADATA"]
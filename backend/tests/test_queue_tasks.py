@@ -0,0 +1,267 @@
+"""
+RQ 任务管线测试（fakeredis + 进程内 SimpleWorker）
+验证注册表路由到队列、platform_jobs 进度回写、重试、幂等键去重，以及路由只入队不执行
+"""
+import time
+
+import fakeredis
+import pytest
+from rq import Queue, SimpleWorker
+from rq.job import Job
+
+from app.queue import connection as queue_connection
+from app.queue import runner
+from app.queue import tasks as queue_tasks
+from app.queue import helpers as queue_helpers
+from app.queue.helpers import submit_task
+from app.queue.registry import (
+    DEFAULT_QUEUE_CONCURRENCY,
+    QUEUE_REVIEW,
+    get_task_spec,
+    parse_queue_concurrency,
+    register_task,
+    unregister_task,
+)
+from app.routers import tender as tender_router
+from app.schemas.tender import ExtractReq
+
+
+class FakeJobsService:
+    """记录 platform_jobs 的状态变化"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.history = []
+
+    def create_job(self, namespace, biz_type, biz_id, owner_id=None, initial_status="queued",
+                   initial_message=None, job_id=None):
+        self.jobs[job_id] = {"namespace": namespace, "biz_type": biz_type, "biz_id": biz_id,
+                             "status": initial_status, "progress": 0, "message": initial_message}
+        return job_id
+
+    def update_job_progress(self, job_id, progress, status=None, message=None):
+        job = self.jobs[job_id]
+        job["progress"] = progress
+        if status is not None:
+            job["status"] = status
+        if message is not None:
+            job["message"] = message
+        self.history.append((job_id, job["status"], progress))
+
+    def finish_job_success(self, job_id, result=None, message=None):
+        self.jobs[job_id].update(status="succeeded", progress=100, message=message, result=result)
+        self.history.append((job_id, "succeeded", 100))
+
+    def finish_job_fail(self, job_id, error, progress=None):
+        self.jobs[job_id].update(status="failed", message=error)
+        self.history.append((job_id, "failed", self.jobs[job_id]["progress"]))
+
+
+@pytest.fixture
+def redis_conn(monkeypatch):
+    conn = fakeredis.FakeStrictRedis()
+    queue_connection.set_redis_connection(conn)
+    jobs = FakeJobsService()
+    monkeypatch.setattr(runner, "_jobs_service", lambda: jobs)
+    conn.jobs_service = jobs
+    yield conn
+    queue_connection.set_redis_connection(None)
+
+
+@pytest.fixture
+def test_tasks():
+    calls = {"ok": [], "flaky": 0, "broken": 0}
+
+    @register_task("test.ok", queue=QUEUE_REVIEW)
+    def ok_task(ctx, project_id, value, run_id=None):
+        ctx.report(0.5, "half")
+        calls["ok"].append((project_id, value, run_id))
+        return {"value": value * 2}
+
+    @register_task("test.flaky", max_retries=2)
+    def flaky_task(ctx, project_id):
+        calls["flaky"] += 1
+        if ctx.attempt == 1:
+            assert ctx.will_retry
+            raise RuntimeError("temporary")
+        return {"attempt": ctx.attempt}
+
+    @register_task("test.broken", max_retries=1)
+    def broken_task(ctx, project_id):
+        calls["broken"] += 1
+        raise RuntimeError("boom")
+
+    yield calls
+    for name in ("test.ok", "test.flaky", "test.broken"):
+        unregister_task(name)
+
+
+def _drain(conn, *queue_names):
+    queues = [Queue(name, connection=conn) for name in queue_names]
+    SimpleWorker(queues, connection=conn).work(burst=True)
+
+
+def test_parse_queue_concurrency():
+    assert parse_queue_concurrency(None) == DEFAULT_QUEUE_CONCURRENCY
+    parsed = parse_queue_concurrency("extract=4, review=0,custom=2")
+    assert parsed["extract"] == 4 and parsed["review"] == 0 and parsed["custom"] == 2
+    assert parsed["ingest"] == DEFAULT_QUEUE_CONCURRENCY["ingest"]
+    with pytest.raises(ValueError):
+        parse_queue_concurrency("extract")
+
+
+def test_builtin_tender_tasks_registered():
+    for name in ("tender.extract_project_info", "tender.extract_risks", "tender.generate_directory",
+                 "tender.run_review", "tender.auto_fill_samples", "tender.ingest_asset_v2"):
+        assert get_task_spec(name).func is not None
+    assert get_task_spec("tender.run_review").queue == QUEUE_REVIEW
+
+
+def test_submit_runs_on_registered_queue_and_reports_progress(redis_conn, test_tasks):
+    result = submit_task("test.ok", {"project_id": "p1", "value": 21},
+                         prepare=lambda job_id: {"run_id": "tr_1"})
+    assert not result.deduplicated
+    assert Queue(QUEUE_REVIEW, connection=redis_conn).count == 1
+    assert Queue("default", connection=redis_conn).count == 0
+
+    _drain(redis_conn, QUEUE_REVIEW)
+
+    assert test_tasks["ok"] == [("p1", 21, "tr_1")]
+    job = redis_conn.jobs_service.jobs[result.job_id]
+    assert job["status"] == "succeeded" and job["biz_id"] == "p1"
+    assert job["result"] == {"value": 42}
+    assert (result.job_id, "running", 50) in redis_conn.jobs_service.history
+
+
+def test_idempotency_key_dedupes_until_job_finishes(redis_conn, test_tasks):
+    prepared = []
+
+    def prepare(job_id):
+        prepared.append(job_id)
+        return {"run_id": f"tr_{len(prepared)}"}
+
+    first = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k", prepare=prepare)
+    second = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k", prepare=prepare)
+    assert second.deduplicated and second.job_id == first.job_id
+    assert second.meta == {"run_id": "tr_1"}
+    assert len(prepared) == 1
+
+    _drain(redis_conn, QUEUE_REVIEW)
+    assert len(test_tasks["ok"]) == 1
+
+    # 任务结束后幂等键释放，可以再次提交
+    third = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k", prepare=prepare)
+    assert not third.deduplicated and third.job_id != first.job_id
+
+
+def test_failed_attempt_is_retried(redis_conn, test_tasks):
+    result = submit_task("test.flaky", {"project_id": "p1"})
+    _drain(redis_conn, "default")
+
+    assert test_tasks["flaky"] == 2
+    statuses = [s for jid, s, _ in redis_conn.jobs_service.history if jid == result.job_id]
+    assert "queued" in statuses  # 第一次失败后回到排队状态而不是 failed
+    assert statuses[-1] == "succeeded"
+    assert redis_conn.jobs_service.jobs[result.job_id]["result"] == {"attempt": 2}
+
+
+def test_final_failure_marks_job_failed_and_releases_key(redis_conn, test_tasks):
+    first = submit_task("test.broken", {"project_id": "p1"}, idempotency_key="broken")
+    _drain(redis_conn, "default")
+
+    assert test_tasks["broken"] == 2
+    job = redis_conn.jobs_service.jobs[first.job_id]
+    assert job["status"] == "failed" and job["message"] == "boom"
+
+    again = submit_task("test.broken", {"project_id": "p1"}, idempotency_key="broken")
+    assert not again.deduplicated
+
+
+
+def test_enqueue_failure_frees_key(redis_conn, test_tasks, monkeypatch):
+    def broken_enqueue(self, *args, **kwargs):
+        raise ConnectionError("redis went away")
+
+    with monkeypatch.context() as m:
+        m.setattr(Queue, "enqueue", broken_enqueue)
+        with pytest.raises(ConnectionError):
+            submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k")
+
+    result = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k")
+    assert not result.deduplicated
+    # 入队成功后键才指向任务并延长到完整 TTL
+    redis_key = queue_helpers._idempotency_redis_key("k")
+    assert redis_conn.get(redis_key).decode() == result.job_id
+    assert redis_conn.ttl(redis_key) > queue_helpers.IDEMPOTENCY_CLAIM_TTL_SECONDS
+
+
+def test_key_pointing_to_missing_or_dead_job_is_free(redis_conn, test_tasks):
+    first = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k")
+
+    # 任务已被清理（或提交方入队前就崩溃）：键不再挡住重新提交
+    redis_conn.delete(f"rq:job:{first.job_id}")
+    second = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k")
+    assert not second.deduplicated
+
+    # 执行中的任务：Worker 还活着时去重，Worker 心跳键过期后视为空闲
+    job = Job.fetch(second.job_id, connection=redis_conn)
+    job.set_status("started")
+    job.worker_name = "w1"
+    job.save()
+    redis_conn.set("rq:worker:w1", "1")
+    assert submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k").deduplicated
+    redis_conn.delete("rq:worker:w1")
+    third = submit_task("test.ok", {"project_id": "p1", "value": 1}, idempotency_key="k")
+    assert not third.deduplicated and third.job_id != second.job_id
+
+
+class _FakeRouterDAO:
+    runs = []
+
+    def __init__(self, pool):
+        pass
+
+    def create_run(self, project_id, kind):
+        run_id = f"tr_{len(self.runs) + 1}"
+        self.runs.append({"id": run_id, "kind": kind, "status": "pending"})
+        return run_id
+
+    def update_run(self, run_id, status, progress=None, message=None, result_json=None):
+        next(r for r in self.runs if r["id"] == run_id)["status"] = status
+
+
+class _FakeRequest:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+def test_router_enqueues_instead_of_running_in_process(redis_conn, monkeypatch):
+    monkeypatch.setenv("ASYNC_EXTRACT_ENABLED", "true")
+    monkeypatch.setattr(tender_router, "TenderDAO", _FakeRouterDAO)
+    monkeypatch.setattr(tender_router, "_get_pool", lambda req: None)
+    _FakeRouterDAO.runs = []
+
+    def heavy(*args, **kwargs):
+        raise AssertionError("heavy job must not run in the API process")
+
+    monkeypatch.setattr(queue_tasks, "extract_project_info", heavy)
+    monkeypatch.setattr(tender_router, "_svc", heavy)
+
+    class NoBackground:
+        def add_task(self, *args, **kwargs):
+            raise AssertionError("BackgroundTasks must not be used when the queue is enabled")
+
+    start = time.perf_counter()
+    out = tender_router.extract_project_info("p1", ExtractReq(model_id="m"), _FakeRequest(), NoBackground(), sync=0, user=None)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0
+    assert out["run_id"] == "tr_1" and not out["deduplicated"]
+    assert Queue("extract", connection=redis_conn).count == 1
+    assert redis_conn.jobs_service.jobs[out["job_id"]]["biz_type"] == "tender.extract_project_info"
+
+    # 重复点击：复用同一个 run，不再入队
+    again = tender_router.extract_project_info("p1", ExtractReq(model_id="m"), _FakeRequest(), NoBackground(), sync=0, user=None)
+    assert again == {**out, "deduplicated": True}
+    assert Queue("extract", connection=redis_conn).count == 1
+    assert len(_FakeRouterDAO.runs) == 1
@@ -0,0 +1,242 @@
+"""
+RulesEvaluatorV2 编译规则引擎测试
+验证关键词自动机、规则编译缓存，以及 exists 规则单遍扫描 / 语义规则并发检索
+"""
+import asyncio
+import random
+
+import pytest
+
+from app.platform.retrieval.new_retriever import RetrievedChunk
+from app.platform.rules import evaluator_v2 as evaluator_module
+from app.platform.rules.compiled_ruleset import (
+    RULE_KIND_DATE_COMPARE,
+    RULE_KIND_EXISTS,
+    RULE_KIND_MISSING_FIELD,
+    RULE_KIND_SEMANTIC,
+    clear_compiled_cache,
+    classify_rule,
+    compile_ruleset,
+)
+from app.platform.rules.evaluator_v2 import RulesEvaluatorV2
+from app.platform.rules.keyword_automaton import KeywordAutomaton
+
+
+RULES_YAML = """
+rules:
+  - id: r_license
+    title: 营业执照检查
+    dimension: 资格审查
+    rigid: true
+    select: bid
+    check: "bid_chunks must contain('营业执照', '有效期')"
+  - id: r_plan
+    title: 技术方案检查
+    dimension: 技术审查
+    rigid: false
+    select: bid
+    check: "bid_chunks must contain('技术方案')"
+  - id: r_missing
+    title: 社保证明检查
+    dimension: 资格审查
+    rigid: true
+    select: bid
+    check: "bid_chunks must contain('社保缴纳证明')"
+  - id: r_field
+    title: 建设单位字段检查
+    dimension: 项目信息
+    select: project_info
+    check: "project_info.field('建设单位') must not be empty"
+  - id: r_semantic
+    title: 售后服务承诺
+    dimension: 商务审查
+    match: semantic
+    select: bid
+    check: "bid_chunks must contain('售后服务承诺')"
+  - id: r_tender
+    title: 招标文件须含评标办法
+    dimension: 招标审查
+    select: tender
+    check: "tender must contain('评标办法')"
+  - id: r_date
+    title: 工期比较
+    check: "extract_date(bid, '工期开始') >= extract_date(tender, '要求开始')"
+"""
+
+
+class FakeRetriever:
+    """记录调用次数的假检索器"""
+
+    def __init__(self, delay: float = 0.0):
+        self.calls = []
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def retrieve(self, query, project_id, doc_types=None, embedding_provider=None, top_k=12, **kwargs):
+        self.calls.append((query, tuple(doc_types or [])))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return [RetrievedChunk("seg_sem", "我方承诺提供售后服务", 0.9, {"page_no": 7, "doc_version_id": "dv_bid"})]
+
+
+class FakeEmbeddingStore:
+    def get_default(self):
+        return object()
+
+
+def _make_evaluator(monkeypatch, segments, retriever=None):
+    evaluator = RulesEvaluatorV2(pool=None, retriever=retriever or FakeRetriever())
+    scans = []
+
+    def fake_iter(project_id, doc_types):
+        scans.append(list(doc_types))
+        for seg in segments:
+            if seg[0] in doc_types:
+                yield seg
+
+    monkeypatch.setattr(evaluator, "_iter_project_segments", fake_iter)
+    monkeypatch.setattr(evaluator_module, "get_embedding_store", lambda: FakeEmbeddingStore())
+    return evaluator, scans
+
+
+def _seg(doc_type, seg_id, text, page_no=1):
+    return doc_type, {
+        "id": seg_id,
+        "doc_version_id": f"dv_{doc_type}",
+        "content_text": text,
+        "meta_json": {"page_no": page_no},
+    }
+
+
+def test_keyword_automaton_matches_naive_search():
+    """自动机结果与逐关键词 str.find 一致（含重叠、前后缀关键词）"""
+    keywords = ["he", "she", "his", "hers", "营业执照", "执照", "营业"]
+    automaton = KeywordAutomaton(keywords)
+
+    rng = random.Random(7)
+    alphabet = "hers营业执照 "
+    for _ in range(200):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        expected = set()
+        for kid, kw in enumerate(keywords):
+            start = text.find(kw)
+            while start != -1:
+                expected.add((kid, start))
+                start = text.find(kw, start + 1)
+        assert set(automaton.iter_matches(text)) == expected
+
+
+def test_keyword_automaton_case_insensitive():
+    automaton = KeywordAutomaton(["ISO9001"])
+    assert automaton.find_first("通过 iso9001 认证") == {0: 3}
+
+
+def test_compile_ruleset_classifies_and_caches():
+    clear_compiled_cache()
+    compiled = compile_ruleset(RULES_YAML)
+    kinds = {r.rule_id: r.kind for r in compiled.rules}
+    assert kinds == {
+        "r_license": RULE_KIND_EXISTS,
+        "r_plan": RULE_KIND_EXISTS,
+        "r_missing": RULE_KIND_EXISTS,
+        "r_field": RULE_KIND_MISSING_FIELD,
+        "r_semantic": RULE_KIND_SEMANTIC,
+        "r_tender": RULE_KIND_EXISTS,
+        "r_date": RULE_KIND_DATE_COMPARE,
+    }
+    assert compiled.scan_doc_types == ["bid", "tender"]
+    # 相同 YAML 命中缓存，不重复解析
+    assert compile_ruleset(RULES_YAML) is compiled
+
+
+
+def test_classify_ignores_markers_inside_keywords():
+    # 关键词本身含"相似/similar"仍是普通 exists 规则，只有表达式或 match 声明才走语义检索
+    assert classify_rule({"check": "must contain '相似业绩'"}) == RULE_KIND_EXISTS
+    assert classify_rule({"check": 'contains "similar projects"'}) == RULE_KIND_EXISTS
+    assert classify_rule({"check": "similar contains '项目经理'"}) == RULE_KIND_SEMANTIC
+    assert classify_rule({"check": "must contain '相似业绩'", "match": "semantic"}) == RULE_KIND_SEMANTIC
+
+
+@pytest.mark.asyncio
+async def test_evaluate_single_scan_and_semantic_only_retrieval(monkeypatch):
+    segments = [
+        _seg("bid", "seg_1", "第一章 投标函"),
+        _seg("bid", "seg_2", "附：营业执照副本复印件", page_no=3),
+        _seg("bid", "seg_3", "详见技术方案第二节；营业执照有效期至2030年", page_no=5),
+        _seg("tender", "seg_t1", "第三章 评标办法"),
+        # bid 中出现评标办法不应算作 tender 规则证据
+        _seg("bid", "seg_4", "响应评标办法要求"),
+    ]
+    retriever = FakeRetriever()
+    evaluator, scans = _make_evaluator(monkeypatch, segments, retriever)
+
+    findings = await evaluator.evaluate(
+        "tp_1",
+        {"content_yaml": RULES_YAML},
+        {"project_info": {"建设单位": "某某集团"}},
+    )
+
+    # 一次扫描覆盖所有 exists 规则
+    assert scans == [["bid", "tender"]]
+    # 只有语义规则走检索
+    assert retriever.calls == [("售后服务承诺", ("bid",))]
+
+    by_id = {f["rule_id"]: f for f in findings}
+    assert [f["rule_id"] for f in findings] == [
+        "r_license", "r_plan", "r_missing", "r_field", "r_semantic", "r_tender", "r_date"
+    ]
+
+    assert by_id["r_license"]["result"] == "pass"
+    assert by_id["r_license"]["evidence_chunk_ids"] == ["seg_2", "seg_3"]
+    assert by_id["r_license"]["evidence_spans"][0]["page_no"] == 3
+    assert "营业执照" in by_id["r_license"]["remark"] and "有效期" in by_id["r_license"]["remark"]
+
+    assert by_id["r_plan"]["evidence_chunk_ids"] == ["seg_3"]
+    assert by_id["r_missing"]["result"] == "fail"
+    assert by_id["r_missing"]["evidence_chunk_ids"] == []
+    assert by_id["r_field"]["result"] == "pass"
+    assert by_id["r_semantic"]["evidence_chunk_ids"] == ["seg_sem"]
+    assert by_id["r_tender"]["evidence_chunk_ids"] == ["seg_t1"]
+
+
+@pytest.mark.asyncio
+async def test_semantic_rules_run_concurrently(monkeypatch):
+    rules = "rules:\n" + "".join(
+        f"  - id: s{i}\n    match: semantic\n    select: bid\n    check: \"must contain('条款{i}')\"\n"
+        for i in range(8)
+    )
+    retriever = FakeRetriever(delay=0.05)
+    evaluator, scans = _make_evaluator(monkeypatch, [], retriever)
+    evaluator.semantic_concurrency = 4
+
+    findings = await evaluator.evaluate("tp_1", {"content_yaml": rules})
+
+    assert len(findings) == 8
+    assert len(retriever.calls) == 8
+    assert retriever.max_in_flight == 4
+    # 没有 exists 规则时不扫描
+    assert scans == []
+
+
+@pytest.mark.asyncio
+async def test_exists_scan_failure_marks_rules_as_risk(monkeypatch):
+    evaluator, _ = _make_evaluator(monkeypatch, [])
+
+    def broken_iter(project_id, doc_types):
+        raise RuntimeError("db down")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(evaluator, "_iter_project_segments", broken_iter)
+    findings = await evaluator.evaluate("tp_1", {"content_yaml": RULES_YAML}, {"project_info": {}})
+
+    by_id = {f["rule_id"]: f for f in findings}
+    assert by_id["r_license"]["result"] == "risk"
+    assert "db down" in by_id["r_license"]["remark"]
+    # 其他规则不受影响
+    assert by_id["r_semantic"]["evidence_chunk_ids"] == ["seg_sem"]
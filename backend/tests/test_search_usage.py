@@ -1,12 +1,17 @@
 import json
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 import pytest
 from fastapi import HTTPException
-from backend.app.services.search_usage import SearchUsageManager
+from app.services.search_usage import SearchUsageManager
+
+DAY = datetime(2025, 1, 1, tzinfo=timezone.utc)
 
 
 def test_search_usage_increment_warn_limit(tmp_path):
-    storage = tmp_path / "usage.json"
+    storage = tmp_path / "usage.db"
     clock = lambda: datetime(2025, 1, 1, tzinfo=timezone.utc)
     manager = SearchUsageManager(
         storage_path=str(storage),
@@ -24,10 +29,11 @@ def test_search_usage_increment_warn_limit(tmp_path):
     with pytest.raises(HTTPException) as exc:
         manager.register_search()
     assert exc.value.status_code == 429
+    assert manager.get_count() == 3
 
 
 def test_search_usage_cross_day(tmp_path):
-    storage = tmp_path / "usage.json"
+    storage = tmp_path / "usage.db"
     first_day = datetime(2025, 1, 1, tzinfo=timezone.utc)
     second_day = first_day + timedelta(days=1)
 
@@ -38,9 +44,7 @@ def test_search_usage_cross_day(tmp_path):
         clock=lambda: first_day,
     )
     manager_day1.register_search()
-    with open(storage, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    assert data[first_day.strftime("%Y-%m-%d")] == 1
+    assert manager_day1.get_count(first_day.strftime("%Y-%m-%d")) == 1
 
     manager_day2 = SearchUsageManager(
         storage_path=str(storage),
@@ -50,7 +54,81 @@ def test_search_usage_cross_day(tmp_path):
     )
     count, warn = manager_day2.register_search()
     assert count == 1 and warn is False
-    with open(storage, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    assert data[second_day.strftime("%Y-%m-%d")] == 1
+    assert manager_day2.get_count(second_day.strftime("%Y-%m-%d")) == 1
+    assert manager_day2.get_count(first_day.strftime("%Y-%m-%d")) == 1
+
+
+def test_legacy_json_counts_are_imported(tmp_path):
+    legacy = tmp_path / "search_usage.json"
+    legacy.write_text(json.dumps({"2025-01-01": 7}), encoding="utf-8")
+
+    manager = SearchUsageManager(str(legacy), default_warn=100, default_limit=8, clock=lambda: DAY)
+    assert manager.storage_path == str(tmp_path / "search_usage.db")
+    assert manager.register_search() == (8, False)
+    with pytest.raises(HTTPException):
+        manager.register_search()
+    # 再次初始化不会用旧文件覆盖新计数
+    again = SearchUsageManager(str(legacy), default_warn=100, default_limit=8, clock=lambda: DAY)
+    assert again.get_count() == 8
+
+
+
+def test_default_db_path_imports_sibling_json(tmp_path):
+    # 默认配置已改为 search_usage.db：首次创建时导入旁边旧版 search_usage.json 的计数
+    (tmp_path / "search_usage.json").write_text(json.dumps({"2025-01-01": 7}), encoding="utf-8")
+    storage = str(tmp_path / "search_usage.db")
+
+    manager = SearchUsageManager(storage, default_warn=100, default_limit=8, clock=lambda: DAY)
+    assert manager.get_count() == 7
+    assert manager.register_search() == (8, False)
+    # .db 已存在时不再读取旧文件
+    (tmp_path / "search_usage.json").write_text(json.dumps({"2025-01-02": 5}), encoding="utf-8")
+    again = SearchUsageManager(storage, default_warn=100, default_limit=8, clock=lambda: DAY)
+    assert again.get_count() == 8
+    assert again.get_count("2025-01-02") == 0
+
+
+def _register_batch(storage_path, limit, per_process, start_event, results):
+    """子进程：等所有进程就绪后，用多线程同时发起 per_process 次计数"""
+    manager = SearchUsageManager(storage_path, default_warn=limit, default_limit=limit, clock=lambda: DAY)
+    barrier = threading.Barrier(per_process)
+
+    def register(_):
+        barrier.wait()
+        try:
+            return manager.register_search()[0]
+        except HTTPException as exc:
+            assert exc.status_code == 429
+            return None
+
+    start_event.wait()
+    with ThreadPoolExecutor(max_workers=per_process) as pool:
+        counts = list(pool.map(register, range(per_process)))
+    results.put(counts)
+
+
+def test_concurrent_registrations_across_processes_hit_limit_exactly(tmp_path):
+    storage = str(tmp_path / "usage.db")
+    limit, processes, per_process = 300, 10, 50
+    SearchUsageManager(storage, default_warn=limit, default_limit=limit)  # 预先建表
+
+    ctx = multiprocessing.get_context("fork")
+    start_event, results = ctx.Event(), ctx.Queue()
+    workers = [
+        ctx.Process(target=_register_batch, args=(storage, limit, per_process, start_event, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    start_event.set()
+    counts = [c for _ in workers for c in results.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=10)
+        assert worker.exitcode == 0
 
+    granted = sorted(c for c in counts if c is not None)
+    assert len(counts) == processes * per_process
+    # 每次放行拿到唯一的序号 1..limit，其余全部 429
+    assert granted == list(range(1, limit + 1))
+    manager = SearchUsageManager(storage, default_warn=limit, default_limit=limit, clock=lambda: DAY)
+    assert manager.get_count() == limit
@@ -0,0 +1,89 @@
+"""
+SSE delta 合并测试
+验证按大小/时间合并后的帧拼出的文本与逐 token 输出逐字节一致，且低速输出时不会被拖延
+"""
+import asyncio
+import json
+import random
+
+import pytest
+
+from app.routers import chat
+from app.schemas.chat import ChatRequest, ChatResponse
+
+TOKENS = ["你", "好", "，", "world", " ", "\"quote\"", "\\n", "\n", "😀", "</script>", "a b", "数据"]
+
+
+def _tokens(n, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(TOKENS) for _ in range(n)]
+
+
+class FakeTurn:
+    def __init__(self, tokens, pause_every=0, pause=0.0):
+        self.tokens = tokens
+        self.pause_every = pause_every
+        self.pause = pause
+
+    async def __call__(self, req, request_id, stream_tokens=None):
+        for i, token in enumerate(self.tokens):
+            if self.pause_every and i % self.pause_every == 0:
+                await asyncio.sleep(self.pause)
+            await stream_tokens(token)
+        return ChatResponse(
+            answer="".join(self.tokens), llm_key="fake", llm_name="fake", session_id="s1",
+            search_mode="off", used_search=False,
+        )
+
+
+def _parse(raw: bytes):
+    events = []
+    for block in raw.decode("utf-8").split("\n\n"):
+        if block.startswith("event: "):
+            event, data = block.split("\n", 1)
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+async def _run(monkeypatch, turn, flush_chars, flush_ms):
+    monkeypatch.setattr(chat, "_chat_endpoint_impl", turn)
+    monkeypatch.setattr(chat.settings, "CHAT_STREAM_FLUSH_CHARS", flush_chars)
+    monkeypatch.setattr(chat.settings, "CHAT_STREAM_FLUSH_INTERVAL_MS", flush_ms)
+    response = await chat.chat_stream_endpoint(ChatRequest(message="你好"))
+    raw = b"".join([chunk async for chunk in response.body_iterator])
+    return _parse(raw)
+
+
+@pytest.mark.asyncio
+async def test_coalesced_text_is_byte_identical(monkeypatch):
+    tokens = _tokens(3000)
+    expected = "".join(tokens)
+
+    per_token = await _run(monkeypatch, FakeTurn(tokens, pause_every=100, pause=0.001), 256, 0)
+    coalesced = await _run(monkeypatch, FakeTurn(tokens, pause_every=100, pause=0.001), 256, 40)
+
+    for events in (per_token, coalesced):
+        deltas = [data["text"] for event, data in events if event == "delta"]
+        assert "".join(deltas).encode("utf-8") == expected.encode("utf-8")
+        assert events[-1][0] == "result"
+    assert len([e for e in per_token if e[0] == "delta"]) == len(tokens)
+    frames = [data["text"] for event, data in coalesced if event == "delta"]
+    assert len(frames) < len(tokens) / 10
+    # 只在 token 边界合并，单帧最多超出阈值一个 token
+    assert max(len(f) for f in frames) < 256 + max(len(t) for t in TOKENS)
+
+
+@pytest.mark.asyncio
+async def test_slow_tokens_are_flushed_by_timer(monkeypatch):
+    monkeypatch.setattr(chat, "_chat_endpoint_impl", FakeTurn(["甲", "乙", "丙"], pause_every=1, pause=0.15))
+    monkeypatch.setattr(chat.settings, "CHAT_STREAM_FLUSH_CHARS", 256)
+    monkeypatch.setattr(chat.settings, "CHAT_STREAM_FLUSH_INTERVAL_MS", 20)
+    response = await chat.chat_stream_endpoint(ChatRequest(message="你好"))
+
+    stream = response.body_iterator
+    assert await stream.__anext__() == b":open\n\n"
+    # 每个 token 在下一个 token 到来前就按时间阈值单独发出
+    for expected in ("甲", "乙", "丙"):
+        chunk = await asyncio.wait_for(stream.__anext__(), timeout=0.2)
+        assert _parse(chunk) == [("delta", {"text": expected})]
+    await stream.aclose()
@@ -0,0 +1,327 @@
+"""
+指标与链路计时测试
+- Prometheus 文本格式、span 嵌套与错误状态
+- 一次完整的聊天轮次、一次招标抽取都能产出预期的 span / 直方图 / token 计数
+- Postgres 连接池借连接等待时间
+"""
+import json
+from datetime import datetime
+
+import pytest
+from psycopg_pool import PoolTimeout
+
+from app.core.telemetry import (
+    REGISTRY,
+    InMemorySpanExporter,
+    add_span_exporter,
+    histogram,
+    remove_span_exporter,
+    span,
+    _Metric,
+)
+from app.schemas.embedding_provider import EmbeddingProviderStored
+from app.schemas.llm_config import LLMModelStored
+
+
+@pytest.fixture
+def exporter():
+    exp = InMemorySpanExporter()
+    add_span_exporter(exp)
+    yield exp
+    remove_span_exporter(exp)
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _span_count(name, status="ok"):
+    return _sample("span_duration_seconds_count", span=name, status=status)
+
+
+def test_render_prometheus_text_format():
+    h = histogram("test_render_seconds", "render test", ("leg",), buckets=(0.1, 1.0))
+    h.labels(leg='a"b').observe(0.05)
+    h.labels(leg='a"b').observe(0.5)
+    h.labels(leg='a"b').observe(3)
+
+    text = REGISTRY.render()
+    assert "# TYPE test_render_seconds histogram" in text
+    assert 'test_render_seconds_bucket{leg="a\\"b",le="0.1"} 1' in text
+    assert 'test_render_seconds_bucket{leg="a\\"b",le="1.0"} 2' in text
+    assert 'test_render_seconds_bucket{leg="a\\"b",le="+Inf"} 3' in text
+    assert _sample("test_render_seconds_sum", leg='a"b') == pytest.approx(3.55)
+    with pytest.raises(ValueError):
+        h.labels(other="x")
+
+
+def test_metric_subclass_must_define_child():
+    class Incomplete(_Metric):
+        kind = "counter"
+
+    with pytest.raises(TypeError):
+        Incomplete("test_incomplete_total", "missing _new_child")
+
+
+def test_span_nesting_and_error_status(exporter):
+    errors_before = _span_count("test.inner", status="error")
+    with pytest.raises(RuntimeError):
+        with span("test.outer", kind="unit") as outer:
+            with span("test.inner"):
+                raise RuntimeError("boom")
+    inner, = exporter.spans("test.inner")
+    outer_record, = exporter.spans("test.outer")
+    assert inner.parent_id == outer.span_id and inner.trace_id == outer_record.trace_id
+    assert inner.status == "error" and "boom" in inner.error
+    assert outer_record.attributes == {"kind": "unit"}
+    assert _span_count("test.inner", status="error") == errors_before + 1
+
+
+class _FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self.headers = {}
+        self._body = body
+        self.text = json.dumps(body, ensure_ascii=False)
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._body
+
+
+class _FakeServices:
+    """同时扮演 Embedding 服务与 OpenAI 兼容 LLM 服务"""
+
+    usage = {"prompt_tokens": 120, "completion_tokens": 30}
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def _respond(self, url, payload):
+        if url.endswith("/embeddings"):
+            return _FakeResponse({"data": [{"embedding": [0.1, 0.2, 0.3]} for _ in payload["input"]]})
+        content = json.dumps({"data": {"budget": "300万元"}, "evidence_chunk_ids": ["seg_1"]}, ensure_ascii=False)
+        return _FakeResponse({"choices": [{"message": {"content": content}}], "usage": self.usage})
+
+    async def post(self, url, json=None, headers=None):
+        return self._respond(url, json)
+
+
+class _SyncFakeServices(_FakeServices):
+    def post(self, url, json=None, headers=None):
+        return self._respond(url, json)
+
+
+def _embedding_provider():
+    now = datetime.utcnow()
+    return EmbeddingProviderStored(
+        id="emb_1", name="emb", base_url="http://emb.local", model="emb-model",
+        output_sparse=False, dense_dim=3, created_at=now, updated_at=now,
+    )
+
+
+def _llm_model():
+    return LLMModelStored(name="fake", base_url="http://llm.local", endpoint_path="/v1/chat/completions", model="fake-llm")
+
+
+@pytest.mark.asyncio
+async def test_chat_turn_emits_spans_and_histograms(monkeypatch, exporter):
+    from app.routers import chat
+    from app.schemas.chat import ChatRequest
+    from app.services.dao import kb_dao
+    from app.services.retrieval import retriever
+    from app.services.settings_store import AppSettings
+
+    sessions = {}
+
+    def create_session(title, kb_ids, search_mode, llm_key):
+        sessions["s1"] = {"id": "s1", "messages": [], "default_kb_ids": kb_ids}
+        return "s1"
+
+    def append_message(session_id, role, content, meta):
+        sessions[session_id]["messages"].append({"role": role, "content": content})
+
+    class _LLMStore:
+        def get_default_model(self):
+            return _llm_model()
+
+    class _EmbeddingStore:
+        def get_default(self):
+            return _embedding_provider()
+
+    monkeypatch.setattr(chat, "load_settings", lambda: AppSettings())
+    monkeypatch.setattr(chat, "create_history_session", create_session)
+    monkeypatch.setattr(chat, "get_history_session", lambda sid: sessions.get(sid))
+    monkeypatch.setattr(chat, "get_history_session_window", lambda sid, limit: sessions.get(sid))
+    monkeypatch.setattr(chat, "append_history_message", append_message)
+    monkeypatch.setattr(chat, "update_history_session_kb_ids", lambda sid, kb_ids: None)
+    monkeypatch.setattr(chat, "update_history_session_meta", lambda sid, meta: None)
+    monkeypatch.setattr(chat, "get_llm_store", lambda: _LLMStore())
+    monkeypatch.setattr(chat, "get_embedding_store", lambda: _EmbeddingStore())
+    monkeypatch.setattr("app.services.embedding.http_embedding_client.get_embedding_store", lambda: _EmbeddingStore())
+    monkeypatch.setattr("httpx.AsyncClient", _FakeServices)
+    monkeypatch.setattr(
+        retriever.milvus_store, "search_dense",
+        lambda vec, limit, kb_ids, kb_categories, request_id: [{"chunk_id": "c1", "score": 0.9, "rank": 0}],
+    )
+    monkeypatch.setattr(
+        retriever, "search_lexical",
+        lambda *a, **kw: [{"chunk_id": "c1", "score": 0.5, "rank": 0}, {"chunk_id": "c2", "score": 0.4, "rank": 1}],
+    )
+    monkeypatch.setattr(kb_dao, "get_chunks_by_ids", lambda ids: {
+        cid: {"kb_id": "kb1", "doc_id": f"doc_{cid}", "title": cid, "content": f"{cid} 正文"} for cid in ids
+    })
+    monkeypatch.setattr(kb_dao, "get_kb_names", lambda ids: {"kb1": "知识库"})
+    monkeypatch.setattr(kb_dao, "get_documents_meta", lambda ids: {})
+
+    tokens_before = _sample("llm_tokens_total", model="fake-llm", type="completion")
+    embed_before = _span_count("embedding.embed")
+    response = await chat._chat_endpoint_impl(
+        ChatRequest(message="保证金是多少", kb_ids=["kb1"], enable_web=False, enable_orchestrator=False),
+        request_id="req_test",
+    )
+    assert response.answer and len(response.sources) == 2
+
+    turn, = exporter.spans("chat.turn")
+    by_name = {}
+    for record in exporter.spans():
+        by_name.setdefault(record.name, []).append(record)
+    for name in ("embedding.embed", "retrieval.kb", "retrieval.kb.dense", "retrieval.kb.lexical",
+                 "retrieval.kb.fuse", "llm.request"):
+        assert name in by_name, name
+        assert all(r.trace_id == turn.trace_id for r in by_name[name])
+    assert by_name["retrieval.kb.dense"][0].attributes["hits"] == 1
+    assert by_name["retrieval.kb.lexical"][0].attributes["hits"] == 2
+    # 意图解析 + 回答生成两次 LLM 调用，均带上 token 用量
+    assert len(by_name["llm.request"]) >= 2
+    assert by_name["llm.request"][-1].attributes["completion_tokens"] == 30
+
+    assert _span_count("embedding.embed") == embed_before + 1
+    assert _span_count("retrieval.kb.lexical") >= 1
+    assert _sample("llm_tokens_total", model="fake-llm", type="completion") == tokens_before + 30 * len(by_name["llm.request"])
+    assert 'span_duration_seconds_bucket{span="chat.turn",status="ok",le="+Inf"}' in REGISTRY.render()
+
+
+class _SegmentPool:
+    """按 SQL 分派结果的假连接池（项目文档版本 / 词法检索 / 片段加载）"""
+
+    def connection(self):
+        from contextlib import contextmanager
+
+        @contextmanager
+        def _conn():
+            class Cur:
+                rows = []
+
+                def __enter__(self):
+                    return self
+
+                def __exit__(self, *exc):
+                    return False
+
+                def execute(self, sql, params):
+                    if "tender_project_assets" in sql:
+                        self.rows = [("dv_1",)]
+                    elif "tsv_cjk @@" in sql:
+                        self.rows = [("seg_1", 0.8), ("seg_2", 0.3)]
+                    else:
+                        self.rows = [(sid, f"{sid} 预算金额 300 万元", {"page_no": 1}, "dv_1") for sid in params[0]]
+
+                def fetchall(self):
+                    return self.rows
+
+            class Conn:
+                def cursor(self):
+                    return Cur()
+
+            yield Conn()
+
+        return _conn()
+
+
+@pytest.mark.asyncio
+async def test_tender_extraction_emits_spans_and_histograms(monkeypatch, exporter):
+    from app.platform.extraction.engine import ExtractionEngine
+    from app.platform.extraction.types import ExtractionSpec
+    from app.platform.retrieval.new_retriever import NewRetriever
+    from app.services import simple_llm_orchestrator
+    from app.services.vectorstore.milvus_docseg_store import milvus_docseg_store
+
+    monkeypatch.setattr("httpx.AsyncClient", _FakeServices)
+    monkeypatch.setattr("httpx.Client", _SyncFakeServices)
+    monkeypatch.setattr(simple_llm_orchestrator, "get_default_llm_model", _llm_model)
+    monkeypatch.setattr(
+        milvus_docseg_store, "search_dense",
+        lambda **kw: [{"segment_id": "seg_2", "score": 0.7, "rank": 0}],
+    )
+
+    prompt_before = _sample("llm_tokens_total", model="fake-llm", type="prompt")
+    result = await ExtractionEngine().run(
+        spec=ExtractionSpec(prompt="抽取项目预算", queries={"budget": "项目预算金额", "deposit": "投标保证金"}),
+        retriever=NewRetriever(_SegmentPool()),
+        llm=simple_llm_orchestrator.SimpleLLMOrchestrator(),
+        project_id="tp_1",
+        embedding_provider=_embedding_provider(),
+    )
+    assert result.data == {"budget": "300万元"}
+
+    run, = exporter.spans("extraction.run")
+    names = [record.name for record in exporter.spans() if record.trace_id == run.trace_id]
+    assert names.count("retrieval.docseg") == 2
+    assert names.count("retrieval.docseg.dense") == 2 and names.count("retrieval.docseg.lexical") == 2
+    assert names.count("embedding.embed") == 2
+    for stage in ("extraction.retrieve", "extraction.context", "extraction.llm", "extraction.parse", "llm.request"):
+        assert stage in names, stage
+    llm_span, = exporter.spans("llm.request")
+    assert llm_span.attributes == {"kind": "sync", "model": "fake-llm", "prompt_tokens": 120, "completion_tokens": 30}
+    assert exporter.spans("retrieval.docseg.lexical")[0].attributes["hits"] == 2
+
+    assert _sample("llm_tokens_total", model="fake-llm", type="prompt") == prompt_before + 120
+    assert _span_count("extraction.llm") >= 1 and _span_count("retrieval.docseg.dense") >= 2
+
+
+def test_db_pool_wait_is_observed():
+    from app.services.db.postgres import InstrumentedConnectionPool
+
+    count_before = _sample("db_pool_wait_seconds_count")
+    timeouts_before = _sample("db_pool_timeouts_total")
+    pool = InstrumentedConnectionPool(
+        "host=/nonexistent-socket-dir dbname=x connect_timeout=1", min_size=0, max_size=1,
+        open=True, reconnect_timeout=1,
+    )
+    try:
+        with pytest.raises(PoolTimeout):
+            pool.getconn(timeout=0.2)
+    finally:
+        pool.close()
+    assert _sample("db_pool_wait_seconds_count") == count_before + 1
+    assert _sample("db_pool_wait_seconds_sum") >= 0.2
+    assert _sample("db_pool_timeouts_total") == timeouts_before + 1
+
+
+def test_metrics_endpoint_serves_registry():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routers import metrics
+
+    app = FastAPI()
+    app.include_router(metrics.router)
+    resp = TestClient(app).get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE span_duration_seconds histogram" in resp.text
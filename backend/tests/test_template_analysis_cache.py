@@ -0,0 +1,204 @@
+"""
+模板分析缓存测试
+验证 LRU 上限、跨实例（模拟重启 / 多 worker）持久化命中、版本升级失效，以及抽取结果缓存
+"""
+from io import BytesIO
+
+import pytest
+from docx import Document
+
+from app.services.template import analysis_cache as cache_module
+from app.services.template.analysis_cache import CACHE_KIND_SPEC, TemplateAnalysisCache
+from app.services.template.docx_extractor import DocxBlockExtractor, DocxExtractResult
+from app.services.template.template_spec import create_minimal_spec
+from app.services.tender_service import TenderService
+
+
+class FakeCursor:
+    """按语句类型模拟 template_analysis_cache 表"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.table = pool.table
+        self._row = None
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        stmt = " ".join(sql.split())
+        if stmt.startswith("UPDATE template_analysis_cache"):
+            payload = self.table.get(tuple(params))
+            self._row = (payload,) if payload is not None else None
+            if payload is not None:
+                self.pool.last_hit[tuple(params)] = self.pool.now
+        elif stmt.startswith("INSERT INTO template_analysis_cache"):
+            *key, payload = params
+            self.table[tuple(key)] = payload
+            self.pool.last_hit[tuple(key)] = self.pool.now
+        elif stmt.startswith("DELETE FROM template_analysis_cache WHERE cache_kind"):
+            kind, version, ttl = params
+            stale = [
+                k for k in self.table
+                if k[0] == kind and k[2] != version and self.pool.last_hit[k] < self.pool.now - ttl
+            ]
+            for k in stale:
+                del self.table[k]
+            self.rowcount = len(stale)
+        else:
+            raise AssertionError(f"unexpected sql: {stmt}")
+
+    def fetchone(self):
+        return self._row
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        self.pool.statements += 1
+        return FakeCursor(self.pool)
+
+
+class FakePool:
+    def __init__(self):
+        self.table = {}
+        self.last_hit = {}
+        self.now = 0.0  # 模拟 now()（秒）
+        self.statements = 0
+
+    def connection(self):
+        return FakeConnection(self)
+
+
+class FakeDAO:
+    def __init__(self, pool):
+        self.pool = pool
+
+
+def _docx_bytes() -> bytes:
+    doc = Document()
+    doc.add_heading("第一章 投标函", level=1)
+    doc.add_paragraph("正文内容")
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def test_memory_lru_is_bounded():
+    cache = TemplateAnalysisCache(pool=None, memory_size=2)
+    cache.set("a", "v1", "m", "A")
+    cache.set("b", "v1", "m", "B")
+    assert cache.get("a", "v1", "m") == "A"  # a 变为最近使用
+    cache.set("c", "v1", "m", "C")
+    assert cache.get("b", "v1", "m") is None
+    assert cache.get("a", "v1", "m") == "A"
+    assert cache.get("c", "v1", "m") == "C"
+
+
+def test_persistent_hit_across_instances_and_version_bump():
+    pool = FakePool()
+    TemplateAnalysisCache(pool=pool).set("sha", "v1", "gpt", '{"spec": 1}')
+
+    # 新实例（模拟重启 / 另一个 worker）从数据库命中，并回填内存
+    restarted = TemplateAnalysisCache(pool=pool)
+    assert restarted.get("sha", "v1", "gpt") == '{"spec": 1}'
+    statements = pool.statements
+    assert restarted.get("sha", "v1", "gpt") == '{"spec": 1}'
+    assert pool.statements == statements
+
+    # 模型不同不命中
+    assert restarted.get("sha", "v1", "other-model") is None
+
+    # 分析器版本升级：旧版本不命中；滚动发布期间旧条目仍在被旧进程使用，不清理
+    bumped = TemplateAnalysisCache(pool=pool, stale_ttl_seconds=3600)
+    assert bumped.get("sha", "v2", "gpt") is None
+    assert ("spec", "sha", "v1", "gpt") in pool.table
+
+    # 旧进程继续命中刷新 last_hit_at，新进程反复首次访问也删不掉
+    pool.now += 3000
+    assert TemplateAnalysisCache(pool=pool).get("sha", "v1", "gpt") == '{"spec": 1}'
+    pool.now += 3000
+    assert TemplateAnalysisCache(pool=pool, stale_ttl_seconds=3600).get("sha", "v2", "gpt") is None
+    assert ("spec", "sha", "v1", "gpt") in pool.table
+
+    # 旧版本下线、超过 TTL 未命中后才清理
+    pool.now += 3601
+    assert TemplateAnalysisCache(pool=pool, stale_ttl_seconds=3600).get("sha", "v2", "gpt") is None
+    assert not [k for k in pool.table if k[0] == CACHE_KIND_SPEC and k[2] == "v1"]
+
+
+def test_purge_stale_explicit_ttl_zero():
+    pool = FakePool()
+    cache = TemplateAnalysisCache(pool=pool)
+    cache.set("sha", "v1", "gpt", "{}")
+    cache.set("sha", "v2", "gpt", "{}")
+    pool.now += 1
+    assert cache.purge_stale(CACHE_KIND_SPEC, "v2") == 0  # 默认 TTL 内保留
+    assert cache.purge_stale(CACHE_KIND_SPEC, "v2", ttl_seconds=0) == 1
+    assert list(pool.table) == [("spec", "sha", "v2", "gpt")]
+
+
+def test_extract_result_json_roundtrip():
+    result = DocxBlockExtractor().extract(_docx_bytes())
+    result.numbering_stats = {"numbering_count": {3: 2}, "level_count": {0: 2}, "has_numbering": True}
+
+    restored = DocxExtractResult.from_json(result.to_json())
+    assert restored == result
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(cache_module, "_cache_instance", None)
+    pool = FakePool()
+    svc = TenderService(dao=FakeDAO(pool), llm_orchestrator=None)
+    return svc, pool
+
+
+@pytest.mark.asyncio
+async def test_analyze_reuses_persisted_spec_and_extract(service, monkeypatch):
+    svc, pool = service
+    docx_bytes = _docx_bytes()
+    sha = "f" * 64
+
+    extract_calls = []
+    real_extract = DocxBlockExtractor.extract
+
+    def counting_extract(self, *args, **kwargs):
+        extract_calls.append(1)
+        return real_extract(self, *args, **kwargs)
+
+    analyze_calls = []
+
+    async def fake_analyze(extract_result):
+        analyze_calls.append(extract_result)
+        return create_minimal_spec(confidence=0.9)
+
+    monkeypatch.setattr(DocxBlockExtractor, "extract", counting_extract)
+    monkeypatch.setattr(svc.llm_analyzer, "analyze", fake_analyze)
+
+    first = await svc.analyze_template_with_llm(docx_bytes, sha)
+    assert len(analyze_calls) == 1 and len(extract_calls) == 1
+
+    # 模拟进程重启：内存缓存清空，只剩数据库
+    monkeypatch.setattr(cache_module, "_cache_instance", None)
+    second = await svc.analyze_template_with_llm(docx_bytes, sha)
+    assert len(analyze_calls) == 1
+    assert second.to_json() == first.to_json()
+
+    # force 重新分析时仍复用抽取结果（block id 不变）
+    await svc.analyze_template_with_llm(docx_bytes, sha, force=True)
+    assert len(analyze_calls) == 2
+    assert len(extract_calls) == 1
+    assert [b.id for b in analyze_calls[1].blocks] == [b.id for b in analyze_calls[0].blocks]
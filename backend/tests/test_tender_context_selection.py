@@ -0,0 +1,153 @@
+"""
+招投标审核上下文选择测试
+验证审核提示词按维度相关性在 token 预算内选片段，而不是截取文档开头的固定条数
+"""
+from app.services.tender.context_selector import (
+    REVIEW_DIMENSION_QUERIES,
+    chunk_cost,
+    select_context,
+    select_leftover,
+)
+from app.services.tender_service import TenderService
+
+
+def _chunk(doc_id, position, content):
+    return {
+        "chunk_id": f"{doc_id}_c{position:04d}",
+        "doc_id": doc_id,
+        "title": doc_id,
+        "url": "",
+        "position": position,
+        "content": content,
+    }
+
+
+def _tender_chunks():
+    chunks = [
+        _chunk("doc_tender", i, f"第{i}条 本项目招标范围说明及一般性条款，投标人应仔细阅读本章内容。")
+        for i in range(200)
+    ]
+    chunks[150] = _chunk(
+        "doc_tender", 150,
+        "资格要求：投标人须具有有效的ISO9001质量管理体系认证证书，并提供证书复印件加盖公章。",
+    )
+    return chunks
+
+
+def _bid_chunks():
+    chunks = [
+        _chunk("doc_bid", i, f"第{i}页 我公司简介与企业文化介绍，秉承诚信经营理念，持续为客户创造价值。")
+        for i in range(1000)
+    ]
+    chunks[900] = _chunk(
+        "doc_bid", 900,
+        "资质证明：我公司已通过ISO9001质量管理体系认证，证书编号Q2024-0815，附证书复印件。",
+    )
+    return chunks
+
+
+class FakeDAO:
+    def __init__(self):
+        self.chunks = {"doc_tender": _tender_chunks(), "doc_bid": _bid_chunks()}
+        self.review_items = None
+        self.limits = []
+
+    def list_assets(self, project_id):
+        return [
+            {"id": "a_tender", "kind": "tender", "kb_doc_id": "doc_tender"},
+            {"id": "a_bid", "kind": "bid", "bidder_name": "甲公司", "kb_doc_id": "doc_bid"},
+        ]
+
+    def load_chunks_by_doc_ids(self, doc_ids, limit=None):
+        self.limits.append(limit)
+        rows = [c for doc_id in sorted(doc_ids) for c in self.chunks.get(doc_id, [])]
+        return rows if limit is None else rows[:limit]
+
+    def replace_review_items(self, project_id, items):
+        self.review_items = items
+
+
+class CapturingLLM:
+    def __init__(self):
+        self.messages = []
+
+    def chat(self, messages, model_id=None):
+        self.messages.append(messages)
+        return "[]"
+
+
+def _run_review(budget):
+    dao, llm = FakeDAO(), CapturingLLM()
+    svc = TenderService(dao=dao, llm_orchestrator=llm)
+    svc.settings = svc.settings.model_copy(update={"TENDER_REVIEW_SHARD_TOKEN_BUDGET": budget})
+    svc.run_review("p1", None, [], bidder_name="甲公司", bid_asset_ids=[])
+    # 分片并发完成顺序不定，按维度取提示词
+    prompts = {}
+    for messages in llm.messages:
+        content = messages[1]["content"]
+        dim = content.split("\n", 1)[0].split("：", 1)[1].split("（", 1)[0]
+        prompts[dim] = content
+    return dao, prompts
+
+
+def test_requirement_buried_deep_in_bid_reaches_prompt():
+    dao, prompts = _run_review(budget=1500)
+
+    tender_part, bid_part = prompts["资格审查"].split("投标文件原文片段：")
+    assert "CHUNK doc_tender_c0150" in tender_part
+    assert "CHUNK doc_bid_c0900 " in bid_part
+    assert "证书编号Q2024-0815" in bid_part
+    # 原先的 LIMIT 180 只能看到投标文件前 180 个片段
+    assert dao.limits == [None, None, None]
+    assert dao.review_items == []
+
+
+def test_review_context_is_deterministic():
+    _, first = _run_review(budget=1500)
+    _, second = _run_review(budget=1500)
+    assert first == second
+
+
+def test_selection_respects_budget_and_keeps_document_order():
+    chunks = _bid_chunks()
+    budget = 2000
+    selection = select_context(chunks, REVIEW_DIMENSION_QUERIES, budget)
+
+    assert selection.truncated
+    assert selection.used_tokens == sum(chunk_cost(c) for c in selection.chunks) <= budget
+    positions = [c["position"] for c in selection.chunks]
+    assert positions == sorted(positions)
+    assert selection.by_dimension["资格审查"][0] == "doc_bid_c0900"
+
+    # 预算足够时全部保留，与原来的小文档行为一致
+    small = chunks[:10]
+    assert select_context(small, REVIEW_DIMENSION_QUERIES, budget).chunks == small
+
+
+def test_off_dimension_requirement_reaches_catch_all_shard():
+    dao, llm = FakeDAO(), CapturingLLM()
+    dao.chunks["doc_tender"][180] = _chunk(
+        "doc_tender", 180, "环境保护：夜间二十二时后禁止产生噪声，渣土车辆须全封闭。",
+    )
+    svc = TenderService(dao=dao, llm_orchestrator=llm)
+    svc.settings = svc.settings.model_copy(update={"TENDER_REVIEW_SHARD_TOKEN_BUDGET": 1500})
+    shards = svc._build_review_shards(dao.chunks["doc_tender"], dao.chunks["doc_bid"], [])
+
+    assert [s.key for s in shards][-1] == "其他"
+    dimension_ids = {str(c["chunk_id"]) for s in shards[:-1] for c in s.tender_chunks}
+    assert "doc_tender_c0180" not in dimension_ids
+    catch_all = shards[-1]
+    assert "doc_tender_c0180" in {c["chunk_id"] for c in catch_all.tender_chunks}
+    assert "只输出不属于资格审查" in catch_all.messages[1]["content"]
+
+
+def test_leftover_selection_prefers_uncovered_chunks():
+    chunks = _tender_chunks()[:10]
+    covered = {c["chunk_id"] for c in chunks[:5]}
+    budget = sum(chunk_cost(c) for c in chunks[:6])
+    selection = select_leftover(chunks, covered, budget)
+
+    ids = [c["chunk_id"] for c in selection.chunks]
+    # 未覆盖的 5 个全部入选，剩余预算按文档顺序补一个已覆盖片段，输出仍为文档顺序
+    assert ids == [chunks[0]["chunk_id"]] + [c["chunk_id"] for c in chunks[5:]]
+    assert selection.used_tokens <= budget
@@ -0,0 +1,289 @@
+"""
+多文件资产导入测试
+导入一个目录的生成文档，验证并发导入的加速效果、结果集正确性、部分失败与幂等重试
+"""
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from app.core import cutover
+from app.core.cutover import CutoverMode
+from app.services.tender_service import AssetImportError, TenderService
+
+WRITE_LATENCY = 0.05  # 模拟每个文档写库的往返耗时
+
+
+class FakeDAO:
+    def __init__(self, fail_filenames=()):
+        self.lock = threading.Lock()
+        self.create_lock = threading.Lock()
+        self.fail_filenames = set(fail_filenames)
+        self.assets = []
+        self.kb_docs = {}
+        self.kb_chunks = {}
+        self.bindings = []
+        self.seq = 0
+
+    def _next(self, prefix):
+        with self.lock:
+            self.seq += 1
+            return f"{prefix}_{self.seq:04d}"
+
+    def get_project(self, project_id):
+        return {"id": project_id, "kb_id": "kb_1", "owner_id": "u1"}
+
+    def list_assets(self, project_id):
+        return [a for a in self.assets if a["project_id"] == project_id]
+
+    def create_kb_document(self, kb_id, filename, content_hash, meta_json, kb_category="tender_app"):
+        doc_id = self._next("doc")
+        self.kb_docs[doc_id] = filename
+        return doc_id
+
+    def insert_kb_chunks(self, kb_id, doc_id, chunks):
+        time.sleep(WRITE_LATENCY)
+        if self.kb_docs[doc_id] in self.fail_filenames:
+            raise RuntimeError("connection reset")
+        self.kb_chunks[doc_id] = chunks
+
+    def create_project_document_binding(self, project_id, role, kb_doc_id, bidder_name, filename):
+        self.bindings.append(kb_doc_id)
+
+    def create_asset(self, project_id, kind, filename, mime_type, size_bytes, kb_doc_id,
+                     storage_path, bidder_name, meta_json):
+        asset = {
+            "id": self._next("ta"), "project_id": project_id, "kind": kind, "filename": filename,
+            "size_bytes": size_bytes, "kb_doc_id": kb_doc_id, "storage_path": storage_path,
+            "bidder_name": bidder_name, "meta_json": meta_json,
+        }
+        with self.lock:
+            self.assets.append(asset)
+        return asset
+
+    def create_asset_once(self, project_id, kind, filename, mime_type, size_bytes, kb_doc_id,
+                          storage_path, bidder_name, meta_json):
+        with self.create_lock:
+            for a in self.list_assets(project_id):
+                same = (a["kind"], a["bidder_name"], a["filename"]) == (kind, bidder_name, filename)
+                if same and a["meta_json"]["content_sha256"] == meta_json["content_sha256"]:
+                    return a, False
+            return self.create_asset(project_id, kind, filename, mime_type, size_bytes, kb_doc_id,
+                                     storage_path, bidder_name, meta_json), True
+
+    def _execute(self, sql, params=()):
+        if "tender_project_documents" in sql:
+            self.bindings = [d for d in self.bindings if d != params[1]]
+
+
+class _OldCutover:
+    def get_mode(self, kind, project_id=None):
+        return CutoverMode.OLD
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cutover, "get_cutover_config", lambda: _OldCutover())
+    deleted = []
+    from app.services import kb_service
+    monkeypatch.setattr(
+        kb_service, "delete_document",
+        lambda kb_id, doc_id, skip_asset_cleanup=False: deleted.append(doc_id),
+    )
+
+    docs_dir = tmp_path / "bid_package"
+    docs_dir.mkdir()
+    for i in range(16):
+        (docs_dir / f"part_{i:02d}.txt").write_text(f"第{i}册 投标文件内容，分项报价与技术响应。" * 20, encoding="utf-8")
+    return docs_dir, deleted
+
+
+def _uploads(docs_dir):
+    return [
+        UploadFile(file=io.BytesIO(p.read_bytes()), filename=p.name)
+        for p in sorted(docs_dir.iterdir())
+    ]
+
+
+def _service(dao, concurrency):
+    svc = TenderService(dao=dao, llm_orchestrator=None)
+    svc.settings = svc.settings.model_copy(update={"TENDER_IMPORT_CONCURRENCY": concurrency})
+    return svc
+
+
+async def _timed_import(dao, docs_dir, concurrency):
+    start = time.perf_counter()
+    out = await _service(dao, concurrency).import_assets("p1", "bid", _uploads(docs_dir), "甲公司")
+    return out, time.perf_counter() - start
+
+
+@pytest.mark.asyncio
+async def test_concurrent_import_is_faster_and_result_set_is_correct(env):
+    docs_dir, _ = env
+    serial_dao, parallel_dao = FakeDAO(), FakeDAO()
+    serial, serial_s = await _timed_import(serial_dao, docs_dir, concurrency=1)
+    parallel, parallel_s = await _timed_import(parallel_dao, docs_dir, concurrency=8)
+
+    assert serial_s / parallel_s > 3
+    names = sorted(p.name for p in docs_dir.iterdir())
+    for out, dao in ((serial, serial_dao), (parallel, parallel_dao)):
+        # 返回顺序与上传顺序一致，每个文件一个资产、一个 KB 文档及完整分块
+        assert [a["filename"] for a in out] == names
+        assert {a["import_status"] for a in out} == {"created"}
+        assert len(dao.assets) == len(names) and len(set(dao.kb_docs)) == len(names)
+        for asset in out:
+            text = (docs_dir / asset["filename"]).read_text(encoding="utf-8")
+            chunks = dao.kb_chunks[asset["kb_doc_id"]]
+            assert chunks[0]["content"] == text[: len(chunks[0]["content"])]
+            assert dao.kb_docs[asset["kb_doc_id"]] == asset["filename"]
+            assert open(asset["storage_path"], "rb").read() == text.encode("utf-8")
+    assert [a["meta_json"]["content_sha256"] for a in serial] == [a["meta_json"]["content_sha256"] for a in parallel]
+
+
+@pytest.mark.asyncio
+async def test_partial_failure_reports_per_file_and_retry_is_idempotent(env):
+    docs_dir, deleted = env
+    dao = FakeDAO(fail_filenames={"part_03.txt", "part_11.txt"})
+    svc = _service(dao, concurrency=4)
+
+    with pytest.raises(AssetImportError) as exc_info:
+        await svc.import_assets("p1", "bid", _uploads(docs_dir), "甲公司")
+    statuses = {r.filename: r.status for r in exc_info.value.results}
+    assert [name for name, status in statuses.items() if status == "failed"] == ["part_03.txt", "part_11.txt"]
+    assert len(dao.assets) == 14
+    # 失败文件的 KB 文档与落盘文件已清理
+    failed_docs = [d for d, name in dao.kb_docs.items() if name in {"part_03.txt", "part_11.txt"}]
+    assert sorted(deleted) == sorted(failed_docs)
+    assert len(list((docs_dir.parent / "data" / "tender_assets" / "p1").iterdir())) == 14
+
+    # 故障恢复后重新提交整批：已导入的直接返回，只补导失败的两个
+    dao.fail_filenames.clear()
+    out = await svc.import_assets("p1", "bid", _uploads(docs_dir), "甲公司")
+    created = [a["filename"] for a in out if a["import_status"] == "created"]
+    assert created == ["part_03.txt", "part_11.txt"]
+    assert len(out) == 16 and len(dao.assets) == 16
+    assert len({a["id"] for a in out}) == 16
+
+    # 再次提交完全一致的批次不产生任何新资产
+    again = await svc.import_assets("p1", "bid", _uploads(docs_dir), "甲公司")
+    assert {a["import_status"] for a in again} == {"existing"} and len(dao.assets) == 16
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_importing_same_batch_create_each_asset_once(env):
+    docs_dir, deleted = env
+    dao = FakeDAO()
+    svc = _service(dao, concurrency=8)
+
+    # 两个请求都在对方落库前读到空的已有资产列表，落库时只有一个能创建
+    first, second = await asyncio.gather(
+        svc.import_assets("p1", "bid", _uploads(docs_dir), "甲公司"),
+        svc.import_assets("p1", "bid", _uploads(docs_dir), "甲公司"),
+    )
+    assert len(dao.assets) == 16
+    assert [a["id"] for a in first] == [a["id"] for a in second]
+    statuses = [a["import_status"] for a in first + second]
+    assert statuses.count("created") == 16 and statuses.count("existing") == 16
+    # 落库失败一方的 KB 文档与落盘文件已清理
+    assert len(deleted) == 16 and not set(deleted) & {a["kb_doc_id"] for a in dao.assets}
+    assert len(list((docs_dir.parent / "data" / "tender_assets" / "p1").iterdir())) == 16
+
+
+
+@pytest.mark.asyncio
+async def test_failed_import_removes_doc_and_rule_set_versions(env, monkeypatch):
+    docs_dir, deleted = env
+    from app.platform.docstore.service import DocStoreService
+    from app.services.db import postgres
+    from app.services.platform.ruleset_service import RuleSetService
+
+    removed = []
+    monkeypatch.setattr(postgres, "_get_pool", lambda: None)
+    monkeypatch.setattr(DocStoreService, "delete_document_version", lambda self, vid: removed.append(vid))
+    monkeypatch.setattr(RuleSetService, "delete_version", lambda self, vid: removed.append(vid))
+
+    dao = FakeDAO()
+
+    def fail_create(*args, **kwargs):
+        raise RuntimeError("connection reset")
+
+    dao.create_asset_once = fail_create
+    svc = _service(dao, concurrency=1)
+    svc.feature_flags = svc.feature_flags.model_copy(
+        update={"DOCSTORE_DUALWRITE": True, "RULESET_PARSE_ENABLED": True}
+    )
+    monkeypatch.setattr(svc, "_docstore_dualwrite", lambda *args: "dv_1")
+    monkeypatch.setattr(svc, "_parse_custom_rule_meta", lambda *args: {"rule_set_version_id": "rsv_1"})
+
+    rules = UploadFile(file=io.BytesIO("rules: []".encode("utf-8")), filename="rules.yaml")
+    with pytest.raises(AssetImportError):
+        await svc.import_assets("p1", "custom_rule", [rules], None)
+    # 同一次导入写入的 KB 文档、DocStore 版本、RuleSet 版本与落盘文件全部清理
+    assert len(deleted) == 1 and not dao.bindings
+    assert sorted(removed) == ["dv_1", "rsv_1"]
+    assert not list((docs_dir.parent / "data" / "tender_assets" / "p1").iterdir())
+
+
+@pytest.mark.integration
+def test_create_asset_once_and_rule_set_version_under_concurrency(pg_pool):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services.dao.tender_dao import TenderDAO
+    from app.services.platform.ruleset_service import RuleSetService
+
+    dao = TenderDAO(pg_pool)
+    with pg_pool.connection() as conn:
+        conn.execute("INSERT INTO tender_projects (id, kb_id, name) VALUES ('p1', 'kb_1', 'p')")
+
+    def create(_):
+        return dao.create_asset_once(
+            "p1", "bid", "a.docx", None, 1, None, None, "甲公司", {"content_sha256": "h1"},
+        )
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(create, range(8)))
+    assert sum(created for _, created in results) == 1
+    assert len({asset["id"] for asset, _ in results}) == 1
+    _, created = dao.create_asset_once("p1", "bid", "a.docx", None, 1, None, None, "乙公司", {"content_sha256": "h1"})
+    assert created
+
+    rules = RuleSetService(pg_pool)
+    with ThreadPoolExecutor(4) as pool:
+        versions = list(pool.map(lambda i: rules.create_project_version("p1", f"rules: [{i}]", "valid"), range(8)))
+    assert len({rule_set_id for rule_set_id, _ in versions}) == 1
+    with pg_pool.connection() as conn:
+        numbers = [row[0] for row in conn.execute("SELECT version_no FROM rule_set_versions ORDER BY version_no")]
+    assert numbers == list(range(1, 9))
+
+    # 删除版本：最后一个版本删除后空的项目规则集一并删除
+    rule_set_id = versions[0][0]
+    for _, version_id in versions:
+        assert rules.delete_version(version_id)
+    assert not rules.delete_version(versions[0][1])
+    assert rules.get_rule_set(rule_set_id) is None
+
+
+@pytest.mark.integration
+def test_delete_document_version_removes_segments_and_empty_document(pg_pool):
+    from app.platform.docstore.service import DocStoreService
+
+    docstore = DocStoreService(pg_pool)
+    document_id = docstore.create_document(namespace="tender", doc_type="bid")
+    keep = docstore.create_document_version(document_id, "a.docx", b"a")
+    drop = docstore.create_document_version(document_id, "b.docx", b"b")
+    with pg_pool.connection() as conn:
+        conn.execute(
+            "INSERT INTO doc_segments (id, doc_version_id, segment_no, content_text) VALUES ('seg_1', %s, 0, '正文')",
+            (drop,),
+        )
+
+    assert docstore.delete_document_version(drop)
+    assert docstore.count_segments_by_version(drop) == 0
+    assert docstore.get_document(document_id) is not None
+    assert docstore.delete_document_version(keep)
+    assert docstore.get_document(document_id) is None
+    assert not docstore.delete_document_version(keep)
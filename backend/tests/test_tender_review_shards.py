@@ -0,0 +1,71 @@
+"""
+审核分片执行测试
+验证并发上限、单分片重试、部分失败不影响其他分片，以及合并结果与完成顺序无关
+"""
+import random
+import threading
+import time
+
+from app.services.tender.review_shards import (
+    ReviewShard,
+    merge_shard_items,
+    run_review_shards,
+)
+
+
+def _shards(n):
+    return [ReviewShard(key=f"dim{i}", messages=[]) for i in range(n)]
+
+
+def test_concurrency_is_bounded_and_results_keep_shard_order():
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+    rng = random.Random(0)
+    delays = [rng.uniform(0.01, 0.05) for _ in range(8)]
+
+    def call(shard):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(delays[int(shard.key[3:])])
+        with lock:
+            state["running"] -= 1
+        return [{"dimension": "其他", "requirement_text": shard.key, "result": "pass"}]
+
+    results = run_review_shards(_shards(8), call, max_concurrency=3, max_retries=0)
+
+    assert 1 < state["peak"] <= 3
+    assert [r.key for r in results] == [f"dim{i}" for i in range(8)]
+    assert [item["requirement_text"] for item in merge_shard_items(results)] == [f"dim{i}" for i in range(8)]
+
+
+def test_failing_shard_is_retried_and_isolated():
+    attempts = {}
+
+    def call(shard):
+        attempts[shard.key] = attempts.get(shard.key, 0) + 1
+        if shard.key == "dim1" and attempts[shard.key] < 3:
+            raise RuntimeError("timeout")
+        if shard.key == "dim2":
+            raise RuntimeError("bad gateway")
+        return [{"requirement_text": shard.key, "result": "pass"}]
+
+    results = run_review_shards(_shards(3), call, max_concurrency=3, max_retries=2, retry_backoff=0)
+
+    assert [(r.ok, r.attempts) for r in results] == [(True, 1), (True, 3), (False, 3)]
+    merged = merge_shard_items(results)
+    assert [item["requirement_text"] for item in merged[:2]] == ["dim0", "dim1"]
+    # 缺失的 dimension 归到分片维度（非标准维度归为"其他"）
+    assert merged[0]["dimension"] == "其他"
+    assert merged[2]["result"] == "risk" and "bad gateway" in merged[2]["remark"]
+
+
+def test_merge_dedups_identical_items_across_shards():
+    def call(shard):
+        return [
+            {"dimension": "资格审查", "requirement_text": "营业执照", "response_text": "已提供", "result": "pass"},
+            {"dimension": "资格审查", "requirement_text": f"{shard.key}专属", "response_text": "", "result": "risk"},
+        ]
+
+    merged = merge_shard_items(run_review_shards(_shards(2), call, max_concurrency=2, max_retries=0))
+    assert [item["requirement_text"] for item in merged] == ["营业执照", "dim0专属", "dim1专属"]
@@ -4,9 +4,12 @@ RQ Worker 启动脚本 - Step 10
 用于处理异步任务（ingest, extract, review）
 """
 import logging
+import multiprocessing as mp
 import os
 import sys
+import time
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 # 添加 app 到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent))
@@ -72,35 +75,74 @@ def get_worker_redis_connection() -> redis.Redis:
     return conn
 
 
+def _work(queue_names: List[str]) -> None:
+    """子进程：监听指定队列（带调度器，用于按间隔重试的任务）"""
+    try:
+        conn = get_worker_redis_connection()
+    except Exception as e:
+        logger.error(f"Failed to connect to Redis: {e}")
+        sys.exit(1)
+
+    worker = Worker(queue_names, connection=conn)
+    try:
+        worker.work(logging_level="INFO", with_scheduler=True)
+    except KeyboardInterrupt:
+        pass
+
+
 def main():
-    """启动 RQ Worker"""
+    """
+    启动 RQ Worker
+
+    每个队列按 RQ_QUEUE_CONCURRENCY（如 "extract=3,review=1"）启动对应数量的 Worker 进程，
+    一个队列的积压不会占满其他队列的执行槽位；子进程异常退出后自动拉起。
+    """
+    from app.queue.registry import parse_queue_concurrency
+
     logger.info("Starting RQ Worker...")
-    
-    # 获取 Redis 连接（Worker 专用配置）
+
+    # 启动前确认 Redis 可用
     try:
-        conn = get_worker_redis_connection()
+        get_worker_redis_connection()
         logger.info("Redis connection established")
     except Exception as e:
         logger.error(f"Failed to connect to Redis: {e}")
         sys.exit(1)
-    
-    # 监听的队列列表（按优先级排序）
-    queues = ['default', 'ingest', 'extract', 'review']
-    
-    # 创建并启动 Worker
-    worker = Worker(queues, connection=conn)
-    
-    logger.info(f"Worker listening on queues: {queues}")
-    
+
+    concurrency = parse_queue_concurrency(os.getenv("RQ_QUEUE_CONCURRENCY"))
+    slots = [(name, i) for name, count in concurrency.items() for i in range(count)]
+    if not slots:
+        logger.error("No queue slots configured, check RQ_QUEUE_CONCURRENCY")
+        sys.exit(1)
+    logger.info(f"Worker queue concurrency: {concurrency}")
+
+    ctx = mp.get_context("spawn")
+    procs: Dict[Tuple[str, int], mp.Process] = {}
+
+    def start(slot: Tuple[str, int]) -> None:
+        proc = ctx.Process(target=_work, args=([slot[0]],), name=f"rq-{slot[0]}-{slot[1]}")
+        proc.start()
+        procs[slot] = proc
+
+    for slot in slots:
+        start(slot)
+
     try:
-        worker.work(logging_level="INFO")
+        while True:
+            time.sleep(5)
+            for slot, proc in list(procs.items()):
+                if not proc.is_alive():
+                    logger.warning(f"Worker {proc.name} exited with code {proc.exitcode}, restarting")
+                    start(slot)
     except KeyboardInterrupt:
         logger.info("Worker interrupted, shutting down...")
-    except Exception as e:
-        logger.error(f"Worker error: {e}", exc_info=True)
-        sys.exit(1)
+    finally:
+        for proc in procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs.values():
+            proc.join(timeout=30)
 
 
 if __name__ == '__main__':
     main()
-
@@ -29,6 +29,7 @@ interface TenderProject {
   name: string;
   description?: string;
   created_at?: string;
+  delete_status?: string;  // 删除失败时为 FAILED，可重新删除
 }
 
 interface TenderAsset {
@@ -509,7 +510,7 @@ export default function TenderWorkspace() {
       }
       setDeletingProject(null);
       setDeletePlan(null);
-      alert('项目删除成功');
+      alert('项目已删除，关联资源正在后台清理');
     } catch (err) {
       alert(`删除失败: ${err}`);
     } finally {
@@ -547,7 +548,9 @@ export default function TenderWorkspace() {
         `/api/apps/tender/projects/${currentProject.id}/assets/import`,
         formData
       );
-      setAssets([...assets, ...newAssets]);
+      // 重新提交已导入过的文件时返回已有资产，按 id 去重
+      const newIds = new Set(newAssets.map((a: TenderAsset) => a.id));
+      setAssets([...assets.filter(a => !newIds.has(a.id)), ...newAssets]);
       setFiles([]);
       setBidderName('');
       alert('上传成功');
@@ -1031,6 +1034,9 @@ export default function TenderWorkspace() {
                   {proj.description && (
                     <div className="kb-meta">{proj.description}</div>
                   )}
+                  {proj.delete_status === 'FAILED' && (
+                    <div className="kb-meta" style={{ color: '#dc3545' }}>删除失败，可再次点击删除重试</div>
+                  )}
                 </div>
                 <div style={{ display: 'flex', gap: '4px', flexShrink: 0 }}>
                   <button
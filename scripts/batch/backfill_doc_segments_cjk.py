@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+回填 doc_segments.tsv_cjk（中文词法索引）
+迁移 026 之后执行一次即可；新写入的片段由 DocStoreService.create_segments 直接生成。
+
+用法：
+    python scripts/batch/backfill_doc_segments_cjk.py --batch-size 500
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+
+def main():
+    from app.platform.docstore.service import DocStoreService
+    from app.services.db.postgres import _get_pool
+
+    parser = argparse.ArgumentParser(description="backfill doc_segments.tsv_cjk")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批片段数")
+    parser.add_argument("--max-batches", type=int, default=None, help="最多处理批数")
+    args = parser.parse_args()
+
+    service = DocStoreService(_get_pool())
+    start = time.perf_counter()
+    count = service.backfill_cjk_lexical(batch_size=args.batch_size, max_batches=args.max_batches)
+    print(f"[INFO] backfilled {count} segments in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
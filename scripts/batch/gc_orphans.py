@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+孤儿数据回收：没有文档的 kb_chunks、chunk/segment 已不存在的 Milvus 向量、没有记录引用的资产文件
+默认只报告（dry-run），加 --apply 才删除；需在 backend 目录下运行（资产目录是相对路径）。
+
+用法：
+    python ../scripts/batch/gc_orphans.py                      # 只报告
+    python ../scripts/batch/gc_orphans.py --apply --rate 200   # 删除，每秒最多 200 条
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+
+def main():
+    from app.services.db.postgres import _get_pool
+    from app.services.project_delete import OrphanCollector
+
+    parser = argparse.ArgumentParser(description="garbage-collect orphan chunks, vectors and files")
+    parser.add_argument("--apply", action="store_true", help="执行删除（默认只报告）")
+    parser.add_argument("--rate", type=float, default=None, help="每秒最多删除条数")
+    parser.add_argument("--min-age", type=int, default=3600, help="只回收早于该秒数的数据")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批条数")
+    args = parser.parse_args()
+
+    collector = OrphanCollector(
+        _get_pool(),
+        batch_size=args.batch_size,
+        max_deletes_per_sec=args.rate,
+        min_age_seconds=args.min_age,
+        dry_run=not args.apply,
+    )
+    start = time.perf_counter()
+    reports = collector.run()
+    mode = "apply" if args.apply else "dry-run"
+    for report in reports:
+        print(f"[INFO] {report.kind}: found={report.found} deleted={report.deleted}")
+        for sample in report.samples:
+            print(f"         {sample}")
+    print(f"[INFO] {mode} finished in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+长音频转写基准
+生成带停顿的合成录音，在本地桩 Whisper 服务上对比：
+- single：整段一次请求（现有路径，300s 超时）
+- segmented：按静音切段 + 受限并发 + 片段重试
+
+用法：
+    python scripts/bench/bench_asr_segmented.py --minutes 60 --rtf 0.02 --parallel 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+SAMPLE_RATE = 16000
+
+
+def build_wav(path: str, minutes: float, seed: int = 0) -> float:
+    """合成"说话 2~8 秒 + 停顿 0.4~1.5 秒"交替的录音，分块写入避免整段常驻内存"""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    written = 0
+    with sf.SoundFile(path, "w", samplerate=SAMPLE_RATE, channels=1, subtype="PCM_16") as f:
+        while written < total:
+            speech = int(rng.uniform(2, 8) * SAMPLE_RATE)
+            t = np.arange(speech) / SAMPLE_RATE
+            tone = 0.3 * np.sin(2 * np.pi * rng.uniform(150, 300) * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+            pause = int(rng.uniform(0.4, 1.5) * SAMPLE_RATE)
+            chunk = np.concatenate([tone, 0.002 * rng.standard_normal(pause)]).astype(np.float32)
+            chunk = chunk[: total - written]
+            f.write(chunk)
+            written += len(chunk)
+    return total / SAMPLE_RATE
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(args) -> str:
+    import uvicorn
+    from stub_whisper_server import create_app
+
+    port = _free_port()
+    app = create_app(rtf=args.rtf, base_latency=args.base_latency, parallel=args.parallel, fail_rate=args.fail_rate)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1/audio/transcriptions"
+
+
+async def run_single(path: str, api_url: str, timeout: int) -> dict:
+    from app.services.asr_api_service import call_remote_asr_api
+
+    start = time.perf_counter()
+    try:
+        text, duration = await call_remote_asr_api(Path(path), api_url, timeout=timeout)
+        status, chars = "ok", len(text)
+    except Exception as e:
+        status, chars = f"error: {e}", 0
+    return {"ms": round((time.perf_counter() - start) * 1000, 1), "status": status, "chars": chars}
+
+
+async def run_segmented(path: str, api_url: str) -> dict:
+    from app.services.asr_service import transcribe_long_audio
+
+    config = {"api_url": api_url, "model_name": "whisper", "response_format": "verbose_json", "api_key": None}
+    start = time.perf_counter()
+    try:
+        merged = await transcribe_long_audio(path, config, {})
+        status, chars, segs = "ok", len(merged["text"]), len(merged["segments"])
+    except Exception as e:
+        status, chars, segs = f"error: {e}", 0, 0
+    return {"ms": round((time.perf_counter() - start) * 1000, 1), "status": status, "chars": chars, "segments": segs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="segmented ASR benchmark")
+    parser.add_argument("--minutes", type=float, default=60, help="合成录音时长（分钟）")
+    parser.add_argument("--rtf", type=float, default=0.02, help="桩服务实时率")
+    parser.add_argument("--base-latency", type=float, default=0.2, help="桩服务每请求固定开销（秒）")
+    parser.add_argument("--parallel", type=int, default=4, help="桩服务并发推理数")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="桩服务随机 503 概率")
+    parser.add_argument("--concurrency", type=int, default=4, help="分段转写客户端并发（ASR_SEGMENT_CONCURRENCY）")
+    parser.add_argument("--timeout", type=int, default=300, help="整段请求超时（秒）")
+    parser.add_argument("--skip-single", action="store_true", help="只跑分段路径")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    args = parser.parse_args()
+
+    os.environ["ASR_SEGMENT_CONCURRENCY"] = str(args.concurrency)
+    os.environ.setdefault("ASR_SEGMENT_MAX_RETRIES", "3")
+    api_url = start_stub(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "meeting.wav")
+        seconds = build_wav(path, args.minutes)
+        results = {}
+        if not args.skip_single:
+            results["single"] = asyncio.run(run_single(path, api_url, args.timeout))
+        results["segmented"] = asyncio.run(run_segmented(path, api_url))
+
+    if args.json:
+        print(json.dumps({"audio_seconds": seconds, "results": results}, ensure_ascii=False, indent=2))
+    else:
+        print(f"audio={seconds / 60:.1f}min rtf={args.rtf} server_parallel={args.parallel} "
+              f"client_concurrency={args.concurrency} fail_rate={args.fail_rate}")
+        for name, stats in results.items():
+            extra = f"  segments={stats['segments']}" if "segments" in stats else ""
+            print(f"  {name:<10} {stats['ms']:>10.1f}ms  {stats['status']}{extra}")
+    return 0 if results["segmented"]["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+转录片段与说话人片段合并基准
+对比原逐对比较实现与按时间扫描实现，并校验两者输出一致。
+
+用法：
+    python scripts/bench/bench_diarization_merge.py --segments 20000 --turns 5000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+
+def legacy_merge(transcription_segments, diarization_segments):
+    """原 O(N·M) 实现"""
+    if not diarization_segments:
+        return transcription_segments
+    merged = []
+    for trans_seg in transcription_segments:
+        trans_mid = (trans_seg["start"] + trans_seg["end"]) / 2
+        speaker = "Unknown"
+        for diar_seg in diarization_segments:
+            if diar_seg["start"] <= trans_mid <= diar_seg["end"]:
+                speaker = diar_seg["speaker"]
+                break
+        merged.append({**trans_seg, "speaker": speaker})
+    return merged
+
+
+def build_case(n_segments: int, n_turns: int, speakers: int, seed: int = 0):
+    """按时间顺序生成说话人轮次（含 10% 重叠），转录片段均匀覆盖整段录音"""
+    rng = random.Random(seed)
+    turns, t = [], 0.0
+    for i in range(n_turns):
+        length = rng.uniform(1.0, 20.0)
+        overlap = rng.uniform(0.0, 1.5) if rng.random() < 0.1 else 0.0
+        start = max(0.0, t - overlap)
+        turns.append({"start": round(start, 3), "end": round(start + length, 3), "speaker": f"SPEAKER_{rng.randrange(speakers):02d}"})
+        t = start + length + rng.uniform(0.0, 0.8)
+    total = t
+    step = total / n_segments
+    segments = [
+        {"id": i, "start": round(i * step, 3), "end": round((i + 1) * step, 3), "text": f"s{i}"}
+        for i in range(n_segments)
+    ]
+    return segments, turns
+
+
+def main():
+    from app.services.asr_service import merge_transcription_with_diarization
+
+    parser = argparse.ArgumentParser(description="diarization merge benchmark")
+    parser.add_argument("--segments", type=int, default=20000, help="转录片段数")
+    parser.add_argument("--turns", type=int, default=5000, help="说话人片段数")
+    parser.add_argument("--speakers", type=int, default=6, help="说话人数")
+    parser.add_argument("--skip-legacy", action="store_true", help="不跑原实现（规模很大时）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    args = parser.parse_args()
+
+    segments, turns = build_case(args.segments, args.turns, args.speakers)
+    results = {}
+
+    start = time.perf_counter()
+    fast = merge_transcription_with_diarization(segments, turns)
+    results["sweep_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        slow = legacy_merge(segments, turns)
+        results["legacy_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        results["identical"] = fast == slow
+        results["speedup"] = round(results["legacy_ms"] / max(results["sweep_ms"], 1e-3), 1)
+
+    if args.json:
+        print(json.dumps({"segments": args.segments, "turns": args.turns, **results}, indent=2))
+    else:
+        print(f"segments={args.segments} turns={args.turns}")
+        print(f"  sweep   {results['sweep_ms']:>10.1f}ms")
+        if "legacy_ms" in results:
+            print(f"  legacy  {results['legacy_ms']:>10.1f}ms  speedup={results['speedup']}x  identical={results['identical']}")
+    return 0 if results.get("identical", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
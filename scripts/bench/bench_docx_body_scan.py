@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+docx 正文扫描基准
+对比 python-docx 全量 DOM 遍历与 docx_body_scanner 流式扫描的耗时和峰值 RSS
+
+用法：
+    python scripts/bench/bench_docx_body_scan.py --paragraphs 50000 --tables 1000
+（每种方式在独立子进程中运行，峰值 RSS 互不干扰）
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+
+def build_docx(path: str, paragraphs: int, tables: int) -> None:
+    """生成带标题 / 正文 / 合并单元格表格的大文档"""
+    from docx import Document
+
+    doc = Document()
+    table_every = max(1, paragraphs // max(1, tables)) if tables else 0
+    made_tables = 0
+    for i in range(paragraphs):
+        if i % 200 == 0:
+            doc.add_heading(f"第{i // 200 + 1}章 招标要求", level=1)
+        doc.add_paragraph(f"第{i}条 投标人须提供有效的营业执照及资质证书，并承诺按期交付。" * 2)
+        if table_every and i % table_every == 0 and made_tables < tables:
+            table = doc.add_table(rows=6, cols=5)
+            for r in range(6):
+                for c in range(5):
+                    table.cell(r, c).text = f"R{r}C{c} 报价明细"
+            table.cell(0, 0).merge(table.cell(0, 1))
+            table.cell(1, 4).merge(table.cell(4, 4))
+            made_tables += 1
+    doc.save(path)
+
+
+def run_python_docx(path: str) -> int:
+    from docx import Document
+    from docx.oxml.table import CT_Tbl
+    from docx.oxml.text.paragraph import CT_P
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(path)
+    chars = 0
+    for el in doc.element.body:
+        if isinstance(el, CT_P):
+            chars += len(Paragraph(el, doc).text)
+        elif isinstance(el, CT_Tbl):
+            for row in Table(el, doc).rows:
+                chars += sum(len(c.text) for c in row.cells)
+    return chars
+
+
+def run_stream(path: str) -> int:
+    from app.services.docx_body_scanner import scan_docx_body
+
+    chars = 0
+    for item in scan_docx_body(path):
+        if item.is_paragraph:
+            chars += len(item.text)
+        elif item.is_table:
+            chars += sum(len(c) for row in item.cell_texts() for c in row)
+    return chars
+
+
+STRATEGIES = {"python_docx": run_python_docx, "stream": run_stream}
+
+
+def _peak_rss_kb() -> int:
+    # ru_maxrss 会跨 exec 继承父进程峰值，优先读取按地址空间统计的 VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(name: str, path: str, queue) -> None:
+    base_rss = _peak_rss_kb()
+    start = time.perf_counter()
+    chars = STRATEGIES[name](path)
+    elapsed = (time.perf_counter() - start) * 1000
+    peak_rss = _peak_rss_kb()
+    queue.put({"ms": round(elapsed, 1), "peak_rss_mb": round(peak_rss / 1024, 1),
+               "delta_rss_mb": round((peak_rss - base_rss) / 1024, 1), "chars": chars})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="docx body scan benchmark")
+    parser.add_argument("--paragraphs", type=int, default=20000, help="正文段落数")
+    parser.add_argument("--tables", type=int, default=500, help="表格数")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.docx")
+        build_docx(path, args.paragraphs, args.tables)
+        size_mb = round(os.path.getsize(path) / 1024 / 1024, 2)
+
+        results = {}
+        for name in STRATEGIES:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_child, args=(name, path, queue))
+            proc.start()
+            results[name] = queue.get()
+            proc.join()
+
+    if results["python_docx"]["chars"] != results["stream"]["chars"]:
+        print("✗ 两种方式提取的文本长度不一致", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps({"docx_mb": size_mb, "results": results}, ensure_ascii=False, indent=2))
+    else:
+        print(f"docx={size_mb}MB paragraphs={args.paragraphs} tables={args.tables}")
+        for name, stats in results.items():
+            print(f"  {name:<12} {stats['ms']:>9.1f}ms  peak_rss={stats['peak_rss_mb']:>7.1f}MB"
+                  f"  delta_rss={stats['delta_rss_mb']:>7.1f}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+网页正文提取基准
+生成一组确定性的多 MB 文章页（也可用 --pages-dir 指定保存好的真实页面），对比：
+  - legacy：原实现（trafilatura 解析字符串 + BeautifulSoup 再解析取标题），直接在事件循环上运行
+  - inline：单次解析的 extract_content，直接在事件循环上运行
+  - pool：extract_content_async，在进程池中并行
+统计吞吐（页/秒、MB/秒）与事件循环延迟（10ms 心跳的超时 p50/p99/max）。
+
+用法：
+    python scripts/bench/bench_html_extract.py --pages 8 --sections 600 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+WORDS = "招标 投标 文件 技术 要求 响应 the model data system 供应商 资质 报价 项目 工期 质量".split()
+TICK = 0.01
+
+
+def make_page(sections: int, seed: int) -> str:
+    """接近真实新闻/公告页的结构：导航、正文段落、表格、链接列表、内联脚本"""
+    rng = random.Random(seed)
+
+    def para(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    body = "".join(
+        f"<h2>第{i}节</h2>"
+        + "".join(f"<p>{para(120)}</p>" for _ in range(8))
+        + f"<table><tr><td>{para(5)}</td><td>{para(5)}</td></tr></table><ul>"
+        + "".join(f"<li><a href='/n{i}_{j}'>{para(4)}</a></li>" for j in range(10))
+        + "</ul>"
+        for i in range(sections)
+    )
+    return (
+        f"<html><head><title>公告 {seed}</title><script>{'var x=1;' * 2000}</script></head>"
+        f"<body><nav>{para(50)}</nav><article>{body}</article><footer>{para(30)}</footer></body></html>"
+    )
+
+
+def legacy_extract(html: str, url: str):
+    """原实现：trafilatura 自行解析一次，BeautifulSoup 为取标题再解析一次"""
+    from bs4 import BeautifulSoup
+    from trafilatura import extract as trafilatura_extract
+
+    text = trafilatura_extract(html, url=url, include_links=False, include_tables=False)
+    if not text:
+        soup = BeautifulSoup(html, "lxml")
+        for tag in soup(["script", "style", "noscript"]):
+            tag.decompose()
+        text = soup.get_text("\n", strip=True)
+    soup = BeautifulSoup(html, "lxml")
+    title_tag = soup.find("title")
+    return (title_tag.get_text(strip=True) if title_tag else url), text
+
+
+async def measure(pages, run) -> dict:
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - start - TICK) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 2)
+    start = time.perf_counter()
+    texts = await run(pages)
+    wall = time.perf_counter() - start
+    stop.set()
+    await tick
+    lags.sort()
+    mb = sum(len(p.encode("utf-8")) for p in pages) / 1e6
+    return {
+        "wall_s": round(wall, 2),
+        "pages_per_s": round(len(pages) / wall, 2),
+        "mb_per_s": round(mb / wall, 2),
+        "lag_p50_ms": round(statistics.median(lags), 1),
+        "lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 1),
+        "lag_max_ms": round(lags[-1], 1),
+        "texts": texts,
+    }
+
+
+async def main_async(args) -> dict:
+    from app.services.crawler import extractor
+
+    extractor.get_settings().CRAWLER_EXTRACT_WORKERS = args.workers
+    if args.pages_dir:
+        pages = [p.read_text(encoding="utf-8", errors="replace") for p in sorted(Path(args.pages_dir).glob("*.htm*"))]
+    else:
+        pages = [make_page(args.sections, seed) for seed in range(args.pages)]
+
+    async def run_legacy(items):
+        return [legacy_extract(html, f"u{i}")[1] for i, html in enumerate(items)]
+
+    async def run_inline(items):
+        return [extractor.extract_content(html, f"u{i}").text for i, html in enumerate(items)]
+
+    async def run_pool(items):
+        docs = await asyncio.gather(*(extractor.extract_content_async(html, f"u{i}") for i, html in enumerate(items)))
+        return [d.text for d in docs]
+
+    # 预热进程池（spawn 启动与子进程 import 不计入）
+    await run_pool([make_page(1, 0)] * args.workers)
+    results = {
+        "pages": len(pages),
+        "total_mb": round(sum(len(p.encode("utf-8")) for p in pages) / 1e6, 1),
+        "legacy": await measure(pages, run_legacy),
+        "inline": await measure(pages, run_inline),
+        "pool": await measure(pages, run_pool),
+    }
+    extractor.shutdown_extract_pool()
+    baseline = results["legacy"].pop("texts")
+    for mode in ("inline", "pool"):
+        results[mode]["same_text"] = results[mode].pop("texts") == baseline
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction throughput / event-loop lag benchmark")
+    parser.add_argument("--pages", type=int, default=8, help="生成的页面数")
+    parser.add_argument("--sections", type=int, default=600, help="每页章节数（600 约 4.4MB）")
+    parser.add_argument("--pages-dir", help="改用目录下保存的 .html 页面")
+    parser.add_argument("--workers", type=int, default=4, help="CRAWLER_EXTRACT_WORKERS")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print(f"pages={results['pages']} total={results['total_mb']}MB workers={args.workers}")
+        for mode in ("legacy", "inline", "pool"):
+            r = results[mode]
+            extra = f" same_text={r['same_text']}" if "same_text" in r else ""
+            print(f"  {mode:<7} wall={r['wall_s']:>6.2f}s {r['pages_per_s']:>5.2f} pages/s {r['mb_per_s']:>5.2f} MB/s "
+                  f"lag p50={r['lag_p50_ms']:>7.1f}ms p99={r['lag_p99_ms']:>7.1f}ms max={r['lag_max_ms']:>7.1f}ms{extra}")
+    return 0 if all(results[m]["same_text"] for m in ("inline", "pool")) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+分片审核基准
+合成招标/投标文件，用带注入延迟的本地假 LLM 跑 TenderService.run_review，
+对比不同分片并发数下的端到端耗时。
+假 LLM 延迟 = 固定开销 + 提示词 token 数 × 单 token 耗时，可按概率注入失败以观察重试。
+
+用法：
+    python scripts/bench/bench_review_shards.py --bid-chunks 2000 --base-latency 0.5 --concurrency 1 2 4 6
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+REQUIREMENTS = [
+    "投标人须具有有效的营业执照和ISO9001质量管理体系认证证书",
+    "投标报价不得超过最高限价，须提供分项报价表",
+    "设备技术参数须满足技术规格要求，提供技术偏离表",
+    "付款方式为验收合格后支付，履约保证金为合同金额的5%",
+    "工期不超过90日历天，质量标准为合格",
+    "投标文件须签字盖章，正本一份副本四份，密封提交",
+]
+
+
+def build_chunks(doc_id: str, count: int, specials: dict) -> list:
+    chunks = []
+    for i in range(count):
+        content = specials.get(i) or f"第{i}节 一般性说明文字，介绍公司情况与项目背景，内容与审核要点无直接关系。"
+        chunks.append({
+            "chunk_id": f"{doc_id}_c{i:05d}", "doc_id": doc_id, "title": doc_id,
+            "url": "", "position": i, "content": content,
+        })
+    return chunks
+
+
+class BenchDAO:
+    def __init__(self, tender_chunks: int, bid_chunks: int, seed: int):
+        rng = random.Random(seed)
+        tender_pos = rng.sample(range(tender_chunks), len(REQUIREMENTS))
+        bid_pos = rng.sample(range(bid_chunks), len(REQUIREMENTS))
+        self.chunks = {
+            "doc_tender": build_chunks("doc_tender", tender_chunks, dict(zip(tender_pos, REQUIREMENTS))),
+            "doc_bid": build_chunks(
+                "doc_bid", bid_chunks, {p: f"响应：{r}，我方完全满足。" for p, r in zip(bid_pos, REQUIREMENTS)}
+            ),
+        }
+        self.review_items = []
+
+    def list_assets(self, project_id):
+        return [
+            {"id": "a_tender", "kind": "tender", "kb_doc_id": "doc_tender"},
+            {"id": "a_bid", "kind": "bid", "kb_doc_id": "doc_bid"},
+        ]
+
+    def load_chunks_by_doc_ids(self, doc_ids, limit=None):
+        rows = [c for doc_id in sorted(doc_ids) for c in self.chunks.get(doc_id, [])]
+        return rows if limit is None else rows[:limit]
+
+    def replace_review_items(self, project_id, items):
+        self.review_items = items
+
+
+class FakeLLM:
+    """按提示词长度注入延迟；fail_rate 概率抛错"""
+
+    def __init__(self, base_latency: float, per_token: float, fail_rate: float, seed: int):
+        self.base_latency = base_latency
+        self.per_token = per_token
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def latency(self, text: str) -> float:
+        from app.services.tender.context_selector import estimate_tokens
+
+        return self.base_latency + estimate_tokens(text) * self.per_token
+
+    def chat(self, messages, model_id=None):
+        text = "".join(m["content"] for m in messages)
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+        time.sleep(self.latency(text))
+        if fail:
+            raise RuntimeError("injected failure")
+        dim = messages[1]["content"].split("\n", 1)[0].split("：", 1)[-1].split("（", 1)[0]
+        return json.dumps([{
+            "dimension": dim, "requirement_text": f"{dim}要求", "response_text": "已响应",
+            "result": "pass", "remark": "", "rigid": False,
+            "tender_evidence_chunk_ids": [], "bid_evidence_chunk_ids": [],
+        }], ensure_ascii=False)
+
+
+def run(args, concurrency: int) -> dict:
+    from app.services.tender_service import TenderService
+
+    dao = BenchDAO(args.tender_chunks, args.bid_chunks, args.seed)
+    llm = FakeLLM(args.base_latency, args.per_token, args.fail_rate, args.seed)
+    svc = TenderService(dao=dao, llm_orchestrator=llm)
+    svc.settings = svc.settings.model_copy(update={
+        "TENDER_REVIEW_SHARD_CONCURRENCY": concurrency,
+        "TENDER_REVIEW_SHARD_RETRY_BACKOFF": args.retry_backoff,
+    })
+    start = time.perf_counter()
+    try:
+        svc.run_review("bench", None, [], bidder_name=None, bid_asset_ids=[])
+        status = "ok"
+    except Exception as e:
+        status = f"error: {e}"
+    return {
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+        "status": status,
+        "calls": llm.calls,
+        "failures": llm.failures,
+        "items": len(dao.review_items),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sharded tender review benchmark")
+    parser.add_argument("--tender-chunks", type=int, default=400, help="招标文件片段数")
+    parser.add_argument("--bid-chunks", type=int, default=2000, help="投标文件片段数")
+    parser.add_argument("--base-latency", type=float, default=0.5, help="假 LLM 每次调用固定开销（秒）")
+    parser.add_argument("--per-token", type=float, default=0.0001, help="假 LLM 每个提示词 token 耗时（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="假 LLM 随机失败概率")
+    parser.add_argument("--retry-backoff", type=float, default=0.1, help="分片重试退避（秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 6], help="分片并发数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    args = parser.parse_args()
+
+    results = {}
+    for c in args.concurrency:
+        results[f"shards@{c}"] = run(args, c)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print(f"tender={args.tender_chunks} bid={args.bid_chunks} base_latency={args.base_latency}s "
+              f"per_token={args.per_token}s fail_rate={args.fail_rate}")
+        for name, stats in results.items():
+            extra = " ".join(f"{k}={v}" for k, v in stats.items() if k != "ms")
+            print(f"  {name:<12} {stats['ms']:>10.1f}ms  {extra}")
+    return 0 if all(r["status"] == "ok" for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
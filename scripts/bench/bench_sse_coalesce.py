@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+SSE delta 合并基准
+假 LLM 经 chat_stream_endpoint 输出 N 个 token，对比逐 token 发帧与按大小/时间合并发帧的
+帧数、字节数与服务端 CPU 时间，并校验客户端拼出的文本逐字节一致。
+
+用法：
+    python scripts/bench/bench_sse_coalesce.py --tokens 20000 --burst 16 --burst-interval-ms 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "backend"))
+
+VOCAB = ["的", "投标", "文件", "，", "。", "技术", " the", " model", "\n", "要求", "1", "2025", "ISO", "9001", "：", "😀"]
+
+
+def make_tokens(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [rng.choice(VOCAB) for _ in range(n)]
+
+
+def fake_turn(tokens: list, burst: int, burst_interval: float):
+    """上游按 burst 个 token 一批到达（模拟网络分包），批间隔 burst_interval 秒"""
+    from app.schemas.chat import ChatResponse
+
+    async def impl(req, request_id, stream_tokens=None):
+        for i, token in enumerate(tokens):
+            if i % burst == 0:
+                await asyncio.sleep(burst_interval)
+            await stream_tokens(token)
+        return ChatResponse(
+            answer="".join(tokens), llm_key="fake", llm_name="fake", session_id="bench",
+            search_mode="off", used_search=False,
+        )
+
+    return impl
+
+
+async def run_once(tokens: list, args, flush_chars: int, flush_ms: int) -> dict:
+    from app.routers import chat
+    from app.schemas.chat import ChatRequest
+
+    chat._chat_endpoint_impl = fake_turn(tokens, args.burst, args.burst_interval_ms / 1000)
+    chat.settings.CHAT_STREAM_FLUSH_CHARS = flush_chars
+    chat.settings.CHAT_STREAM_FLUSH_INTERVAL_MS = flush_ms
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    response = await chat.chat_stream_endpoint(ChatRequest(message="bench"))
+    frames, size, parts = 0, 0, []
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+        text = chunk.decode("utf-8")
+        if text.startswith("event: delta"):
+            frames += 1
+            parts.append(json.loads(text.split("\ndata: ", 1)[1])["text"])
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return {
+        "frames": frames,
+        "bytes": size,
+        "cpu_ms": round(cpu * 1000, 1),
+        "wall_ms": round(wall * 1000, 1),
+        "identical": "".join(parts).encode("utf-8") == "".join(tokens).encode("utf-8"),
+    }
+
+
+async def main_async(args) -> dict:
+    tokens = make_tokens(args.tokens, args.seed)
+    modes = {"per_token": (args.flush_chars, 0), "coalesced": (args.flush_chars, args.flush_ms)}
+    results = {}
+    for name, (chars, ms) in modes.items():
+        await run_once(tokens[:200], args, chars, ms)  # 预热
+        runs = [await run_once(tokens, args, chars, ms) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["cpu_ms"])
+        best["identical"] = all(r["identical"] for r in runs)
+        results[name] = best
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE delta coalescing benchmark")
+    parser.add_argument("--tokens", type=int, default=20000, help="假 LLM 输出 token 数")
+    parser.add_argument("--burst", type=int, default=16, help="每批到达的 token 数")
+    parser.add_argument("--burst-interval-ms", type=float, default=2, help="批间隔（毫秒）")
+    parser.add_argument("--flush-chars", type=int, default=256, help="CHAT_STREAM_FLUSH_CHARS")
+    parser.add_argument("--flush-ms", type=int, default=40, help="CHAT_STREAM_FLUSH_INTERVAL_MS")
+    parser.add_argument("--repeat", type=int, default=3, help="每种模式重复次数（取 CPU 最少的一次）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="输出 JSON 结果")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print(f"tokens={args.tokens} burst={args.burst}@{args.burst_interval_ms}ms "
+              f"flush={args.flush_chars}chars/{args.flush_ms}ms")
+        for name, stats in results.items():
+            print(f"  {name:<10} frames={stats['frames']:>6} bytes={stats['bytes']:>8} "
+                  f"cpu={stats['cpu_ms']:>8.1f}ms wall={stats['wall_ms']:>8.1f}ms identical={stats['identical']}")
+    return 0 if all(r["identical"] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
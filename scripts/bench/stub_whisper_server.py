@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+本地 Whisper 兼容桩服务（OpenAI /v1/audio/transcriptions, verbose_json）
+按音频时长模拟推理耗时，用于分段转写基准和联调，不做真实识别。
+
+用法：
+    python scripts/bench/stub_whisper_server.py --port 9009 --rtf 0.02 --parallel 4
+    然后在 ASR 配置中把 api_url 设为 http://127.0.0.1:9009/v1/audio/transcriptions
+"""
+import argparse
+import asyncio
+import io
+import random
+
+import soundfile as sf
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+
+
+def create_app(
+    rtf: float = 0.02,
+    base_latency: float = 0.2,
+    parallel: int = 4,
+    fail_rate: float = 0.0,
+    segment_seconds: float = 10.0,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Args:
+        rtf: 实时率，处理 1 秒音频耗时 rtf 秒
+        base_latency: 每个请求的固定开销（秒）
+        parallel: 服务端同时推理的请求数（模拟 GPU 并发上限）
+        fail_rate: 随机返回 503 的概率（用于验证片段重试）
+        segment_seconds: 返回的 segments 粒度
+    """
+    app = FastAPI(title="stub-whisper")
+    gate = asyncio.Semaphore(max(1, parallel))
+    rng = random.Random(seed)
+    app.state.requests = 0
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(
+        file: UploadFile = File(...),
+        model: str = Form("whisper"),
+        response_format: str = Form("verbose_json"),
+    ):
+        data = await file.read()
+        try:
+            duration = float(sf.info(io.BytesIO(data)).duration)
+        except Exception:
+            duration = len(data) / 32000.0  # 按 16kHz 16bit 估算
+
+        app.state.requests += 1
+        async with gate:
+            await asyncio.sleep(base_latency + duration * rtf)
+            if fail_rate and rng.random() < fail_rate:
+                raise HTTPException(status_code=503, detail="stub overloaded")
+
+        segments = []
+        t, idx = 0.0, 0
+        while t < duration:
+            end = min(duration, t + segment_seconds)
+            segments.append({"id": idx, "start": round(t, 3), "end": round(end, 3), "text": f"第{idx}句"})
+            t, idx = end, idx + 1
+        text = " ".join(s["text"] for s in segments)
+        if response_format != "verbose_json":
+            return {"text": text}
+        return {"text": text, "duration": duration, "language": "zh", "segments": segments}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="stub whisper server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9009)
+    parser.add_argument("--rtf", type=float, default=0.02, help="实时率")
+    parser.add_argument("--base-latency", type=float, default=0.2, help="每请求固定开销（秒）")
+    parser.add_argument("--parallel", type=int, default=4, help="服务端并发推理数")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="随机 503 概率")
+    args = parser.parse_args()
+
+    app = create_app(args.rtf, args.base_latency, args.parallel, args.fail_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()